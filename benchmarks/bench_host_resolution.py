@@ -0,0 +1,82 @@
+"""
+Benchmark: resolución de tenant por header Host con muchos dominios mapeados
+
+Compara el escaneo lineal anterior de TenantConfig.get_tenant_from_domain
+(búsqueda exacta + subcadena sobre domain_mapping) contra TenantHostIndex,
+sin cache y con el LRU caliente.
+
+Uso:
+    python -m benchmarks.bench_host_resolution [--domains 10000] [--iterations 20000]
+"""
+import argparse
+import random
+import timeit
+
+from config.host_index import TenantHostIndex
+
+
+def legacy_get_tenant_from_domain(domain_mapping, domain: str) -> str:
+    """Implementación anterior: exacta y luego subcadena en orden de inserción"""
+    domain_lower = domain.lower()
+    if domain_lower in domain_mapping:
+        return domain_mapping[domain_lower]
+    for domain_key, tenant_id in domain_mapping.items():
+        if domain_key in domain_lower:
+            return tenant_id
+    return "default"
+
+
+def build_mapping(count: int):
+    """Genera dominios sintéticos: la mitad exactos y la mitad comodín"""
+    mapping = {}
+    for i in range(count):
+        tenant_id = f"tenant{i % 500}"
+        if i % 2:
+            mapping[f"*.clinica{i}.example.com"] = tenant_id
+        else:
+            mapping[f"portal{i}.ips{i}.co"] = tenant_id
+    return mapping
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--domains", type=int, default=10000)
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    mapping = build_mapping(args.domains)
+    # El código anterior no entendía comodines: se mapea el dominio base
+    legacy_mapping = {domain.replace("*.", ""): tenant for domain, tenant in mapping.items()}
+
+    index = TenantHostIndex(mapping, cache_size=4096)
+    uncached = TenantHostIndex(mapping, cache_size=0)
+
+    last = args.domains - 1 if (args.domains - 1) % 2 == 0 else args.domains - 2
+    hosts = {
+        "exacto (último)": f"portal{last}.ips{last}.co:8080",
+        "comodín": f"app.clinica{args.domains - 1}.example.com",
+        "sin mapeo": "desconocido.otro-dominio.org",
+    }
+
+    print(f"Dominios mapeados: {args.domains} - iteraciones: {args.iterations}")
+    print(f"  {'host':<18} {'lineal':>12} {'índice':>12} {'índice+LRU':>12}")
+    for name, host in hosts.items():
+        legacy = min(timeit.repeat(lambda: legacy_get_tenant_from_domain(legacy_mapping, host.split(":")[0]),
+                                   number=max(1, args.iterations // 100), repeat=3)) / max(1, args.iterations // 100)
+        trie = min(timeit.repeat(lambda: uncached.resolve(host), number=args.iterations, repeat=3)) / args.iterations
+        cached = min(timeit.repeat(lambda: index.resolve(host), number=args.iterations, repeat=3)) / args.iterations
+        print(f"  {name:<18} {legacy * 1e6:10.2f}µs {trie * 1e6:10.2f}µs {cached * 1e6:10.2f}µs")
+
+    # Mezcla realista: muchos hosts distintos, algunos repetidos
+    rng = random.Random(42)
+    sample = [f"portal{i}.ips{i}.co" if i % 2 == 0 else f"www.clinica{i}.example.com"
+              for i in (rng.randrange(args.domains) for _ in range(args.iterations))]
+    start = timeit.default_timer()
+    for host in sample:
+        index.resolve(host)
+    elapsed = timeit.default_timer() - start
+    print(f"  mezcla aleatoria ({len(sample)} hosts): {elapsed / len(sample) * 1e6:.2f}µs/host, LRU {index.cache_info()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Benchmark: throughput de AuthService.is_authenticated con y sin la cache de claims
+
+Simula sesiones autenticadas con access tokens vigentes (JWT firmados con
+un secreto de prueba) y mide is_authenticated, que corre en cada request
+protegido, decodificando el token en cada llamada (cache desactivada)
+contra la cache de claims caliente.
+
+Uso:
+    python -m benchmarks.bench_is_authenticated [--sessions 1000] [--iterations 50000]
+"""
+import argparse
+import asyncio
+import logging
+import time
+from types import SimpleNamespace
+
+from jose import jwt
+
+from services.auth_service import AuthService
+from utils.claims_cache import claims_cache
+
+
+def build_sessions(count: int, tenant_id: str):
+    """Requests mínimos (state + session) con un token vigente cada uno"""
+    now = int(time.time())
+    requests = []
+    for i in range(count):
+        claims = {
+            "sub": str(i),
+            "username": f"usuario{i}",
+            "tenant_id": tenant_id,
+            "roles": ["user"],
+            "iat": now,
+            "exp": now + 3600,
+        }
+        token = jwt.encode(claims, "bench-secret", algorithm="HS256")
+        session = {"authenticated": True, "access_token": token, "tenant_id": tenant_id}
+        requests.append(SimpleNamespace(state=SimpleNamespace(tenant_id=tenant_id), session=session))
+    return requests
+
+
+async def measure(auth_service: AuthService, requests, iterations: int) -> float:
+    """Segundos por llamada a is_authenticated (recorriendo las sesiones en ronda)"""
+    for request in requests:
+        assert await auth_service.is_authenticated(request)
+    start = time.perf_counter()
+    for i in range(iterations):
+        await auth_service.is_authenticated(requests[i % len(requests)])
+    return (time.perf_counter() - start) / iterations
+
+
+async def run(sessions: int, iterations: int, tenant_id: str):
+    auth_service = AuthService()
+    requests = build_sessions(sessions, tenant_id)
+
+    print(f"Sesiones: {sessions} - iteraciones: {iterations}")
+    results = {}
+    for name, enabled in (("sin cache", False), ("con cache", True)):
+        claims_cache.enabled = enabled
+        claims_cache.clear()
+        best = min([await measure(auth_service, requests, iterations) for _ in range(3)])
+        results[name] = best
+        print(f"  {name:<10} {best * 1e6:8.2f} µs/llamada {1 / best:12,.0f} llamadas/s")
+
+    print(f"  Aceleración: x{results['sin cache'] / results['con cache']:.1f}")
+    print(f"  Cache: {claims_cache.stats()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=1000)
+    parser.add_argument("--iterations", type=int, default=50000)
+    parser.add_argument("--tenant", default="biomed")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    asyncio.run(run(args.sessions, args.iterations, args.tenant))
+
+
+if __name__ == "__main__":
+    main()
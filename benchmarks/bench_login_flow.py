@@ -0,0 +1,190 @@
+"""
+Benchmark: flujo login → dashboard → refresh → logout de punta a punta
+
+Levanta las APIs de prueba (fakes.auth_api y fakes.data_api) y corre el
+frontend en el mismo proceso (ASGI, con su lifespan) apuntando a ellas.
+Cada flujo usa un cliente con cookies propias y recorre:
+
+    login      POST /login (form) → 302 a /dashboard
+    dashboard  GET /dashboard (llama a la API de datos)
+    refresh    GET / (resuelve la sesión; el token emitido vence dentro de
+               TOKEN_REFRESH_AHEAD_SECONDS, así que dispara el refresco)
+    logout     GET /logout → 302 a /login
+
+Con --concurrency flujos en paralelo, repartidos en ronda entre los
+tenants, reporta el throughput y los percentiles p50/p95/p99 del flujo y
+de cada paso por tenant, y cuántas llamadas recibió cada API de prueba.
+Con --url el flujo se corre contra un frontend ya levantado.
+
+Uso:
+    python -m benchmarks.bench_login_flow [--flows 300] [--concurrency 20]
+        [--tenants biomed,coosalud,default] [--auth-latency 0.02] [--data-latency 0.01]
+        [--error-rate 0.0] [--token-ttl 30]
+"""
+import argparse
+import asyncio
+import contextlib
+import logging
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+import httpx
+
+STEPS = ("login", "dashboard", "refresh", "logout")
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Percentil por rango más cercano"""
+    ordered = sorted(values)
+    return ordered[max(int(round(fraction * len(ordered))) - 1, 0)]
+
+
+def start_fake(module: str, port: int, *options: str) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, "-m", module, "--port", str(port), *options],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+async def wait_until_ready(*urls: str, timeout: float = 15.0):
+    """Espera a que las APIs de prueba respondan /health"""
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        for url in urls:
+            while True:
+                try:
+                    await client.get(f"{url}/health")
+                    break
+                except httpx.TransportError:
+                    if time.monotonic() > deadline:
+                        raise RuntimeError(f"La API de prueba no respondió en {url}")
+                    await asyncio.sleep(0.1)
+
+
+async def run_flow(make_client, tenant: str, username: str, password: str) -> Dict[str, float]:
+    """Un flujo completo; devuelve la duración de cada paso (falla si un paso no responde lo esperado)"""
+    durations = {}
+    query = f"?tenant={tenant}"
+    async with make_client() as client:
+        async def step(name: str, method: str, path: str, expected: int, location: str = None, **kwargs):
+            start = time.perf_counter()
+            response = await client.request(method, f"{path}{query}", **kwargs)
+            durations[name] = time.perf_counter() - start
+            if response.status_code != expected or (location and not response.headers.get("location", "").startswith(location)):
+                raise RuntimeError(f"{name}: {response.status_code} {response.headers.get('location', '')}")
+
+        await step("login", "POST", "/login", 302, "/dashboard",
+                   data={"username": username, "password": password, "next_url": f"/dashboard{query}"})
+        await step("dashboard", "GET", "/dashboard", 200)
+        await step("refresh", "GET", "/", 302, "/dashboard")
+        await step("logout", "GET", "/logout", 302, "/login")
+    return durations
+
+
+async def drive(make_client, flows: int, concurrency: int, tenants: List[str], username: str, password: str):
+    """Corre los flujos con `concurrency` trabajadores e imprime los resultados"""
+    results: Dict[str, Dict[str, List[float]]] = defaultdict(lambda: defaultdict(list))
+    errors: Dict[str, List[str]] = defaultdict(list)
+    counter = iter(range(flows))
+
+    async def worker():
+        for index in counter:
+            tenant = tenants[index % len(tenants)]
+            start = time.perf_counter()
+            try:
+                durations = await run_flow(make_client, tenant, username, password)
+            except Exception as e:
+                errors[tenant].append(str(e))
+                continue
+            results[tenant]["flow"].append(time.perf_counter() - start)
+            for name, duration in durations.items():
+                results[tenant][name].append(duration)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    completed = sum(len(series["flow"]) for series in results.values())
+    print(f"Flujos: {completed}/{flows} en {elapsed:.2f}s - {completed / elapsed:.1f} flujos/s "
+          f"({completed * len(STEPS) / elapsed:.1f} requests/s) - concurrencia {concurrency}")
+    for tenant in tenants:
+        series = results.get(tenant, {})
+        print(f"  {tenant} ({len(series.get('flow', []))} ok, {len(errors[tenant])} errores)")
+        for name in ("flow",) + STEPS:
+            values = series.get(name)
+            if values:
+                print(f"    {name:<10} p50 {percentile(values, 0.50) * 1000:8.2f} ms  "
+                      f"p95 {percentile(values, 0.95) * 1000:8.2f} ms  p99 {percentile(values, 0.99) * 1000:8.2f} ms")
+        for message in sorted(set(errors[tenant]))[:3]:
+            print(f"    error: {message}")
+
+
+async def run(args):
+    auth_url = f"http://127.0.0.1:{args.auth_port}"
+    data_url = f"http://127.0.0.1:{args.data_port}"
+    await wait_until_ready(auth_url, data_url)
+    tenants = [tenant.strip() for tenant in args.tenants.split(",") if tenant.strip()]
+
+    if args.url:
+        def make_client():
+            return httpx.AsyncClient(base_url=args.url, timeout=30)
+        lifespan = contextlib.nullcontext()
+    else:
+        # La configuración se lee al importar: main se importa con el entorno ya armado
+        os.environ.update(AUTH_API_URL=auth_url, DATA_API_URL=data_url)
+        for name, value in (("RATE_LIMIT_ENABLED", "false"), ("APP_NAME", "SGC"),
+                            ("IMAGE_VARIANTS_ENABLED", "false"), ("AUDIT_ENABLED", "false"),
+                            ("TOKEN_REFRESH_AHEAD_SECONDS", "60")):
+            os.environ.setdefault(name, value)
+        import main
+
+        def make_client():
+            transport = httpx.ASGITransport(app=main.app, client=("127.0.0.1", 50000))
+            return httpx.AsyncClient(transport=transport, base_url="https://testserver", timeout=30)
+        lifespan = main.app.router.lifespan_context(main.app)
+
+    async with lifespan:
+        await drive(make_client, args.flows, args.concurrency, tenants, args.username, args.password)
+
+    async with httpx.AsyncClient() as client:
+        for name, url in (("auth", auth_url), ("datos", data_url)):
+            stats = (await client.get(f"{url}/admin/stats")).json()
+            print(f"  API de {name}: {stats['calls']} - errores inyectados: {sum(stats['injected_errors'].values())}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--flows", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--tenants", default="biomed,coosalud,default")
+    parser.add_argument("--username", default="demo")
+    parser.add_argument("--password", default="demo123")
+    parser.add_argument("--auth-port", type=int, default=9320)
+    parser.add_argument("--data-port", type=int, default=9321)
+    parser.add_argument("--auth-latency", type=float, default=0.02, help="Latencia de la API de auth (s)")
+    parser.add_argument("--data-latency", type=float, default=0.01, help="Latencia de la API de datos (s)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Latencia aleatoria extra de ambas APIs (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Proporción de errores 503 inyectados")
+    parser.add_argument("--token-ttl", type=int, default=30, help="Vida de los access tokens emitidos (s)")
+    parser.add_argument("--url", default=None, help="Frontend ya levantado (por defecto corre en proceso)")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    faults = ["--jitter", str(args.jitter), "--error-rate", str(args.error_rate)]
+    servers = [
+        start_fake("fakes.auth_api", args.auth_port, "--token-ttl", str(args.token_ttl),
+                   "--latency", str(args.auth_latency), *faults),
+        start_fake("fakes.data_api", args.data_port, "--latency", str(args.data_latency), *faults),
+    ]
+    try:
+        asyncio.run(run(args))
+    finally:
+        for server in servers:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Micro-benchmark: costo de render de la página de login por tenant
+
+Compara el camino anterior (reconstruir contexto, CSS, JS y meta tags en
+cada request) contra los bundles precalculados por TenantConfig.
+
+Uso:
+    python -m benchmarks.bench_login_render [--iterations 5000] [--tenant biomed]
+"""
+import argparse
+import logging
+import timeit
+from types import SimpleNamespace
+
+from config.tenant_bundle import (
+    build_tenant_context,
+    build_tenant_css,
+    build_tenant_javascript,
+    build_tenant_meta_tags,
+)
+from config.tenant_config import tenant_config
+
+
+def _login_context(tenant_context, tenant_meta, tenant_css, tenant_js):
+    """Replica el contexto que arma routers.auth.login_page"""
+    return {
+        "request": None,
+        "title": tenant_meta.get('title', 'Iniciar Sesión'),
+        "description": tenant_meta.get('description', ''),
+        "error": None,
+        "message": None,
+        "next_url": "/dashboard",
+        "tenant_css": tenant_css,
+        "tenant_js": tenant_js,
+        "tenant_meta": tenant_meta,
+        "settings": SimpleNamespace(),
+        **tenant_context,
+        "enable_registration": tenant_context['tenant']['features']['registration'],
+        "enable_password_reset": tenant_context['tenant']['features']['password_reset'],
+        "enable_remember_me": tenant_context['tenant']['features']['remember_me'],
+        "enable_2fa": tenant_context['tenant']['features']['two_factor'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=5000)
+    parser.add_argument("--tenant", default="biomed")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+
+    tenant_config.ensure_loaded()
+    tenant_id = args.tenant
+    branding = tenant_config.get_tenant_config(tenant_id)
+    bundle = tenant_config.get_tenant_bundle(tenant_id)
+    # Mismo entorno (y funciones globales) que usa routers.auth
+    from routers.auth import templates
+    template = templates.env.get_template("auth/login.html")
+
+    def legacy_context():
+        context = build_tenant_context(tenant_id, branding)
+        return _login_context(
+            context,
+            build_tenant_meta_tags(branding),
+            build_tenant_css(branding),
+            build_tenant_javascript(tenant_id, context),
+        )
+
+    def bundle_context():
+        return _login_context(bundle.context, bundle.meta_tags, bundle.css, bundle.js)
+
+    cases = [
+        ("contexto (antes)", legacy_context),
+        ("contexto (bundle)", bundle_context),
+        ("render completo (antes)", lambda: template.render(legacy_context())),
+        ("render completo (bundle)", lambda: template.render(bundle_context())),
+    ]
+
+    print(f"Tenant: {tenant_id} - iteraciones: {args.iterations}")
+    results = {}
+    for name, func in cases:
+        func()  # calentamiento
+        best = min(timeit.repeat(func, number=args.iterations, repeat=3))
+        results[name] = best / args.iterations * 1e6
+        print(f"  {name:<26} {results[name]:8.2f} µs/request")
+
+    print(f"  Ahorro en contexto: {results['contexto (antes)'] - results['contexto (bundle)']:.2f} µs/request")
+    print(f"  Ahorro en render:   {results['render completo (antes)'] - results['render completo (bundle)']:.2f} µs/request")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Benchmark: bytes de headers y costo por request de la sesión, cookie vs servidor
+
+Arma una sesión como la de AuthService.create_session (access token RS256
+real de fakes.auth_api, refresh token, user_data, roles, IP y user agent) y
+mide, para cada modo de CustomSessionMiddleware, los bytes del header
+Cookie del request y del Set-Cookie de la respuesta, y el tiempo por
+request del middleware (llamando a la app ASGI directamente) en dos casos:
+
+    lectura   el request solo lee la sesión
+    cambio    el request modifica last_activity (como SessionEnhancerMiddleware)
+
+Modos: cookie (firmada, Starlette), memory, sqlite y redis (si hay REDIS_URL).
+
+Uso:
+    python -m benchmarks.bench_session_modes [--iterations 5000]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import time
+from datetime import datetime
+from http.cookies import SimpleCookie
+
+from config.settings import settings
+from fakes import auth_api
+from middleware.session_middleware import CustomSessionMiddleware
+from services.session_store import MemoryBackend, RedisBackend, SessionStore, SqliteBackend
+
+USER_AGENT = "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36"
+
+
+def login_session() -> dict:
+    """Sesión con los mismos campos que guardan create_session y SessionEnhancerMiddleware"""
+    tokens = auth_api.issue_tokens("admin", "biomed")
+    claims = auth_api.jwt.get_unverified_claims(tokens["access_token"])
+    now = datetime.now().isoformat()
+    return {
+        "access_token": tokens["access_token"],
+        "refresh_token": tokens["refresh_token"],
+        "token_type": tokens["token_type"],
+        "tenant_id": "biomed",
+        "user_data": claims,
+        "user_id": claims["sub"],
+        "username": claims["username"],
+        "user_roles": claims["roles"],
+        "authenticated": True,
+        "login_time": now,
+        "login_tenant": "biomed",
+        "session_id": tokens["session_id"],
+        "last_activity": now,
+        "ip_address": "203.0.113.10",
+        "user_agent": USER_AGENT,
+    }
+
+
+def build_app(store, session_data: dict):
+    """App ASGI mínima: /login crea la sesión, /touch la modifica, el resto solo la lee"""
+    async def endpoint(scope, receive, send):
+        session = scope["session"]
+        if scope["path"] == "/login":
+            session.update(session_data)
+        elif scope["path"] == "/touch":
+            session["last_activity"] = datetime.now().isoformat()
+        else:
+            session.get("access_token")
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    return CustomSessionMiddleware(endpoint, secret_key="bench-secret", session_cookie="session_id",
+                                   max_age=settings.SESSION_MAX_AGE, https_only=True, store=store)
+
+
+async def call(app, path: str, cookie: str = ""):
+    """Ejecuta un request; devuelve el valor del Set-Cookie (o "")"""
+    headers = [(b"cookie", cookie.encode("latin-1"))] if cookie else []
+    scope = {"type": "http", "method": "GET", "path": path, "headers": headers, "query_string": b""}
+    set_cookie = ""
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        nonlocal set_cookie
+        if message["type"] == "http.response.start":
+            for name, value in message["headers"]:
+                if name == b"set-cookie":
+                    set_cookie = value.decode("latin-1")
+
+    await app(scope, receive, send)
+    return set_cookie
+
+
+def cookie_from(set_cookie: str) -> str:
+    morsel = next(iter(SimpleCookie(set_cookie).values()))
+    return f"{morsel.key}={morsel.value}"
+
+
+async def measure(name: str, store, session_data: dict, iterations: int):
+    app = build_app(store, session_data)
+    cookie = cookie_from(await call(app, "/login"))
+    if store is not None:
+        await store.flush()
+
+    results = {}
+    for case, path in (("lectura", "/page"), ("cambio", "/touch")):
+        set_cookie = await call(app, path, cookie)
+        if set_cookie:
+            cookie = cookie_from(set_cookie)
+        start = time.perf_counter()
+        for _ in range(iterations):
+            set_cookie = await call(app, path, cookie)
+            if set_cookie:
+                cookie = cookie_from(set_cookie)
+        elapsed = (time.perf_counter() - start) / iterations
+        if store is not None:
+            await store.flush()
+        results[case] = (elapsed, len(set_cookie))
+
+    print(f"  {name:<7} Cookie {len('Cookie: ' + cookie):5d} B  "
+          f"lectura {results['lectura'][0] * 1e6:7.1f} µs (Set-Cookie {results['lectura'][1]:4d} B)  "
+          f"cambio {results['cambio'][0] * 1e6:7.1f} µs (Set-Cookie {results['cambio'][1]:4d} B)")
+    if store is not None:
+        await store.aclose()
+
+
+async def run(iterations: int):
+    session_data = login_session()
+    print(f"Iteraciones por caso: {iterations}")
+    await measure("cookie", None, session_data, iterations)
+    await measure("memory", SessionStore(MemoryBackend(), ttl=settings.SESSION_MAX_AGE), session_data, iterations)
+    with tempfile.TemporaryDirectory() as directory:
+        backend = SqliteBackend(os.path.join(directory, "sessions.sqlite3"))
+        await measure("sqlite", SessionStore(backend, ttl=settings.SESSION_MAX_AGE), session_data, iterations)
+    if settings.REDIS_URL:
+        try:
+            backend = RedisBackend(settings.REDIS_URL)
+            await backend.client.ping()
+        except Exception as e:
+            print(f"  redis   no disponible ({e})")
+        else:
+            await measure("redis", SessionStore(backend, ttl=settings.SESSION_MAX_AGE), session_data, iterations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=5000)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    asyncio.run(run(args.iterations))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Benchmark de escalabilidad del registro de tenants (modo eager vs lazy)
+
+Genera N archivos de tenant sintéticos y, en un subproceso por escenario
+para aislar la memoria, mide tiempo de arranque de TenantConfig, RSS
+resultante y latencia del primer acceso a un tenant.
+
+Uso:
+    python -m benchmarks.bench_tenant_registry [--tenants 1000 10000] [--cache-size 256]
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BASE_TENANT_FILE = "config/tenants/biomed.json"
+
+
+def rss_mb() -> float:
+    """RSS actual del proceso en MB (Linux: /proc/self/status)"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def generate_tenants(directory: str, count: int):
+    """Crea `count` archivos de tenant a partir de la config de biomed"""
+    with open(BASE_TENANT_FILE, encoding="utf-8") as f:
+        base = json.load(f)
+    for i in range(count):
+        data = dict(base)
+        data["company_name"] = f"Clínica {i}"
+        data["primary_color"] = f"#{i % 0xFFFFFF:06x}"
+        data["support_email"] = f"soporte@clinica{i}.com"
+        with open(os.path.join(directory, f"tenant{i}.json"), "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+
+
+def run_worker(directory: str, lazy: bool, cache_size: int, count: int):
+    """Escenario aislado: se ejecuta en un subproceso y reporta JSON"""
+    logging.disable(logging.CRITICAL)
+    rss_before = rss_mb()
+
+    from config.tenant_config import TenantConfig
+
+    rss_imported = rss_mb()
+    start = time.perf_counter()
+    config = TenantConfig(directory, lazy=lazy, cache_size=cache_size)
+    config.ensure_loaded()
+    startup = time.perf_counter() - start
+    rss_after = rss_mb()
+
+    rng = random.Random(7)
+    probes = [f"tenant{rng.randrange(count)}" for _ in range(50)]
+
+    start = time.perf_counter()
+    for tenant_id in probes:
+        config.get_tenant_bundle(tenant_id)
+    first_hit = (time.perf_counter() - start) / len(probes)
+
+    start = time.perf_counter()
+    for tenant_id in probes:
+        config.get_tenant_bundle(tenant_id)
+    warm_hit = (time.perf_counter() - start) / len(probes)
+
+    start = time.perf_counter()
+    valid = all(config.is_valid_tenant(tenant_id) for tenant_id in probes)
+    is_valid = (time.perf_counter() - start) / len(probes)
+
+    print(json.dumps({
+        "startup_s": startup,
+        "rss_mb": rss_after - rss_imported,
+        "rss_total_mb": rss_after,
+        "rss_baseline_mb": rss_before,
+        "first_hit_us": first_hit * 1e6,
+        "warm_hit_us": warm_hit * 1e6,
+        "is_valid_us": is_valid * 1e6,
+        "tenants": len(config.get_available_tenants()),
+        "valid": valid,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tenants", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--cache-size", type=int, default=256)
+    parser.add_argument("--worker", nargs=4, metavar=("DIR", "MODE", "CACHE", "COUNT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        directory, mode, cache_size, count = args.worker
+        run_worker(directory, mode == "lazy", int(cache_size), int(count))
+        return
+
+    print(f"{'tenants':>8} {'modo':>6} {'arranque':>10} {'RSS':>9} {'1er acceso':>11} {'caliente':>10} {'is_valid':>9}")
+    for count in args.tenants:
+        directory = tempfile.mkdtemp(prefix="tenants-bench-")
+        try:
+            generate_tenants(directory, count)
+            for mode in ("eager", "lazy"):
+                output = subprocess.run(
+                    [sys.executable, "-m", "benchmarks.bench_tenant_registry",
+                     "--worker", directory, mode, str(args.cache_size), str(count)],
+                    check=True, capture_output=True, text=True,
+                ).stdout
+                result = json.loads(output.strip().splitlines()[-1])
+                print(f"{count:>8} {mode:>6} {result['startup_s'] * 1000:>8.1f}ms {result['rss_mb']:>7.1f}MB "
+                      f"{result['first_hit_us']:>9.1f}µs {result['warm_hit_us']:>8.2f}µs {result['is_valid_us']:>7.2f}µs")
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Benchmark de arranque: JSON + validación completa vs snapshot compilado
+
+Genera N tenants sintéticos, compila el snapshot con
+config.tenant_snapshot y mide, en un subproceso por escenario, el tiempo de
+construir TenantConfig leyendo los JSON y leyendo el snapshot (mmap +
+model_construct). También mide el caso de snapshot desactualizado, que
+debe volver a los JSON.
+
+Uso:
+    python -m benchmarks.bench_tenant_snapshot [--tenants 1000 10000] [--runs 3]
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_tenant_registry import generate_tenants
+
+
+def run_worker(directory: str, snapshot_path: str):
+    """Escenario aislado: se ejecuta en un subproceso y reporta JSON"""
+    logging.disable(logging.CRITICAL)
+
+    from config.tenant_config import TenantBranding, TenantConfig, scan_tenant_dir
+    from utils.metrics import metrics
+
+    # Fase que reemplaza el snapshot: leer + validar (o construir) las configs
+    start = time.perf_counter()
+    scanned = scan_tenant_dir(directory)
+    try:
+        sources = {tenant_id: signature for tenant_id, (_, signature) in scanned.items()}
+        loaded = TenantConfig.load_snapshot_configs(snapshot_path, sources) if snapshot_path else None
+    except Exception:
+        loaded = None
+    if loaded is None:
+        loaded = {}
+        for tenant_id, (path, _) in scanned.items():
+            with open(path, encoding="utf-8") as f:
+                loaded[tenant_id] = TenantBranding(**json.load(f))
+    load = time.perf_counter() - start
+
+    # Arranque completo (incluye construir los bundles de render)
+    start = time.perf_counter()
+    config = TenantConfig(directory, lazy=False, snapshot_path=snapshot_path)
+    config.ensure_loaded()
+    startup = time.perf_counter() - start
+
+    print(json.dumps({
+        "load_s": load,
+        "startup_s": startup,
+        "tenants": len(config.get_available_tenants()),
+        "fallbacks": metrics.get_counter("tenant_snapshot_fallbacks_total"),
+    }))
+
+
+def measure(directory: str, snapshot_path: str, runs: int) -> dict:
+    """Mejor tiempo de cada fase en `runs` subprocesos nuevos"""
+    best = None
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_tenant_snapshot", "--worker", directory, snapshot_path],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        if best is None:
+            best = result
+        else:
+            best = {key: min(best[key], result[key]) if key.endswith("_s") else result[key] for key in result}
+    return best
+
+
+def report(count: int, name: str, result: dict):
+    """Imprime una fila de resultados"""
+    print(f"{count:>8} {name:>24} {result['load_s'] * 1000:>11.1f}ms {result['startup_s'] * 1000:>8.1f}ms "
+          f"{result['tenants']:>8} {result['fallbacks']:>9.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tenants", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--worker", nargs=2, metavar=("DIR", "SNAPSHOT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(*args.worker)
+        return
+
+    from config.tenant_snapshot import compile_tenants, write_snapshot
+
+    print(f"{'tenants':>8} {'escenario':>24} {'leer+validar':>13} {'arranque':>10} {'tenants':>8} {'fallbacks':>9}")
+    for count in args.tenants:
+        directory = tempfile.mkdtemp(prefix="tenants-bench-")
+        try:
+            generate_tenants(directory, count)
+            snapshot_path = os.path.join(directory, "tenants.snapshot")
+
+            start = time.perf_counter()
+            payload, _ = compile_tenants(directory)
+            write_snapshot(payload, snapshot_path)
+            build = time.perf_counter() - start
+            size_kb = os.path.getsize(snapshot_path) / 1024
+
+            scenarios = [("JSON", ""), ("snapshot", snapshot_path)]
+            for name, path in scenarios:
+                result = measure(directory, path, args.runs)
+                report(count, name, result)
+
+            # Un archivo modificado invalida el snapshot: se cargan los JSON
+            with open(os.path.join(directory, "tenant0.json"), "a", encoding="utf-8") as f:
+                f.write("\n")
+            result = measure(directory, snapshot_path, args.runs)
+            report(count, "snapshot desactualizado", result)
+            print(f"{'':>8} compilación {build * 1000:.0f}ms, snapshot {size_kb:.0f}KB")
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark: latencia del primer request a la API de auth con y sin warmup
+
+Levanta la API de auth de prueba (fakes.auth_api) y, para cada modo, crea
+un SharedHttpClient nuevo (como después de un deploy), opcionalmente
+pre-abre conexiones con warmup y mide el primer login contra la mediana de
+los siguientes, con el desglose por fase (connect, tls, ttfb) que publica
+el transporte.
+
+Uso:
+    python -m benchmarks.bench_upstream_warmup [--requests 1000] [--port 9310]
+"""
+import argparse
+import asyncio
+import logging
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+from services.http_clients import SharedHttpClient
+from utils.metrics import metrics
+
+
+async def wait_until_ready(url: str, timeout: float = 15.0):
+    """Espera a que la API de prueba responda"""
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get(f"{url}/health")
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.1)
+    raise RuntimeError(f"La API de prueba no respondió en {url}")
+
+
+async def measure(url: str, name: str, warmup: int, requests: int):
+    """Primer request, mediana y percentil 99 de los siguientes (en ms)"""
+    client = SharedHttpClient(name, base_url=url, warmup_connections=warmup, warmup_path="/health")
+    client.open()
+    if warmup:
+        await client.warmup()
+    body = {"username": "admin", "password": "admin123"}
+    headers = {"X-Tenant-ID": "biomed"}
+    durations = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        response = await client.client.post(f"{url}/auth/login", json=body, headers=headers)
+        response.raise_for_status()
+        durations.append((time.perf_counter() - start) * 1000)
+    stats = client.stats()
+    await client.aclose()
+    rest = sorted(durations[1:])
+    return {
+        "first": durations[0],
+        "p50": statistics.median(rest),
+        "p99": rest[int(len(rest) * 0.99) - 1],
+        "new_connections": stats["new_connections"],
+        "phases": stats["phases_ms"],
+    }
+
+
+async def run(port: int, requests: int, warmup: int):
+    url = f"http://127.0.0.1:{port}"
+    await wait_until_ready(url)
+    print(f"Requests por modo: {requests} - conexiones de warmup: {warmup}")
+    for name, connections in (("sin warmup", 0), ("con warmup", warmup)):
+        metrics.reset()
+        result = await measure(url, name.replace(" ", "_"), connections, requests)
+        print(f"  {name:<11} primero {result['first']:7.2f} ms  p50 {result['p50']:6.2f} ms  "
+              f"p99 {result['p99']:6.2f} ms  conexiones nuevas {result['new_connections']}  "
+              f"fases {result['phases']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--port", type=int, default=9310)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    server = subprocess.Popen([sys.executable, "-m", "fakes.auth_api", "--port", str(args.port)],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        asyncio.run(run(args.port, args.requests, args.warmup))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
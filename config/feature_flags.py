@@ -0,0 +1,131 @@
+"""
+Feature flags precompilados por tenant
+
+Los flags de cada tenant se compilan una sola vez al construir su bundle:
+los campos enable_* de TenantBranding y el diccionario `features`
+(flag -> true/false o porcentaje 0-100 de rollout). El resultado es un
+objeto inmutable donde consultar un flag es una búsqueda en un frozenset,
+sin crear objetos. Los rollouts parciales se evalúan con un hash estable
+de (tenant, flag, usuario), así que cada usuario ve siempre la misma
+variante en todos los workers.
+"""
+import hashlib
+from types import MappingProxyType
+from typing import Any, Dict, Iterator, Mapping, Optional
+
+# Nombres alternativos aceptados por is_tenant_feature_enabled
+FEATURE_ALIASES = {"2fa": "two_factor"}
+
+# Flags que vienen de campos enable_* con otro nombre
+LEGACY_FIELD_NAMES = {"enable_2fa": "two_factor"}
+
+
+def rollout_bucket(tenant_id: str, feature: str, user_id: Any) -> int:
+    """
+    Cubeta 0-99 estable para un usuario dentro del rollout de un flag
+
+    Args:
+        tenant_id: ID del tenant
+        feature: Nombre del flag
+        user_id: ID del usuario
+
+    Returns:
+        int: Cubeta en [0, 100)
+    """
+    digest = hashlib.sha256(f"{tenant_id}:{feature}:{user_id}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % 100
+
+
+class TenantFeatureFlags(Mapping):
+    """
+    Flags compilados de un tenant
+
+    Como Mapping devuelve el valor estático de cada flag (un rollout parcial
+    vale False sin usuario), así sigue funcionando donde antes había un dict
+    en tenant_context['tenant']['features'].
+    """
+    __slots__ = ("tenant_id", "enabled", "rollouts", "_values")
+
+    def __init__(self, tenant_id: str, values: Dict[str, bool], rollouts: Dict[str, int]):
+        """
+        Inicializa los flags (usar compile_feature_flags)
+
+        Args:
+            tenant_id: ID del tenant
+            values: Flag -> habilitado para todos
+            rollouts: Flag -> porcentaje de usuarios (1-99)
+        """
+        self.tenant_id = tenant_id
+        self.enabled = frozenset(name for name, value in values.items() if value)
+        self.rollouts = MappingProxyType(dict(rollouts))
+        self._values = MappingProxyType(dict(values))
+
+    def is_enabled(self, feature: str, user_id: Optional[Any] = None) -> bool:
+        """
+        Verifica si un flag está habilitado
+
+        Args:
+            feature: Nombre del flag (acepta alias como "2fa")
+            user_id: ID del usuario para evaluar rollouts parciales
+
+        Returns:
+            bool: True si está habilitado (para ese usuario)
+        """
+        if feature in self.enabled:
+            return True
+        percentage = self.rollouts.get(feature)
+        if percentage is None or user_id is None:
+            return False
+        return rollout_bucket(self.tenant_id, FEATURE_ALIASES.get(feature, feature), user_id) < percentage
+
+    def __getitem__(self, feature: str) -> bool:
+        return self._values[feature]
+
+    def get(self, feature: str, default: Any = None) -> Any:
+        return self._values.get(feature, default)
+
+    def __iter__(self) -> Iterator[str]:
+        return (name for name in self._values if name not in FEATURE_ALIASES)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return f"TenantFeatureFlags({self.tenant_id!r}, enabled={sorted(self.enabled)}, rollouts={dict(self.rollouts)})"
+
+
+def compile_feature_flags(tenant_id: str, branding) -> TenantFeatureFlags:
+    """
+    Compila los flags de un tenant
+
+    Args:
+        tenant_id: ID del tenant
+        branding: TenantBranding del tenant
+
+    Returns:
+        TenantFeatureFlags: Flags inmutables
+    """
+    values: Dict[str, bool] = {}
+    rollouts: Dict[str, int] = {}
+
+    for field_name in type(branding).model_fields:
+        if field_name.startswith("enable_"):
+            name = LEGACY_FIELD_NAMES.get(field_name, field_name[len("enable_"):])
+            values[name] = bool(getattr(branding, field_name))
+
+    for name, value in (getattr(branding, "features", None) or {}).items():
+        if isinstance(value, bool):
+            values[name] = value
+        elif 0 < value < 100:
+            values[name] = False
+            rollouts[name] = int(value)
+        else:
+            values[name] = value >= 100
+
+    for alias, name in FEATURE_ALIASES.items():
+        if name in values:
+            values[alias] = values[name]
+        if name in rollouts:
+            rollouts[alias] = rollouts[name]
+
+    return TenantFeatureFlags(tenant_id, values, rollouts)
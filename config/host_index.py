@@ -0,0 +1,149 @@
+"""
+Índice de dominios -> tenant para resolver el tenant por el header Host
+
+Los dominios se guardan en un trie de etiquetas invertidas
+(www.biomed.com -> com, biomed, www), así que la búsqueda cuesta
+O(etiquetas del host) sin importar cuántos dominios haya mapeados.
+Soporta coincidencia exacta, comodín de subdominio (*.biomed.com) y
+descarta el puerto. Los resultados recientes se guardan en un LRU acotado.
+"""
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+# Marca para distinguir "no está en cache" de "cacheado como sin tenant"
+_MISSING = object()
+
+
+class _HostNode:
+    """Nodo del trie de etiquetas"""
+    __slots__ = ("children", "exact", "wildcard")
+
+    def __init__(self):
+        self.children: Dict[str, "_HostNode"] = {}
+        self.exact: Optional[str] = None
+        self.wildcard: Optional[str] = None
+
+
+def normalize_host(host: str) -> str:
+    """
+    Normaliza un header Host: minúsculas, sin puerto ni punto final
+
+    Args:
+        host: Valor del header Host (p. ej. "Portal.Biomed.com:8080")
+
+    Returns:
+        str: Host normalizado (p. ej. "portal.biomed.com")
+    """
+    host = host.strip().lower()
+    if host.startswith("["):
+        # IPv6 literal: [::1]:8080
+        end = host.find("]")
+        return host[1:end] if end != -1 else host[1:]
+    if host.count(":") == 1:
+        host = host.split(":", 1)[0]
+    return host.rstrip(".")
+
+
+class TenantHostIndex:
+    """
+    Índice de sufijos de dominio con cache LRU host -> tenant
+    """
+
+    def __init__(self, domain_mapping: Optional[Dict[str, str]] = None, cache_size: int = 4096):
+        """
+        Inicializa el índice
+
+        Args:
+            domain_mapping: Dominio -> tenant_id. Un dominio "*.ejemplo.com"
+                            aplica a cualquier subdominio de ejemplo.com
+            cache_size: Máximo de hosts recordados en el LRU
+        """
+        self._root = _HostNode()
+        self._size = 0
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, Optional[str]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+        for domain, tenant_id in (domain_mapping or {}).items():
+            self.add(domain, tenant_id)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, domain: str, tenant_id: str):
+        """
+        Añade un dominio al índice
+
+        Args:
+            domain: Dominio exacto o comodín (*.ejemplo.com)
+            tenant_id: Tenant asociado
+        """
+        domain = normalize_host(domain)
+        wildcard = domain.startswith("*.")
+        if wildcard:
+            domain = domain[2:]
+
+        node = self._root
+        for label in reversed(domain.split(".")):
+            child = node.children.get(label)
+            if child is None:
+                child = node.children[label] = _HostNode()
+            node = child
+
+        if wildcard:
+            node.wildcard = tenant_id
+        else:
+            node.exact = tenant_id
+        self._size += 1
+
+        with self._cache_lock:
+            self._cache.clear()
+
+    def resolve(self, host: str) -> Optional[str]:
+        """
+        Resuelve el tenant de un host
+
+        La coincidencia exacta gana; si no, aplica el comodín más específico.
+
+        Args:
+            host: Valor del header Host
+
+        Returns:
+            Optional[str]: tenant_id o None si ningún dominio coincide
+        """
+        with self._cache_lock:
+            cached = self._cache.get(host, _MISSING)
+            if cached is not _MISSING:
+                self._cache.move_to_end(host)
+                return cached
+
+        tenant_id = self._lookup(normalize_host(host))
+
+        with self._cache_lock:
+            self._cache[host] = tenant_id
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+        return tenant_id
+
+    def _lookup(self, host: str) -> Optional[str]:
+        """Recorre el trie sin usar la cache"""
+        labels = host.split(".")
+        node = self._root
+        best_wildcard = None
+
+        for remaining in range(len(labels) - 1, -1, -1):
+            node = node.children.get(labels[remaining])
+            if node is None:
+                return best_wildcard
+            # El comodín solo aplica si queda al menos una etiqueta más
+            if node.wildcard is not None and remaining > 0:
+                best_wildcard = node.wildcard
+
+        return node.exact if node.exact is not None else best_wildcard
+
+    def cache_info(self) -> Dict[str, int]:
+        """Tamaño actual y máximo del LRU"""
+        with self._cache_lock:
+            return {"size": len(self._cache), "max_size": self.cache_size, "domains": self._size}
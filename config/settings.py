@@ -19,18 +19,102 @@ class Settings(BaseSettings):
     AUTH_API_URL: str = os.getenv("AUTH_API_URL", "http://localhost:9000")
     DATA_API_URL: str = os.getenv("DATA_API_URL", "http://localhost:8000")
     
+    # Pool de conexiones compartido con la API de auth
+    AUTH_HTTP_MAX_CONNECTIONS: int = int(os.getenv("AUTH_HTTP_MAX_CONNECTIONS", "100"))
+    AUTH_HTTP_MAX_KEEPALIVE: int = int(os.getenv("AUTH_HTTP_MAX_KEEPALIVE", "20"))
+    AUTH_HTTP_KEEPALIVE_EXPIRY: float = float(os.getenv("AUTH_HTTP_KEEPALIVE_EXPIRY", "30"))  # segundos
+    AUTH_HTTP_POOL_TIMEOUT: float = float(os.getenv("AUTH_HTTP_POOL_TIMEOUT", "5"))  # espera por conexión libre
+    AUTH_HTTP_WARMUP_CONNECTIONS: int = int(os.getenv("AUTH_HTTP_WARMUP_CONNECTIONS", "2"))  # pre-abiertas al arrancar
+    AUTH_HTTP_WARMUP_PATH: str = os.getenv("AUTH_HTTP_WARMUP_PATH", "/health")
+    
+    # Pool de conexiones compartido con la API de datos
+    DATA_HTTP_MAX_CONNECTIONS: int = int(os.getenv("DATA_HTTP_MAX_CONNECTIONS", "100"))
+    DATA_HTTP_MAX_KEEPALIVE: int = int(os.getenv("DATA_HTTP_MAX_KEEPALIVE", "20"))
+    DATA_HTTP_KEEPALIVE_EXPIRY: float = float(os.getenv("DATA_HTTP_KEEPALIVE_EXPIRY", "30"))  # segundos
+    DATA_HTTP_POOL_TIMEOUT: float = float(os.getenv("DATA_HTTP_POOL_TIMEOUT", "5"))  # espera por conexión libre
+    DATA_HTTP_WARMUP_CONNECTIONS: int = int(os.getenv("DATA_HTTP_WARMUP_CONNECTIONS", "2"))  # pre-abiertas al arrancar
+    DATA_HTTP_WARMUP_PATH: str = os.getenv("DATA_HTTP_WARMUP_PATH", "/health")
+    
+    # HTTP/2 con las APIs (requiere el paquete h2 y URLs https)
+    UPSTREAM_HTTP2: bool = os.getenv("UPSTREAM_HTTP2", "False").lower() == "true"
+    UPSTREAM_WARMUP_TIMEOUT: float = float(os.getenv("UPSTREAM_WARMUP_TIMEOUT", "3"))  # segundos máximos al arrancar
+    
     # Configuración de seguridad
     SECRET_KEY: str = os.getenv("SECRET_KEY", "change-this-secret-key-in-production")
     
     # ✅ CONFIGURACIÓN SIMPLE DE TENANT - SOLO ESTO NECESITAS CAMBIAR
     DEFAULT_TENANT: str = os.getenv("DEFAULT_TENANT", "biomed")  # 🎯 CAMBIA AQUÍ: biomed, coosalud, default, etc.
     
+    # Detección de tenant por header Host (dominio exacto, *.dominio o subdominio)
+    TENANT_HOST_DETECTION: bool = os.getenv("TENANT_HOST_DETECTION", "True").lower() == "true"
+    TENANT_DOMAIN_MAPPING: str = os.getenv("TENANT_DOMAIN_MAPPING", "")  # "portal.ips.com=biomed,*.coosalud.co=coosalud"
+    TENANT_HOST_CACHE_SIZE: int = int(os.getenv("TENANT_HOST_CACHE_SIZE", "4096"))
+    
+    # Carga lazy de tenants: solo se indexan los archivos al iniciar y cada
+    # tenant se valida en su primer uso, con un LRU acotado en memoria
+    TENANT_LAZY_LOADING: bool = os.getenv("TENANT_LAZY_LOADING", "False").lower() == "true"
+    TENANT_CACHE_SIZE: int = int(os.getenv("TENANT_CACHE_SIZE", "256"))
+    
+    # Hilos para leer los JSON de tenants al arrancar (0 = según CPUs, máximo 8)
+    TENANT_LOAD_WORKERS: int = int(os.getenv("TENANT_LOAD_WORKERS", "0"))
+    
+    # Snapshot compilado (python -m config.tenant_snapshot build); vacío = desactivado
+    TENANT_SNAPSHOT_PATH: str = os.getenv("TENANT_SNAPSHOT_PATH", "config/tenants.snapshot")
+    
+    # Fuente remota de tenants: servicio de configuración HTTP (vacío = solo archivos)
+    TENANT_CONFIG_URL: str = os.getenv("TENANT_CONFIG_URL", "")  # p. ej. http://localhost:9100/tenants
+    TENANT_CONFIG_CACHE_PATH: str = os.getenv("TENANT_CONFIG_CACHE_PATH", "config/tenants.remote.json")
+    TENANT_CONFIG_REFRESH_INTERVAL: float = float(os.getenv("TENANT_CONFIG_REFRESH_INTERVAL", "30"))  # segundos
+    TENANT_CONFIG_TIMEOUT: float = float(os.getenv("TENANT_CONFIG_TIMEOUT", "5"))  # segundos
+    
+    # Recarga en caliente de config/tenants/*.json
+    TENANT_HOT_RELOAD: bool = os.getenv("TENANT_HOT_RELOAD", "True").lower() == "true"
+    TENANT_RELOAD_POLL_INTERVAL: float = float(os.getenv("TENANT_RELOAD_POLL_INTERVAL", "2"))  # segundos (modo sondeo)
+    
     # Configuración de sesiones
     SESSION_COOKIE_NAME: str = "session_id"
     SESSION_COOKIE_HTTPONLY: bool = True
     SESSION_COOKIE_SECURE: bool = not DEBUG  # HTTPS en producción
     SESSION_COOKIE_SAMESITE: str = "lax"
     SESSION_MAX_AGE: int = int(os.getenv("SESSION_MAX_AGE", "86400"))  # 24 horas
+    SESSION_BACKEND: str = os.getenv("SESSION_BACKEND", "cookie").lower()  # cookie, memory, redis o sqlite
+    SESSION_MEMORY_MAX_ENTRIES: int = int(os.getenv("SESSION_MEMORY_MAX_ENTRIES", "100000"))
+    SESSION_SQLITE_PATH: str = os.getenv("SESSION_SQLITE_PATH", "data/sessions.sqlite3")
+    SESSION_ACTIVITY_GRANULARITY: float = float(os.getenv("SESSION_ACTIVITY_GRANULARITY", "60"))  # segundos entre updates de last_activity
+    
+    # Cache de claims decodificados de los JWT de sesión (LRU, expira en el exp del token)
+    JWT_CLAIMS_CACHE_ENABLED: bool = os.getenv("JWT_CLAIMS_CACHE_ENABLED", "True").lower() == "true"
+    JWT_CLAIMS_CACHE_SIZE: int = int(os.getenv("JWT_CLAIMS_CACHE_SIZE", "10000"))
+    
+    # Circuit breaker y bulkhead de la API de auth (fallar rápido si está caída o lenta)
+    AUTH_BREAKER_ENABLED: bool = os.getenv("AUTH_BREAKER_ENABLED", "True").lower() == "true"
+    AUTH_BREAKER_WINDOW: int = int(os.getenv("AUTH_BREAKER_WINDOW", "20"))  # llamadas evaluadas
+    AUTH_BREAKER_MIN_CALLS: int = int(os.getenv("AUTH_BREAKER_MIN_CALLS", "10"))
+    AUTH_BREAKER_FAILURE_RATE: float = float(os.getenv("AUTH_BREAKER_FAILURE_RATE", "0.5"))
+    AUTH_BREAKER_SLOW_CALL_SECONDS: float = float(os.getenv("AUTH_BREAKER_SLOW_CALL_SECONDS", "5"))
+    AUTH_BREAKER_SLOW_CALL_RATE: float = float(os.getenv("AUTH_BREAKER_SLOW_CALL_RATE", "0.8"))
+    AUTH_BREAKER_OPEN_SECONDS: float = float(os.getenv("AUTH_BREAKER_OPEN_SECONDS", "30"))
+    AUTH_BREAKER_HALF_OPEN_CALLS: int = int(os.getenv("AUTH_BREAKER_HALF_OPEN_CALLS", "3"))
+    AUTH_BULKHEAD_MAX_CONCURRENT: int = int(os.getenv("AUTH_BULKHEAD_MAX_CONCURRENT", "50"))
+    AUTH_BULKHEAD_MAX_WAIT: float = float(os.getenv("AUTH_BULKHEAD_MAX_WAIT", "0.5"))  # segundos
+    
+    # Verificación local de firma de los JWT con las claves JWKS de la API de auth
+    JWT_LOCAL_VERIFICATION: bool = os.getenv("JWT_LOCAL_VERIFICATION", "False").lower() == "true"
+    JWT_JWKS_URL: str = os.getenv("JWT_JWKS_URL", "")  # vacío = {AUTH_API_URL}/.well-known/jwks.json
+    JWT_ALGORITHMS: str = os.getenv("JWT_ALGORITHMS", "RS256")  # separados por comas
+    JWT_AUDIENCE: str = os.getenv("JWT_AUDIENCE", "")  # vacío = no se verifica aud
+    # Rechazar tokens sin claim tenant_id (por defecto solo se rechaza un tenant_id distinto al del request)
+    JWT_REQUIRE_TENANT_CLAIM: bool = os.getenv("JWT_REQUIRE_TENANT_CLAIM", "False").lower() == "true"
+    JWKS_CACHE_TTL: float = float(os.getenv("JWKS_CACHE_TTL", "3600"))  # segundos
+    JWKS_MIN_REFRESH_INTERVAL: float = float(os.getenv("JWKS_MIN_REFRESH_INTERVAL", "30"))  # segundos
+    
+    # Refresco de tokens single-flight: reutilización del resultado y lock entre workers (Redis)
+    TOKEN_REFRESH_RESULT_TTL: float = float(os.getenv("TOKEN_REFRESH_RESULT_TTL", "10"))  # segundos
+    TOKEN_REFRESH_LOCK_TTL: float = float(os.getenv("TOKEN_REFRESH_LOCK_TTL", "15"))  # segundos
+    # Refresh-ahead: segundos antes del exp en que se refresca en segundo plano (0 = desactivado).
+    # Por defecto solo con REDIS_URL: sin store compartido cada worker rotaría el mismo refresh token
+    TOKEN_REFRESH_AHEAD_SECONDS: float = float(os.getenv("TOKEN_REFRESH_AHEAD_SECONDS",
+                                                         "60" if os.getenv("REDIS_URL") else "0"))
     
     # Configuración de CORS
     CORS_ORIGINS: List[str] = []
@@ -55,6 +139,23 @@ class Settings(BaseSettings):
     # Configuración de logging
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
     
+    # Métricas internas expuestas en /metrics (desactivadas por defecto: exponen estado interno)
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "False").lower() == "true"
+    METRICS_TOKEN: str = os.getenv("METRICS_TOKEN", "")  # si se configura se exige "Authorization: Bearer <token>"
+    METRICS_ALLOWED_NETWORKS: str = os.getenv("METRICS_ALLOWED_NETWORKS", "127.0.0.1,::1")  # sin token: IPs/redes CIDR permitidas
+    
+    # Cache de páginas anónimas (/login, /register, /forgot-password)
+    PAGE_CACHE_ENABLED: bool = os.getenv("PAGE_CACHE_ENABLED", "True").lower() == "true"
+    PAGE_CACHE_MAX_ENTRIES: int = int(os.getenv("PAGE_CACHE_MAX_ENTRIES", "1024"))
+    PAGE_CACHE_TTL: int = int(os.getenv("PAGE_CACHE_TTL", "300"))  # segundos
+    
+    # Variantes responsivas (WebP/JPEG) de logos y heroes de los tenants
+    IMAGE_VARIANTS_ENABLED: bool = os.getenv("IMAGE_VARIANTS_ENABLED", "True").lower() == "true"
+    IMAGE_VARIANTS_ON_STARTUP: bool = os.getenv("IMAGE_VARIANTS_ON_STARTUP", "True").lower() == "true"
+    IMAGE_VARIANT_WIDTHS: str = os.getenv("IMAGE_VARIANT_WIDTHS", "320,640,960,1280")
+    IMAGE_VARIANT_WORKERS: int = int(os.getenv("IMAGE_VARIANT_WORKERS", "0"))  # 0 = número de CPUs
+    IMAGE_CACHE_DIR: str = os.getenv("IMAGE_CACHE_DIR", "static/images/cache")
+    
     # Configuración de cache
     REDIS_URL: Optional[str] = os.getenv("REDIS_URL")
     CACHE_TTL: int = int(os.getenv("CACHE_TTL", "3600"))  # 1 hora
@@ -70,6 +171,37 @@ class Settings(BaseSettings):
         "/favicon.ico"
     ]
     
+    # Límite local de intentos de login (por tenant+usuario y tenant+IP, usa max_login_attempts del tenant)
+    LOGIN_THROTTLE_ENABLED: bool = os.getenv("LOGIN_THROTTLE_ENABLED", "True").lower() == "true"
+    LOGIN_THROTTLE_WINDOW: float = float(os.getenv("LOGIN_THROTTLE_WINDOW", "900"))  # segundos
+    LOGIN_LOCKOUT_SECONDS: float = float(os.getenv("LOGIN_LOCKOUT_SECONDS", "60"))  # primer bloqueo, luego se duplica
+    LOGIN_LOCKOUT_MAX_SECONDS: float = float(os.getenv("LOGIN_LOCKOUT_MAX_SECONDS", "3600"))
+    LOGIN_THROTTLE_IP_FACTOR: int = int(os.getenv("LOGIN_THROTTLE_IP_FACTOR", "5"))
+    
+    # Auditoría de eventos de autenticación (cola en memoria + escritor en segundo plano)
+    AUDIT_ENABLED: bool = os.getenv("AUDIT_ENABLED", "True").lower() == "true"
+    AUDIT_LOG_PATH: str = os.getenv("AUDIT_LOG_PATH", "logs/audit.jsonl")
+    AUDIT_HTTP_URL: str = os.getenv("AUDIT_HTTP_URL", "")  # si se configura reemplaza al archivo JSONL
+    AUDIT_QUEUE_SIZE: int = int(os.getenv("AUDIT_QUEUE_SIZE", "10000"))
+    AUDIT_BATCH_SIZE: int = int(os.getenv("AUDIT_BATCH_SIZE", "200"))
+    AUDIT_FLUSH_INTERVAL: float = float(os.getenv("AUDIT_FLUSH_INTERVAL", "1"))  # segundos
+    AUDIT_FSYNC_INTERVAL: float = float(os.getenv("AUDIT_FSYNC_INTERVAL", "5"))  # segundos
+    AUDIT_MAX_BYTES: int = int(os.getenv("AUDIT_MAX_BYTES", str(50 * 1024 * 1024)))
+    AUDIT_BACKUP_COUNT: int = int(os.getenv("AUDIT_BACKUP_COUNT", "5"))
+    AUDIT_OVERFLOW: str = os.getenv("AUDIT_OVERFLOW", "drop_oldest")  # drop_oldest | drop_newest
+    
+    # Envío en segundo plano de las solicitudes de recuperación de contraseña
+    FORGOT_PASSWORD_QUEUE_SIZE: int = int(os.getenv("FORGOT_PASSWORD_QUEUE_SIZE", "1000"))
+    FORGOT_PASSWORD_WORKERS: int = int(os.getenv("FORGOT_PASSWORD_WORKERS", "2"))
+    FORGOT_PASSWORD_MAX_ATTEMPTS: int = int(os.getenv("FORGOT_PASSWORD_MAX_ATTEMPTS", "5"))
+    FORGOT_PASSWORD_RETRY_BASE: float = float(os.getenv("FORGOT_PASSWORD_RETRY_BASE", "1"))  # segundos
+    FORGOT_PASSWORD_RETRY_MAX: float = float(os.getenv("FORGOT_PASSWORD_RETRY_MAX", "60"))  # segundos
+    FORGOT_PASSWORD_DEDUP_WINDOW: float = float(os.getenv("FORGOT_PASSWORD_DEDUP_WINDOW", "300"))  # misma solicitud ignorada
+    
+    # Proxies de confianza (IPs o redes CIDR separadas por coma); solo a ellos se les
+    # cree X-Forwarded-For/X-Real-IP. Vacío = se usa la IP de la conexión
+    TRUSTED_PROXIES: str = os.getenv("TRUSTED_PROXIES", "")
+    
     # Configuración de rate limiting
     RATE_LIMIT_ENABLED: bool = os.getenv("RATE_LIMIT_ENABLED", "True").lower() == "true"
     RATE_LIMIT_REQUESTS: int = int(os.getenv("RATE_LIMIT_REQUESTS", "100"))
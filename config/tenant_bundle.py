@@ -0,0 +1,407 @@
+"""
+Bundles de render precalculados por tenant
+
+Cada bundle se construye una sola vez cuando se cargan las configuraciones
+de tenants y contiene todo lo que las vistas necesitan en cada request:
+contexto para templates (inmutable), CSS y JavaScript ya renderizados y
+meta tags. Así el hot path solo hace una búsqueda por tenant_id.
+"""
+import hashlib
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional
+
+from config.feature_flags import TenantFeatureFlags, compile_feature_flags
+
+
+@dataclass(frozen=True)
+class TenantBundle:
+    """Recursos de render inmutables de un tenant"""
+    tenant_id: str
+    branding: Any = field(repr=False)  # TenantBranding (se evita import circular)
+    context: Mapping[str, Any] = field(repr=False)
+    features: TenantFeatureFlags = field(repr=False)
+    meta_tags: Mapping[str, str] = field(repr=False)
+    css: str = field(repr=False)
+    css_bytes: bytes = field(repr=False)
+    js: str = field(repr=False)
+    js_bytes: bytes = field(repr=False)
+    css_version: str
+    js_version: str
+
+    @property
+    def css_etag(self) -> str:
+        """ETag fuerte del CSS del tenant"""
+        return f'"{self.css_version}"'
+
+    @property
+    def js_etag(self) -> str:
+        """ETag fuerte del JavaScript del tenant"""
+        return f'"{self.js_version}"'
+
+
+def freeze(value: Any) -> Any:
+    """
+    Convierte recursivamente dicts en mappings de solo lectura
+
+    Args:
+        value: Valor a congelar
+
+    Returns:
+        Any: MappingProxyType para dicts, tupla para listas, el mismo valor en otro caso
+    """
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def thaw(value: Any) -> Any:
+    """
+    Copia mutable de un valor congelado con freeze()
+
+    Args:
+        value: Valor a descongelar
+
+    Returns:
+        Any: dicts y listas normales
+    """
+    if isinstance(value, Mapping):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(item) for item in value]
+    return value
+
+
+def content_version(content: bytes) -> str:
+    """
+    Hash de contenido usado en URLs versionadas y ETags
+
+    Args:
+        content: Bytes del recurso
+
+    Returns:
+        str: Primeros 16 caracteres hex del SHA-256
+    """
+    return hashlib.sha256(content).hexdigest()[:16]
+
+
+def build_tenant_context(tenant_id: str, branding, features: Optional[TenantFeatureFlags] = None) -> Dict[str, Any]:
+    """
+    Construye el contexto completo del tenant para templates
+
+    Args:
+        tenant_id: ID del tenant
+        branding: TenantBranding del tenant
+        features: Flags compilados (se compilan si no se pasan)
+
+    Returns:
+        Dict[str, Any]: Contexto del tenant
+    """
+    if features is None:
+        features = compile_feature_flags(tenant_id, branding)
+
+    return {
+        'tenant': {
+            'id': tenant_id,
+            'company_name': branding.company_name,
+            'company_slogan': branding.company_slogan,
+            'portal_name': branding.portal_name,
+            'portal_subtitle': branding.portal_subtitle,
+            'logo_url': branding.logo_url,
+            'hero_image_url': branding.hero_image_url,
+            'favicon_url': branding.favicon_url,
+            'background_image_url': branding.background_image_url,
+
+            # Colores y estilos
+            'colors': {
+                'primary': branding.primary_color,
+                'secondary': branding.secondary_color,
+                'accent': branding.accent_color,
+                'success': branding.success_color,
+                'danger': branding.danger_color,
+                'warning': branding.warning_color,
+                'info': branding.info_color,
+            },
+
+            'gradients': {
+                'primary': branding.primary_gradient,
+                'background': branding.background_gradient,
+            },
+
+            # Contacto y soporte
+            'contact': {
+                'support_email': branding.support_email,
+                'support_phone': branding.support_phone,
+                'website_url': branding.website_url,
+            },
+
+            # URLs importantes
+            'urls': {
+                'terms': branding.terms_url,
+                'privacy': branding.privacy_url,
+                'help': branding.help_url,
+                'videos': branding.video_tutorials_url,
+            },
+
+            # Configuración de features (flags compilados, de solo lectura)
+            'features': features,
+
+            # Configuración de login
+            'login': {
+                'title': branding.login_title,
+                'subtitle': branding.login_subtitle,
+                'username_placeholder': branding.username_placeholder,
+                'password_placeholder': branding.password_placeholder,
+            },
+
+            # Información de la empresa
+            'company_info': {
+                'description': branding.company_description,
+                'address': branding.company_address,
+                'nit': branding.company_nit,
+            },
+
+            # Configuración técnica
+            'technical': {
+                'api_base_url': branding.api_base_url,
+                'api_timeout': branding.api_timeout,
+                'session_timeout': branding.session_timeout,
+                'max_login_attempts': branding.max_login_attempts,
+            }
+        }
+    }
+
+
+def build_tenant_css(branding) -> str:
+    """
+    Genera CSS variables basadas en la configuración del tenant
+
+    Args:
+        branding: TenantBranding del tenant
+
+    Returns:
+        str: CSS con variables personalizadas
+    """
+    return f"""
+        :root {{
+            --tenant-primary-color: {branding.primary_color};
+            --tenant-secondary-color: {branding.secondary_color};
+            --tenant-accent-color: {branding.accent_color};
+            --tenant-success-color: {branding.success_color};
+            --tenant-danger-color: {branding.danger_color};
+            --tenant-warning-color: {branding.warning_color};
+            --tenant-info-color: {branding.info_color};
+            --tenant-primary-gradient: {branding.primary_gradient};
+            --tenant-background-gradient: {branding.background_gradient};
+        }}
+
+        /* Aplicar variables del tenant */
+        body.login-page {{
+            background: var(--tenant-background-gradient) !important;
+        }}
+
+        .logo {{
+            background: var(--tenant-primary-gradient) !important;
+            -webkit-background-clip: text !important;
+            -webkit-text-fill-color: transparent !important;
+            background-clip: text !important;
+        }}
+
+        .portal-subtitle {{
+            color: var(--tenant-secondary-color) !important;
+        }}
+
+        .video-link {{
+            background: linear-gradient(135deg, var(--tenant-secondary-color), var(--tenant-accent-color)) !important;
+        }}
+
+        .video-link:hover {{
+            box-shadow: 0 5px 15px var(--tenant-secondary-color)33 !important;
+        }}
+
+        .login-btn {{
+            background: var(--tenant-primary-gradient) !important;
+        }}
+
+        .login-btn:hover {{
+            box-shadow: 0 5px 15px var(--tenant-primary-color)33 !important;
+        }}
+
+        .form-control:focus {{
+            border-color: var(--tenant-secondary-color) !important;
+            box-shadow: 0 0 0 3px var(--tenant-secondary-color)1a !important;
+        }}
+
+        .form-control.is-valid {{
+            border-color: var(--tenant-success-color) !important;
+            box-shadow: 0 0 0 3px var(--tenant-success-color)1a !important;
+        }}
+
+        .form-control.is-invalid {{
+            border-color: var(--tenant-danger-color) !important;
+            box-shadow: 0 0 0 3px var(--tenant-danger-color)1a !important;
+        }}
+
+        .alert-success {{
+            border-left-color: var(--tenant-success-color) !important;
+        }}
+
+        .alert-danger {{
+            border-left-color: var(--tenant-danger-color) !important;
+        }}
+
+        .forgot-password a {{
+            color: var(--tenant-secondary-color) !important;
+        }}
+
+        .register-link a {{
+            color: var(--tenant-secondary-color) !important;
+        }}
+
+        /* Navegación */
+        .navbar-brand {{
+            color: var(--tenant-primary-color) !important;
+        }}
+
+        .nav-link:hover {{
+            color: var(--tenant-secondary-color) !important;
+        }}
+
+        /* Botones secundarios */
+        .btn-outline-primary {{
+            border-color: var(--tenant-primary-color) !important;
+            color: var(--tenant-primary-color) !important;
+        }}
+
+        .btn-outline-primary:hover {{
+            background-color: var(--tenant-primary-color) !important;
+            border-color: var(--tenant-primary-color) !important;
+        }}
+        """
+
+
+def build_tenant_meta_tags(branding) -> Dict[str, str]:
+    """
+    Genera meta tags específicos del tenant
+
+    Args:
+        branding: TenantBranding del tenant
+
+    Returns:
+        Dict[str, str]: Meta tags para el HTML head
+    """
+    return {
+        'title': f"{branding.portal_name} {branding.portal_subtitle} - {branding.company_name}",
+        'description': branding.company_description,
+        'keywords': f"{branding.company_name}, {branding.portal_name}, IPS, salud, portal médico",
+        'author': branding.company_name,
+        'theme-color': branding.primary_color,
+        'favicon': branding.favicon_url,
+        'og:title': f"{branding.company_name} - {branding.portal_name}",
+        'og:description': branding.company_description,
+        'og:type': 'website',
+        'og:image': branding.logo_url,
+        'twitter:card': 'summary',
+        'twitter:title': f"{branding.company_name} - {branding.portal_name}",
+        'twitter:description': branding.company_description,
+    }
+
+
+def build_tenant_javascript(tenant_id: str, context: Mapping[str, Any]) -> str:
+    """
+    Genera configuración JavaScript específica del tenant
+
+    Args:
+        tenant_id: ID del tenant
+        context: Contexto del tenant (ver build_tenant_context)
+
+    Returns:
+        str: JavaScript con configuración del tenant
+    """
+    tenant = context['tenant']
+
+    return f"""
+        // Configuración del tenant
+        window.TENANT_CONFIG = {{
+            id: '{tenant_id}',
+            name: '{tenant['company_name']}',
+            colors: {{
+                primary: '{tenant['colors']['primary']}',
+                secondary: '{tenant['colors']['secondary']}',
+                accent: '{tenant['colors']['accent']}',
+                success: '{tenant['colors']['success']}',
+                danger: '{tenant['colors']['danger']}',
+                warning: '{tenant['colors']['warning']}',
+                info: '{tenant['colors']['info']}'
+            }},
+            features: {{
+                registration: {str(tenant['features']['registration']).lower()},
+                passwordReset: {str(tenant['features']['password_reset']).lower()},
+                rememberMe: {str(tenant['features']['remember_me']).lower()},
+                twoFactor: {str(tenant['features']['two_factor']).lower()}
+            }},
+            urls: {{
+                support: '{tenant['contact']['support_email']}',
+                help: '{tenant['urls']['help']}',
+                videos: '{tenant['urls']['videos']}'
+            }},
+            api: {{
+                timeout: {tenant['technical']['api_timeout']},
+                maxLoginAttempts: {tenant['technical']['max_login_attempts']}
+            }}
+        }};
+
+        // Funciones de utilidad del tenant
+        window.TenantUtils = {{
+            getColor: function(colorName) {{
+                return window.TENANT_CONFIG.colors[colorName] || '#000000';
+            }},
+
+            isFeatureEnabled: function(featureName) {{
+                return window.TENANT_CONFIG.features[featureName] || false;
+            }},
+
+            getSupportContact: function() {{
+                return window.TENANT_CONFIG.urls.support;
+            }},
+
+            getHelpUrl: function() {{
+                return window.TENANT_CONFIG.urls.help;
+            }}
+        }};
+        """
+
+
+def build_tenant_bundle(tenant_id: str, branding) -> TenantBundle:
+    """
+    Construye el bundle de render inmutable de un tenant
+
+    Args:
+        tenant_id: ID del tenant
+        branding: TenantBranding del tenant
+
+    Returns:
+        TenantBundle: Bundle listo para usarse en el hot path
+    """
+    features = compile_feature_flags(tenant_id, branding)
+    context = build_tenant_context(tenant_id, branding, features)
+    css = build_tenant_css(branding)
+    js = build_tenant_javascript(tenant_id, context)
+    css_bytes = css.encode('utf-8')
+    js_bytes = js.encode('utf-8')
+
+    return TenantBundle(
+        tenant_id=tenant_id,
+        branding=branding,
+        context=freeze(context),
+        features=features,
+        meta_tags=freeze(build_tenant_meta_tags(branding)),
+        css=css,
+        css_bytes=css_bytes,
+        js=js,
+        js_bytes=js_bytes,
+        css_version=content_version(css_bytes),
+        js_version=content_version(js_bytes),
+    )
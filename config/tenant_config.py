@@ -3,11 +3,23 @@ Sistema de configuración para múltiples empresas/tenants
 """
 import os
 import json
-from typing import Dict, Any, Optional, List
-from pydantic import BaseModel, Field
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Dict, Any, Optional, List, Mapping, Tuple, Set, Callable, FrozenSet, Union
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError, field_validator
 from enum import Enum
 import logging
 
+from config.host_index import TenantHostIndex, normalize_host
+from config.settings import settings
+from config.tenant_bundle import TenantBundle, build_tenant_bundle
+from config.tenant_snapshot import load_snapshot, schema_fingerprint
+from utils.metrics import metrics
+
 logger = logging.getLogger(__name__)
 
 class TenantTheme(str, Enum):
@@ -60,6 +72,8 @@ class TenantBranding(BaseModel):
     enable_password_reset: bool = Field(default=True, description="Permitir reset password")
     enable_remember_me: bool = Field(default=True, description="Permitir recordar sesión")
     enable_2fa: bool = Field(default=False, description="Habilitar 2FA")
+    # Flags adicionales sin campo propio: nombre -> true/false o porcentaje (0-100) de usuarios
+    features: Dict[str, Union[bool, int]] = Field(default_factory=dict, description="Feature flags y rollouts")
     
     # Configuración de login
     login_title: str = Field(default="Iniciar sesión", description="Título del formulario")
@@ -80,45 +94,681 @@ class TenantBranding(BaseModel):
     session_timeout: int = Field(default=86400, description="Timeout de sesión en segundos")
     max_login_attempts: int = Field(default=5, description="Máximo intentos de login")
     
+    @field_validator("features")
+    @classmethod
+    def validate_features(cls, value: Dict[str, Union[bool, int]]) -> Dict[str, Union[bool, int]]:
+        """Los rollouts deben ser un porcentaje entre 0 y 100"""
+        for name, flag in value.items():
+            if not isinstance(flag, bool) and not 0 <= flag <= 100:
+                raise ValueError(f"features.{name}: el porcentaje debe estar entre 0 y 100")
+        return value
+    
     class Config:
         extra = "forbid"
         validate_assignment = True
 
+# Valida todos los tenants en una sola llamada a pydantic-core
+TENANT_MAP_ADAPTER = TypeAdapter(Dict[str, TenantBranding])
+
+def check_tenant_branding(config: TenantBranding) -> Tuple[List[str], List[str]]:
+    """
+    Reglas de negocio de una configuración de tenant (además del esquema)
+    
+    Args:
+        config: Configuración ya validada por TenantBranding
+        
+    Returns:
+        Tuple[List[str], List[str]]: (errores, advertencias)
+    """
+    errors = []
+    warnings = []
+    
+    # Validaciones básicas
+    if not config.company_name:
+        errors.append('company_name es requerido')
+    
+    if not config.logo_url:
+        warnings.append('logo_url no está configurado')
+    
+    if not config.hero_image_url:
+        warnings.append('hero_image_url no está configurado')
+    
+    if not config.primary_color or not config.primary_color.startswith('#'):
+        errors.append('primary_color debe ser un color hexadecimal válido')
+    
+    if not config.support_email:
+        warnings.append('support_email no está configurado')
+    
+    return errors, warnings
+
+# Directorio con un archivo JSON por tenant
+TENANT_CONFIG_DIR = "config/tenants"
+
+def scan_tenant_dir(config_dir: str) -> Dict[str, Tuple[str, Tuple[int, int]]]:
+    """
+    Lista los archivos JSON de tenants con su firma (mtime_ns, tamaño)
+    
+    Args:
+        config_dir: Directorio con los JSON de tenants
+        
+    Returns:
+        Dict[str, Tuple[str, Tuple[int, int]]]: tenant_id -> (ruta, firma)
+    """
+    scanned = {}
+    try:
+        with os.scandir(config_dir) as entries:
+            for entry in entries:
+                if not entry.name.endswith('.json') or not entry.is_file():
+                    continue
+                stat = entry.stat()
+                scanned[entry.name[:-len('.json')]] = (entry.path, (stat.st_mtime_ns, stat.st_size))
+    except FileNotFoundError:
+        pass
+    return scanned
+
+# Con menos archivos que esto el pool de hilos cuesta más de lo que ahorra
+PARALLEL_PARSE_THRESHOLD = 64
+
+def _parse_tenant_files(items: List[Tuple[str, str]]) -> List[Tuple[str, Any]]:
+    """
+    Lee y decodifica un lote de JSON de tenants (se ejecuta en un hilo del pool)
+    
+    Args:
+        items: Pares (tenant_id, ruta)
+        
+    Returns:
+        List[Tuple[str, Any]]: (tenant_id, datos) o (tenant_id, excepción) si falló
+    """
+    parsed = []
+    for tenant_id, path in items:
+        try:
+            with open(path, 'rb') as f:
+                parsed.append((tenant_id, json.loads(f.read())))
+        except Exception as e:
+            parsed.append((tenant_id, e))
+    return parsed
+
+@dataclass(frozen=True)
+class TenantRegistry:
+    """
+    Snapshot inmutable de las configuraciones de tenants
+    
+    TenantConfig reemplaza el snapshot completo de forma atómica en cada
+    recarga; quien tome una referencia (p. ej. el middleware al inicio del
+    request) ve siempre un conjunto consistente de configs y bundles.
+    
+    En modo lazy `configs`/`bundles` solo contienen el tenant por defecto y
+    `sources` actúa como índice; los demás tenants se piden a `loader`.
+    
+    `overrides` son los tenants entregados por fuentes externas (p. ej. el
+    servicio de configuración HTTP); tienen prioridad sobre los archivos.
+    """
+    configs: Mapping[str, TenantBranding]
+    bundles: Mapping[str, TenantBundle]
+    asset_versions: Mapping[str, TenantBundle]
+    # tenant_id -> (mtime_ns, tamaño) del archivo fuente
+    sources: Mapping[str, Tuple[int, int]]
+    version: int = 0
+    loader: Optional[Callable[[str, Tuple[int, int]], Optional[TenantBundle]]] = None
+    overrides: FrozenSet[str] = frozenset()
+    
+    def get_config(self, tenant_id: str) -> TenantBranding:
+        """Configuración del tenant o la de 'default' si no existe"""
+        return self.get_bundle(tenant_id).branding
+    
+    def get_bundle(self, tenant_id: str) -> TenantBundle:
+        """Bundle del tenant o el de 'default' si no existe"""
+        if self.loader is not None and tenant_id in self.sources and tenant_id not in self.overrides:
+            bundle = self.loader(tenant_id, self.sources[tenant_id])
+            if bundle is not None:
+                return bundle
+        bundle = self.bundles.get(tenant_id)
+        return bundle if bundle is not None else self.bundles["default"]
+    
+    def is_valid(self, tenant_id: str) -> bool:
+        """Verifica si el tenant existe en este snapshot"""
+        if self.loader is not None:
+            return tenant_id in self.sources or tenant_id in self.configs
+        return tenant_id in self.configs
+    
+    def tenant_ids(self) -> List[str]:
+        """IDs de tenants del snapshot ('default' primero)"""
+        ids = list(self.configs)
+        if self.loader is not None:
+            ids.extend(tenant_id for tenant_id in self.sources if tenant_id not in self.configs)
+        return ids
+
 class TenantConfig:
     """Manejador de configuración de tenants"""
     
-    def __init__(self):
-        self.configs: Dict[str, TenantBranding] = {}
+    def __init__(self, config_dir: str = TENANT_CONFIG_DIR, lazy: Optional[bool] = None,
+                 cache_size: Optional[int] = None, snapshot_path: Optional[str] = None,
+                 load_workers: Optional[int] = None):
+        """
+        Inicializa el manejador
+        
+        No lee ningún archivo: los tenants se cargan con ensure_loaded() (lo
+        hace el lifespan de la aplicación); hasta entonces solo existe 'default'.
+        
+        Args:
+            config_dir: Directorio con los JSON de tenants
+            lazy: Cargar cada tenant en su primer uso (por defecto settings.TENANT_LAZY_LOADING)
+            cache_size: Máximo de tenants en memoria en modo lazy (por defecto settings.TENANT_CACHE_SIZE)
+            snapshot_path: Snapshot compilado a usar si está al día (por defecto settings.TENANT_SNAPSHOT_PATH)
+            load_workers: Hilos para leer los JSON (por defecto settings.TENANT_LOAD_WORKERS, 0 = según CPUs)
+        """
+        self.config_dir = config_dir
+        self.lazy = settings.TENANT_LAZY_LOADING if lazy is None else lazy
+        self.cache_size = settings.TENANT_CACHE_SIZE if cache_size is None else cache_size
+        self.snapshot_path = settings.TENANT_SNAPSHOT_PATH if snapshot_path is None else snapshot_path
+        load_workers = settings.TENANT_LOAD_WORKERS if load_workers is None else load_workers
+        self.load_workers = load_workers or min(8, os.cpu_count() or 1)
+        self.loaded = False
+        # Duración de cada fase de la última carga completa (segundos)
+        self.load_timings: Dict[str, float] = {}
+        # Fuente externa -> tenants que entrega (tienen prioridad sobre los archivos)
+        self._source_configs: Dict[str, Dict[str, TenantBranding]] = {}
+        self.registry: TenantRegistry = self._build_registry(
+            {"default": self._get_default_config()}, {}
+        )
         self.domain_mapping: Dict[str, str] = {}
         self.subdomain_mapping: Dict[str, str] = {}
-        self.load_tenant_configs()
+        self.host_index = TenantHostIndex()
+        self._reload_lock = threading.RLock()
+        self._reload_listeners: List[Callable[[Set[str]], None]] = []
+        # Modo lazy: tenant_id -> (firma, bundle o None si el archivo es inválido)
+        self._lazy_cache: "OrderedDict[str, Tuple[Tuple[int, int], Optional[TenantBundle]]]" = OrderedDict()
+        self._lazy_asset_versions: Dict[str, TenantBundle] = {}
+        self._lazy_lock = threading.Lock()
         self._setup_domain_mappings()
     
+    @property
+    def configs(self) -> Mapping[str, TenantBranding]:
+        """Configuraciones del snapshot actual (solo lectura)"""
+        return self.registry.configs
+    
+    @property
+    def bundles(self) -> Mapping[str, TenantBundle]:
+        """Bundles de render del snapshot actual (solo lectura)"""
+        return self.registry.bundles
+    
+    @property
+    def asset_versions(self) -> Mapping[str, TenantBundle]:
+        """Índice hash de CSS/JS -> bundle del snapshot actual"""
+        return self.registry.asset_versions
+    
+    def ensure_loaded(self) -> bool:
+        """
+        Carga los tenants si todavía no se cargaron (idempotente)
+        
+        Returns:
+            bool: True si esta llamada hizo la carga
+        """
+        if self.loaded:
+            return False
+        with self._reload_lock:
+            if self.loaded:
+                return False
+            self.load_tenant_configs()
+            return True
+    
     def load_tenant_configs(self):
-        """Carga las configuraciones de todos los tenants"""
-        config_dir = "config/tenants"
-        
-        # Configuración por defecto
-        self.configs["default"] = self._get_default_config()
-        
-        # Cargar configuraciones específicas
-        if os.path.exists(config_dir):
-            for filename in os.listdir(config_dir):
-                if filename.endswith('.json'):
-                    tenant_id = filename.replace('.json', '')
-                    config_path = os.path.join(config_dir, filename)
-                    
+        """
+        Carga completa de los tenants, por fases medidas
+        
+        discover: listar los JSON con su firma
+        parse: leerlos y decodificarlos en un pool de hilos (o leer el snapshot)
+        validate: validar todos con pydantic en una sola llamada y aplicar
+            las reglas de check_tenant_branding
+        index: construir los bundles y publicar el registro
+        
+        En modo lazy solo hay discover e index: cada tenant se valida en su
+        primer uso.
+        """
+        config_dir = self.config_dir
+        timings: Dict[str, float] = {}
+        load_start = phase_start = time.perf_counter()
+        
+        def end_phase(name: str):
+            nonlocal phase_start
+            now = time.perf_counter()
+            timings[name] = now - phase_start
+            phase_start = now
+        
+        with self._reload_lock:
+            # Configuración por defecto
+            configs: Dict[str, TenantBranding] = {"default": self._get_default_config()}
+            sources: Dict[str, Tuple[int, int]] = {}
+            
+            exists = os.path.exists(config_dir)
+            scanned = self._scan_config_dir() if exists else {}
+            end_phase("discover")
+            
+            # Cargar configuraciones específicas
+            if exists and self.lazy:
+                # Solo se indexan IDs y firmas; cada tenant se valida en su primer uso
+                sources = {tenant_id: signature for tenant_id, (_, signature) in scanned.items()}
+                self._clear_lazy_cache()
+                logger.info(f"Índice de tenants (lazy): {len(sources)} archivos")
+            elif exists:
+                sources = {tenant_id: signature for tenant_id, (_, signature) in scanned.items()}
+                snapshot_configs = self._load_snapshot(scanned)
+                if snapshot_configs is not None:
+                    end_phase("parse")
+                    configs.update(snapshot_configs)
+                else:
+                    parsed = self._parse_tenant_files(scanned)
+                    end_phase("parse")
+                    configs.update(self._validate_tenant_data(parsed))
+                self._check_tenants(configs)
+                end_phase("validate")
+            else:
+                logger.warning(f"Directorio de configuraciones no encontrado: {config_dir}")
+                # Crear directorio y archivos por defecto
+                self._create_default_configs(config_dir)
+            
+            configs.update(self._external_configs())
+            self.registry = self._build_registry(configs, sources, self.registry)
+            end_phase("index")
+            self.loaded = True
+        
+        total = time.perf_counter() - load_start
+        self.load_timings = dict(timings, total=total)
+        for phase, elapsed in timings.items():
+            metrics.observe("tenant_load_phase_seconds", elapsed, phase=phase)
+        metrics.observe("tenant_load_seconds", total)
+        metrics.set_gauge("tenants_loaded", len(self.registry.tenant_ids()))
+        phases = ", ".join(f"{phase} {elapsed * 1000:.1f} ms" for phase, elapsed in timings.items())
+        logger.info(f"⏱️ {len(self.registry.tenant_ids())} tenants cargados en {total * 1000:.1f} ms ({phases})")
+    
+    def _parse_tenant_files(self, scanned: Dict[str, Tuple[str, Tuple[int, int]]]) -> Dict[str, Any]:
+        """
+        Lee y decodifica los JSON de tenants, repartidos en lotes entre hilos
+        
+        Args:
+            scanned: Archivos de scan_tenant_dir
+            
+        Returns:
+            Dict[str, Any]: tenant_id -> datos del JSON o la excepción al leerlo
+        """
+        items = [(tenant_id, path) for tenant_id, (path, _) in scanned.items()]
+        workers = min(self.load_workers, len(items))
+        if workers <= 1 or len(items) < PARALLEL_PARSE_THRESHOLD:
+            return dict(_parse_tenant_files(items))
+        
+        # Un lote por hilo: una tarea por archivo costaría más que leerlo
+        size = -(-len(items) // workers)
+        batches = [items[i:i + size] for i in range(0, len(items), size)]
+        parsed: Dict[str, Any] = {}
+        with ThreadPoolExecutor(max_workers=len(batches), thread_name_prefix="tenant-load") as pool:
+            for batch in pool.map(_parse_tenant_files, batches):
+                parsed.update(batch)
+        return parsed
+    
+    def _validate_tenant_data(self, parsed: Dict[str, Any]) -> Dict[str, TenantBranding]:
+        """
+        Valida todos los tenants leídos con una sola llamada a pydantic
+        
+        Los tenants ilegibles o inválidos se registran y se omiten.
+        
+        Args:
+            parsed: Resultado de _parse_tenant_files
+            
+        Returns:
+            Dict[str, TenantBranding]: Configuraciones válidas
+        """
+        data = {}
+        for tenant_id, value in parsed.items():
+            if isinstance(value, Exception):
+                logger.error(f"Error cargando config para {tenant_id}: {value}")
+            else:
+                data[tenant_id] = value
+        
+        try:
+            return TENANT_MAP_ADAPTER.validate_python(data)
+        except ValidationError as e:
+            failed: Dict[str, List[str]] = {}
+            for error in e.errors():
+                location = ".".join(str(part) for part in error["loc"][1:]) or "config"
+                failed.setdefault(str(error["loc"][0]), []).append(f"{location}: {error['msg']}")
+            for tenant_id, problems in failed.items():
+                logger.error(f"Error cargando config para {tenant_id}: {'; '.join(problems)}")
+            # Los errores son por tenant: el resto se valida sin los inválidos
+            return TENANT_MAP_ADAPTER.validate_python(
+                {tenant_id: value for tenant_id, value in data.items() if tenant_id not in failed}
+            )
+    
+    def _check_tenants(self, configs: Mapping[str, TenantBranding]):
+        """Aplica check_tenant_branding a todos los tenants y registra el resultado"""
+        with_errors = with_warnings = 0
+        for tenant_id, config in configs.items():
+            errors, warnings = check_tenant_branding(config)
+            if errors:
+                with_errors += 1
+                logger.warning(f"⚠️ Tenant {tenant_id} tiene errores: {errors}")
+            elif warnings:
+                with_warnings += 1
+                logger.info(f"ℹ️ Tenant {tenant_id} tiene advertencias: {warnings}")
+        metrics.set_gauge("tenants_with_errors", with_errors)
+        logger.info(f"✅ Tenants validados: {len(configs)} ({with_errors} con errores, "
+                    f"{with_warnings} con advertencias)")
+    
+    def reload_changed_configs(self) -> Set[str]:
+        """
+        Recarga solo los archivos de tenant nuevos, modificados o eliminados
+        
+        Los archivos sin cambios (mismo mtime y tamaño) no se vuelven a
+        validar y conservan su bundle. Si un archivo modificado no es válido
+        se mantiene la última versión buena del tenant. El nuevo snapshot se
+        publica con una sola asignación.
+        
+        Returns:
+            Set[str]: IDs de tenants cuya configuración cambió
+        """
+        start_time = time.perf_counter()
+        
+        with self._reload_lock:
+            current = self.registry
+            scanned = self._scan_config_dir()
+            
+            changed = {
+                tenant_id for tenant_id, (_, signature) in scanned.items()
+                if current.sources.get(tenant_id) != signature
+            }
+            removed = {tenant_id for tenant_id in current.sources if tenant_id not in scanned}
+            
+            if not changed and not removed:
+                return set()
+            
+            configs = dict(current.configs)
+            sources = {tenant_id: signature for tenant_id, (_, signature) in scanned.items()}
+            failed: Set[str] = set()
+            
+            external = self._external_configs()
+            for tenant_id in changed:
+                if tenant_id in external:
+                    continue
+                if self.lazy:
+                    # Se validará en el próximo uso; la firma nueva invalida la cache
+                    self._evict_lazy(tenant_id)
+                    continue
+                try:
+                    configs[tenant_id] = self._load_tenant_file(scanned[tenant_id][0])
+                    logger.info(f"🔄 Configuración recargada para tenant: {tenant_id}")
+                except Exception as e:
+                    failed.add(tenant_id)
+                    metrics.increment("tenant_reload_failures_total", tenant=tenant_id)
+                    logger.error(f"❌ Error recargando config para {tenant_id}, se mantiene la versión anterior: {e}")
+            
+            for tenant_id in removed:
+                if tenant_id in external:
+                    continue
+                configs.pop(tenant_id, None)
+                self._evict_lazy(tenant_id)
+                logger.info(f"🗑️ Configuración eliminada para tenant: {tenant_id}")
+            if "default" not in configs:
+                configs["default"] = self._get_default_config()
+            
+            self.registry = self._build_registry(configs, sources, current)
+        
+        affected = (changed - failed) | removed
+        elapsed = time.perf_counter() - start_time
+        metrics.observe("tenant_reload_seconds", elapsed)
+        metrics.increment("tenant_reloads_total")
+        metrics.set_gauge("tenants_loaded", len(self.registry.tenant_ids()))
+        logger.info(f"🔄 Recarga de tenants: {sorted(affected)} en {elapsed * 1000:.1f} ms")
+        
+        if affected:
+            self._notify_reload(affected)
+        
+        return affected
+    
+    def apply_source_configs(self, source: str, configs: Dict[str, TenantBranding]) -> Set[str]:
+        """
+        Publica las configuraciones entregadas por una fuente externa
+        
+        Los tenants de la fuente se superponen a los de archivos y los que la
+        fuente deja de entregar se eliminan. Solo se reconstruyen los bundles
+        de los tenants que cambiaron.
+        
+        Args:
+            source: Nombre de la fuente (p. ej. "http")
+            configs: Configuraciones completas y ya validadas de la fuente
+            
+        Returns:
+            Set[str]: IDs de tenants cuya configuración cambió
+        """
+        with self._reload_lock:
+            current = self.registry
+            previous = self._source_configs.get(source, {})
+            self._source_configs[source] = dict(configs)
+            external = self._external_configs()
+            
+            merged = dict(current.configs)
+            changed = {
+                tenant_id for tenant_id, config in configs.items()
+                if current.configs.get(tenant_id) != config
+            }
+            for tenant_id in changed:
+                merged[tenant_id] = configs[tenant_id]
+            
+            removed = {tenant_id for tenant_id in previous if tenant_id not in external}
+            for tenant_id in removed:
+                merged.pop(tenant_id, None)
+                if not self.lazy and tenant_id in current.sources:
+                    # Vuelve a la versión del archivo local
                     try:
-                        with open(config_path, 'r', encoding='utf-8') as f:
-                            config_data = json.load(f)
-                            self.configs[tenant_id] = TenantBranding(**config_data)
-                            logger.info(f"Configuración cargada para tenant: {tenant_id}")
+                        merged[tenant_id] = self._load_tenant_file(
+                            os.path.join(self.config_dir, f"{tenant_id}.json")
+                        )
                     except Exception as e:
                         logger.error(f"Error cargando config para {tenant_id}: {e}")
-        else:
-            logger.warning(f"Directorio de configuraciones no encontrado: {config_dir}")
-            # Crear directorio y archivos por defecto
-            self._create_default_configs(config_dir)
+            if "default" not in merged:
+                merged["default"] = self._get_default_config()
+            
+            if not changed and not removed:
+                return set()
+            
+            for tenant_id in changed | removed:
+                self._evict_lazy(tenant_id)
+            self.registry = self._build_registry(merged, dict(current.sources), current)
+        
+        affected = changed | removed
+        metrics.set_gauge("tenants_loaded", len(self.registry.tenant_ids()))
+        logger.info(f"🔄 Tenants actualizados desde {source}: {sorted(affected)}")
+        self._notify_reload(affected)
+        return affected
+    
+    def _external_configs(self) -> Dict[str, TenantBranding]:
+        """Tenants entregados por todas las fuentes externas"""
+        external: Dict[str, TenantBranding] = {}
+        for configs in self._source_configs.values():
+            external.update(configs)
+        return external
+    
+    def add_reload_listener(self, listener: Callable[[Set[str]], None]):
+        """
+        Registra una función que se llama con los tenants recargados
+        
+        Se usa para invalidar caches derivadas (páginas renderizadas, etc.)
+        
+        Args:
+            listener: Función que recibe el set de tenant_ids afectados
+        """
+        self._reload_listeners.append(listener)
+    
+    def _notify_reload(self, tenant_ids: Set[str]):
+        """Notifica a los listeners registrados"""
+        for listener in list(self._reload_listeners):
+            try:
+                listener(set(tenant_ids))
+            except Exception as e:
+                logger.error(f"Error notificando recarga de tenants: {e}")
+    
+    def _scan_config_dir(self) -> Dict[str, Tuple[str, Tuple[int, int]]]:
+        """Lista los archivos JSON del directorio de tenants con su firma"""
+        return scan_tenant_dir(self.config_dir)
+    
+    def _load_snapshot(self, scanned: Dict[str, Tuple[str, Tuple[int, int]]]) -> Optional[Dict[str, TenantBranding]]:
+        """
+        Intenta cargar las configuraciones desde el snapshot compilado
+        
+        Args:
+            scanned: Archivos JSON actuales con su firma
+            
+        Returns:
+            Optional[Dict[str, TenantBranding]]: Configuraciones o None si no
+            hay snapshot o está desactualizado (se cargan los JSON)
+        """
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return None
+        
+        start_time = time.perf_counter()
+        paths = {tenant_id: path for tenant_id, (path, _) in scanned.items()}
+        try:
+            configs = self.load_snapshot_configs(self.snapshot_path, paths)
+        except Exception as e:
+            metrics.increment("tenant_snapshot_fallbacks_total")
+            logger.warning(f"⚠️ Snapshot de tenants no utilizable ({e}), se cargan los JSON")
+            return None
+        
+        elapsed = time.perf_counter() - start_time
+        metrics.observe("tenant_snapshot_load_seconds", elapsed)
+        logger.info(f"📦 {len(configs)} tenants cargados desde {self.snapshot_path} en {elapsed * 1000:.1f} ms")
+        return configs
+    
+    @staticmethod
+    def load_snapshot_configs(snapshot_path: str, paths: Mapping[str, str]) -> Dict[str, TenantBranding]:
+        """
+        Construye las configuraciones del snapshot sin re-validarlas
+        
+        Los datos se validaron al compilar el snapshot, así que se usa
+        model_construct (sin validación de pydantic).
+        
+        Args:
+            snapshot_path: Ruta del snapshot
+            paths: tenant_id -> ruta de cada JSON de tenant (se compara su contenido)
+            
+        Returns:
+            Dict[str, TenantBranding]: tenant_id -> configuración
+            
+        Raises:
+            SnapshotError: Si el snapshot es inválido o está desactualizado
+        """
+        data = load_snapshot(snapshot_path, paths, schema_fingerprint(TenantBranding))
+        return {
+            tenant_id: TenantBranding.model_construct(**values)
+            for tenant_id, values in data.items()
+        }
+    
+    def _load_tenant_file(self, config_path: str) -> TenantBranding:
+        """Lee y valida el archivo JSON de un tenant"""
+        with open(config_path, 'r', encoding='utf-8') as f:
+            config_data = json.load(f)
+        return TenantBranding(**config_data)
+    
+    def _build_registry(self, configs: Dict[str, TenantBranding], sources: Dict[str, Tuple[int, int]],
+                        previous: Optional[TenantRegistry] = None) -> TenantRegistry:
+        """
+        Construye un snapshot nuevo reutilizando los bundles sin cambios
+        
+        Args:
+            configs: Configuraciones por tenant
+            sources: Firmas de los archivos fuente
+            previous: Snapshot anterior (opcional)
+            
+        Returns:
+            TenantRegistry: Snapshot inmutable
+        """
+        bundles = {}
+        asset_versions = {}
+        for tenant_id, config in configs.items():
+            bundle = previous.bundles.get(tenant_id) if previous else None
+            if bundle is None or bundle.branding is not config:
+                try:
+                    bundle = build_tenant_bundle(tenant_id, config)
+                except Exception as e:
+                    logger.error(f"Error construyendo bundle para {tenant_id}: {e}")
+                    continue
+            bundles[tenant_id] = bundle
+            asset_versions[bundle.css_version] = bundle
+            asset_versions[bundle.js_version] = bundle
+        
+        return TenantRegistry(
+            configs=MappingProxyType(dict(configs)),
+            bundles=MappingProxyType(bundles),
+            asset_versions=MappingProxyType(asset_versions),
+            sources=MappingProxyType(dict(sources)),
+            version=previous.version + 1 if previous else 0,
+            loader=self._load_lazy if self.lazy else None,
+            overrides=frozenset(self._external_configs()),
+        )
+    
+    def _load_lazy(self, tenant_id: str, signature: Tuple[int, int]) -> Optional[TenantBundle]:
+        """
+        Obtiene el bundle de un tenant en modo lazy (LRU acotado)
+        
+        Args:
+            tenant_id: ID del tenant
+            signature: Firma (mtime_ns, tamaño) del archivo según el índice
+            
+        Returns:
+            Optional[TenantBundle]: Bundle o None si el archivo no es válido
+        """
+        with self._lazy_lock:
+            cached = self._lazy_cache.get(tenant_id)
+            if cached is not None and cached[0] == signature:
+                self._lazy_cache.move_to_end(tenant_id)
+                metrics.increment("tenant_cache_hits_total")
+                return cached[1]
+        
+        metrics.increment("tenant_cache_misses_total")
+        start_time = time.perf_counter()
+        config_path = os.path.join(self.config_dir, f"{tenant_id}.json")
+        try:
+            bundle = build_tenant_bundle(tenant_id, self._load_tenant_file(config_path))
+            logger.info(f"Configuración cargada para tenant: {tenant_id}")
+        except Exception as e:
+            bundle = None
+            metrics.increment("tenant_reload_failures_total", tenant=tenant_id)
+            logger.error(f"Error cargando config para {tenant_id}: {e}")
+        metrics.observe("tenant_lazy_load_seconds", time.perf_counter() - start_time)
+        
+        with self._lazy_lock:
+            previous = self._lazy_cache.pop(tenant_id, None)
+            if previous is not None and previous[1] is not None:
+                self._forget_assets(previous[1])
+            self._lazy_cache[tenant_id] = (signature, bundle)
+            if bundle is not None:
+                self._lazy_asset_versions[bundle.css_version] = bundle
+                self._lazy_asset_versions[bundle.js_version] = bundle
+            while len(self._lazy_cache) > max(self.cache_size, 1):
+                _, (_, evicted) = self._lazy_cache.popitem(last=False)
+                if evicted is not None:
+                    self._forget_assets(evicted)
+                metrics.increment("tenant_cache_evictions_total")
+            metrics.set_gauge("tenant_cache_size", len(self._lazy_cache))
+        
+        return bundle
+    
+    def _forget_assets(self, bundle: TenantBundle):
+        """Quita del índice lazy los hashes de CSS/JS de un bundle (con _lazy_lock tomado)"""
+        for version in (bundle.css_version, bundle.js_version):
+            if self._lazy_asset_versions.get(version) is bundle:
+                del self._lazy_asset_versions[version]
+    
+    def _evict_lazy(self, tenant_id: str):
+        """Descarta un tenant de la cache lazy"""
+        with self._lazy_lock:
+            cached = self._lazy_cache.pop(tenant_id, None)
+            if cached is not None and cached[1] is not None:
+                self._forget_assets(cached[1])
+    
+    def _clear_lazy_cache(self):
+        """Vacía la cache lazy"""
+        with self._lazy_lock:
+            self._lazy_cache.clear()
+            self._lazy_asset_versions.clear()
     
     def _create_default_configs(self, config_dir: str):
         """Crea configuraciones por defecto si no existen"""
@@ -154,10 +804,16 @@ class TenantConfig:
             "medicorp.com": "medicorp",
             "portal-medicorp.com": "medicorp",
             "www.medicorp.com": "medicorp",
-            "localhost": os.getenv("DEFAULT_TENANT", "default"),
-            "127.0.0.1": os.getenv("DEFAULT_TENANT", "default"),
+            "localhost": settings.DEFAULT_TENANT,
+            "127.0.0.1": settings.DEFAULT_TENANT,
         }
         
+        # Mapeos adicionales desde el entorno: "dominio=tenant,*.dominio=tenant"
+        for entry in settings.TENANT_DOMAIN_MAPPING.split(","):
+            if "=" in entry:
+                domain, tenant_id = entry.split("=", 1)
+                self.domain_mapping[domain.strip().lower()] = tenant_id.strip()
+        
         # Mapeos de subdominio
         self.subdomain_mapping = {
             "coosalud": "coosalud",
@@ -166,27 +822,29 @@ class TenantConfig:
             "demo": "default",
             "test": "default"
         }
+        
+        self.host_index = TenantHostIndex(self.domain_mapping, cache_size=settings.TENANT_HOST_CACHE_SIZE)
     
     def get_tenant_config(self, tenant_id: str) -> TenantBranding:
         """Obtiene la configuración de un tenant específico"""
-        config = self.configs.get(tenant_id, self.configs["default"])
+        config = self.registry.get_config(tenant_id)
         logger.debug(f"Obteniendo configuración para tenant: {tenant_id}")
         return config
     
+    def get_tenant_bundle(self, tenant_id: str) -> TenantBundle:
+        """Obtiene el bundle de render precalculado de un tenant"""
+        return self.registry.get_bundle(tenant_id)
+    
+    def get_bundle_by_asset_version(self, version: str) -> Optional[TenantBundle]:
+        """Busca el bundle dueño de un recurso versionado (hash de CSS/JS)"""
+        bundle = self.registry.asset_versions.get(version)
+        if bundle is None and self.lazy:
+            bundle = self._lazy_asset_versions.get(version)
+        return bundle
+    
     def get_tenant_from_domain(self, domain: str) -> str:
         """Determina el tenant basado en el dominio"""
-        domain_lower = domain.lower()
-        
-        # Búsqueda exacta
-        if domain_lower in self.domain_mapping:
-            return self.domain_mapping[domain_lower]
-        
-        # Búsqueda parcial
-        for domain_key, tenant_id in self.domain_mapping.items():
-            if domain_key in domain_lower:
-                return tenant_id
-        
-        return "default"
+        return self.host_index.resolve(domain) or "default"
     
     def get_tenant_from_subdomain(self, host: str) -> str:
         """Determina el tenant basado en el subdominio"""
@@ -197,19 +855,41 @@ class TenantConfig:
         
         return "default"
     
+    def resolve_tenant_from_host(self, host: str) -> Optional[str]:
+        """
+        Determina el tenant a partir del header Host
+        
+        Primero consulta el índice de dominios (exacto o *.dominio) y luego
+        el mapeo de subdominios por la primera etiqueta.
+        
+        Args:
+            host: Valor del header Host (puede incluir puerto)
+            
+        Returns:
+            Optional[str]: tenant_id o None si el host no está mapeado
+        """
+        tenant_id = self.host_index.resolve(host)
+        if tenant_id is not None:
+            return tenant_id
+        
+        hostname = normalize_host(host)
+        if "." in hostname:
+            return self.subdomain_mapping.get(hostname.split(".", 1)[0])
+        return None
+    
     def get_tenant_from_header(self, tenant_header: str) -> str:
         """Determina el tenant basado en header personalizado"""
-        if tenant_header and tenant_header.lower() in self.configs:
+        if tenant_header and self.is_valid_tenant(tenant_header.lower()):
             return tenant_header.lower()
         return "default"
     
     def get_available_tenants(self) -> List[str]:
         """Obtiene lista de tenants disponibles"""
-        return list(self.configs.keys())
+        return self.registry.tenant_ids()
     
     def is_valid_tenant(self, tenant_id: str) -> bool:
         """Verifica si un tenant es válido"""
-        return tenant_id in self.configs
+        return self.registry.is_valid(tenant_id)
     
     def _get_default_config(self) -> TenantBranding:
         """Configuración por defecto"""
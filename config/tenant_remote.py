@@ -0,0 +1,228 @@
+"""
+Fuente remota de configuraciones de tenants (servicio de configuración HTTP)
+
+HttpTenantSource descarga {"tenants": {tenant_id: {...}}} del endpoint
+configurado con GET condicional (If-None-Match / ETag) en una tarea de
+fondo y publica el resultado en TenantConfig.apply_source_configs. Los
+requests nunca esperan al servicio: siempre leen el último snapshot bueno.
+
+La última respuesta válida se guarda en disco para arrancar en frío sin
+depender del servicio; si está caído, se sigue sirviendo esa copia.
+"""
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+
+from config.tenant_config import TenantBranding, TenantConfig, check_tenant_branding
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+SOURCE_NAME = "http"
+
+
+class HttpTenantSource:
+    """
+    Mantiene sincronizados los tenants con el servicio de configuración
+    """
+
+    def __init__(self, config: TenantConfig, url: str, cache_path: str = "",
+                 refresh_interval: float = 30.0, timeout: float = 5.0, max_backoff: float = 300.0):
+        """
+        Inicializa la fuente
+
+        Args:
+            config: Manejador de configuración donde se publican los tenants
+            url: URL del endpoint de configuraciones
+            cache_path: Archivo de cache local (vacío = sin cache en disco)
+            refresh_interval: Segundos entre consultas
+            timeout: Timeout de cada consulta en segundos
+            max_backoff: Espera máxima entre reintentos tras errores
+        """
+        self.config = config
+        self.url = url
+        self.cache_path = cache_path
+        self.refresh_interval = refresh_interval
+        self.timeout = timeout
+        self.max_backoff = max_backoff
+        self.etag: Optional[str] = None
+        self.last_success: Optional[float] = None
+        self.consecutive_failures = 0
+        self._raw: Dict[str, Dict[str, Any]] = {}
+        self._stop_event = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Estado de la fuente para /metrics"""
+        return {
+            "url": self.url,
+            "etag": self.etag,
+            "tenants": len(self._raw),
+            "last_success": self.last_success,
+            "seconds_since_success": time.time() - self.last_success if self.last_success else None,
+            "consecutive_failures": self.consecutive_failures,
+        }
+
+    def load_cache(self) -> bool:
+        """
+        Publica la copia local de la última respuesta buena (arranque en frío)
+
+        Returns:
+            bool: True si había una cache utilizable
+        """
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return False
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+            configs, _ = self._validate(cached["tenants"])
+        except Exception as e:
+            logger.warning(f"⚠️ Cache de configuración remota ilegible ({self.cache_path}): {e}")
+            return False
+
+        self._raw = {tenant_id: cached["tenants"][tenant_id] for tenant_id in configs}
+        self.etag = cached.get("etag")
+        self.last_success = cached.get("fetched_at")
+        self.config.apply_source_configs(SOURCE_NAME, configs)
+        logger.info(f"💾 {len(configs)} tenants cargados desde la cache remota {self.cache_path}")
+        return True
+
+    def start(self):
+        """Inicia la sincronización como tarea de fondo"""
+        if self._task is None:
+            self._stop_event.clear()
+            self._client = httpx.AsyncClient(timeout=self.timeout)
+            self._task = asyncio.create_task(self._run(), name="tenant-remote-source")
+            logger.info(f"🌐 Fuente remota de tenants iniciada: {self.url} (cada {self.refresh_interval}s)")
+
+    async def stop(self):
+        """Detiene la sincronización y cierra el cliente HTTP"""
+        if self._task is not None:
+            self._stop_event.set()
+            try:
+                await asyncio.wait_for(self._task, timeout=self.timeout + 1)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                self._task.cancel()
+            self._task = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        logger.info("🌐 Fuente remota de tenants detenida")
+
+    async def _run(self):
+        """Bucle de refresco con backoff exponencial ante errores"""
+        while not self._stop_event.is_set():
+            await self.refresh()
+            delay = self.refresh_interval
+            if self.consecutive_failures:
+                delay = min(self.refresh_interval * 2 ** self.consecutive_failures, self.max_backoff)
+            try:
+                await asyncio.wait_for(self._stop_event.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def refresh(self) -> bool:
+        """
+        Consulta el servicio una vez y publica los cambios
+
+        Cualquier error se registra y se conserva el último snapshot bueno.
+
+        Returns:
+            bool: True si la consulta terminó bien (200 o 304)
+        """
+        headers = {"Accept": "application/json"}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+
+        start_time = time.perf_counter()
+        try:
+            client = self._client or httpx.AsyncClient(timeout=self.timeout)
+            try:
+                response = await client.get(self.url, headers=headers)
+            finally:
+                if client is not self._client:
+                    await client.aclose()
+
+            if response.status_code == 304:
+                result = "not_modified"
+            elif response.status_code == 200:
+                result = "updated"
+                await asyncio.to_thread(self._apply_response, response.content, response.headers.get("etag"))
+            else:
+                raise httpx.HTTPStatusError(
+                    f"respuesta {response.status_code}", request=response.request, response=response
+                )
+        except Exception as e:
+            self.consecutive_failures += 1
+            metrics.increment("tenant_remote_refresh_total", result="error")
+            logger.warning(f"⚠️ Servicio de configuración no disponible ({e}), "
+                           f"se mantiene el último snapshot bueno ({self.consecutive_failures} fallos seguidos)")
+            return False
+
+        self.consecutive_failures = 0
+        self.last_success = time.time()
+        metrics.increment("tenant_remote_refresh_total", result=result)
+        metrics.observe("tenant_remote_refresh_seconds", time.perf_counter() - start_time)
+        return True
+
+    def _apply_response(self, content: bytes, etag: Optional[str]):
+        """Valida la respuesta, la publica y actualiza la cache en disco (en un hilo)"""
+        raw = json.loads(content)["tenants"]
+        configs, errors = self._validate(raw)
+
+        # Un tenant inválido conserva su última versión buena
+        for tenant_id in errors:
+            if tenant_id in self._raw:
+                try:
+                    configs[tenant_id] = TenantBranding(**self._raw[tenant_id])
+                    raw[tenant_id] = self._raw[tenant_id]
+                except Exception:
+                    pass
+
+        self._raw = {tenant_id: raw[tenant_id] for tenant_id in configs}
+        self.etag = etag
+        self.config.apply_source_configs(SOURCE_NAME, configs)
+        self._write_cache()
+
+    def _validate(self, raw: Dict[str, Dict[str, Any]]) -> Tuple[Dict[str, TenantBranding], Dict[str, str]]:
+        """
+        Valida cada tenant con TenantBranding y check_tenant_branding
+
+        Returns:
+            Tuple[Dict[str, TenantBranding], Dict[str, str]]: (válidos, errores por tenant)
+        """
+        configs: Dict[str, TenantBranding] = {}
+        errors: Dict[str, str] = {}
+        for tenant_id, data in raw.items():
+            try:
+                config = TenantBranding(**data)
+                problems, _ = check_tenant_branding(config)
+                if problems:
+                    raise ValueError("; ".join(problems))
+                configs[tenant_id] = config
+            except Exception as e:
+                errors[tenant_id] = str(e)
+                metrics.increment("tenant_reload_failures_total", tenant=tenant_id)
+                logger.error(f"❌ Config remota inválida para {tenant_id}: {e}")
+        return configs, errors
+
+    def _write_cache(self):
+        """Guarda la última respuesta buena de forma atómica"""
+        if not self.cache_path:
+            return
+        try:
+            directory = os.path.dirname(os.path.abspath(self.cache_path))
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tenant-remote-", suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"etag": self.etag, "fetched_at": time.time(), "tenants": self._raw}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.cache_path)
+        except Exception as e:
+            logger.error(f"Error guardando cache de configuración remota: {e}")
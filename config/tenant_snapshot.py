@@ -0,0 +1,289 @@
+"""
+Snapshot compilado de tenants para arranques rápidos
+
+`python -m config.tenant_snapshot build` valida una sola vez todos los JSON
+de config/tenants (esquema de TenantBranding + check_tenant_branding) y
+escribe un único archivo compacto:
+
+    SGCTENANTS2 <formato> <sha256 del payload>\\n
+    <payload>
+
+El payload guarda el sha256 del contenido de cada archivo fuente, una
+huella del esquema de TenantBranding y los datos ya validados como filas de
+valores en el orden de "fields" (los nombres de campo no se repiten por
+tenant). Se compara el contenido y no (mtime, tamaño) porque el snapshot se
+compila en CI y los archivos llegan a la imagen con otras fechas. Al
+arrancar, cada worker mapea el archivo en memoria, verifica el hash, compara
+el sha256 de cada JSON (mucho más barato que validarlo) y construye los
+modelos con TenantBranding.model_construct, sin volver a validar. Si algún
+archivo fuente o el esquema cambió, el snapshot se considera desactualizado
+y TenantConfig vuelve a leer los JSON.
+
+El formato es JSON compacto si msgpack no está instalado; msgpack figura en
+requirements.txt, así que la imagen que compila el snapshot y la que lo lee
+usan el mismo. Un snapshot en msgpack leído sin msgpack se descarta y se
+cargan los JSON.
+
+Uso:
+    python -m config.tenant_snapshot build [--config-dir DIR] [--output RUTA]
+    python -m config.tenant_snapshot check [--config-dir DIR] [--output RUTA]
+"""
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import sys
+import tempfile
+from typing import Any, Dict, List, Mapping, Optional, Tuple, Type
+
+from pydantic import BaseModel
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - depende del entorno
+    msgpack = None
+
+SNAPSHOT_MAGIC = b"SGCTENANTS2"
+
+
+class SnapshotError(Exception):
+    """Snapshot ilegible, corrupto o desactualizado"""
+
+
+def schema_fingerprint(model: Type[BaseModel]) -> str:
+    """
+    Huella de los campos de un modelo
+
+    Un snapshot compilado con otro esquema no se puede cargar sin validar.
+    """
+    fields = sorted(f"{name}:{field.annotation}" for name, field in model.model_fields.items())
+    return hashlib.sha256("\n".join(fields).encode("utf-8")).hexdigest()[:16]
+
+
+def file_digest(path: str) -> str:
+    """sha256 del contenido de un archivo"""
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def source_digests(paths: Mapping[str, str]) -> Dict[str, str]:
+    """
+    sha256 del contenido de cada JSON de tenant
+
+    Args:
+        paths: tenant_id -> ruta del archivo
+
+    Returns:
+        Dict[str, str]: tenant_id -> sha256 en hexadecimal
+    """
+    return {tenant_id: file_digest(path) for tenant_id, path in paths.items()}
+
+
+def _encode(payload: Dict[str, Any]) -> Tuple[bytes, bytes]:
+    """Serializa el payload: (formato, bytes)"""
+    if msgpack is not None:
+        return b"msgpack", msgpack.packb(payload, use_bin_type=True)
+    return b"json", json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _decode(encoding: bytes, data) -> Dict[str, Any]:
+    """Deserializa el payload según el formato del encabezado"""
+    if encoding == b"msgpack":
+        if msgpack is None:
+            raise SnapshotError("snapshot en msgpack pero msgpack no está instalado")
+        return msgpack.unpackb(data, raw=False)
+    if encoding == b"json":
+        return json.loads(bytes(data))
+    raise SnapshotError(f"formato de snapshot desconocido: {encoding!r}")
+
+
+def compile_tenants(config_dir: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Valida todos los JSON de tenants y arma el payload del snapshot
+
+    Args:
+        config_dir: Directorio con los JSON de tenants
+
+    Returns:
+        Tuple[Dict[str, Any], Dict[str, Any]]: (payload, reporte con errores
+        y advertencias por tenant). Si el reporte tiene errores el payload
+        no debe escribirse.
+    """
+    # Import local: tenant_config usa este módulo para cargar el snapshot
+    from config.tenant_config import TenantBranding, check_tenant_branding, scan_tenant_dir
+
+    fields = list(TenantBranding.model_fields)
+    tenants: Dict[str, List[Any]] = {}
+    sources: Dict[str, str] = {}
+    report: Dict[str, Any] = {"errors": {}, "warnings": {}}
+
+    for tenant_id, (config_path, _) in sorted(scan_tenant_dir(config_dir).items()):
+        try:
+            with open(config_path, "rb") as f:
+                raw = f.read()
+            config = TenantBranding(**json.loads(raw))
+        except Exception as e:
+            report["errors"][tenant_id] = [str(e)]
+            continue
+
+        errors, warnings = check_tenant_branding(config)
+        if errors:
+            report["errors"][tenant_id] = errors
+            continue
+        if warnings:
+            report["warnings"][tenant_id] = warnings
+
+        values = config.model_dump()
+        tenants[tenant_id] = [values[name] for name in fields]
+        sources[tenant_id] = hashlib.sha256(raw).hexdigest()
+
+    payload = {
+        "schema": schema_fingerprint(TenantBranding),
+        "fields": fields,
+        "sources": sources,
+        "tenants": tenants,
+    }
+    return payload, report
+
+
+def write_snapshot(payload: Dict[str, Any], output_path: str) -> str:
+    """
+    Escribe el snapshot de forma atómica (archivo temporal + rename)
+
+    Args:
+        payload: Payload generado por compile_tenants
+        output_path: Ruta destino
+
+    Returns:
+        str: sha256 del payload
+    """
+    encoding, data = _encode(payload)
+    digest = hashlib.sha256(data).hexdigest()
+    directory = os.path.dirname(os.path.abspath(output_path))
+    os.makedirs(directory, exist_ok=True)
+
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tenants-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(b" ".join((SNAPSHOT_MAGIC, encoding, digest.encode("ascii"))) + b"\n")
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return digest
+
+
+def read_snapshot(snapshot_path: str) -> Dict[str, Any]:
+    """
+    Lee un snapshot mapeándolo en memoria y verifica su hash
+
+    Args:
+        snapshot_path: Ruta del snapshot
+
+    Returns:
+        Dict[str, Any]: Payload con schema, sources y tenants
+
+    Raises:
+        SnapshotError: Si el archivo no es un snapshot válido
+    """
+    with open(snapshot_path, "rb") as f:
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            raise SnapshotError("snapshot vacío")
+
+    with mapped:
+        header = mapped.readline()
+        parts = header.split()
+        if len(parts) != 3 or parts[0] != SNAPSHOT_MAGIC:
+            raise SnapshotError("encabezado de snapshot inválido")
+        encoding, digest = parts[1], parts[2].decode("ascii")
+
+        with memoryview(mapped) as view, view[len(header):] as data:
+            if hashlib.sha256(data).hexdigest() != digest:
+                raise SnapshotError("hash del snapshot no coincide")
+            return _decode(encoding, data)
+
+
+def load_snapshot(snapshot_path: str, paths: Mapping[str, str],
+                  schema: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Obtiene los datos ya validados del snapshot si sigue al día
+
+    Args:
+        snapshot_path: Ruta del snapshot
+        paths: tenant_id -> ruta actual de cada JSON de tenant
+        schema: Huella esperada del esquema (schema_fingerprint)
+
+    Returns:
+        Dict[str, Dict[str, Any]]: tenant_id -> valores por campo
+
+    Raises:
+        SnapshotError: Si el snapshot es inválido o está desactualizado
+    """
+    payload = read_snapshot(snapshot_path)
+
+    if payload.get("schema") != schema:
+        raise SnapshotError("esquema de TenantBranding distinto al del snapshot")
+
+    sources = payload.get("sources") or {}
+    # Primero el conjunto de tenants (gratis); solo si coincide se leen los archivos
+    if set(sources) != set(paths) or source_digests(paths) != sources:
+        raise SnapshotError("archivos de tenants modificados después de compilar el snapshot")
+
+    fields = payload["fields"]
+    return {tenant_id: dict(zip(fields, row)) for tenant_id, row in payload["tenants"].items()}
+
+
+def _print_report(report: Dict[str, Any]):
+    """Muestra errores y advertencias de la compilación"""
+    for tenant_id, warnings in report["warnings"].items():
+        for warning in warnings:
+            print(f"⚠️ {tenant_id}: {warning}")
+    for tenant_id, errors in report["errors"].items():
+        for error in errors:
+            print(f"❌ {tenant_id}: {error}")
+
+
+def main(argv: Optional[list] = None) -> int:
+    from config.settings import settings
+    from config.tenant_config import TENANT_CONFIG_DIR, TenantConfig, scan_tenant_dir
+
+    parser = argparse.ArgumentParser(description="Compila los JSON de tenants en un snapshot")
+    parser.add_argument("command", choices=("build", "check"),
+                        help="build: validar y escribir el snapshot; check: verificar si está al día")
+    parser.add_argument("--config-dir", default=TENANT_CONFIG_DIR)
+    parser.add_argument("--output", default=settings.TENANT_SNAPSHOT_PATH or "config/tenants.snapshot")
+    args = parser.parse_args(argv)
+
+    if args.command == "check":
+        scanned = scan_tenant_dir(args.config_dir)
+        try:
+            configs = TenantConfig.load_snapshot_configs(
+                args.output, {tenant_id: path for tenant_id, (path, _) in scanned.items()}
+            )
+        except (OSError, SnapshotError) as e:
+            print(f"❌ Snapshot no utilizable: {e}")
+            return 1
+        print(f"✅ Snapshot al día: {len(configs)} tenants")
+        return 0
+
+    payload, report = compile_tenants(args.config_dir)
+    _print_report(report)
+    if report["errors"]:
+        print(f"❌ Snapshot no generado: {len(report['errors'])} tenants con errores")
+        return 1
+
+    digest = write_snapshot(payload, args.output)
+    print(f"✅ Snapshot escrito en {args.output}: {len(payload['tenants'])} tenants, "
+          f"{os.path.getsize(args.output)} bytes, sha256 {digest[:16]}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+"""
+Watcher de config/tenants/*.json para recarga en caliente de tenants
+
+Usa watchfiles (inotify en Linux, incluido con uvicorn[standard]) y, si no
+está instalado, un sondeo periódico de mtimes. Cada cambio dispara
+TenantConfig.reload_changed_configs en un hilo para no bloquear el event loop.
+"""
+import asyncio
+import logging
+from typing import Optional
+
+from config.tenant_config import TenantConfig
+
+logger = logging.getLogger(__name__)
+
+try:
+    from watchfiles import awatch
+except ImportError:  # pragma: no cover - depende del entorno
+    awatch = None
+
+
+class TenantConfigWatcher:
+    """
+    Observa el directorio de tenants y recarga las configuraciones modificadas
+    """
+
+    def __init__(self, config: TenantConfig, poll_interval: float = 2.0, use_polling: bool = False):
+        """
+        Inicializa el watcher
+
+        Args:
+            config: Manejador de configuración a recargar
+            poll_interval: Segundos entre sondeos (modo polling)
+            use_polling: Forzar sondeo aunque watchfiles esté disponible
+        """
+        self.config = config
+        self.poll_interval = poll_interval
+        self.use_polling = use_polling or awatch is None
+        self._stop_event = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def mode(self) -> str:
+        """Mecanismo de detección en uso"""
+        return "polling" if self.use_polling else "inotify"
+
+    def start(self):
+        """Inicia el watcher como tarea de fondo"""
+        if self._task is None:
+            self._stop_event.clear()
+            self._task = asyncio.create_task(self._run(), name="tenant-config-watcher")
+            logger.info(f"👀 Watcher de tenants iniciado ({self.mode}): {self.config.config_dir}")
+
+    async def stop(self):
+        """Detiene el watcher y espera a que termine"""
+        if self._task is None:
+            return
+        self._stop_event.set()
+        try:
+            await asyncio.wait_for(self._task, timeout=self.poll_interval + 1)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            self._task.cancel()
+        self._task = None
+        logger.info("👀 Watcher de tenants detenido")
+
+    async def _run(self):
+        """Bucle principal del watcher"""
+        if not self.use_polling:
+            try:
+                await self._watch_inotify()
+                return
+            except Exception as e:
+                logger.warning(f"⚠️ watchfiles no disponible ({e}), usando sondeo cada {self.poll_interval}s")
+        await self._watch_polling()
+
+    async def _watch_inotify(self):
+        """Espera eventos del sistema de archivos"""
+        async for changes in awatch(
+            self.config.config_dir,
+            stop_event=self._stop_event,
+            watch_filter=lambda change, path: path.endswith('.json'),
+            recursive=False,
+        ):
+            logger.debug(f"Cambios en tenants: {changes}")
+            await self._reload()
+
+    async def _watch_polling(self):
+        """Compara mtimes periódicamente"""
+        while not self._stop_event.is_set():
+            try:
+                await asyncio.wait_for(self._stop_event.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                await self._reload()
+
+    async def _reload(self):
+        """Ejecuta la recarga incremental fuera del event loop"""
+        try:
+            await asyncio.to_thread(self.config.reload_changed_configs)
+        except Exception as e:
+            logger.error(f"❌ Error en recarga de tenants: {e}")
@@ -0,0 +1,186 @@
+"""
+API de autenticación de prueba
+
+Emite access tokens RS256 reales (con kid, aud, tenant_id y exp) y publica
+las claves públicas en GET /.well-known/jwks.json, para probar la
+verificación local de firma sin la API real. Implementa login, refresh (con
+rotación del refresh token), logout, registro y recuperación de contraseña.
+POST /admin/rotate-keys genera una clave nueva; la anterior sigue publicada
+hasta la siguiente rotación para que los tokens emitidos sigan siendo válidos.
+
+El tenant del token es el del login (tenant_id del cuerpo o X-Tenant-ID);
+--tenant lo fija para probar el rechazo por tenant incorrecto. --token-ttl
+define el exp. Latencia y errores se inyectan con --latency, --jitter y
+--error-rate (ver fakes.faults) o en caliente con POST /admin/faults.
+
+Usuarios: admin/admin123 (rol admin) y demo/demo123 (rol user), en cualquier tenant.
+
+Uso:
+    python -m fakes.auth_api [--port 9000] [--audience sgc-frontend] [--token-ttl 900]
+                             [--tenant biomed] [--latency 0.05] [--jitter 0.02] [--error-rate 0.01]
+    JWT_LOCAL_VERIFICATION=true JWT_AUDIENCE=sgc-frontend AUTH_API_URL=http://localhost:9000 python main.py
+"""
+import argparse
+import secrets
+import time
+import uuid
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from jose import jwk, jwt
+
+from fakes import faults
+
+app = FastAPI(title="API de autenticación (fake)")
+app.state.audience = "sgc-frontend"
+app.state.token_ttl = 900
+app.state.forced_tenant = None  # Tenant fijo en los tokens (None = el del request)
+app.state.signing_keys = []  # [(kid, pem privado, jwk público)], la primera firma
+app.state.refresh_tokens = {}  # refresh token -> (username, tenant_id)
+
+USERS = {
+    "admin": {"password": "admin123", "roles": ["admin"], "email": "admin@example.com"},
+    "demo": {"password": "demo123", "roles": ["user"], "email": "demo@example.com"},
+}
+
+
+def rotate_keys():
+    """Genera una clave de firma nueva y conserva solo la anterior"""
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = private_key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    )
+    kid = uuid.uuid4().hex[:12]
+    public_jwk = {**jwk.construct(pem, "RS256").public_key().to_dict(), "kid": kid, "use": "sig"}
+    app.state.signing_keys = [(kid, pem, public_jwk)] + app.state.signing_keys[:1]
+    return kid
+
+
+def issue_tokens(username: str, tenant_id: str) -> dict:
+    """Access token firmado con la clave vigente y refresh token opaco"""
+    if not app.state.signing_keys:
+        rotate_keys()
+    kid, pem, _ = app.state.signing_keys[0]
+    user = USERS[username]
+    tenant_id = app.state.forced_tenant or tenant_id
+    now = int(time.time())
+    claims = {
+        "sub": username,
+        "username": username,
+        "email": user["email"],
+        "roles": user["roles"],
+        "tenant_id": tenant_id,
+        "aud": app.state.audience,
+        "iat": now,
+        "exp": now + app.state.token_ttl,
+    }
+    refresh_token = secrets.token_urlsafe(32)
+    app.state.refresh_tokens[refresh_token] = (username, tenant_id)
+    return {
+        "access_token": jwt.encode(claims, pem, algorithm="RS256", headers={"kid": kid}),
+        "refresh_token": refresh_token,
+        "token_type": "bearer",
+        "expires_in": app.state.token_ttl,
+        "session_id": uuid.uuid4().hex,
+        "user": {"username": username, "tenant_id": tenant_id, "roles": user["roles"]},
+    }
+
+
+faults.install(app)
+
+
+def request_tenant(request: Request, body: dict) -> str:
+    """Tenant del request: cuerpo, header X-Tenant-ID o default"""
+    return body.get("tenant_id") or request.headers.get("x-tenant-id") or "default"
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+
+@app.get("/.well-known/jwks.json")
+async def jwks():
+    if not app.state.signing_keys:
+        rotate_keys()
+    return JSONResponse(
+        {"keys": [public_jwk for _, _, public_jwk in app.state.signing_keys]},
+        headers={"Cache-Control": "max-age=300"},
+    )
+
+
+@app.post("/auth/login")
+async def login(request: Request):
+    body = await request.json()
+    username = body.get("username", "")
+    user = USERS.get(username)
+    if user is None or not secrets.compare_digest(user["password"], body.get("password", "")):
+        return JSONResponse({"detail": "Usuario o contraseña incorrectos"}, status_code=401)
+    return issue_tokens(username, request_tenant(request, body))
+
+
+@app.post("/auth/refresh-token")
+async def refresh_token(request: Request):
+    body = await request.json()
+    owner = app.state.refresh_tokens.pop(body.get("refresh_token", ""), None)
+    if owner is None:
+        return JSONResponse({"detail": "Refresh token inválido"}, status_code=401)
+    return issue_tokens(*owner)
+
+
+@app.post("/auth/logout")
+async def logout(request: Request):
+    body = await request.json()
+    app.state.refresh_tokens.pop(body.get("refresh_token", ""), None)
+    return {"detail": "ok"}
+
+
+@app.post("/auth/register", status_code=201)
+async def register(request: Request):
+    body = await request.json()
+    username = body.get("username", "")
+    if not username or username in USERS:
+        return JSONResponse({"detail": "El usuario ya existe"}, status_code=400)
+    USERS[username] = {"password": body.get("password", ""), "roles": ["user"], "email": body.get("email", "")}
+    return {"username": username, "tenant_id": request_tenant(request, body)}
+
+
+@app.post("/auth/forgot-password")
+async def forgot_password():
+    return {"detail": "ok"}
+
+
+@app.post("/auth/reset-password")
+async def reset_password():
+    return {"detail": "ok"}
+
+
+@app.post("/admin/rotate-keys")
+async def admin_rotate_keys():
+    return {"kid": rotate_keys(), "published": [kid for kid, _, _ in app.state.signing_keys]}
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="API de autenticación de prueba")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--audience", default="sgc-frontend")
+    parser.add_argument("--token-ttl", type=int, default=900, help="Vida del access token en segundos")
+    parser.add_argument("--tenant", default=None, help="Tenant fijo en los tokens emitidos")
+    faults.add_arguments(parser)
+    args = parser.parse_args()
+
+    app.state.audience = args.audience
+    app.state.token_ttl = args.token_ttl
+    app.state.forced_tenant = args.tenant
+    faults.configure(app, args)
+    rotate_keys()
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Servicio de configuración de tenants de prueba
+
+Sirve los JSON de un directorio como {"tenants": {tenant_id: {...}}} en
+GET /tenants, con ETag y respuesta 304 para If-None-Match. Editar un
+archivo cambia el ETag. POST /admin/outage?enabled=true simula una caída
+(503) para probar que el frontend sigue sirviendo el último snapshot bueno.
+
+Uso:
+    python -m fakes.config_server [--dir config/tenants] [--port 9100] [--latency 0.0]
+    TENANT_CONFIG_URL=http://localhost:9100/tenants python main.py
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+
+from fastapi import FastAPI, Request, Response
+
+app = FastAPI(title="Servicio de configuración de tenants (fake)")
+app.state.config_dir = "config/tenants"
+app.state.latency = 0.0
+app.state.outage = False
+
+
+def build_payload(config_dir: str) -> bytes:
+    """Lee todos los JSON del directorio y arma el cuerpo de la respuesta"""
+    tenants = {}
+    for name in sorted(os.listdir(config_dir)):
+        if name.endswith(".json"):
+            with open(os.path.join(config_dir, name), encoding="utf-8") as f:
+                tenants[name[:-len(".json")]] = json.load(f)
+    return json.dumps({"tenants": tenants}, ensure_ascii=False, sort_keys=True).encode("utf-8")
+
+
+@app.get("/tenants")
+async def get_tenants(request: Request):
+    if app.state.latency:
+        await asyncio.sleep(app.state.latency)
+    if app.state.outage:
+        return Response(status_code=503)
+
+    payload = build_payload(app.state.config_dir)
+    etag = f'"{hashlib.sha256(payload).hexdigest()[:16]}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(payload, media_type="application/json", headers={"ETag": etag})
+
+
+@app.post("/admin/outage")
+async def set_outage(enabled: bool = True):
+    app.state.outage = enabled
+    return {"outage": enabled}
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Servicio de configuración de tenants de prueba")
+    parser.add_argument("--dir", default="config/tenants")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency", type=float, default=0.0, help="Segundos de latencia añadida")
+    args = parser.parse_args()
+
+    app.state.config_dir = args.dir
+    app.state.latency = args.latency
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
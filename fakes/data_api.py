@@ -0,0 +1,125 @@
+"""
+API de datos de prueba
+
+Implementa los endpoints que usa ApiService: /statistics, /dashboard,
+/users/{user_id}, /health y, con Authorization: Bearer, /user/profile y
+/user/statistics. Los datos son sintéticos y estables por tenant
+(X-Tenant-ID o el tenant_id del token). El token no se verifica: solo se
+leen sus claims (la firma la verifica el frontend). Latencia y errores se
+inyectan igual que en fakes.auth_api (ver fakes.faults).
+
+Uso:
+    python -m fakes.data_api [--port 8000] [--latency 0.02] [--jitter 0.01] [--error-rate 0.01]
+    DATA_API_URL=http://localhost:8000 python main.py
+"""
+import argparse
+import time
+import zlib
+from typing import Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from jose import jwt
+from jose.exceptions import JWTError
+
+from fakes import faults
+
+app = FastAPI(title="API de datos (fake)")
+app.state.started_at = time.time()
+faults.install(app)
+
+
+def token_claims(request: Request) -> Optional[dict]:
+    """Claims del bearer token sin verificar (None si no hay o no es un JWT)"""
+    authorization = request.headers.get("authorization", "")
+    if not authorization.lower().startswith("bearer "):
+        return None
+    try:
+        return jwt.get_unverified_claims(authorization[7:])
+    except JWTError:
+        return None
+
+
+def request_tenant(request: Request) -> str:
+    claims = token_claims(request) or {}
+    return request.headers.get("x-tenant-id") or claims.get("tenant_id") or "default"
+
+
+def seed(*parts: str) -> int:
+    """Número estable para generar datos sintéticos"""
+    return zlib.crc32(":".join(parts).encode("utf-8"))
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok", "uptime_seconds": round(time.time() - app.state.started_at)}
+
+
+@app.get("/statistics")
+async def statistics(request: Request):
+    base = seed(request_tenant(request))
+    uptime = int(time.time() - app.state.started_at)
+    return {
+        "total_users": 100 + base % 900,
+        "active_sessions": 1 + base % 50,
+        "total_requests": sum(app.state.calls.values()),
+        "system_uptime": f"{uptime // 3600}h {uptime % 3600 // 60}m",
+    }
+
+
+@app.get("/dashboard")
+async def dashboard(request: Request):
+    base = seed(request_tenant(request), "dashboard")
+    return {
+        "widgets": [
+            {"id": "requests", "title": "Solicitudes", "value": base % 5000},
+            {"id": "pending", "title": "Pendientes", "value": base % 120},
+            {"id": "closed", "title": "Cerradas", "value": base % 3000},
+        ],
+        "generated_at": int(time.time()),
+    }
+
+
+@app.get("/users/{user_id}")
+async def user_profile(user_id: str, request: Request):
+    return {
+        "id": user_id,
+        "username": user_id,
+        "tenant_id": request_tenant(request),
+        "email": f"{user_id}@example.com",
+        "created_at": 1_600_000_000 + seed(user_id) % 100_000_000,
+    }
+
+
+@app.get("/user/profile")
+async def current_user_profile(request: Request):
+    claims = token_claims(request)
+    if claims is None:
+        return JSONResponse({"detail": "No autenticado"}, status_code=401)
+    return await user_profile(claims.get("sub", ""), request)
+
+
+@app.get("/user/statistics")
+async def current_user_statistics(request: Request):
+    claims = token_claims(request)
+    if claims is None:
+        return JSONResponse({"detail": "No autenticado"}, status_code=401)
+    base = seed(request_tenant(request), claims.get("sub", ""))
+    return {"requests_created": base % 200, "requests_closed": base % 150, "last_login": int(time.time())}
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="API de datos de prueba")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    faults.add_arguments(parser)
+    args = parser.parse_args()
+
+    faults.configure(app, args)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Latencia y errores inyectados en las APIs de prueba
+
+install() agrega a una app FastAPI un middleware que, antes de cada
+request, espera latency + uniform(0, jitter) segundos y responde
+error_status con probabilidad error_rate. Las rutas de /health, /admin y
+/.well-known no se ven afectadas. La configuración se cambia en caliente
+con POST /admin/faults (JSON con los mismos campos) y GET /admin/stats
+devuelve cuántos requests recibió cada ruta y cuántos errores se inyectaron.
+"""
+import asyncio
+import random
+from collections import Counter
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+EXEMPT_PREFIXES = ("/health", "/admin", "/.well-known")
+
+
+def add_arguments(parser):
+    """Opciones de línea de comandos comunes a las APIs de prueba"""
+    parser.add_argument("--latency", type=float, default=0.0, help="Segundos de latencia añadida")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Latencia aleatoria extra (0..jitter)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Proporción de requests con error (0..1)")
+    parser.add_argument("--error-status", type=int, default=503, help="Status de los errores inyectados")
+
+
+def configure(app: FastAPI, args):
+    """Aplica las opciones de línea de comandos"""
+    app.state.faults.update(
+        latency=args.latency, jitter=args.jitter, error_rate=args.error_rate, error_status=args.error_status
+    )
+
+
+def install(app: FastAPI):
+    """Registra el middleware de fallas y las rutas /admin/faults y /admin/stats"""
+    app.state.faults = {"latency": 0.0, "jitter": 0.0, "error_rate": 0.0, "error_status": 503}
+    app.state.calls = Counter()
+    app.state.injected_errors = Counter()
+
+    @app.middleware("http")
+    async def inject_faults(request: Request, call_next):
+        path = request.url.path
+        if path.startswith(EXEMPT_PREFIXES):
+            return await call_next(request)
+        route = f"{request.method} {path}"
+        app.state.calls[route] += 1
+        faults = app.state.faults
+        delay = faults["latency"] + random.uniform(0, faults["jitter"])
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if faults["error_rate"] and random.random() < faults["error_rate"]:
+            app.state.injected_errors[route] += 1
+            return JSONResponse({"detail": "Error inyectado"}, status_code=faults["error_status"])
+        return await call_next(request)
+
+    @app.post("/admin/faults")
+    async def set_faults(request: Request):
+        body = await request.json()
+        app.state.faults.update({key: body[key] for key in app.state.faults if key in body})
+        return app.state.faults
+
+    @app.get("/admin/stats")
+    async def get_stats():
+        return {
+            "faults": app.state.faults,
+            "calls": dict(app.state.calls),
+            "injected_errors": dict(app.state.injected_errors),
+        }
@@ -6,16 +6,21 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
-from fastapi.responses import HTMLResponse, Response, RedirectResponse
+from fastapi.responses import HTMLResponse, JSONResponse, Response, RedirectResponse
 from fastapi.exceptions import HTTPException
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 import os
+import secrets
 from datetime import datetime
 
 # Configuraciones
 from config.settings import settings
 from config.tenant_config import tenant_config
+from config.tenant_watcher import TenantConfigWatcher
+from config.tenant_remote import HttpTenantSource
+from config.feature_flags import TenantFeatureFlags
 
 # Middlewares
 from middleware.auth_middleware import AuthMiddleware
@@ -24,12 +29,27 @@ from middleware.security_middleware import SecurityMiddleware
 from middleware.tenant_middleware import TenantMiddleware
 
 # Servicios
-from services.tenant_service import TenantService
-from services.auth_service import AuthService
+from services.tenant_service import TenantService, tenant_asset_url
+from services.audit import audit_log
+from services.auth_context import AuthContext
+from services.background_queue import forgot_password_queue
+from services.auth_service import get_auth_context
+from services.circuit_breaker import ServiceUnavailableError
+from services.http_clients import auth_http_client, data_http_client
+from services.jwt_verifier import jwt_verifier
+from services.login_throttle import login_throttle
+from services.session_store import session_store
+from services.token_refresh import token_refresher
 
 # Routers
 from routers import auth, dashboard, profile, admin, api_proxy
 
+# Utilidades
+from utils.metrics import metrics
+from utils.client_ip import get_client_ip, ip_in_networks, parse_networks
+from utils.page_cache import page_cache
+from utils.image_variants import collect_tenant_image_urls, image_sources, image_srcset, image_variants
+
 # Configuración de logging
 logging.basicConfig(
     level=getattr(logging, settings.LOG_LEVEL),
@@ -43,24 +63,14 @@ async def lifespan(app: FastAPI):
     """Maneja el ciclo de vida de la aplicación"""
     logger.info(f"🚀 Iniciando {settings.APP_NAME} v{settings.APP_VERSION}")
     
-    # Inicializar configuración de tenants
+    # Carga única de tenants (descubrir, leer, validar e indexar, con tiempos por fase)
     logger.info("📊 Cargando configuraciones de tenants...")
     try:
-        tenant_config.load_tenant_configs()
+        tenant_config.ensure_loaded()
         
         # Log de tenants disponibles
-        available_tenants = list(tenant_config.configs.keys())
-        logger.info(f"🏢 Tenants disponibles: {available_tenants}")
-        
-        # Validar configuraciones de tenants
-        for tenant_id in available_tenants:
-            validation = TenantService.validate_tenant_config(tenant_id)
-            if not validation['valid']:
-                logger.warning(f"⚠️ Tenant {tenant_id} tiene errores: {validation['errors']}")
-            elif validation.get('warnings'):
-                logger.info(f"ℹ️ Tenant {tenant_id} tiene advertencias: {validation['warnings']}")
-            else:
-                logger.info(f"✅ Tenant {tenant_id} configurado correctamente")
+        available_tenants = tenant_config.get_available_tenants()
+        logger.info(f"🏢 Tenants disponibles: {len(available_tenants)}")
     
     except Exception as e:
         logger.error(f"❌ Error cargando configuraciones de tenants: {e}")
@@ -84,14 +94,86 @@ async def lifespan(app: FastAPI):
             except Exception as e:
                 logger.error(f"❌ Error creando directorio {static_dir}: {e}")
     
+    # Escritor de auditoría en segundo plano (los requests solo encolan eventos)
+    audit_log.start()
+    
+    # Llamadas a la API cuyo resultado el request no espera (recuperación de contraseña)
+    forgot_password_queue.start()
+    
+    # Pools de conexiones compartidos con las APIs, con conexiones pre-abiertas
+    # para que el primer request después del deploy no pague el handshake
+    auth_http_client.open()
+    data_http_client.open()
+    await asyncio.gather(
+        auth_http_client.warmup(timeout=settings.UPSTREAM_WARMUP_TIMEOUT),
+        data_http_client.warmup(timeout=settings.UPSTREAM_WARMUP_TIMEOUT),
+    )
+    
+    # Claves públicas para verificar los JWT sin llamar a la API en cada request
+    if settings.JWT_LOCAL_VERIFICATION:
+        await jwt_verifier.prefetch()
+    
+    # Recarga en caliente de configuraciones de tenants
+    tenant_watcher = None
+    if settings.TENANT_HOT_RELOAD:
+        tenant_watcher = TenantConfigWatcher(tenant_config, poll_interval=settings.TENANT_RELOAD_POLL_INTERVAL)
+        tenant_watcher.start()
+    
+    # Fuente remota: se publica la cache local y se refresca en segundo plano
+    tenant_source = None
+    if settings.TENANT_CONFIG_URL:
+        tenant_source = HttpTenantSource(
+            tenant_config,
+            settings.TENANT_CONFIG_URL,
+            cache_path=settings.TENANT_CONFIG_CACHE_PATH,
+            refresh_interval=settings.TENANT_CONFIG_REFRESH_INTERVAL,
+            timeout=settings.TENANT_CONFIG_TIMEOUT,
+        )
+        tenant_source.load_cache()
+        tenant_source.start()
+        metrics.register_collector("tenant_remote", tenant_source.stats)
+    
+    # Variantes responsivas de imágenes: se publica el manifest existente y se
+    # completan las que falten en segundo plano (en modo lazy usar el CLI)
+    image_task = None
+    if settings.IMAGE_VARIANTS_ENABLED:
+        image_variants.load_manifest()
+        if settings.IMAGE_VARIANTS_ON_STARTUP and not tenant_config.lazy:
+            image_task = asyncio.create_task(build_image_variants(), name="image-variants")
+    
     logger.info("🎯 Aplicación iniciada correctamente")
     
     yield
     
     # Limpieza al cerrar
     logger.info("🔄 Cerrando aplicación...")
+    if tenant_watcher:
+        await tenant_watcher.stop()
+    if tenant_source:
+        await tenant_source.stop()
+    if image_task and not image_task.done():
+        image_task.cancel()
+    await forgot_password_queue.stop()
+    await auth_http_client.aclose()
+    await data_http_client.aclose()
+    await token_refresher.aclose()
+    await login_throttle.aclose()
+    await audit_log.stop()
+    if session_store is not None:
+        await session_store.aclose()
     logger.info("✅ Aplicación cerrada")
 
+async def build_image_variants():
+    """Genera las variantes de imágenes de los tenants en un pool de procesos"""
+    try:
+        urls = collect_tenant_image_urls(tenant_config)
+        result = await asyncio.to_thread(image_variants.build, urls, settings.IMAGE_VARIANT_WORKERS)
+        if result["images"]:
+            # Las páginas cacheadas se renderizaron sin srcset
+            page_cache.clear()
+    except Exception as e:
+        logger.error(f"❌ Error generando variantes de imágenes: {e}")
+
 # Crear aplicación FastAPI
 app = FastAPI(
     title=settings.APP_NAME,
@@ -147,9 +229,10 @@ app.add_middleware(
     session_cookie=settings.SESSION_COOKIE_NAME,
     max_age=settings.SESSION_MAX_AGE,
     https_only=settings.SESSION_COOKIE_SECURE,
-    same_site=settings.SESSION_COOKIE_SAMESITE
+    same_site=settings.SESSION_COOKIE_SAMESITE,
+    store=session_store
 )
-logger.info(f"🍪 Sesiones configuradas: cookie={settings.SESSION_COOKIE_NAME}")
+logger.info(f"🍪 Sesiones configuradas: cookie={settings.SESSION_COOKIE_NAME}, backend={settings.SESSION_BACKEND}")
 
 # 6. Middleware de autenticación (debe ir después de sesiones y tenant)
 app.add_middleware(
@@ -167,37 +250,29 @@ app.add_middleware(SessionEnhancerMiddleware)
 
 @app.get("/tenant.css")
 async def tenant_css(request: Request):
-    """Endpoint que sirve CSS dinámico basado en el tenant"""
-    css_content = TenantService.get_tenant_css_variables(request)
-    tenant_id = getattr(request.state, 'tenant_id', 'default')
-    
-    return Response(
-        content=css_content,
-        media_type="text/css",
-        headers={
-            "Cache-Control": "public, max-age=3600",  # Cache por 1 hora
-            "Content-Type": "text/css; charset=utf-8",
-            "X-Tenant-ID": tenant_id if settings.DEBUG else "",
-            "X-Generated": "dynamic-css"
-        }
-    )
+    """Endpoint que sirve CSS dinámico basado en el tenant (revalidación por ETag)"""
+    response = TenantService.get_tenant_asset_response(request, "css")
+    if settings.DEBUG:
+        response.headers["X-Tenant-ID"] = getattr(request.state, 'tenant_id', 'default')
+    return response
+
+@app.get("/tenant.{version}.css")
+async def tenant_css_versioned(request: Request, version: str):
+    """CSS del tenant con URL versionada por hash de contenido (cache inmutable)"""
+    return TenantService.get_tenant_asset_response(request, "css", version)
 
 @app.get("/tenant/config.js")
 async def tenant_js_config(request: Request):
-    """Endpoint que sirve configuración JavaScript del tenant"""
-    js_content = TenantService.get_tenant_javascript_config(request)
-    tenant_id = getattr(request.state, 'tenant_id', 'default')
-    
-    return Response(
-        content=js_content,
-        media_type="application/javascript",
-        headers={
-            "Cache-Control": "public, max-age=3600",  # Cache por 1 hora
-            "Content-Type": "application/javascript; charset=utf-8",
-            "X-Tenant-ID": tenant_id if settings.DEBUG else "",
-            "X-Generated": "dynamic-js"
-        }
-    )
+    """Endpoint que sirve configuración JavaScript del tenant (revalidación por ETag)"""
+    response = TenantService.get_tenant_asset_response(request, "js")
+    if settings.DEBUG:
+        response.headers["X-Tenant-ID"] = getattr(request.state, 'tenant_id', 'default')
+    return response
+
+@app.get("/tenant/config.{version}.js")
+async def tenant_js_config_versioned(request: Request, version: str):
+    """Configuración JavaScript del tenant con URL versionada (cache inmutable)"""
+    return TenantService.get_tenant_asset_response(request, "js", version)
 
 @app.get("/tenant/info")
 async def tenant_info(request: Request):
@@ -217,7 +292,7 @@ async def tenant_info(request: Request):
         "request_info": {
             "method": request.method,
             "url": str(request.url),
-            "client_ip": request.client.host if request.client else "unknown"
+            "client_ip": get_client_ip(request)
         },
         "tenant_config": tenant_context,
         "available_tenants": TenantService.get_available_tenants(),
@@ -265,15 +340,14 @@ if settings.DEBUG:
 # ================================
 
 @app.get("/", response_class=HTMLResponse)
-async def root(request: Request):
+async def root(request: Request, auth: AuthContext = Depends(get_auth_context)):
     """Página principal - redirige según autenticación"""
-    auth_service = AuthService()
     tenant_id = getattr(request.state, 'tenant_id', 'default')
     
     # Log de acceso a la raíz
     logger.info(f"Acceso a raíz desde tenant: {tenant_id}")
     
-    if await auth_service.is_authenticated(request):
+    if auth.authenticated:
         # Usuario autenticado, redirigir al dashboard
         return RedirectResponse(url="/dashboard", status_code=302)
     else:
@@ -317,6 +391,36 @@ async def health_check(request: Request):
     
     return health_info
 
+# Redes que pueden leer /metrics sin METRICS_TOKEN
+METRICS_NETWORKS = parse_networks(settings.METRICS_ALLOWED_NETWORKS)
+
+def metrics_access_allowed(request: Request) -> bool:
+    """
+    Verifica el acceso a /metrics
+    
+    Con METRICS_TOKEN se exige el header Authorization: Bearer <token>; sin
+    token solo pueden leerlas las IPs de METRICS_ALLOWED_NETWORKS (red interna).
+    
+    Args:
+        request: Request de FastAPI
+        
+    Returns:
+        bool: True si el request puede leer las métricas
+    """
+    if settings.METRICS_TOKEN:
+        scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+        expected = settings.METRICS_TOKEN.encode("utf-8")
+        return scheme.lower() == "bearer" and secrets.compare_digest(token.strip().encode("utf-8"), expected)
+    return ip_in_networks(get_client_ip(request), METRICS_NETWORKS)
+
+@app.get("/metrics")
+async def metrics_endpoint(request: Request):
+    """Métricas internas del proceso (recargas de tenants, caches, etc.)"""
+    if not settings.METRICS_ENABLED or not metrics_access_allowed(request):
+        raise HTTPException(status_code=404, detail="Not found")
+    
+    return metrics.snapshot()
+
 @app.get("/favicon.ico")
 async def favicon(request: Request):
     """Favicon dinámico basado en el tenant"""
@@ -426,6 +530,39 @@ async def rate_limit_handler(request: Request, exc: HTTPException):
         status_code=429
     )
 
+@app.exception_handler(ServiceUnavailableError)
+async def service_unavailable_handler(request: Request, exc: ServiceUnavailableError):
+    """Manejador para API externa degradada (circuito abierto o bulkhead lleno) con branding del tenant"""
+    tenant_id = getattr(request.state, 'tenant_id', 'unknown')
+    logger.warning(f"⚠️ Request rechazado en tenant {tenant_id}: {exc}")
+    headers = {"Retry-After": str(max(1, int(exc.retry_after)))}
+    
+    if request.url.path.startswith("/api/"):
+        return JSONResponse(
+            status_code=503,
+            content={"detail": "Servicio temporalmente no disponible"},
+            headers=headers
+        )
+    
+    tenant_context = TenantService.get_tenant_context(request)
+    tenant_css = TenantService.get_tenant_css_variables(request)
+    
+    context = {
+        "request": request,
+        "title": "Servicio degradado",
+        "message": "No pudimos conectar con el servicio de autenticación. Intenta nuevamente en unos minutos.",
+        "error_code": 503,
+        "tenant_css": tenant_css,
+        **tenant_context
+    }
+    
+    return templates.TemplateResponse(
+        "errors/503.html",
+        context,
+        status_code=503,
+        headers=headers
+    )
+
 # ================================
 # MIDDLEWARE ADICIONAL PARA TEMPLATES
 # ================================
@@ -484,12 +621,14 @@ def tenant_color(color_name, tenant_context=None):
     colors = tenant_context['tenant'].get('colors', {})
     return colors.get(color_name, "#000000")
 
-def tenant_feature(feature_name, tenant_context=None):
-    """Filtro para verificar si una feature está habilitada"""
+def tenant_feature(feature_name, tenant_context=None, user_id=None):
+    """Filtro para verificar si una feature está habilitada (flags compilados del tenant)"""
     if not tenant_context or 'tenant' not in tenant_context:
         return False
     
     features = tenant_context['tenant'].get('features', {})
+    if isinstance(features, TenantFeatureFlags):
+        return features.is_enabled(feature_name, user_id)
     return features.get(feature_name, False)
 
 def format_file_size(bytes_value):
@@ -511,6 +650,9 @@ templates.env.filters["tenant_color"] = tenant_color
 templates.env.filters["tenant_feature"] = tenant_feature
 templates.env.filters["file_size"] = format_file_size
 
+# Las páginas cacheadas de un tenant se descartan cuando se recarga su configuración
+tenant_config.add_reload_listener(page_cache.invalidate_tenants)
+
 # ================================
 # FUNCIONES GLOBALES PARA TEMPLATES
 # ================================
@@ -528,6 +670,9 @@ def get_app_version():
 templates.env.globals["current_year"] = get_current_year
 templates.env.globals["app_version"] = get_app_version
 templates.env.globals["debug_mode"] = settings.DEBUG
+templates.env.globals["tenant_asset_url"] = tenant_asset_url
+templates.env.globals["image_sources"] = image_sources
+templates.env.globals["image_srcset"] = image_srcset
 
 # ================================
 # FUNCIÓN PARA EJECUTAR LA APLICACIÓN
@@ -539,7 +684,6 @@ def run_app():
     
     logger.info(f"🌟 Iniciando servidor en {settings.HOST}:{settings.PORT}")
     logger.info(f"🔧 Modo debug: {settings.DEBUG}")
-    logger.info(f"🏢 Tenants disponibles: {len(tenant_config.get_available_tenants())}")
     
     uvicorn.run(
         "main:app",
@@ -9,6 +9,7 @@ from typing import List
 import logging
 
 from services.auth_service import AuthService
+from services.circuit_breaker import ServiceUnavailableError
 
 logger = logging.getLogger(__name__)
 
@@ -44,7 +45,14 @@ class AuthMiddleware(BaseHTTPMiddleware):
             return await call_next(request)
         
         # Verificar autenticación para rutas protegidas
-        if not await self.auth_service.is_authenticated(request):
+        try:
+            # Queda en request.state.auth para decoradores, dependencias y vistas
+            auth = await self.auth_service.resolve_auth_context(request)
+        except ServiceUnavailableError as exc:
+            # API de auth degradada: fallar rápido sin perder la sesión
+            return await self._service_unavailable(request, exc)
+        
+        if not auth.authenticated:
             # Usuario no autenticado
             if self._is_api_request(request):
                 # Para requests de API, devolver JSON
@@ -63,6 +71,31 @@ class AuthMiddleware(BaseHTTPMiddleware):
         response = await call_next(request)
         return response
     
+    async def _service_unavailable(self, request: Request, exc: ServiceUnavailableError) -> Response:
+        """
+        Respuesta 503 cuando la API de auth no está disponible
+        
+        Args:
+            request: Request de FastAPI
+            exc: Rechazo del circuit breaker o del bulkhead
+            
+        Returns:
+            Response: JSON para APIs o la página de servicio degradado del tenant
+        """
+        if self._is_api_request(request):
+            from fastapi.responses import JSONResponse
+            return JSONResponse(
+                status_code=503,
+                content={"detail": "Servicio temporalmente no disponible"},
+                headers={"Retry-After": str(max(1, int(exc.retry_after)))}
+            )
+        
+        # Mismo manejador que usan las rutas (registrado en main.py)
+        handler = request.app.exception_handlers.get(ServiceUnavailableError)
+        if handler is None:
+            raise exc
+        return await handler(request, exc)
+    
     def _is_excluded_path(self, path: str) -> bool:
         """
         Verifica si una ruta está excluida de la autenticación
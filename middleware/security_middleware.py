@@ -13,6 +13,7 @@ import hashlib
 import secrets
 
 from config.settings import settings
+from utils.client_ip import get_client_ip
 
 logger = logging.getLogger(__name__)
 
@@ -76,7 +77,7 @@ class SecurityMiddleware(BaseHTTPMiddleware):
     
     def _get_client_ip(self, request: Request) -> str:
         """
-        Obtiene la IP real del cliente considerando proxies
+        Obtiene la IP real del cliente considerando proxies de confianza
         
         Args:
             request: Request de FastAPI
@@ -84,18 +85,7 @@ class SecurityMiddleware(BaseHTTPMiddleware):
         Returns:
             str: IP del cliente
         """
-        # Verificar headers de proxy
-        forwarded_for = request.headers.get("X-Forwarded-For")
-        if forwarded_for:
-            # Tomar la primera IP (la del cliente original)
-            return forwarded_for.split(",")[0].strip()
-        
-        real_ip = request.headers.get("X-Real-IP")
-        if real_ip:
-            return real_ip.strip()
-        
-        # IP directa
-        return request.client.host if request.client else "unknown"
+        return get_client_ip(request)
     
     async def _verify_csrf(self, request: Request) -> bool:
         """
@@ -210,13 +200,17 @@ class SecurityMiddleware(BaseHTTPMiddleware):
             
             # Política de permisos
             "Permissions-Policy": "geolocation=(), microphone=(), camera=()",
-            
-            # Cache control para páginas sensibles
-            "Cache-Control": "no-cache, no-store, must-revalidate",
-            "Pragma": "no-cache",
-            "Expires": "0"
         }
         
+        # Cache control para páginas sensibles, salvo que el handler haya
+        # definido su propia política (p. ej. recursos versionados del tenant)
+        if "cache-control" not in response.headers:
+            security_headers.update({
+                "Cache-Control": "no-cache, no-store, must-revalidate",
+                "Pragma": "no-cache",
+                "Expires": "0"
+            })
+        
         # CSP (Content Security Policy)
         if not settings.DEBUG:
             csp_policy = (
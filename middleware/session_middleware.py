@@ -1,16 +1,35 @@
 """
 Middleware de sesiones para FastAPI
+
+Por defecto la sesión viaja completa en la cookie firmada (Starlette). Con
+un SessionStore (SESSION_BACKEND distinto de cookie) la cookie lleva solo
+un ID opaco y los datos se guardan en el servidor, y solo si cambiaron.
+
+En ambos modos una sesión que no cambió durante el request no se vuelve a
+serializar ni a firmar y la respuesta no lleva Set-Cookie. last_activity
+se actualiza con granularidad SESSION_ACTIVITY_GRANULARITY, así que la
+mayoría de los requests (assets incluidos) no modifican la sesión. El
+contador session_cookie_writes_total{result} (written, skipped, cleared)
+muestra la proporción de respuestas que se ahorran el Set-Cookie.
 """
 from fastapi import Request
+from itsdangerous.exc import BadSignature
+from starlette.datastructures import MutableHeaders
 from starlette.middleware.sessions import SessionMiddleware as BaseSessionMiddleware
 from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.types import ASGIApp, Scope, Receive, Send
+from starlette.requests import HTTPConnection
+from starlette.types import ASGIApp, Message, Scope, Receive, Send
 from typing import Dict, Any, Optional
+from base64 import b64decode, b64encode
 import json
 import logging
+import secrets
 from datetime import datetime, timedelta
 
 from config.settings import settings
+from services.session_store import SessionStore
+from utils.metrics import metrics
+from utils.client_ip import get_client_ip
 
 logger = logging.getLogger(__name__)
 
@@ -28,7 +47,8 @@ class CustomSessionMiddleware(BaseSessionMiddleware):
         path: str = "/",
         same_site: str = "lax",
         https_only: bool = None,
-        domain: str = None
+        domain: str = None,
+        store: Optional[SessionStore] = None
     ):
         """
         Inicializa el middleware de sesiones
@@ -42,6 +62,7 @@ class CustomSessionMiddleware(BaseSessionMiddleware):
             same_site: Política SameSite
             https_only: Solo HTTPS
             domain: Dominio de la cookie
+            store: Almacén del lado del servidor (None = sesión en la cookie firmada)
         """
         # Usar configuración por defecto si no se proporciona
         session_cookie = session_cookie or settings.SESSION_COOKIE_NAME
@@ -60,7 +81,10 @@ class CustomSessionMiddleware(BaseSessionMiddleware):
             https_only=https_only
         )
         
-        logger.info(f"CustomSessionMiddleware configurado: cookie={session_cookie}, max_age={max_age}s")
+        self.store = store
+        
+        logger.info(f"CustomSessionMiddleware configurado: cookie={session_cookie}, max_age={max_age}s, "
+                    f"almacén={store.backend.name if store else 'cookie'}")
     
     async def __call__(self, scope: Scope, receive: Receive, send: Send):
         """
@@ -75,10 +99,119 @@ class CustomSessionMiddleware(BaseSessionMiddleware):
             await self.app(scope, receive, send)
             return
         
-        # Procesar con el middleware base
-        await super().__call__(scope, receive, send)
+        if self.store is not None:
+            await self._call_with_store(scope, receive, send)
+            return
+        
+        await self._call_with_cookie(scope, receive, send)
+    
+    async def _call_with_cookie(self, scope: Scope, receive: Receive, send: Send):
+        """
+        Sesión en la cookie firmada (mismo formato que Starlette)
+        
+        A diferencia del middleware base, la cookie solo se vuelve a firmar y
+        enviar si el contenido de la sesión cambió.
+        """
+        initial = None
+        cookie = HTTPConnection(scope).cookies.get(self.session_cookie)
+        scope["session"] = {}
+        if cookie:
+            try:
+                initial = b64decode(self.signer.unsign(cookie.encode("utf-8"), max_age=self.max_age)).decode("utf-8")
+                scope["session"] = json.loads(initial)
+            except (BadSignature, ValueError):
+                initial = None
+        
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                session = scope["session"]
+                if session:
+                    data = json.dumps(session)
+                    if data == initial:
+                        _count_cookie_write("skipped")
+                    else:
+                        signed = self.signer.sign(b64encode(data.encode("utf-8"))).decode("utf-8")
+                        MutableHeaders(scope=message).append("Set-Cookie", self._cookie_header(signed))
+                        _count_cookie_write("written")
+                elif initial is not None:
+                    MutableHeaders(scope=message).append("Set-Cookie", self._cookie_header("null", expire=True))
+                    _count_cookie_write("cleared")
+            await send(message)
+        
+        await self.app(scope, receive, send_wrapper)
+    
+    async def _call_with_store(self, scope: Scope, receive: Receive, send: Send):
+        """
+        Sesión del lado del servidor: la cookie lleva solo el ID
+        
+        Un ID desconocido o vencido no se reutiliza (se emite uno nuevo al
+        guardar) y el ID cambia cuando la sesión pasa a autenticada, para
+        que un ID fijado antes del login no sirva después. Un ID nuevo y un
+        borrado se escriben en el almacén antes de enviar la respuesta; los
+        cambios de una sesión existente, en segundo plano.
+        """
+        session_id = HTTPConnection(scope).cookies.get(self.session_cookie)
+        session = await self.store.load(session_id) if session_id else None
+        if session is None:
+            session_id = None
+        initial = json.dumps(session) if session else None
+        scope["session"] = dict(session) if session else {}
+        
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                await self._persist(scope["session"], session_id, initial, message)
+            await send(message)
+        
+        await self.app(scope, receive, send_wrapper)
+    
+    async def _persist(self, session: Dict[str, Any], session_id: Optional[str], initial: Optional[str],
+                       message: Message):
+        """Guarda la sesión si cambió y ajusta la cookie en la respuesta"""
+        headers = MutableHeaders(scope=message)
+        if not session:
+            if session_id is not None:
+                # Sesión borrada (logout)
+                await self.store.delete(session_id)
+                headers.append("Set-Cookie", self._cookie_header("null", expire=True))
+                _count_cookie_write("cleared")
+            return
+        
+        data = json.dumps(session)
+        if data == initial:
+            _count_cookie_write("skipped")
+            return  # Sin cambios: ni escritura ni Set-Cookie
         
-        # Aquí puedes añadir lógica adicional si es necesaria
+        was_authenticated = initial is not None and json.loads(initial).get("authenticated")
+        new_id = session_id is None or (session.get("authenticated") and not was_authenticated)
+        if new_id:
+            if session_id is not None:
+                await self.store.delete(session_id)
+            session_id = secrets.token_urlsafe(32)
+        # Con un ID nuevo se espera la escritura: otro worker puede recibir el próximo request
+        await self.store.save(session_id, data, wait=new_id)
+        headers.append("Set-Cookie", self._cookie_header(session_id))
+        _count_cookie_write("written")
+    
+    def _cookie_header(self, value: str, expire: bool = False) -> str:
+        """Valor del header Set-Cookie con los mismos flags que la cookie firmada"""
+        if expire:
+            lifetime = "expires=Thu, 01 Jan 1970 00:00:00 GMT; "
+        else:
+            lifetime = f"Max-Age={self.max_age}; " if self.max_age else ""
+        return f"{self.session_cookie}={value}; path={self.path}; {lifetime}{self.security_flags}"
+
+def _count_cookie_write(result: str):
+    """Cuenta las respuestas con sesión según si llevaron Set-Cookie"""
+    metrics.increment("session_cookie_writes_total", result=result)
+
+def _cookie_write_stats() -> Dict[str, Any]:
+    """Proporción de respuestas con sesión que no necesitaron Set-Cookie (para /metrics)"""
+    counts = {result: metrics.get_counter("session_cookie_writes_total", result=result)
+              for result in ("written", "skipped", "cleared")}
+    total = sum(counts.values())
+    return {**counts, "skip_rate": round(counts["skipped"] / total, 3) if total else 0.0}
+
+metrics.register_collector("session_cookies", _cookie_write_stats)
 
 class EnhancedSessionManager:
     """
@@ -128,14 +261,31 @@ class EnhancedSessionManager:
         return session_data
     
     @staticmethod
-    def update_last_activity(session: Dict[str, Any]):
+    def update_last_activity(session: Dict[str, Any], granularity: Optional[float] = None) -> bool:
         """
-        Actualiza el timestamp de última actividad
+        Actualiza el timestamp de última actividad si es más viejo que la granularidad
+        
+        Actualizarlo en cada request cambiaba la sesión siempre (y con ella la
+        cookie); con granularidad la sesión solo cambia una vez por intervalo.
         
         Args:
             session: Diccionario de sesión
+            granularity: Segundos mínimos entre actualizaciones (None = SESSION_ACTIVITY_GRANULARITY)
+            
+        Returns:
+            bool: True si se actualizó
         """
-        session["last_activity"] = datetime.now().isoformat()
+        now = datetime.now()
+        granularity = settings.SESSION_ACTIVITY_GRANULARITY if granularity is None else granularity
+        last_activity = session.get("last_activity")
+        if last_activity and granularity > 0:
+            try:
+                if (now - datetime.fromisoformat(last_activity)).total_seconds() < granularity:
+                    return False
+            except ValueError:
+                pass
+        session["last_activity"] = now.isoformat()
+        return True
     
     @staticmethod
     def is_session_expired(session: Dict[str, Any], max_age_seconds: int = None) -> bool:
@@ -243,12 +393,12 @@ class SessionEnhancerMiddleware(BaseHTTPMiddleware):
         # Añadir información de contexto si hay sesión activa
         try:
             if hasattr(request, 'session') and request.session.get("authenticated"):
-                # Actualizar última actividad
+                # Actualizar última actividad (solo cada SESSION_ACTIVITY_GRANULARITY segundos)
                 EnhancedSessionManager.update_last_activity(request.session)
                 
                 # Añadir información de request si no existe
                 if not request.session.get("ip_address"):
-                    request.session["ip_address"] = request.client.host if request.client else "unknown"
+                    request.session["ip_address"] = get_client_ip(request)
                 
                 if not request.session.get("user_agent"):
                     request.session["user_agent"] = request.headers.get("user-agent", "unknown")
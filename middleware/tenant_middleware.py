@@ -8,8 +8,9 @@ import logging
 import time
 from typing import Optional, Callable, List
 
-from config.tenant_config import tenant_config
+from config.tenant_config import TenantRegistry, tenant_config
 from config.settings import settings  # ✅ Importar settings
+from utils.client_ip import get_client_ip
 
 logger = logging.getLogger(__name__)
 
@@ -21,9 +22,10 @@ class TenantMiddleware(BaseHTTPMiddleware):
     def __init__(self, app: ASGIApp):
         super().__init__(app)
         
-        # ✅ Estrategias simples: query param tiene prioridad, luego Settings
+        # ✅ Estrategias: query param tiene prioridad, luego el Host, luego Settings
         self.detection_strategies: List[Callable] = [
             self._detect_from_query_param,    # Para testing: ?tenant=biomed
+            self._detect_from_host,           # Dominio/subdominio del header Host
             self._detect_from_settings        # Desde Settings (DEFAULT_TENANT)
         ]
         
@@ -40,15 +42,21 @@ class TenantMiddleware(BaseHTTPMiddleware):
         # Obtener información del host
         host = request.headers.get("host", "localhost")
         
+        # Snapshot de tenants para todo el request (las recargas en caliente
+        # publican uno nuevo sin afectar requests en curso)
+        registry = tenant_config.registry
+        
         # ✅ Detectar tenant (súper simple)
-        tenant_id = self._detect_tenant(request, host)
+        tenant_id = self._detect_tenant(request, host, registry)
         
-        # Obtener configuración del tenant
-        tenant_branding = tenant_config.get_tenant_config(tenant_id)
+        # Obtener configuración y bundle de render precalculado del tenant
+        tenant_bundle = registry.get_bundle(tenant_id)
+        tenant_branding = tenant_bundle.branding
         
         # Añadir información al request state
         request.state.tenant_id = tenant_id
         request.state.tenant_config = tenant_branding
+        request.state.tenant_bundle = tenant_bundle
         request.state.tenant_detection_time = time.time() - start_time
         
         # Log simple
@@ -69,23 +77,30 @@ class TenantMiddleware(BaseHTTPMiddleware):
             logger.error(f"❌ Error procesando request para tenant {tenant_id}: {str(e)}")
             raise
     
-    def _detect_tenant(self, request: Request, host: str) -> str:
+    def _detect_tenant(self, request: Request, host: str, registry: TenantRegistry) -> str:
         """
-        Detecta el tenant de forma SIMPLE
+        Detecta el tenant: query param, header Host y luego Settings
         """
         # 1. Verificar query parameter (para testing)
         tenant_param = request.query_params.get("tenant")
-        if tenant_param and tenant_config.is_valid_tenant(tenant_param):
+        if tenant_param and registry.is_valid(tenant_param):
             logger.debug(f"✅ Usando tenant desde query param: {tenant_param}")
             return tenant_param
         
-        # 2. Usar el configurado en Settings
+        # 2. Resolver por el header Host (índice de dominios)
+        if settings.TENANT_HOST_DETECTION:
+            tenant_from_host = self._detect_from_host(request, host)
+            if tenant_from_host and registry.is_valid(tenant_from_host):
+                logger.debug(f"✅ Usando tenant desde host {host}: {tenant_from_host}")
+                return tenant_from_host
+        
+        # 3. Usar el configurado en Settings
         tenant_from_settings = settings.DEFAULT_TENANT
-        if tenant_config.is_valid_tenant(tenant_from_settings):
+        if registry.is_valid(tenant_from_settings):
             logger.debug(f"✅ Usando tenant desde Settings: {tenant_from_settings}")
             return tenant_from_settings
         
-        # 3. Fallback a default si el configurado no existe
+        # 4. Fallback a default si el configurado no existe
         logger.warning(f"⚠️ Tenant configurado no existe: {tenant_from_settings}, usando 'default'")
         return "default"
     
@@ -93,6 +108,10 @@ class TenantMiddleware(BaseHTTPMiddleware):
         """Detectar desde query parameter (?tenant=biomed)"""
         return request.query_params.get("tenant")
     
+    def _detect_from_host(self, request: Request, host: str) -> Optional[str]:
+        """Detectar desde el header Host (dominio exacto, *.dominio o subdominio)"""
+        return tenant_config.resolve_tenant_from_host(host)
+    
     def _detect_from_settings(self, request: Request, host: str) -> Optional[str]:
         """Detectar desde Settings (DEFAULT_TENANT)"""
         return settings.DEFAULT_TENANT
@@ -113,31 +132,39 @@ class TenantContextManager:
         return getattr(request.state, 'tenant_config', None)
     
     @staticmethod
-    def is_tenant_feature_enabled(request: Request, feature: str) -> bool:
+    def get_tenant_bundle_from_request(request: Request):
+        """Obtiene el bundle de render precalculado del request state"""
+        return getattr(request.state, 'tenant_bundle', None)
+    
+    @staticmethod
+    def is_tenant_feature_enabled(request: Request, feature: str, user_id: Optional[str] = None) -> bool:
         """
         Verifica si una feature está habilitada para el tenant actual
         
+        Usa los flags compilados del bundle del tenant: para flags estáticos
+        es una búsqueda en un frozenset. Los rollouts por porcentaje se
+        evalúan con el user_id (por defecto el de la sesión).
+        
         Args:
             request: Request de FastAPI
-            feature: Nombre de la feature (registration, password_reset, remember_me, 2fa)
+            feature: Nombre de la feature (registration, password_reset, remember_me, 2fa, ...)
+            user_id: Usuario para rollouts parciales
             
         Returns:
             bool: True si la feature está habilitada
         """
-        tenant_config_obj = TenantContextManager.get_tenant_config_from_request(request)
-        if not tenant_config_obj:
+        bundle = TenantContextManager.get_tenant_bundle_from_request(request)
+        if bundle is None:
             return False
         
-        feature_mapping = {
-            'registration': 'enable_registration',
-            'password_reset': 'enable_password_reset',
-            'remember_me': 'enable_remember_me',
-            '2fa': 'enable_2fa',
-            'two_factor': 'enable_2fa'
-        }
-        
-        config_key = feature_mapping.get(feature, f'enable_{feature}')
-        return getattr(tenant_config_obj, config_key, False)
+        features = bundle.features
+        if feature in features.enabled:
+            return True
+        if feature not in features.rollouts:
+            return False
+        if user_id is None and "session" in request.scope:
+            user_id = request.session.get("user_id")
+        return features.is_enabled(feature, user_id)
     
     @staticmethod
     def get_tenant_api_config(request: Request) -> dict:
@@ -191,7 +218,7 @@ class TenantContextManager:
             details: Detalles adicionales opcionales
         """
         tenant_id = TenantContextManager.get_tenant_from_request(request)
-        client_ip = request.client.host if request.client else "unknown"
+        client_ip = get_client_ip(request)
         
         log_data = {
             "tenant_id": tenant_id,
@@ -2,21 +2,29 @@
 Router de autenticación - Con soporte multi-tenant completo
 """
 from fastapi import APIRouter, Request, Form, HTTPException, status
-from fastapi.responses import HTMLResponse, RedirectResponse, Response
+from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
 from typing import Optional
 import logging
 
 from services.auth_service import AuthService
-from services.tenant_service import TenantService
+from services.circuit_breaker import ServiceUnavailableError
+from services.tenant_service import TenantService, tenant_asset_url
 from utils.decorators import guest_required
+from utils.page_cache import cached_page
+from utils.image_variants import image_sources, image_srcset
+from utils.client_ip import get_client_ip
 from config.settings import settings
 
 router = APIRouter(prefix="", tags=["auth"])
 templates = Jinja2Templates(directory="templates")
+templates.env.globals["tenant_asset_url"] = tenant_asset_url
+templates.env.globals["image_sources"] = image_sources
+templates.env.globals["image_srcset"] = image_srcset
 logger = logging.getLogger(__name__)
 
 @router.get("/login", response_class=HTMLResponse)
+@cached_page("auth/login.html", vary=("error", "message", "next_url"))
 @guest_required
 async def login_page(request: Request, error: Optional[str] = None, 
                     message: Optional[str] = None, next_url: Optional[str] = None):
@@ -84,7 +92,7 @@ async def login_submit(
     
     # Validaciones básicas
     if not username or not password:
-        logger.warning(f"Login fallido - campos vacíos - tenant: {tenant_id} - IP: {request.client.host if request.client else 'unknown'}")
+        logger.warning(f"Login fallido - campos vacíos - tenant: {tenant_id} - IP: {get_client_ip(request)}")
         return RedirectResponse(
             url=f"/login?error=Por favor completa todos los campos",
             status_code=302
@@ -104,7 +112,8 @@ async def login_submit(
             password=password, 
             remember_me=remember_me,
             tenant_id=tenant_id,
-            max_attempts=max_attempts
+            max_attempts=max_attempts,
+            client_ip=get_client_ip(request)
         )
         
         if success:
@@ -124,6 +133,8 @@ async def login_submit(
                 status_code=302
             )
     
+    except ServiceUnavailableError:
+        raise  # Página de servicio degradado (manejador en main.py)
     except Exception as e:
         logger.error(f"Error en login para tenant {tenant_id}: {str(e)}")
         return RedirectResponse(
@@ -160,6 +171,7 @@ async def logout(request: Request):
         return RedirectResponse(url="/login", status_code=302)
 
 @router.get("/register", response_class=HTMLResponse)
+@cached_page("auth/register.html", vary=("error", "success"))
 @guest_required
 async def register_page(request: Request, error: Optional[str] = None, 
                        success: Optional[str] = None):
@@ -259,7 +271,7 @@ async def register_submit(
             "terms_accepted": terms_accepted,
             "registration_source": "web_portal",
             "client_info": {
-                "ip": request.client.host if request.client else "unknown",
+                "ip": get_client_ip(request),
                 "user_agent": request.headers.get("user-agent", "unknown")
             }
         }
@@ -281,6 +293,8 @@ async def register_submit(
                 status_code=302
             )
     
+    except ServiceUnavailableError:
+        raise  # Página de servicio degradado (manejador en main.py)
     except Exception as e:
         logger.error(f"Error en registro para tenant {tenant_id}: {str(e)}")
         return RedirectResponse(
@@ -289,6 +303,7 @@ async def register_submit(
         )
 
 @router.get("/forgot-password", response_class=HTMLResponse)
+@cached_page("auth/forgot_password.html", vary=("error", "success"))
 @guest_required
 async def forgot_password_page(request: Request, error: Optional[str] = None, 
                               success: Optional[str] = None):
@@ -460,7 +475,7 @@ async def reset_password_submit(
             "confirm_password": confirm_password,
             "tenant_id": tenant_id,
             "client_info": {
-                "ip": request.client.host if request.client else "unknown",
+                "ip": get_client_ip(request),
                 "user_agent": request.headers.get("user-agent", "unknown")
             }
         }
@@ -481,6 +496,8 @@ async def reset_password_submit(
                 status_code=302
             )
     
+    except ServiceUnavailableError:
+        raise  # Página de servicio degradado (manejador en main.py)
     except Exception as e:
         logger.error(f"Error en reset password para tenant {tenant_id}: {str(e)}")
         return RedirectResponse(
@@ -520,34 +537,14 @@ async def tenant_css_endpoint(request: Request):
     """
     Endpoint que sirve CSS dinámico basado en el tenant
     """
-    css_content = TenantService.get_tenant_css_variables(request)
-    
-    return Response(
-        content=css_content,
-        media_type="text/css",
-        headers={
-            "Cache-Control": "public, max-age=3600",  # Cache por 1 hora
-            "Content-Type": "text/css; charset=utf-8",
-            "X-Tenant-CSS": "dynamic"
-        }
-    )
+    return TenantService.get_tenant_asset_response(request, "css")
 
 @router.get("/tenant/config.js")
 async def tenant_js_config_endpoint(request: Request):
     """
     Endpoint que sirve configuración JavaScript del tenant
     """
-    js_content = TenantService.get_tenant_javascript_config(request)
-    
-    return Response(
-        content=js_content,
-        media_type="application/javascript",
-        headers={
-            "Cache-Control": "public, max-age=3600",  # Cache por 1 hora
-            "Content-Type": "application/javascript; charset=utf-8",
-            "X-Tenant-JS": "dynamic"
-        }
-    )
+    return TenantService.get_tenant_asset_response(request, "js")
 
 @router.get("/tenant/validate")
 async def validate_tenant_endpoint(request: Request):
@@ -1,18 +1,27 @@
 """
 Servicio para comunicarse con la API de datos (aplicación principal)
+
+Usa el cliente compartido data_http_client (services.http_clients): el pool
+de conexiones keep-alive se abre y pre-calienta en el lifespan, así que crear
+un ApiService por request ya no abre conexiones nuevas.
 """
 import httpx
 from typing import Dict, Any, Optional, List
 import logging
 
 from config.settings import settings
+from services.http_clients import data_http_client
 
 logger = logging.getLogger(__name__)
 
 class ApiService:
     def __init__(self):
         self.data_api_url = settings.DATA_API_URL
-        self.client = httpx.AsyncClient(timeout=settings.API_TIMEOUT)
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Cliente compartido de la API de datos"""
+        return data_http_client.client
     
     async def _make_request(self, method: str, endpoint: str, data: Optional[Dict] = None, 
                            params: Optional[Dict] = None, headers: Optional[Dict] = None) -> Optional[Dict[str, Any]]:
@@ -153,5 +162,4 @@ class ApiService:
     
     # Método para cerrar el cliente HTTP
     async def close(self):
-        """Cierra el cliente HTTP"""
-        await self.client.aclose()
\ No newline at end of file
+        """El pool es compartido y se cierra en el lifespan: no hay nada que cerrar"""
\ No newline at end of file
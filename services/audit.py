@@ -0,0 +1,322 @@
+"""
+Auditoría asíncrona de eventos de autenticación
+
+Los eventos (login exitoso/fallido/bloqueado, logout, tenant mismatch,
+refresco fallido) se encolan en memoria con AuditLog.record, que nunca
+bloquea ni hace I/O: el request de login no espera a la auditoría. Una
+tarea en segundo plano junta los eventos en lotes y los escribe en el sink:
+
+- JsonlAuditSink: archivo JSONL append-only con rotación por tamaño y
+  fsync cada AUDIT_FSYNC_INTERVAL segundos (la escritura corre en un hilo).
+- HttpAuditSink: POST de cada lote como JSON a AUDIT_HTTP_URL.
+
+La cola es acotada. Si se llena, la política de desborde decide si se
+descarta el evento nuevo (drop_newest) o el más viejo (drop_oldest); los
+descartes se cuentan por motivo y se publican en /metrics. Un lote que no
+se pudo escribir vuelve al frente de la cola si hay lugar.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, List, Optional
+
+import httpx
+
+from config.settings import settings
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+DROP_NEWEST = "drop_newest"
+DROP_OLDEST = "drop_oldest"
+
+
+class JsonlAuditSink:
+    """
+    Archivo JSONL append-only con rotación y fsync periódico
+    """
+
+    def __init__(self, path: str, max_bytes: int = 50 * 1024 * 1024, backup_count: int = 5,
+                 fsync_interval: float = 5.0):
+        """
+        Inicializa el sink (el archivo se abre en la primera escritura)
+
+        Args:
+            path: Ruta del archivo de auditoría
+            max_bytes: Tamaño a partir del cual se rota (0 = sin rotación)
+            backup_count: Archivos rotados que se conservan (audit.jsonl.1 ... .N)
+            fsync_interval: Segundos mínimos entre fsync (0 = fsync en cada lote)
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.fsync_interval = fsync_interval
+        self._file = None
+        self._last_fsync = 0.0
+
+    async def write(self, events: List[Dict[str, Any]]):
+        """Escribe un lote (en un hilo para no bloquear el event loop)"""
+        data = "".join(json.dumps(event, ensure_ascii=False, default=str) + "\n" for event in events)
+        await asyncio.to_thread(self._write_sync, data.encode("utf-8"))
+
+    def _write_sync(self, data: bytes):
+        if self._file is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(self.path, "ab")
+        if self.max_bytes and self._file.tell() and self._file.tell() + len(data) > self.max_bytes:
+            self._rotate()
+        self._file.write(data)
+        self._file.flush()
+        now = time.monotonic()
+        if now - self._last_fsync >= self.fsync_interval:
+            os.fsync(self._file.fileno())
+            self._last_fsync = now
+
+    def _rotate(self):
+        """audit.jsonl -> audit.jsonl.1 -> ... -> audit.jsonl.N (se descarta el último)"""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        self._file = None
+        if self.backup_count > 0:
+            for index in range(self.backup_count - 1, 0, -1):
+                source = f"{self.path}.{index}"
+                if os.path.exists(source):
+                    os.replace(source, f"{self.path}.{index + 1}")
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._file = open(self.path, "ab")
+        logger.info(f"🗂️ Archivo de auditoría rotado: {self.path}")
+
+    async def aclose(self):
+        """fsync final y cierre del archivo"""
+        if self._file is not None:
+            await asyncio.to_thread(self._close_sync)
+
+    def _close_sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        self._file = None
+
+
+class HttpAuditSink:
+    """
+    Envío de lotes de eventos a un colector HTTP
+    """
+
+    def __init__(self, url: str, timeout: float = 5.0):
+        """
+        Inicializa el sink
+
+        Args:
+            url: Endpoint que recibe {"events": [...]} por POST
+            timeout: Timeout de cada envío en segundos
+        """
+        self.url = url
+        self.timeout = timeout
+        self._client: Optional[httpx.AsyncClient] = None
+
+    async def write(self, events: List[Dict[str, Any]]):
+        """Envía un lote; falla si el colector no responde 2xx"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self.timeout)
+        response = await self._client.post(self.url, json={"events": events})
+        response.raise_for_status()
+
+    async def aclose(self):
+        """Cierra el cliente HTTP"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class AuditLog:
+    """
+    Cola acotada de eventos de auditoría con escritor en segundo plano
+    """
+
+    def __init__(self, sink, max_queue: int = 10000, batch_size: int = 200,
+                 flush_interval: float = 1.0, overflow: str = DROP_OLDEST, enabled: bool = True):
+        """
+        Inicializa la cola (el escritor arranca con start)
+
+        Args:
+            sink: Destino de los lotes (JsonlAuditSink o HttpAuditSink)
+            max_queue: Eventos máximos en memoria
+            batch_size: Eventos máximos por escritura
+            flush_interval: Segundos máximos que un evento espera en la cola
+            overflow: drop_oldest o drop_newest cuando la cola está llena
+            enabled: False para descartar los eventos sin encolarlos
+        """
+        if overflow not in (DROP_NEWEST, DROP_OLDEST):
+            raise ValueError(f"Política de desborde inválida: {overflow}")
+        self.sink = sink
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.enabled = enabled
+        self._queue: Deque[Dict[str, Any]] = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.recorded = 0
+        self.written = 0
+        self.batches = 0
+        self.write_errors = 0
+        self.dropped: Dict[str, int] = {}
+
+    def record(self, event: str, tenant_id: str, **fields):
+        """
+        Encola un evento (sin I/O: seguro de llamar en el request)
+
+        Args:
+            event: Tipo de evento (login_success, login_failure, logout, ...)
+            tenant_id: ID del tenant
+            **fields: Datos del evento (username, client_ip, reason, ...)
+        """
+        if not self.enabled:
+            return
+        entry = {
+            "ts": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+            "event": event,
+            "tenant_id": tenant_id,
+            **fields,
+        }
+        if len(self._queue) >= self.max_queue:
+            if self.overflow == DROP_NEWEST:
+                self._drop("queue_full")
+                return
+            self._queue.popleft()
+            self._drop("queue_full")
+        self._queue.append(entry)
+        self.recorded += 1
+        metrics.increment("audit_events_total", event=event)
+        if self._wakeup is not None and len(self._queue) >= self.batch_size:
+            self._wakeup.set()
+
+    def _drop(self, reason: str, count: int = 1):
+        self.dropped[reason] = self.dropped.get(reason, 0) + count
+        metrics.increment("audit_events_dropped_total", count, reason=reason)
+
+    def start(self):
+        """Inicia el escritor en segundo plano"""
+        if not self.enabled or (self._task is not None and not self._task.done()):
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run(), name="audit-writer")
+        logger.info(f"📝 Auditoría iniciada ({type(self.sink).__name__}, lotes de {self.batch_size}, "
+                    f"cola de {self.max_queue}, {self.overflow})")
+
+    async def stop(self):
+        """Detiene el escritor (esperando el lote en curso), escribe lo pendiente y cierra el sink"""
+        if self._task is not None:
+            # Se avisa en vez de cancelar: un lote a medio escribir no se pierde
+            self._stopping = True
+            self._wakeup.set()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._stopping = False
+        while self._queue:
+            if not await self.flush():
+                self._drop("shutdown", len(self._queue))
+                self._queue.clear()
+        await self.sink.aclose()
+
+    async def _run(self):
+        """Escribe un lote cada flush_interval o cuando se junta batch_size"""
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            while self._queue and not self._stopping:
+                if not await self.flush():
+                    break  # Sink caído: se reintenta en el próximo intervalo
+                if len(self._queue) < self.batch_size:
+                    break
+
+    async def flush(self) -> bool:
+        """
+        Escribe un lote de la cola
+
+        Returns:
+            bool: False si el sink falló (el lote vuelve a la cola si hay lugar)
+        """
+        batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+        if not batch:
+            return True
+        start = time.perf_counter()
+        try:
+            await self.sink.write(batch)
+        except asyncio.CancelledError:
+            # Cancelado a mitad de la escritura: el lote vuelve a la cola para stop()
+            self._requeue(batch, "cancelled")
+            raise
+        except Exception as e:
+            self.write_errors += 1
+            logger.warning(f"⚠️ No se pudo escribir el lote de auditoría ({len(batch)} eventos): {e}")
+            self._requeue(batch, "write_error")
+            return False
+        metrics.observe("audit_flush_seconds", time.perf_counter() - start)
+        self.written += len(batch)
+        self.batches += 1
+        return True
+
+    def _requeue(self, batch: List[Dict[str, Any]], reason: str):
+        """Devuelve un lote no escrito al frente de la cola"""
+        room = self.max_queue - len(self._queue)
+        if room < len(batch):
+            self._drop(reason, len(batch) - room)
+        # Los más viejos primero; si no entran todos se conservan los más recientes
+        self._queue.extendleft(reversed(batch[max(len(batch) - room, 0):]))
+
+    def stats(self) -> Dict[str, Any]:
+        """Estado para /metrics"""
+        return {
+            "enabled": self.enabled,
+            "sink": type(self.sink).__name__,
+            "queued": len(self._queue),
+            "max_queue": self.max_queue,
+            "recorded": self.recorded,
+            "written": self.written,
+            "batches": self.batches,
+            "write_errors": self.write_errors,
+            "dropped": dict(self.dropped),
+        }
+
+
+def build_sink():
+    """Sink configurado en settings (HTTP si hay AUDIT_HTTP_URL, si no JSONL)"""
+    if settings.AUDIT_HTTP_URL:
+        return HttpAuditSink(settings.AUDIT_HTTP_URL)
+    return JsonlAuditSink(
+        settings.AUDIT_LOG_PATH,
+        max_bytes=settings.AUDIT_MAX_BYTES,
+        backup_count=settings.AUDIT_BACKUP_COUNT,
+        fsync_interval=settings.AUDIT_FSYNC_INTERVAL,
+    )
+
+
+# Instancia global de la auditoría
+audit_log = AuditLog(
+    build_sink(),
+    max_queue=settings.AUDIT_QUEUE_SIZE,
+    batch_size=settings.AUDIT_BATCH_SIZE,
+    flush_interval=settings.AUDIT_FLUSH_INTERVAL,
+    overflow=settings.AUDIT_OVERFLOW,
+    enabled=settings.AUDIT_ENABLED,
+)
+metrics.register_collector("audit", audit_log.stats)
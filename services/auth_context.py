@@ -0,0 +1,91 @@
+"""
+Estado de autenticación resuelto una sola vez por request
+
+Antes un request a una página protegida verificaba la sesión en
+AuthMiddleware, otra vez en el decorador y otra más en get_current_user
+(cada vez leyendo la sesión, decodificando el token y quizá refrescándolo).
+AuthService.resolve_auth_context lo resuelve la primera vez y lo guarda en
+request.state.auth como un AuthContext inmutable; el resto del request
+(middleware, decoradores, dependencias y vistas) reutiliza ese objeto.
+"""
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Any, Mapping, Optional, Tuple
+
+from fastapi import Request
+
+from config.settings import settings
+
+# Atributo de request.state donde se guarda el contexto
+STATE_ATTR = "auth"
+
+
+@dataclass(frozen=True)
+class AuthContext:
+    """Usuario, roles, tenant y vencimiento de la sesión del request"""
+    tenant_id: str
+    authenticated: bool = False
+    user_id: Optional[str] = None
+    username: Optional[str] = None
+    roles: Tuple[str, ...] = ()
+    expires_at: Optional[float] = None  # exp del access token (epoch)
+    user: Mapping[str, Any] = field(default_factory=lambda: MappingProxyType({}), repr=False)
+
+    @classmethod
+    def anonymous(cls, tenant_id: str) -> "AuthContext":
+        """Contexto de un request sin sesión válida"""
+        return cls(tenant_id=tenant_id)
+
+    @classmethod
+    def from_session(cls, session: Mapping[str, Any], tenant_id: str,
+                     expires_at: Optional[float] = None) -> "AuthContext":
+        """
+        Construye el contexto de una sesión ya verificada
+
+        Args:
+            session: Sesión del request
+            tenant_id: Tenant del request
+            expires_at: exp del access token vigente
+
+        Returns:
+            AuthContext: Contexto autenticado
+        """
+        return cls(
+            tenant_id=tenant_id,
+            authenticated=True,
+            user_id=session.get("user_id"),
+            username=session.get("username"),
+            roles=tuple(session.get("user_roles") or ()),
+            expires_at=expires_at,
+            user=MappingProxyType(dict(session.get("user_data") or {})),
+        )
+
+    def has_role(self, role: str) -> bool:
+        """True si el usuario tiene el rol"""
+        return role in self.roles
+
+    def has_any_role(self, roles) -> bool:
+        """True si el usuario tiene alguno de los roles"""
+        return any(role in self.roles for role in roles)
+
+    @property
+    def is_admin(self) -> bool:
+        """True si el usuario tiene algún rol de administrador"""
+        return self.has_any_role(settings.ADMIN_ROLES)
+
+
+def cached_auth_context(request: Request) -> Optional[AuthContext]:
+    """Contexto ya resuelto en este request (None si todavía no se resolvió)"""
+    return getattr(request.state, STATE_ATTR, None)
+
+
+def store_auth_context(request: Request, context: AuthContext) -> AuthContext:
+    """Guarda el contexto en request.state para el resto del request"""
+    setattr(request.state, STATE_ATTR, context)
+    return context
+
+
+def invalidate_auth_context(request: Request):
+    """Descarta el contexto (la sesión cambió: login o logout)"""
+    if cached_auth_context(request) is not None:
+        setattr(request.state, STATE_ATTR, None)
@@ -1,40 +1,75 @@
 """
 Servicio de autenticación para FastAPI frontend - Con soporte multi-tenant
 """
+import hashlib
 import httpx
 from fastapi import Request, HTTPException, status
 from fastapi.responses import RedirectResponse
-from typing import Dict, Any, Optional, Tuple
+from typing import Dict, Any, Mapping, Optional, Tuple
 from datetime import datetime, timedelta
 import logging
 import json
+import math
+import time
 from jose import jwt, JWTError
+from jose.exceptions import ExpiredSignatureError
 
 from config.settings import settings
 from middleware.tenant_middleware import TenantContextManager
+from services.audit import audit_log
+from services.auth_context import (
+    AuthContext, cached_auth_context, invalidate_auth_context, store_auth_context
+)
+from services.background_queue import forgot_password_queue
+from services.circuit_breaker import ServiceUnavailableError
+from services.http_clients import auth_http_client
+from services.jwt_verifier import jwt_verifier, JwksUnavailableError
+from services.login_throttle import login_throttle
+from services.token_refresh import token_refresher
+from utils.claims_cache import claims_cache
+from utils.client_ip import get_client_ip
+from utils.metrics import metrics
 
 logger = logging.getLogger(__name__)
 
 class AuthService:
     def __init__(self):
         self.auth_api_url = settings.AUTH_API_URL
-        self.client = httpx.AsyncClient(timeout=settings.API_TIMEOUT)
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Cliente HTTP compartido de la aplicación (pool abierto en el lifespan)"""
+        return auth_http_client.client
     
     async def login(self, username: str, password: str, remember_me: bool = False, 
-                   tenant_id: str = "default", max_attempts: int = 5) -> Tuple[bool, Optional[Dict], Optional[str]]:
+                   tenant_id: str = "default", max_attempts: int = 5,
+                   client_ip: str = "unknown") -> Tuple[bool, Optional[Dict], Optional[str]]:
         """
         Realiza el login del usuario contra la API de auth con información del tenant
         
+        Los intentos fallidos se cuentan localmente por usuario e IP; al
+        llegar a max_attempts el login se rechaza sin llamar a la API
+        (ver services.login_throttle).
+        
         Args:
             username: Nombre de usuario
             password: Contraseña
             remember_me: Recordar sesión
             tenant_id: ID del tenant
-            max_attempts: Máximo número de intentos permitidos
+            max_attempts: Máximo número de intentos permitidos (max_login_attempts del tenant)
+            client_ip: IP del cliente
             
         Returns:
             Tuple[bool, Optional[Dict], Optional[str]]: (éxito, datos_usuario, mensaje_error)
         """
+        retry_after = await login_throttle.check(tenant_id, username, client_ip)
+        if retry_after:
+            logger.warning(f"Login bloqueado para {username} desde {client_ip} en tenant {tenant_id} "
+                           f"({retry_after:.0f}s restantes)")
+            audit_log.record("login_blocked", tenant_id, username=username, client_ip=client_ip,
+                             retry_after=round(retry_after))
+            return False, None, self._lockout_message(retry_after)
+        
         try:
             login_data = {
                 "username": username,
@@ -67,28 +102,60 @@ class AuthService:
                 user_tenant = data.get("user", {}).get("tenant_id")
                 if user_tenant and user_tenant != tenant_id:
                     logger.warning(f"Usuario {username} intentó login en tenant incorrecto: {tenant_id} vs {user_tenant}")
+                    audit_log.record("tenant_mismatch", tenant_id, username=username, client_ip=client_ip,
+                                     stage="login", token_tenant=user_tenant)
+                    await login_throttle.record_failure(tenant_id, username, client_ip, max_attempts)
                     return False, None, "Usuario no autorizado para este portal"
                 
-                logger.info(f"Usuario {username} autenticado correctamente en tenant {tenant_id}")
+                await login_throttle.record_success(tenant_id, username, client_ip)
+                audit_log.record("login_success", tenant_id, username=username, client_ip=client_ip,
+                                 remember_me=remember_me)
+                logger.debug(f"Usuario {username} autenticado correctamente en tenant {tenant_id}")
                 return True, data, None
             elif response.status_code == 429:
                 # Rate limiting
+                await login_throttle.record_failure(tenant_id, username, client_ip, max_attempts)
+                audit_log.record("login_failure", tenant_id, username=username, client_ip=client_ip,
+                                 status=429, reason="upstream_rate_limited")
                 return False, None, f"Demasiados intentos. Máximo {max_attempts} permitidos."
             else:
+                if 400 <= response.status_code < 500:
+                    # Credenciales rechazadas (los 5xx no cuentan como intento)
+                    locked_for = await login_throttle.record_failure(tenant_id, username, client_ip, max_attempts)
+                    audit_log.record("login_failure", tenant_id, username=username, client_ip=client_ip,
+                                     status=response.status_code, locked_for=round(locked_for))
+                    if locked_for:
+                        return False, None, self._lockout_message(locked_for)
                 error_data = response.json()
                 error_msg = error_data.get("detail", "Error de autenticación")
                 logger.warning(f"Error de login para {username} en tenant {tenant_id}: {error_msg}")
                 return False, None, error_msg
                 
+        except ServiceUnavailableError:
+            raise
         except httpx.RequestError as e:
             error_msg = f"Error de conexión: {str(e)}"
             logger.error(f"Error de conexión en login para tenant {tenant_id}: {error_msg}")
+            audit_log.record("login_error", tenant_id, username=username, client_ip=client_ip,
+                             reason="connection_error")
             return False, None, "Error de conexión con el servidor"
         except Exception as e:
             error_msg = f"Error inesperado: {str(e)}"
             logger.error(f"Error inesperado en login para tenant {tenant_id}: {error_msg}")
             return False, None, "Error inesperado"
     
+    @staticmethod
+    def _client_ip(request: Request) -> str:
+        """IP del cliente para auditoría (detrás de proxies de confianza)"""
+        return get_client_ip(request)
+    
+    @staticmethod
+    def _lockout_message(retry_after: float) -> str:
+        """Mensaje para un login bloqueado por exceso de intentos"""
+        if retry_after < 60:
+            return f"Demasiados intentos fallidos. Intenta nuevamente en {math.ceil(retry_after)} segundos."
+        return f"Demasiados intentos fallidos. Intenta nuevamente en {math.ceil(retry_after / 60)} minutos."
+    
     async def register(self, register_data: Dict[str, Any]) -> Tuple[bool, Optional[Dict], Optional[str]]:
         """
         Registra un nuevo usuario con información del tenant
@@ -125,6 +192,8 @@ class AuthService:
                 logger.warning(f"Error en registro para tenant {tenant_id}: {error_msg}")
                 return False, None, error_msg
                 
+        except ServiceUnavailableError:
+            raise
         except Exception as e:
             logger.error(f"Error en registro: {str(e)}")
             return False, None, "Error interno del servidor"
@@ -133,6 +202,11 @@ class AuthService:
         """
         Solicita recuperación de contraseña con información del tenant
         
+        La llamada a la API se encola en forgot_password_queue y se hace en
+        segundo plano (con reintentos): el request no espera a la API y
+        tarda lo mismo exista o no el correo. Las solicitudes repetidas del
+        mismo correo en el mismo tenant dentro de la ventana se ignoran.
+        
         Args:
             email: Correo electrónico
             tenant_id: ID del tenant
@@ -140,29 +214,45 @@ class AuthService:
         Returns:
             Tuple[bool, Optional[Dict], Optional[str]]: (éxito, datos_respuesta, mensaje_error)
         """
-        try:
-            forgot_data = {
-                "email": email,
-                "tenant_id": tenant_id
-            }
-            
-            headers = {
-                "Content-Type": "application/json",
-                "X-Tenant-ID": tenant_id
-            }
-            
-            response = await self.client.post(
-                f"{self.auth_api_url}/auth/forgot-password",
-                json=forgot_data,
-                headers=headers
-            )
-            
-            # Siempre devolver éxito por seguridad
-            return True, {}, None
+        normalized = email.strip().lower()
+        key = f"{tenant_id}:{hashlib.sha256(normalized.encode('utf-8')).hexdigest()}"
+        forgot_password_queue.submit(key, lambda: self._send_forgot_password(email, tenant_id))
+        
+        # Siempre devolver éxito por seguridad
+        return True, {}, None
+    
+    async def _send_forgot_password(self, email: str, tenant_id: str):
+        """
+        Envía la solicitud de recuperación a la API (trabajo de forgot_password_queue)
+        
+        Args:
+            email: Correo electrónico
+            tenant_id: ID del tenant
             
-        except Exception as e:
-            logger.error(f"Error en forgot password para tenant {tenant_id}: {str(e)}")
-            return True, {}, None  # Siempre éxito por seguridad
+        Raises:
+            httpx.HTTPError: Si la API no respondió o respondió 5xx/429 (se reintenta)
+            ServiceUnavailableError: Si el circuito de la API está abierto (se reintenta)
+        """
+        forgot_data = {
+            "email": email,
+            "tenant_id": tenant_id
+        }
+        
+        headers = {
+            "Content-Type": "application/json",
+            "X-Tenant-ID": tenant_id
+        }
+        
+        response = await self.client.post(
+            f"{self.auth_api_url}/auth/forgot-password",
+            json=forgot_data,
+            headers=headers
+        )
+        if response.status_code >= 500 or response.status_code == 429:
+            response.raise_for_status()
+        if response.status_code >= 400:
+            # Error definitivo (datos inválidos): no tiene sentido reintentar
+            logger.warning(f"Forgot password rechazado por la API para tenant {tenant_id}: {response.status_code}")
     
     async def reset_password(self, reset_data: Dict[str, Any]) -> Tuple[bool, Optional[Dict], Optional[str]]:
         """
@@ -196,6 +286,8 @@ class AuthService:
                 error_msg = error_data.get("detail", "Error al restablecer contraseña")
                 return False, None, error_msg
                 
+        except ServiceUnavailableError:
+            raise
         except Exception as e:
             logger.error(f"Error en reset password: {str(e)}")
             return False, None, "Error interno del servidor"
@@ -235,25 +327,38 @@ class AuthService:
                 )
             
             # Limpiar sesión
+            access_token = request.session.get("access_token")
+            if access_token:
+                claims_cache.discard(access_token)
+                jwt_verifier.verified.discard(access_token)
             request.session.clear()
-            logger.info(f"Usuario {username} desconectado del tenant {tenant_id}")
+            invalidate_auth_context(request)
+            audit_log.record("logout", tenant_id, username=username, client_ip=self._client_ip(request))
+            logger.debug(f"Usuario {username} desconectado del tenant {tenant_id}")
             return True
             
         except Exception as e:
             logger.error(f"Error durante logout: {str(e)}")
             # Limpiar sesión aunque haya error
             request.session.clear()
+            invalidate_auth_context(request)
             return True
     
     async def refresh_token(self, request: Request) -> bool:
         """
         Refresca el token de acceso con información del tenant
         
+        Los requests concurrentes de la misma sesión comparten un solo
+        refresco (ver services.token_refresh).
+        
         Args:
             request: Request de FastAPI
             
         Returns:
             bool: True si el refresh fue exitoso
+            
+        Raises:
+            ServiceUnavailableError: Si el circuito de la API de auth está abierto
         """
         try:
             tenant_id = TenantContextManager.get_tenant_from_request(request)
@@ -262,52 +367,103 @@ class AuthService:
             if not refresh_token:
                 return False
             
-            refresh_data = {
-                "refresh_token": refresh_token,
-                "tenant_id": tenant_id
-            }
-            
-            headers = {
-                "Content-Type": "application/json",
-                "X-Tenant-ID": tenant_id
-            }
-            
-            response = await self.client.post(
-                f"{self.auth_api_url}/auth/refresh-token",
-                json=refresh_data,
-                headers=headers
+            data = await token_refresher.refresh(
+                tenant_id, refresh_token, lambda: self._request_token_refresh(refresh_token, tenant_id)
             )
             
-            if response.status_code == 200:
-                data = response.json()
-                
-                # Actualizar tokens en la sesión
-                request.session["access_token"] = data["access_token"]
-                request.session["refresh_token"] = data["refresh_token"]
-                
-                # Actualizar información del usuario
-                user_info = self._decode_token(data["access_token"])
-                if user_info:
-                    request.session["user_data"] = user_info
-                    # ✅ NUEVO: Verificar que el tenant coincide
-                    token_tenant = user_info.get("tenant_id")
-                    if token_tenant and token_tenant != tenant_id:
-                        logger.warning(f"Token refresh: tenant mismatch {tenant_id} vs {token_tenant}")
-                        request.session.clear()
-                        return False
-                
-                logger.debug(f"Token refrescado correctamente para tenant {tenant_id}")
-                return True
+            if data is not None:
+                return self._apply_refreshed_tokens(request, data, tenant_id)
             else:
                 logger.warning(f"Error al refrescar token para tenant {tenant_id}")
+                audit_log.record("refresh_failure", tenant_id, username=request.session.get("username"),
+                                 client_ip=self._client_ip(request), reason="rejected")
                 request.session.clear()
                 return False
                 
+        except ServiceUnavailableError:
+            # API de auth degradada: se conserva la sesión para reintentar después
+            raise
+        except httpx.HTTPError as e:
+            # 5xx, 429 o error de red: no es un rechazo, la sesión se conserva
+            logger.error(f"❌ API de auth no disponible al refrescar token para tenant {tenant_id}: {e}")
+            audit_log.record("refresh_failure", tenant_id, username=request.session.get("username"),
+                             client_ip=self._client_ip(request), reason="unavailable")
+            return False
         except Exception as e:
             logger.error(f"Error al refrescar token para tenant {tenant_id}: {str(e)}")
+            audit_log.record("refresh_failure", tenant_id, username=request.session.get("username"),
+                             client_ip=self._client_ip(request), reason="error")
             request.session.clear()
             return False
     
+    def _apply_refreshed_tokens(self, request: Request, data: Dict[str, Any], tenant_id: str) -> bool:
+        """
+        Guarda en la sesión los tokens de un refresco exitoso
+        
+        Args:
+            request: Request de FastAPI
+            data: Respuesta de /auth/refresh-token
+            tenant_id: ID del tenant
+            
+        Returns:
+            bool: False si el token nuevo pertenece a otro tenant (se limpia la sesión)
+        """
+        # Actualizar tokens en la sesión
+        request.session["access_token"] = data["access_token"]
+        request.session["refresh_token"] = data["refresh_token"]
+        
+        # Actualizar información del usuario
+        user_info = self._decode_token(data["access_token"])
+        if user_info:
+            request.session["user_data"] = user_info
+            # ✅ NUEVO: Verificar que el tenant coincide
+            token_tenant = user_info.get("tenant_id")
+            if token_tenant and token_tenant != tenant_id:
+                logger.warning(f"Token refresh: tenant mismatch {tenant_id} vs {token_tenant}")
+                audit_log.record("tenant_mismatch", tenant_id, username=request.session.get("username"),
+                                 client_ip=self._client_ip(request), stage="refresh", token_tenant=token_tenant)
+                request.session.clear()
+                return False
+        
+        logger.debug(f"Token refrescado correctamente para tenant {tenant_id}")
+        return True
+    
+    async def _request_token_refresh(self, refresh_token: str, tenant_id: str) -> Optional[Dict[str, Any]]:
+        """
+        POST /auth/refresh-token a la API de auth
+        
+        Args:
+            refresh_token: Refresh token de la sesión
+            tenant_id: ID del tenant
+            
+        Returns:
+            Optional[Dict[str, Any]]: Tokens nuevos o None si la API rechazó el refresh (4xx)
+            
+        Raises:
+            httpx.HTTPError: Si la API no respondió o respondió 5xx/429 (no es un rechazo)
+        """
+        refresh_data = {
+            "refresh_token": refresh_token,
+            "tenant_id": tenant_id
+        }
+        
+        headers = {
+            "Content-Type": "application/json",
+            "X-Tenant-ID": tenant_id
+        }
+        
+        response = await self.client.post(
+            f"{self.auth_api_url}/auth/refresh-token",
+            json=refresh_data,
+            headers=headers
+        )
+        
+        if response.status_code >= 500 or response.status_code == 429:
+            response.raise_for_status()
+        if response.status_code == 200:
+            return response.json()
+        return None
+    
     async def is_authenticated(self, request: Request) -> bool:
         """
         Verifica si el usuario está autenticado y pertenece al tenant actual
@@ -332,19 +488,98 @@ class AuthService:
         
         if session_tenant and session_tenant != current_tenant:
             logger.warning(f"Tenant mismatch en sesión: {session_tenant} vs {current_tenant}")
+            audit_log.record("tenant_mismatch", current_tenant, username=request.session.get("username"),
+                             client_ip=self._client_ip(request), stage="session", session_tenant=session_tenant)
             request.session.clear()
             return False
         
+        # Verificación local de firma, aud y tenant (claves JWKS en cache)
+        if settings.JWT_LOCAL_VERIFICATION:
+            try:
+                await jwt_verifier.verify(access_token, current_tenant)
+            except ExpiredSignatureError:
+                pass  # Firma válida: se refresca abajo
+            except JwksUnavailableError as e:
+                logger.error(f"❌ No se puede verificar el token del tenant {current_tenant}: {e}")
+                return False
+            except JWTError as e:
+                logger.warning(f"🔒 Token rechazado para tenant {current_tenant}: {e}")
+                audit_log.record("token_rejected", current_tenant, username=request.session.get("username"),
+                                 client_ip=self._client_ip(request), reason=str(e))
+                request.session.clear()
+                return False
+        
         # Verificar si el token ha expirado
         if self._is_token_expired(access_token):
-            # Intentar refrescar el token
+            # Refresco síncrono: el request espera a la API de auth (ajustar la ventana de refresh-ahead)
+            metrics.increment("token_refresh_sync_total", tenant=current_tenant)
             if await self.refresh_token(request):
                 return True
             else:
                 return False
         
+        # Refresh-ahead: cerca del exp se refresca en segundo plano y el
+        # siguiente request aplica los tokens nuevos
+        window = settings.TOKEN_REFRESH_AHEAD_SECONDS
+        if window > 0:
+            expires_in = self._get_claims(access_token)["exp"] - time.time()
+            if expires_in <= window:
+                await self._refresh_ahead(request, current_tenant, expires_in)
+        
         return True
     
+    async def _refresh_ahead(self, request: Request, tenant_id: str, expires_in: float):
+        """
+        Aplica un refresco anticipado ya terminado o inicia uno en segundo plano
+        
+        Args:
+            request: Request de FastAPI
+            tenant_id: ID del tenant
+            expires_in: Segundos que le quedan al access token actual
+        """
+        refresh_token = request.session.get("refresh_token")
+        if not refresh_token:
+            return
+        
+        data = await token_refresher.peek(tenant_id, refresh_token)
+        if data is not None:
+            self._apply_refreshed_tokens(request, data, tenant_id)
+            return
+        
+        # El refresh token anterior ya quedó rotado: el resultado se conserva
+        # mientras pueda volver un request con la cookie vieja (vida de la sesión)
+        token_refresher.refresh_ahead(
+            tenant_id, refresh_token,
+            lambda: self._request_token_refresh(refresh_token, tenant_id),
+            keep_for=max(expires_in, settings.SESSION_MAX_AGE),
+        )
+    
+    async def resolve_auth_context(self, request: Request) -> AuthContext:
+        """
+        Estado de autenticación del request, resuelto una sola vez
+        
+        La primera llamada verifica la sesión (y refresca el token si hace
+        falta); las siguientes del mismo request devuelven el mismo objeto.
+        
+        Args:
+            request: Request de FastAPI
+            
+        Returns:
+            AuthContext: Usuario, roles, tenant y vencimiento (anónimo si no hay sesión válida)
+        """
+        context = cached_auth_context(request)
+        if context is not None:
+            return context
+        
+        tenant_id = TenantContextManager.get_tenant_from_request(request)
+        if not await self.is_authenticated(request):
+            return store_auth_context(request, AuthContext.anonymous(tenant_id))
+        
+        # Tras is_authenticated el access token de la sesión es el vigente (quizá refrescado)
+        claims = self._get_claims(request.session.get("access_token", ""))
+        expires_at = claims.get("exp") if claims else None
+        return store_auth_context(request, AuthContext.from_session(request.session, tenant_id, expires_at))
+    
     async def get_current_user(self, request: Request) -> Optional[Dict[str, Any]]:
         """
         Obtiene el usuario actual de la sesión con validación de tenant
@@ -355,17 +590,16 @@ class AuthService:
         Returns:
             Optional[Dict[str, Any]]: Datos del usuario actual
         """
-        if not await self.is_authenticated(request):
+        auth = await self.resolve_auth_context(request)
+        if not auth.authenticated:
             return None
         
-        user_data = request.session.get("user_data")
-        
         # ✅ NUEVO: Agregar información del tenant actual
+        user_data = dict(auth.user)
         if user_data:
-            current_tenant = TenantContextManager.get_tenant_from_request(request)
-            user_data["current_tenant"] = current_tenant
+            user_data["current_tenant"] = auth.tenant_id
         
-        return user_data
+        return user_data or None
     
     async def create_session(self, request: Request, login_data: Dict[str, Any], tenant_id: str):
         """
@@ -396,11 +630,14 @@ class AuthService:
             user_tenant = user_info.get("tenant_id")
             if user_tenant and user_tenant != tenant_id:
                 logger.error(f"Token tenant mismatch: {user_tenant} vs {tenant_id}")
+                audit_log.record("tenant_mismatch", tenant_id, username=user_info.get("username"),
+                                 client_ip=self._client_ip(request), stage="create_session", token_tenant=user_tenant)
                 request.session.clear()
                 raise ValueError("Tenant mismatch en token")
         
         # Marcar como autenticado
         request.session["authenticated"] = True
+        invalidate_auth_context(request)
         request.session["login_time"] = datetime.now().isoformat()
         
         # ✅ NUEVO: Información adicional de la sesión
@@ -490,14 +727,30 @@ class AuthService:
             token: Token a decodificar
             
         Returns:
-            Optional[Dict[str, Any]]: Payload del token o None
+            Optional[Dict[str, Any]]: Payload del token (copia modificable) o None
         """
+        claims = self._get_claims(token)
+        return dict(claims) if claims is not None else None
+    
+    def _get_claims(self, token: str) -> Optional[Mapping[str, Any]]:
+        """
+        Claims del token desde la cache (se decodifica solo en un fallo)
+        
+        Args:
+            token: Token a decodificar
+            
+        Returns:
+            Optional[Mapping[str, Any]]: Claims de solo lectura o None
+        """
+        claims = claims_cache.get(token)
+        if claims is not None:
+            return claims
         try:
             # Decodificar sin verificar (solo para obtener información)
             payload = jwt.get_unverified_claims(token)
-            return payload
         except JWTError:
             return None
+        return claims_cache.put(token, payload)
     
     def _is_token_expired(self, token: str) -> bool:
         """
@@ -510,7 +763,7 @@ class AuthService:
             bool: True si ha expirado
         """
         try:
-            payload = self._decode_token(token)
+            payload = self._get_claims(token)
             if not payload:
                 return True
             
@@ -518,8 +771,26 @@ class AuthService:
             if not exp_timestamp:
                 return True
             
-            exp_datetime = datetime.fromtimestamp(exp_timestamp)
-            return datetime.now() >= exp_datetime
+            return time.time() >= exp_timestamp
             
         except Exception:
-            return True
\ No newline at end of file
+            return True
+
+
+async def get_auth_context(request: Request) -> AuthContext:
+    """
+    Dependencia de FastAPI con el estado de autenticación del request
+    
+    Uso:
+        async def vista(request: Request, auth: AuthContext = Depends(get_auth_context))
+    
+    Args:
+        request: Request de FastAPI
+        
+    Returns:
+        AuthContext: Contexto resuelto una sola vez por request
+    """
+    context = cached_auth_context(request)
+    if context is not None:
+        return context
+    return await AuthService().resolve_auth_context(request)
@@ -0,0 +1,218 @@
+"""
+Cola de trabajos en segundo plano dentro del proceso
+
+Para llamadas cuyo resultado el request no necesita (p. ej. pedir a la API
+de auth el correo de recuperación de contraseña): el request encola el
+trabajo con submit, que no espera ni hace I/O, y responde al instante.
+Unos pocos workers ejecutan los trabajos; si uno falla (excepción) se
+reintenta con backoff exponencial y jitter hasta max_attempts. Si la API
+respondió ServiceUnavailableError (circuito abierto) se espera al menos el
+retry_after sugerido.
+
+La cola es acotada: con la cola llena el trabajo se descarta y se cuenta.
+Los trabajos con la misma clave dentro de dedup_window segundos se
+descartan como duplicados (un usuario que aprieta "enviar" varias veces).
+"""
+import asyncio
+import logging
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from config.settings import settings
+from services.circuit_breaker import ServiceUnavailableError
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+Job = Callable[[], Awaitable[Any]]
+
+
+class BackgroundQueue:
+    """
+    Cola acotada con workers, reintentos con backoff y deduplicación por clave
+    """
+
+    def __init__(self, name: str, max_size: int = 1000, workers: int = 2, max_attempts: int = 5,
+                 retry_base: float = 1.0, retry_max: float = 60.0, dedup_window: float = 300.0):
+        """
+        Inicializa la cola (los workers arrancan con start)
+
+        Args:
+            name: Nombre de la cola (etiqueta en métricas y logs)
+            max_size: Trabajos máximos en espera
+            workers: Trabajos que se ejecutan en paralelo
+            max_attempts: Intentos por trabajo antes de descartarlo
+            retry_base: Espera antes del primer reintento en segundos (se duplica en cada uno)
+            retry_max: Espera máxima entre reintentos en segundos
+            dedup_window: Segundos en los que una misma clave no se vuelve a encolar
+        """
+        self.name = name
+        self.max_size = max_size
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.dedup_window = dedup_window
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._retries: Set[asyncio.TimerHandle] = set()
+        self._recent: Dict[str, float] = {}  # clave -> hasta cuándo se descartan duplicados
+        self.counts: Dict[str, int] = {}
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def start(self):
+        """Inicia los workers"""
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"{self.name}-worker-{index}")
+            for index in range(self.workers)
+        ]
+        logger.info(f"📬 Cola '{self.name}' iniciada ({self.workers} workers, máx. {self.max_size} trabajos)")
+
+    async def stop(self, timeout: float = 5.0):
+        """
+        Espera a que terminen los trabajos encolados (hasta timeout) y detiene los workers
+
+        Args:
+            timeout: Segundos máximos de espera; lo que quede se descarta
+        """
+        if not self.running:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pending = self._queue.qsize()
+            if pending:
+                self._count("dropped", pending)
+            logger.warning(f"⚠️ Cola '{self.name}' cerrada con {pending} trabajos sin ejecutar")
+        for handle in self._retries:
+            handle.cancel()
+        if self._retries:
+            self._count("dropped", len(self._retries))
+            self._retries.clear()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, key: str, job: Job) -> bool:
+        """
+        Encola un trabajo sin esperar su ejecución
+
+        Args:
+            key: Clave de deduplicación
+            job: Función sin argumentos que devuelve el awaitable a ejecutar
+                 (se llama una vez por intento)
+
+        Returns:
+            bool: True si se encoló; False si era duplicado o la cola estaba llena
+        """
+        now = time.monotonic()
+        self._prune(now)
+        if self._recent.get(key, 0.0) > now:
+            self._count("deduplicated")
+            return False
+        if not self.running:
+            # Fuera del lifespan (scripts, tests): se ejecuta en una tarea suelta
+            self._recent[key] = now + self.dedup_window
+            asyncio.get_running_loop().create_task(self._run(job, 1))
+            self._count("submitted")
+            return True
+        try:
+            self._queue.put_nowait((job, 1))
+        except asyncio.QueueFull:
+            self._count("dropped")
+            logger.warning(f"⚠️ Cola '{self.name}' llena, trabajo descartado")
+            return False
+        self._recent[key] = now + self.dedup_window
+        self._count("submitted")
+        return True
+
+    def _prune(self, now: float):
+        if len(self._recent) >= 10000:
+            self._recent = {key: until for key, until in self._recent.items() if until > now}
+
+    async def _worker(self):
+        while True:
+            job, attempt = await self._queue.get()
+            try:
+                await self._run(job, attempt)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: Job, attempt: int):
+        """Ejecuta un intento y programa el reintento si falla"""
+        start = time.perf_counter()
+        try:
+            await job()
+        except Exception as e:
+            metrics.observe("background_job_seconds", time.perf_counter() - start, queue=self.name)
+            if attempt >= self.max_attempts:
+                self._count("failed")
+                logger.error(f"❌ Trabajo de '{self.name}' descartado tras {attempt} intentos: {e}")
+                return
+            delay = self._backoff(attempt, e)
+            self._count("retried")
+            logger.warning(f"🔁 Trabajo de '{self.name}' falló (intento {attempt}), reintento en {delay:.1f}s: {e}")
+            self._schedule_retry(job, attempt + 1, delay)
+            return
+        metrics.observe("background_job_seconds", time.perf_counter() - start, queue=self.name)
+        self._count("succeeded")
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        """retry_base * 2^(intento-1) con jitter, sin bajar del retry_after del circuito"""
+        delay = min(self.retry_base * (2 ** (attempt - 1)), self.retry_max)
+        delay = random.uniform(delay / 2, delay)
+        if isinstance(error, ServiceUnavailableError):
+            delay = max(delay, min(error.retry_after, self.retry_max))
+        return delay
+
+    def _schedule_retry(self, job: Job, attempt: int, delay: float):
+        loop = asyncio.get_running_loop()
+        if not self.running:
+            loop.call_later(delay, lambda: loop.create_task(self._run(job, attempt)))
+            return
+
+        def requeue():
+            self._retries.discard(handle)
+            try:
+                self._queue.put_nowait((job, attempt))
+            except asyncio.QueueFull:
+                self._count("dropped")
+
+        handle = loop.call_later(delay, requeue)
+        self._retries.add(handle)
+
+    def _count(self, result: str, value: int = 1):
+        self.counts[result] = self.counts.get(result, 0) + value
+        metrics.increment("background_jobs_total", value, queue=self.name, result=result)
+
+    def stats(self) -> Dict[str, Any]:
+        """Estado para /metrics"""
+        return {
+            "running": self.running,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "waiting_retry": len(self._retries),
+            "max_size": self.max_size,
+            "workers": self.workers,
+            **self.counts,
+        }
+
+
+# Cola de solicitudes de recuperación de contraseña a la API de auth
+forgot_password_queue = BackgroundQueue(
+    "forgot_password",
+    max_size=settings.FORGOT_PASSWORD_QUEUE_SIZE,
+    workers=settings.FORGOT_PASSWORD_WORKERS,
+    max_attempts=settings.FORGOT_PASSWORD_MAX_ATTEMPTS,
+    retry_base=settings.FORGOT_PASSWORD_RETRY_BASE,
+    retry_max=settings.FORGOT_PASSWORD_RETRY_MAX,
+    dedup_window=settings.FORGOT_PASSWORD_DEDUP_WINDOW,
+)
+metrics.register_collector("forgot_password_queue", forgot_password_queue.stats)
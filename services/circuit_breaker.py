@@ -0,0 +1,226 @@
+"""
+Circuit breaker y bulkhead para las llamadas a APIs externas
+
+Si la API de auth se pone lenta, cada login/refresh/logout esperaba el
+API_TIMEOUT completo y los requests se acumulaban en el event loop. El
+CircuitBreaker mira las últimas N llamadas: si la proporción de errores
+(excepciones de red o respuestas 5xx) o de llamadas lentas supera el
+umbral, se abre y las llamadas siguientes fallan al instante con
+ServiceUnavailableError. Pasado open_seconds deja pasar unas pocas
+llamadas de prueba (half-open): si todas salen bien se cierra, si alguna
+falla vuelve a abrirse.
+
+El Bulkhead limita las llamadas simultáneas; si no hay lugar en max_wait
+segundos la llamada se rechaza en vez de encolarse sin límite.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Tuple
+
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Valor del gauge circuit_breaker_state por estado
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class ServiceUnavailableError(Exception):
+    """Llamada rechazada sin intentarla (circuito abierto o bulkhead lleno)"""
+
+    def __init__(self, service: str, reason: str, retry_after: float = 0.0):
+        """
+        Args:
+            service: Nombre de la API
+            reason: "circuit_open" o "bulkhead_full"
+            retry_after: Segundos sugeridos antes de reintentar
+        """
+        super().__init__(f"Servicio '{service}' no disponible ({reason})")
+        self.service = service
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Circuito closed/open/half-open según la tasa de errores y de llamadas lentas
+    """
+
+    def __init__(self, name: str, window_size: int = 20, min_calls: int = 10,
+                 failure_rate_threshold: float = 0.5, slow_call_seconds: float = 5.0,
+                 slow_call_rate_threshold: float = 0.8, open_seconds: float = 30.0,
+                 half_open_calls: int = 3):
+        """
+        Inicializa el circuito (cerrado)
+
+        Args:
+            name: Nombre de la API (etiqueta en métricas y logs)
+            window_size: Llamadas recientes que se evalúan
+            min_calls: Llamadas mínimas en la ventana antes de poder abrir
+            failure_rate_threshold: Proporción de errores que abre el circuito
+            slow_call_seconds: Duración a partir de la cual una llamada cuenta como lenta
+            slow_call_rate_threshold: Proporción de llamadas lentas que abre el circuito
+            open_seconds: Tiempo que permanece abierto antes de probar de nuevo
+            half_open_calls: Llamadas de prueba en half-open
+        """
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+        self.state = CLOSED
+        self._window: Deque[Tuple[bool, bool]] = deque(maxlen=window_size)  # (falló, lenta)
+        self._opened_at = 0.0
+        self._trials = 0
+        self._trial_successes = 0
+        self.rejections = 0
+        self.times_opened = 0
+        metrics.set_gauge("circuit_breaker_state", STATE_VALUES[CLOSED], service=name)
+
+    def before_call(self):
+        """
+        Autoriza una llamada o la rechaza al instante
+
+        Raises:
+            ServiceUnavailableError: Si el circuito está abierto o sin lugar para pruebas
+        """
+        if self.state == OPEN:
+            remaining = self._opened_at + self.open_seconds - time.monotonic()
+            if remaining > 0:
+                self._reject(remaining)
+            self._transition(HALF_OPEN)
+
+        if self.state == HALF_OPEN:
+            if self._trials >= self.half_open_calls:
+                self._reject(self.open_seconds)
+            self._trials += 1
+
+    def record(self, failed: bool, duration: float):
+        """
+        Registra el resultado de una llamada autorizada
+
+        Args:
+            failed: True si hubo error de red/timeout o respuesta 5xx
+            duration: Duración de la llamada en segundos
+        """
+        slow = duration >= self.slow_call_seconds
+        if self.state == HALF_OPEN:
+            if failed or slow:
+                self._transition(OPEN)
+                return
+            self._trial_successes += 1
+            if self._trial_successes >= self.half_open_calls:
+                self._transition(CLOSED)
+            return
+
+        self._window.append((failed, slow))
+        if self.state == CLOSED and len(self._window) >= self.min_calls:
+            failure_rate, slow_rate = self._rates()
+            if failure_rate >= self.failure_rate_threshold or slow_rate >= self.slow_call_rate_threshold:
+                logger.error(f"🔴 Circuito '{self.name}' abierto: {failure_rate:.0%} errores, "
+                             f"{slow_rate:.0%} llamadas lentas en las últimas {len(self._window)}")
+                self._transition(OPEN)
+
+    def abandon(self):
+        """Libera el lugar de una llamada de prueba cancelada sin resultado"""
+        if self.state == HALF_OPEN and self._trials > 0:
+            self._trials -= 1
+
+    def _rates(self) -> Tuple[float, float]:
+        calls = len(self._window)
+        if not calls:
+            return 0.0, 0.0
+        failures = sum(1 for failed, _ in self._window if failed)
+        slow = sum(1 for _, is_slow in self._window if is_slow)
+        return failures / calls, slow / calls
+
+    def _reject(self, retry_after: float):
+        self.rejections += 1
+        metrics.increment("circuit_breaker_rejections_total", service=self.name, reason="circuit_open")
+        raise ServiceUnavailableError(self.name, "circuit_open", retry_after)
+
+    def _transition(self, state: str):
+        previous, self.state = self.state, state
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+            self.times_opened += 1
+        elif state == HALF_OPEN:
+            self._trials = 0
+            self._trial_successes = 0
+            logger.info(f"🟡 Circuito '{self.name}' en prueba (half-open)")
+        elif state == CLOSED:
+            self._window.clear()
+            logger.info(f"🟢 Circuito '{self.name}' cerrado nuevamente")
+        metrics.set_gauge("circuit_breaker_state", STATE_VALUES[state], service=self.name)
+        metrics.increment("circuit_breaker_transitions_total", service=self.name, source=previous, target=state)
+
+    def stats(self) -> Dict[str, Any]:
+        """Estado para /metrics"""
+        failure_rate, slow_rate = self._rates()
+        return {
+            "state": self.state,
+            "failure_rate": round(failure_rate, 3),
+            "slow_call_rate": round(slow_rate, 3),
+            "window_calls": len(self._window),
+            "times_opened": self.times_opened,
+            "rejections": self.rejections,
+        }
+
+
+class Bulkhead:
+    """
+    Límite de llamadas simultáneas con espera acotada
+    """
+
+    def __init__(self, name: str, max_concurrent: int = 50, max_wait: float = 0.5):
+        """
+        Inicializa el bulkhead
+
+        Args:
+            name: Nombre de la API (etiqueta en métricas)
+            max_concurrent: Llamadas simultáneas permitidas
+            max_wait: Segundos que una llamada espera lugar antes de ser rechazada
+        """
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_wait = max_wait
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self.active = 0
+        self.rejections = 0
+
+    def reset(self):
+        """Vacía el bulkhead (al abrir un cliente nuevo, posiblemente en otro event loop)"""
+        self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        self.active = 0
+
+    async def acquire(self):
+        """
+        Ocupa un lugar
+
+        Raises:
+            ServiceUnavailableError: Si no hubo lugar en max_wait segundos
+        """
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.max_wait)
+        except asyncio.TimeoutError:
+            self.rejections += 1
+            metrics.increment("circuit_breaker_rejections_total", service=self.name, reason="bulkhead_full")
+            raise ServiceUnavailableError(self.name, "bulkhead_full", self.max_wait) from None
+        self.active += 1
+
+    def release(self):
+        """Libera un lugar"""
+        self.active -= 1
+        self._semaphore.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """Estado para /metrics"""
+        return {"active": self.active, "max_concurrent": self.max_concurrent, "rejections": self.rejections}
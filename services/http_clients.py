@@ -0,0 +1,428 @@
+"""
+Clientes HTTP compartidos por la aplicación
+
+Cada API externa usa un único httpx.AsyncClient con su pool de conexiones:
+se abre en el lifespan, se reutiliza en todos los requests (las conexiones
+keep-alive evitan repetir el handshake TCP/TLS) y se cierra al apagar. El
+transporte cuenta los requests en curso y los que tuvieron que esperar una
+conexión libre; las estadísticas se publican en /metrics.
+
+Opcionalmente el cliente pasa por un circuit breaker y un bulkhead (ver
+services.circuit_breaker): con la API caída o lenta las llamadas fallan al
+instante con ServiceUnavailableError en vez de esperar el timeout completo.
+
+Cada request se traza con la extensión "trace" de httpcore y se publica la
+duración por fase en upstream_phase_seconds{service, phase}: connect (TCP),
+tls (handshake), ttfb (desde enviar los headers hasta recibir los de la
+respuesta); upstream_connections_total{service, connection} cuenta cuántos
+requests abrieron una conexión nueva y cuántos reutilizaron una del pool.
+En el lifespan se pre-abren `warmup_connections` conexiones (warmup) para
+que el primer request después de un deploy no pague el handshake.
+
+HTTP/2 (multiplexa los requests sobre una sola conexión) es opcional: requiere
+el paquete h2 y una API con TLS (sin TLS httpx sigue usando HTTP/1.1).
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+
+from config.settings import settings
+from services.circuit_breaker import Bulkhead, CircuitBreaker
+from utils.metrics import metrics
+
+try:
+    import h2  # noqa: F401 - solo para saber si HTTP/2 está disponible
+except ImportError:  # pragma: no cover - depende del entorno
+    h2 = None
+
+logger = logging.getLogger(__name__)
+
+
+class _TrackedStream(httpx.AsyncByteStream):
+    """Cuerpo de respuesta que avisa cuando se libera su conexión"""
+
+    def __init__(self, stream: httpx.AsyncByteStream, on_close):
+        self._stream = stream
+        self._on_close = on_close
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        if self._on_close is not None:
+            on_close, self._on_close = self._on_close, None
+            on_close()
+        await self._stream.aclose()
+
+
+class _PhaseTracer:
+    """Callback de la extensión trace de httpcore que mide connect, TLS y TTFB"""
+
+    def __init__(self, service: str, inner=None):
+        self.service = service
+        self._inner = inner
+        self._started: Dict[str, float] = {}
+        self.phases: Dict[str, float] = {}
+
+    async def __call__(self, event_name: str, info: Dict[str, Any]):
+        now = time.perf_counter()
+        if event_name.endswith("connect_tcp.started"):
+            self._started["connect"] = now
+        elif event_name.endswith("connect_tcp.complete"):
+            self._finish("connect", now)
+        elif event_name.endswith("start_tls.started"):
+            self._started["tls"] = now
+        elif event_name.endswith("start_tls.complete"):
+            self._finish("tls", now)
+        elif event_name.endswith("send_request_headers.started"):
+            self._started["ttfb"] = now
+        elif event_name.endswith("receive_response_headers.complete"):
+            self._finish("ttfb", now)
+        if self._inner is not None:
+            await self._inner(event_name, info)
+
+    def _finish(self, phase: str, now: float):
+        started = self._started.pop(phase, None)
+        if started is not None:
+            self.phases[phase] = now - started
+            metrics.observe("upstream_phase_seconds", now - started, service=self.service, phase=phase)
+
+    @property
+    def new_connection(self) -> bool:
+        """True si el request tuvo que abrir una conexión"""
+        return "connect" in self.phases
+
+
+class PoolStatsTransport(httpx.AsyncBaseTransport):
+    """
+    Transporte httpx con pool de conexiones instrumentado
+    """
+
+    def __init__(self, limits: httpx.Limits, service: str = "upstream", **transport_options):
+        """
+        Inicializa el transporte
+
+        Args:
+            limits: Límites del pool (conexiones máximas y keep-alive)
+            service: Nombre de la API (etiqueta de las métricas por fase)
+            **transport_options: Opciones adicionales para httpx.AsyncHTTPTransport
+        """
+        self.limits = limits
+        self.service = service
+        self._transport = httpx.AsyncHTTPTransport(limits=limits, **transport_options)
+        # Requests en curso (con conexión asignada o esperando una)
+        self.in_flight = 0
+        self.requests = 0
+        self.waits = 0
+        self.pool_timeouts = 0
+        self.new_connections = 0
+        self.reused_connections = 0
+
+    def _release(self):
+        self.in_flight -= 1
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        if self.limits.max_connections is not None and self.in_flight >= self.limits.max_connections:
+            self.waits += 1
+        self.in_flight += 1
+        tracer = _PhaseTracer(self.service, request.extensions.get("trace"))
+        request.extensions["trace"] = tracer
+        try:
+            response = await self._transport.handle_async_request(request)
+        except httpx.PoolTimeout:
+            self.pool_timeouts += 1
+            self._release()
+            raise
+        except BaseException:
+            self._release()
+            raise
+        if tracer.new_connection:
+            self.new_connections += 1
+        else:
+            self.reused_connections += 1
+        metrics.increment("upstream_connections_total", service=self.service,
+                          connection="new" if tracer.new_connection else "reused")
+        response.stream = _TrackedStream(response.stream, self._release)
+        return response
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+    def connection_counts(self) -> Dict[str, int]:
+        """Conexiones abiertas e inactivas del pool de httpcore"""
+        pool = getattr(self._transport, "_pool", None)
+        connections = list(getattr(pool, "connections", []))
+        idle = sum(1 for connection in connections if connection.is_idle())
+        return {"connections": len(connections), "idle": idle}
+
+
+class ResilientTransport(httpx.AsyncBaseTransport):
+    """
+    Transporte que aplica circuit breaker y bulkhead antes de llamar a la API
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, breaker: Optional[CircuitBreaker] = None,
+                 bulkhead: Optional[Bulkhead] = None):
+        """
+        Inicializa el transporte
+
+        Args:
+            transport: Transporte que hace la llamada real
+            breaker: Circuit breaker (None = sin circuito)
+            bulkhead: Límite de llamadas simultáneas (None = sin límite)
+        """
+        self._transport = transport
+        self.breaker = breaker
+        self.bulkhead = bulkhead
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if self.bulkhead is not None:
+            await self.bulkhead.acquire()
+        try:
+            if self.breaker is not None:
+                self.breaker.before_call()
+            start = time.perf_counter()
+            try:
+                response = await self._transport.handle_async_request(request)
+            except asyncio.CancelledError:
+                if self.breaker is not None:
+                    self.breaker.abandon()
+                raise
+            except Exception:
+                if self.breaker is not None:
+                    self.breaker.record(True, time.perf_counter() - start)
+                raise
+        except BaseException:
+            if self.bulkhead is not None:
+                self.bulkhead.release()
+            raise
+
+        if self.breaker is not None:
+            self.breaker.record(response.status_code >= 500, time.perf_counter() - start)
+        if self.bulkhead is not None:
+            # El lugar se libera al terminar de leer la respuesta
+            response.stream = _TrackedStream(response.stream, self.bulkhead.release)
+        return response
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+class SharedHttpClient:
+    """
+    httpx.AsyncClient de alcance de aplicación para una API
+    """
+
+    def __init__(self, name: str, max_connections: int = 100, max_keepalive_connections: int = 20,
+                 keepalive_expiry: float = 30.0, timeout: float = 30.0, pool_timeout: float = 5.0,
+                 breaker: Optional[CircuitBreaker] = None, bulkhead: Optional[Bulkhead] = None,
+                 http2: bool = False, base_url: str = "", warmup_connections: int = 0,
+                 warmup_path: str = "/"):
+        """
+        Inicializa la configuración (el cliente se crea en open)
+
+        Args:
+            name: Nombre de la API (etiqueta en métricas y logs)
+            max_connections: Conexiones simultáneas máximas
+            max_keepalive_connections: Conexiones inactivas que se conservan
+            keepalive_expiry: Segundos que se conserva una conexión inactiva
+            timeout: Timeout de cada petición en segundos
+            pool_timeout: Espera máxima por una conexión libre en segundos
+            breaker: Circuit breaker de la API (None = sin circuito)
+            bulkhead: Límite de llamadas simultáneas (None = sin límite)
+            http2: Negociar HTTP/2 con la API (requiere el paquete h2)
+            base_url: URL de la API (destino del warmup)
+            warmup_connections: Conexiones que se pre-abren en el lifespan (0 = ninguna)
+            warmup_path: Ruta liviana que se pide para abrir cada conexión
+        """
+        self.name = name
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = httpx.Timeout(timeout, pool=pool_timeout)
+        self._client: Optional[httpx.AsyncClient] = None
+        self._transport: Optional[PoolStatsTransport] = None
+        self.breaker = breaker
+        self.bulkhead = bulkhead
+        if http2 and h2 is None:
+            logger.warning(f"⚠️ HTTP/2 pedido para '{name}' pero el paquete h2 no está instalado: se usa HTTP/1.1")
+            http2 = False
+        self.http2 = http2
+        self.base_url = base_url.rstrip("/")
+        self.warmup_connections = warmup_connections
+        self.warmup_path = warmup_path
+        self.warmed_up = 0
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Cliente compartido (se abre aquí si se usa fuera del lifespan, p. ej. en scripts)"""
+        if self._client is None or self._client.is_closed:
+            logger.warning(f"⚠️ Cliente HTTP '{self.name}' usado sin abrir en el lifespan, se abre ahora")
+            self.open()
+        return self._client
+
+    def open(self) -> httpx.AsyncClient:
+        """
+        Crea el cliente y su pool de conexiones
+
+        Returns:
+            httpx.AsyncClient: Cliente compartido
+        """
+        if self._client is None or self._client.is_closed:
+            self._transport = PoolStatsTransport(self.limits, service=self.name, http2=self.http2)
+            transport: httpx.AsyncBaseTransport = self._transport
+            if self.breaker is not None or self.bulkhead is not None:
+                if self.bulkhead is not None:
+                    self.bulkhead.reset()
+                transport = ResilientTransport(transport, self.breaker, self.bulkhead)
+            self._client = httpx.AsyncClient(timeout=self.timeout, transport=transport)
+            logger.info(f"🔌 Cliente HTTP '{self.name}' abierto (máx. {self.limits.max_connections} conexiones, "
+                        f"{self.limits.max_keepalive_connections} keep-alive por {self.limits.keepalive_expiry}s"
+                        f"{', HTTP/2' if self.http2 else ''})")
+        return self._client
+
+    async def warmup(self, timeout: float = 5.0) -> int:
+        """
+        Pre-abre conexiones del pool (TCP + TLS) antes del primer request real
+
+        Las peticiones van directo al pool, sin circuit breaker ni bulkhead: una
+        API caída al arrancar no abre el circuito. Cualquier respuesta (incluso
+        404) deja la conexión abierta en el pool; con HTTP/2 alcanza con una.
+
+        Args:
+            timeout: Segundos máximos que se espera el warmup
+
+        Returns:
+            int: Conexiones abiertas
+        """
+        count = min(self.warmup_connections, self.limits.max_keepalive_connections or self.warmup_connections)
+        if self.http2:
+            count = min(count, 1)
+        if count <= 0 or not self.base_url:
+            return 0
+        self.open()
+        url = f"{self.base_url}/{self.warmup_path.lstrip('/')}"
+
+        async def _open_connection() -> bool:
+            request = httpx.Request("GET", url, extensions={"timeout": self.timeout.as_dict()})
+            response = await self._transport.handle_async_request(request)
+            try:
+                await response.aread()  # Sin leer el cuerpo httpcore no devuelve la conexión al pool
+            finally:
+                await response.aclose()
+            return True
+
+        start = time.perf_counter()
+        try:
+            results = await asyncio.wait_for(
+                asyncio.gather(*(_open_connection() for _ in range(count)), return_exceptions=True),
+                timeout=timeout,
+            )
+        except asyncio.TimeoutError:
+            results = []
+        opened = sum(1 for result in results if result is True)
+        self.warmed_up += opened
+        if opened:
+            logger.info(f"🔥 Cliente HTTP '{self.name}': {opened} conexiones pre-abiertas "
+                        f"en {(time.perf_counter() - start) * 1000:.0f}ms")
+        else:
+            logger.warning(f"⚠️ No se pudieron pre-abrir conexiones con '{self.name}' ({url})")
+        return opened
+
+    async def aclose(self):
+        """Cierra el cliente y todas sus conexiones"""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+            logger.info(f"🔌 Cliente HTTP '{self.name}' cerrado")
+        self._client = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Estado del pool para /metrics"""
+        transport = self._transport
+        resilience = {}
+        if self.breaker is not None:
+            resilience["breaker"] = self.breaker.stats()
+        if self.bulkhead is not None:
+            resilience["bulkhead"] = self.bulkhead.stats()
+        if transport is None:
+            return {"open": False, **resilience}
+        in_use = min(transport.in_flight, self.limits.max_connections or transport.in_flight)
+        return {
+            "open": self._client is not None and not self._client.is_closed,
+            "in_use": in_use,
+            **transport.connection_counts(),
+            "waiting": transport.in_flight - in_use,
+            "waits": transport.waits,
+            "pool_timeouts": transport.pool_timeouts,
+            "requests": transport.requests,
+            "new_connections": transport.new_connections,
+            "reused_connections": transport.reused_connections,
+            "warmed_up": self.warmed_up,
+            "http2": self.http2,
+            "phases_ms": self._phase_averages(),
+            "max_connections": self.limits.max_connections,
+            "max_keepalive_connections": self.limits.max_keepalive_connections,
+            **resilience,
+        }
+
+    def _phase_averages(self) -> Dict[str, float]:
+        """Duración promedio de cada fase en milisegundos"""
+        averages = {}
+        for phase in ("connect", "tls", "ttfb"):
+            timing = metrics.get_timing("upstream_phase_seconds", service=self.name, phase=phase)
+            if timing:
+                averages[phase] = round(timing["sum"] / timing["count"] * 1000, 2)
+        return averages
+
+
+# Cliente compartido de la API de autenticación
+auth_http_client = SharedHttpClient(
+    "auth",
+    max_connections=settings.AUTH_HTTP_MAX_CONNECTIONS,
+    max_keepalive_connections=settings.AUTH_HTTP_MAX_KEEPALIVE,
+    keepalive_expiry=settings.AUTH_HTTP_KEEPALIVE_EXPIRY,
+    timeout=settings.API_TIMEOUT,
+    pool_timeout=settings.AUTH_HTTP_POOL_TIMEOUT,
+    http2=settings.UPSTREAM_HTTP2,
+    base_url=settings.AUTH_API_URL,
+    warmup_connections=settings.AUTH_HTTP_WARMUP_CONNECTIONS,
+    warmup_path=settings.AUTH_HTTP_WARMUP_PATH,
+    breaker=CircuitBreaker(
+        "auth",
+        window_size=settings.AUTH_BREAKER_WINDOW,
+        min_calls=settings.AUTH_BREAKER_MIN_CALLS,
+        failure_rate_threshold=settings.AUTH_BREAKER_FAILURE_RATE,
+        slow_call_seconds=settings.AUTH_BREAKER_SLOW_CALL_SECONDS,
+        slow_call_rate_threshold=settings.AUTH_BREAKER_SLOW_CALL_RATE,
+        open_seconds=settings.AUTH_BREAKER_OPEN_SECONDS,
+        half_open_calls=settings.AUTH_BREAKER_HALF_OPEN_CALLS,
+    ) if settings.AUTH_BREAKER_ENABLED else None,
+    bulkhead=Bulkhead(
+        "auth",
+        max_concurrent=settings.AUTH_BULKHEAD_MAX_CONCURRENT,
+        max_wait=settings.AUTH_BULKHEAD_MAX_WAIT,
+    ) if settings.AUTH_BREAKER_ENABLED else None,
+)
+metrics.register_collector("http_pool_auth", auth_http_client.stats)
+
+# Cliente compartido de la API de datos
+data_http_client = SharedHttpClient(
+    "data",
+    max_connections=settings.DATA_HTTP_MAX_CONNECTIONS,
+    max_keepalive_connections=settings.DATA_HTTP_MAX_KEEPALIVE,
+    keepalive_expiry=settings.DATA_HTTP_KEEPALIVE_EXPIRY,
+    timeout=settings.API_TIMEOUT,
+    pool_timeout=settings.DATA_HTTP_POOL_TIMEOUT,
+    http2=settings.UPSTREAM_HTTP2,
+    base_url=settings.DATA_API_URL,
+    warmup_connections=settings.DATA_HTTP_WARMUP_CONNECTIONS,
+    warmup_path=settings.DATA_HTTP_WARMUP_PATH,
+)
+metrics.register_collector("http_pool_data", data_http_client.stats)
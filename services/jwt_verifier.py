@@ -0,0 +1,249 @@
+"""
+Verificación local de los JWT de sesión con claves JWKS en cache
+
+Con JWT_LOCAL_VERIFICATION activado, is_authenticated ya no confía en los
+claims sin verificar: comprueba en el proceso la firma del access token con
+las claves públicas que publica la API de auth (/.well-known/jwks.json), más
+`exp`, `aud` (si JWT_AUDIENCE está configurado) y que el `tenant_id` del
+token, si lo trae, sea el del request (con JWT_REQUIRE_TENANT_CLAIM un token
+sin `tenant_id` también se rechaza). No hace falta ningún request a la API
+por request.
+
+Las claves se guardan por `kid` y se vuelven a pedir al vencer el TTL o al
+aparecer un `kid` desconocido (rotación de claves), con un intervalo mínimo
+entre descargas para que tokens con `kid` inventados no saturen la API. Si
+la descarga falla se siguen usando las claves anteriores. Un `kid` que no
+está se toma como falso solo si falta en una descarga exitosa hecha durante
+la verificación; si no se pudo descargar (API caída o intervalo mínimo) la
+verificación queda pendiente (JwksUnavailableError) y la sesión se conserva.
+
+Los claims verificados se memorizan por hash del token hasta su `exp`, así
+que la firma RSA se comprueba una vez por token y no en cada request.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Mapping, Optional
+
+from jose import jwt, JWTError
+from jose.exceptions import JWTClaimsError
+
+from config.settings import settings
+from services.http_clients import auth_http_client
+from utils.claims_cache import ClaimsCache
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class JwksUnavailableError(Exception):
+    """No hay claves JWKS para verificar el token (API de auth caída o descarga demorada)"""
+
+
+class JwksCache:
+    """
+    Claves públicas de firma indexadas por kid, con refresco por TTL y por rotación
+    """
+
+    def __init__(self, url: str, ttl: float = 3600.0, min_refresh_interval: float = 30.0):
+        """
+        Inicializa la cache (las claves se descargan en el primer uso o en prefetch)
+
+        Args:
+            url: URL del documento JWKS
+            ttl: Segundos que se consideran vigentes las claves descargadas
+            min_refresh_interval: Espera mínima entre descargas (kid desconocido o API caída)
+        """
+        self.url = url
+        self.ttl = ttl
+        self.min_refresh_interval = min_refresh_interval
+        self._keys: Dict[str, Dict[str, Any]] = {}
+        self._fetched_at: Optional[float] = None
+        self._last_attempt: Optional[float] = None
+        self._lock = asyncio.Lock()
+        self.fetches = 0
+        self.fetch_errors = 0
+
+    @property
+    def loaded(self) -> bool:
+        """True si alguna descarga tuvo éxito"""
+        return self._fetched_at is not None
+
+    def _is_stale(self) -> bool:
+        return self._fetched_at is None or time.monotonic() - self._fetched_at >= self.ttl
+
+    def _may_refetch(self) -> bool:
+        return self._last_attempt is None or time.monotonic() - self._last_attempt >= self.min_refresh_interval
+
+    async def get_key(self, kid: Optional[str]) -> Optional[Dict[str, Any]]:
+        """
+        Clave pública (JWK) para un kid
+
+        Args:
+            kid: kid del header del token (None si el token no trae)
+
+        Returns:
+            Optional[Dict[str, Any]]: JWK o None si una descarga recién hecha no trae el kid
+
+        Raises:
+            JwksUnavailableError: El kid no está y no se pudo descargar el JWKS para confirmarlo
+        """
+        kid = kid or ""
+        key = self._keys.get(kid)
+        if key is not None and not self._is_stale():
+            return key
+        # Vencido el TTL, o kid nuevo (la API rotó las claves): se vuelve a descargar
+        started = time.monotonic()
+        await self.refresh(kid)
+        key = self._keys.get(kid)
+        if key is None and (self._fetched_at is None or self._fetched_at < started):
+            # Sin descarga exitosa nueva no se sabe si el kid es falso o de una rotación reciente
+            raise JwksUnavailableError(f"No se pudo confirmar el kid {kid!r} en {self.url}")
+        return key
+
+    async def refresh(self, wanted_kid: Optional[str] = None) -> bool:
+        """
+        Descarga el JWKS (una sola descarga aunque la pidan varios requests)
+
+        Args:
+            wanted_kid: kid que motivó la descarga; si otro request ya lo trajo no se descarga
+
+        Returns:
+            bool: True si las claves quedaron vigentes
+        """
+        async with self._lock:
+            if wanted_kid is not None and wanted_kid in self._keys and not self._is_stale():
+                return True
+            if not self._may_refetch():
+                # Descarga reciente (exitosa o no): no se insiste hasta min_refresh_interval
+                return not self._is_stale()
+
+            self._last_attempt = time.monotonic()
+            self.fetches += 1
+            try:
+                response = await auth_http_client.client.get(self.url, headers={"Accept": "application/json"})
+                response.raise_for_status()
+                keys = {
+                    jwk.get("kid", ""): jwk
+                    for jwk in response.json().get("keys", [])
+                    if jwk.get("use", "sig") == "sig"
+                }
+            except Exception as e:
+                self.fetch_errors += 1
+                metrics.increment("jwks_fetch_total", result="error")
+                logger.warning(f"⚠️ No se pudo descargar el JWKS de {self.url}: {e} "
+                               f"(se siguen usando {len(self._keys)} claves)")
+                return False
+
+            rotated = set(keys) != set(self._keys)
+            self._keys = keys
+            self._fetched_at = time.monotonic()
+            metrics.increment("jwks_fetch_total", result="ok")
+            if rotated:
+                logger.info(f"🔑 JWKS actualizado: {len(keys)} claves ({', '.join(sorted(keys)) or 'sin kid'})")
+            return True
+
+    def stats(self) -> Dict[str, Any]:
+        """Estado para /metrics"""
+        return {
+            "keys": len(self._keys),
+            "age_seconds": round(time.monotonic() - self._fetched_at, 1) if self._fetched_at is not None else None,
+            "fetches": self.fetches,
+            "fetch_errors": self.fetch_errors,
+        }
+
+
+class JwtVerifier:
+    """
+    Verifica firma y claims de los access tokens en el proceso
+    """
+
+    def __init__(self, jwks: JwksCache, algorithms: List[str], audience: Optional[str] = None,
+                 cache_size: int = 10000, require_tenant: bool = False):
+        """
+        Inicializa el verificador
+
+        Args:
+            jwks: Cache de claves públicas
+            algorithms: Algoritmos de firma aceptados (nunca "none" ni HS con clave pública)
+            audience: Valor esperado del claim aud (None = no se verifica)
+            cache_size: Máximo de tokens verificados que se memorizan
+            require_tenant: Rechazar tokens sin claim tenant_id (por defecto solo un tenant distinto)
+        """
+        self.jwks = jwks
+        self.algorithms = algorithms
+        self.audience = audience or None
+        self.verified = ClaimsCache(max_entries=cache_size)
+        self.require_tenant = require_tenant
+
+    async def verify(self, token: str, tenant_id: str) -> Mapping[str, Any]:
+        """
+        Claims verificados del token
+
+        Args:
+            token: Access token de la sesión
+            tenant_id: Tenant del request
+
+        Returns:
+            Mapping[str, Any]: Claims de solo lectura
+
+        Raises:
+            ExpiredSignatureError: Firma válida pero token vencido (se puede refrescar)
+            JWTError: Firma, algoritmo, aud, tenant o kid (ausente en un JWKS recién descargado) inválidos
+            JwksUnavailableError: No hay claves para verificar o no se pudo confirmar el kid
+        """
+        claims = self.verified.get(token)
+        if claims is None:
+            try:
+                claims = self.verified.put(token, await self._decode(token))
+            except JWTError as e:
+                metrics.increment("jwt_verification_total", result=type(e).__name__)
+                raise
+            metrics.increment("jwt_verification_total", result="verified")
+
+        token_tenant = claims.get("tenant_id")
+        if (token_tenant and token_tenant != tenant_id) or (self.require_tenant and not token_tenant):
+            metrics.increment("jwt_verification_total", result="tenant_mismatch")
+            raise JWTClaimsError(f"Token del tenant {token_tenant!r}, se esperaba {tenant_id!r}")
+        return claims
+
+    async def _decode(self, token: str) -> Dict[str, Any]:
+        """Verifica la firma con la clave del kid y valida los claims estándar"""
+        header = jwt.get_unverified_header(token)
+        if header.get("alg") not in self.algorithms:
+            raise JWTError(f"Algoritmo no permitido: {header.get('alg')}")
+
+        key = await self.jwks.get_key(header.get("kid"))
+        if key is None:
+            raise JWTError(f"kid desconocido: {header.get('kid')}")
+
+        return jwt.decode(
+            token,
+            key,
+            algorithms=self.algorithms,
+            audience=self.audience,
+            options={"verify_aud": self.audience is not None, "require_exp": True},
+        )
+
+    async def prefetch(self):
+        """Descarga las claves al iniciar para que el primer request no espere"""
+        await self.jwks.refresh()
+
+    def stats(self) -> Dict[str, Any]:
+        """Estado para /metrics"""
+        return {**self.jwks.stats(), "verified_cache": self.verified.stats()}
+
+
+# Instancia global del verificador
+jwt_verifier = JwtVerifier(
+    JwksCache(
+        settings.JWT_JWKS_URL or f"{settings.AUTH_API_URL}/.well-known/jwks.json",
+        ttl=settings.JWKS_CACHE_TTL,
+        min_refresh_interval=settings.JWKS_MIN_REFRESH_INTERVAL,
+    ),
+    algorithms=[alg.strip() for alg in settings.JWT_ALGORITHMS.split(",") if alg.strip()],
+    audience=settings.JWT_AUDIENCE,
+    cache_size=settings.JWT_CLAIMS_CACHE_SIZE,
+    require_tenant=settings.JWT_REQUIRE_TENANT_CLAIM,
+)
+metrics.register_collector("jwt_verifier", jwt_verifier.stats)
@@ -0,0 +1,286 @@
+"""
+Limitador local de intentos de login
+
+TenantBranding.max_login_attempts solo se usaba para armar el mensaje de
+error después de que la API de auth devolvía 429, así que las ráfagas de
+credential stuffing llegaban completas a la API. LoginThrottle cuenta los
+intentos fallidos en una ventana deslizante por (tenant, usuario) y por
+(tenant, IP); al llegar al máximo del tenant la clave queda bloqueada y el
+login se rechaza sin llamar a la API. Cada bloqueo sucesivo de la misma
+clave dura el doble (backoff exponencial) hasta LOGIN_LOCKOUT_MAX_SECONDS.
+La IP tolera max_login_attempts * LOGIN_THROTTLE_IP_FACTOR fallos, para no
+bloquear a todos los usuarios detrás de un mismo NAT por un solo error.
+
+Con REDIS_URL configurado el estado se comparte entre workers (sorted set
+por clave para la ventana, key con TTL para el bloqueo). Si Redis no
+responde se usa el estado en memoria del proceso.
+"""
+import hashlib
+import logging
+import time
+import uuid
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from config.settings import settings
+from utils.metrics import metrics
+
+try:
+    import redis.asyncio as redis_asyncio
+except ImportError:  # pragma: no cover - depende del entorno
+    redis_asyncio = None
+
+logger = logging.getLogger(__name__)
+
+REDIS_KEY_PREFIX = "sgc:login-throttle:"
+
+# Tiempo que se recuerda la cantidad de bloqueos de una clave (para el backoff)
+LOCKOUT_MEMORY_SECONDS = 24 * 3600
+
+
+def throttle_keys(tenant_id: str, username: str, client_ip: str) -> Tuple[str, str]:
+    """Claves (usuario, IP) del limitador; el usuario va hasheado"""
+    user = hashlib.sha256(username.strip().lower().encode("utf-8")).hexdigest()[:32]
+    return f"user:{tenant_id}:{user}", f"ip:{tenant_id}:{client_ip}"
+
+
+def lockout_duration(lockouts: int, base: float, maximum: float) -> float:
+    """Duración del bloqueo número `lockouts` (1, 2, 4, 8... veces la base)"""
+    return min(base * (2 ** max(lockouts - 1, 0)), maximum)
+
+
+class _MemoryBackend:
+    """Estado del limitador en memoria del proceso"""
+
+    def __init__(self):
+        self._failures: Dict[str, Deque[float]] = {}
+        self._locked_until: Dict[str, float] = {}
+        self._lockouts: Dict[str, Tuple[int, float]] = {}  # clave -> (bloqueos, recordar hasta)
+
+    async def locked_for(self, key: str) -> float:
+        remaining = self._locked_until.get(key, 0.0) - time.time()
+        if remaining <= 0:
+            self._locked_until.pop(key, None)
+            return 0.0
+        return remaining
+
+    async def add_failure(self, key: str, window: float) -> int:
+        now = time.time()
+        failures = self._failures.setdefault(key, deque())
+        failures.append(now)
+        while failures and failures[0] <= now - window:
+            failures.popleft()
+        self._prune(now, window)
+        return len(failures)
+
+    async def lock(self, key: str, base: float, maximum: float) -> float:
+        now = time.time()
+        count, remember_until = self._lockouts.get(key, (0, 0.0))
+        count = count + 1 if remember_until > now else 1
+        self._lockouts[key] = (count, now + LOCKOUT_MEMORY_SECONDS)
+        duration = lockout_duration(count, base, maximum)
+        self._locked_until[key] = now + duration
+        self._failures.pop(key, None)
+        return duration
+
+    async def reset(self, key: str):
+        self._failures.pop(key, None)
+        self._lockouts.pop(key, None)
+        self._locked_until.pop(key, None)
+
+    def _prune(self, now: float, window: float):
+        """Descarta claves sin actividad reciente y bloqueos vencidos para acotar la memoria"""
+        if max(len(self._failures), len(self._lockouts), len(self._locked_until)) < 10000:
+            return
+        for key in [k for k, failures in self._failures.items() if not failures or failures[-1] <= now - window]:
+            del self._failures[key]
+        for key in [k for k, (_, until) in self._lockouts.items() if until <= now]:
+            del self._lockouts[key]
+        for key in [k for k, until in self._locked_until.items() if until <= now]:
+            del self._locked_until[key]
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.time()
+        return {
+            "tracked_keys": len(self._failures),
+            "locked_keys": sum(1 for until in self._locked_until.values() if until > now),
+        }
+
+
+class _RedisBackend:
+    """Estado del limitador compartido en Redis"""
+
+    def __init__(self, client):
+        self.client = client
+
+    async def locked_for(self, key: str) -> float:
+        ttl_ms = await self.client.pttl(f"{REDIS_KEY_PREFIX}lock:{key}")
+        return ttl_ms / 1000 if ttl_ms and ttl_ms > 0 else 0.0
+
+    async def add_failure(self, key: str, window: float) -> int:
+        now = time.time()
+        failures_key = f"{REDIS_KEY_PREFIX}failures:{key}"
+        pipe = self.client.pipeline(transaction=True)
+        pipe.zremrangebyscore(failures_key, 0, now - window)
+        pipe.zadd(failures_key, {f"{now}:{uuid.uuid4().hex[:8]}": now})
+        pipe.zcard(failures_key)
+        pipe.pexpire(failures_key, int(window * 1000))
+        results = await pipe.execute()
+        return int(results[2])
+
+    async def lock(self, key: str, base: float, maximum: float) -> float:
+        lockouts_key = f"{REDIS_KEY_PREFIX}lockouts:{key}"
+        pipe = self.client.pipeline(transaction=True)
+        pipe.incr(lockouts_key)
+        pipe.expire(lockouts_key, LOCKOUT_MEMORY_SECONDS)
+        count = int((await pipe.execute())[0])
+        duration = lockout_duration(count, base, maximum)
+        pipe = self.client.pipeline(transaction=True)
+        pipe.set(f"{REDIS_KEY_PREFIX}lock:{key}", count, px=int(duration * 1000))
+        pipe.delete(f"{REDIS_KEY_PREFIX}failures:{key}")
+        await pipe.execute()
+        return duration
+
+    async def reset(self, key: str):
+        await self.client.delete(
+            f"{REDIS_KEY_PREFIX}failures:{key}",
+            f"{REDIS_KEY_PREFIX}lockouts:{key}",
+            f"{REDIS_KEY_PREFIX}lock:{key}",
+        )
+
+
+class LoginThrottle:
+    """
+    Ventana deslizante de intentos fallidos con bloqueo y backoff por tenant
+    """
+
+    def __init__(self, window_seconds: float = 900.0, lockout_seconds: float = 60.0,
+                 max_lockout_seconds: float = 3600.0, ip_factor: int = 5,
+                 redis_url: Optional[str] = None, enabled: bool = True):
+        """
+        Inicializa el limitador
+
+        Args:
+            window_seconds: Ventana en la que se cuentan los intentos fallidos
+            lockout_seconds: Duración del primer bloqueo
+            max_lockout_seconds: Duración máxima de un bloqueo
+            ip_factor: La IP se bloquea con max_login_attempts * ip_factor fallos
+            redis_url: URL de Redis para compartir el estado entre workers (None = solo en proceso)
+            enabled: False para no limitar (desarrollo, pruebas de carga)
+        """
+        self.window_seconds = window_seconds
+        self.lockout_seconds = lockout_seconds
+        self.max_lockout_seconds = max_lockout_seconds
+        self.ip_factor = ip_factor
+        self.redis_url = redis_url
+        self.enabled = enabled
+        self._memory = _MemoryBackend()
+        self._redis_backend: Optional[_RedisBackend] = None
+        if redis_url and redis_asyncio is None:
+            logger.warning("⚠️ REDIS_URL configurado pero el paquete redis no está instalado: "
+                           "el límite de intentos de login es por proceso")
+
+    @property
+    def backend(self):
+        """Backend de Redis si está configurado, si no el de memoria"""
+        if self._redis_backend is None and self.redis_url and redis_asyncio is not None:
+            self._redis_backend = _RedisBackend(redis_asyncio.from_url(self.redis_url, socket_timeout=1.0))
+        return self._redis_backend or self._memory
+
+    async def aclose(self):
+        """Cierra la conexión con Redis"""
+        if self._redis_backend is not None:
+            await self._redis_backend.client.aclose()
+            self._redis_backend = None
+
+    async def _call(self, operation: str, *args):
+        """Ejecuta la operación en el backend, con memoria como respaldo si Redis falla"""
+        backend = self.backend
+        try:
+            return await getattr(backend, operation)(*args)
+        except Exception as e:
+            if backend is self._memory:
+                raise
+            logger.warning(f"⚠️ Redis no disponible para el límite de login, se usa memoria: {e}")
+            return await getattr(self._memory, operation)(*args)
+
+    async def check(self, tenant_id: str, username: str, client_ip: str) -> float:
+        """
+        Verifica si el intento está bloqueado (antes de llamar a la API)
+
+        Args:
+            tenant_id: ID del tenant
+            username: Usuario del formulario
+            client_ip: IP del cliente
+
+        Returns:
+            float: Segundos que faltan para poder reintentar (0 = permitido)
+        """
+        if not self.enabled:
+            return 0.0
+        retry_after = 0.0
+        for scope, key in zip(("user", "ip"), throttle_keys(tenant_id, username, client_ip)):
+            remaining = await self._call("locked_for", key)
+            if remaining > 0:
+                retry_after = max(retry_after, remaining)
+                metrics.increment("login_throttle_rejections_total", tenant=tenant_id, scope=scope)
+        return retry_after
+
+    async def record_failure(self, tenant_id: str, username: str, client_ip: str, max_attempts: int) -> float:
+        """
+        Registra un intento rechazado por la API y bloquea si se llegó al máximo
+
+        Args:
+            tenant_id: ID del tenant
+            username: Usuario del formulario
+            client_ip: IP del cliente
+            max_attempts: max_login_attempts del tenant
+
+        Returns:
+            float: Duración del bloqueo aplicado (0 = sin bloqueo)
+        """
+        if not self.enabled:
+            return 0.0
+        user_key, ip_key = throttle_keys(tenant_id, username, client_ip)
+        applied = 0.0
+        for scope, key, limit in (("user", user_key, max_attempts), ("ip", ip_key, max_attempts * self.ip_factor)):
+            failures = await self._call("add_failure", key, self.window_seconds)
+            if failures >= max(limit, 1):
+                duration = await self._call("lock", key, self.lockout_seconds, self.max_lockout_seconds)
+                applied = max(applied, duration)
+                metrics.increment("login_lockouts_total", tenant=tenant_id, scope=scope)
+                logger.warning(f"🔒 Login bloqueado {duration:.0f}s por {scope} en tenant {tenant_id} "
+                               f"({failures} intentos fallidos)")
+        return applied
+
+    async def record_success(self, tenant_id: str, username: str, client_ip: str):
+        """
+        Limpia los fallos del usuario tras un login correcto (los de la IP se mantienen)
+
+        Args:
+            tenant_id: ID del tenant
+            username: Usuario del formulario
+            client_ip: IP del cliente
+        """
+        if self.enabled:
+            await self._call("reset", throttle_keys(tenant_id, username, client_ip)[0])
+
+    def stats(self) -> Dict[str, Any]:
+        """Estado para /metrics"""
+        return {
+            "enabled": self.enabled,
+            "shared": bool(self.redis_url) and redis_asyncio is not None,
+            **self._memory.stats(),
+        }
+
+
+# Instancia global del limitador de login
+login_throttle = LoginThrottle(
+    window_seconds=settings.LOGIN_THROTTLE_WINDOW,
+    lockout_seconds=settings.LOGIN_LOCKOUT_SECONDS,
+    max_lockout_seconds=settings.LOGIN_LOCKOUT_MAX_SECONDS,
+    ip_factor=settings.LOGIN_THROTTLE_IP_FACTOR,
+    redis_url=settings.REDIS_URL,
+    enabled=settings.LOGIN_THROTTLE_ENABLED,
+)
+metrics.register_collector("login_throttle", login_throttle.stats)
@@ -0,0 +1,302 @@
+"""
+Almacenes de sesiones del lado del servidor
+
+Con SESSION_BACKEND=cookie (por defecto) la sesión completa (tokens,
+user_data, roles, IP, user agent) viaja firmada en la cookie en cada
+request y en cada respuesta. Con los demás backends la cookie lleva solo un
+ID opaco y los datos quedan en el servidor:
+
+- memory: LRU en memoria del proceso (un solo worker, se pierde al reiniciar)
+- redis: compartido entre workers, usando REDIS_URL (TTL nativo por clave)
+- sqlite: archivo local para instalaciones de un solo nodo
+
+CustomSessionMiddleware solo guarda la sesión si cambió durante el request.
+Los cambios de una sesión existente se escriben en diferido (write-behind):
+el dato queda en `pending` del proceso y se escribe en el backend en
+segundo plano, sin demorar la respuesta; los requests siguientes del mismo
+proceso leen primero `pending`. Un ID nuevo (login, rotación) y un borrado
+se escriben antes de responder: el request siguiente puede caer en otro
+worker, que solo ve el backend.
+"""
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from config.settings import settings
+from utils.metrics import metrics
+
+try:
+    import redis.asyncio as redis_asyncio
+except ImportError:  # pragma: no cover - depende del entorno
+    redis_asyncio = None
+
+logger = logging.getLogger(__name__)
+
+REDIS_KEY_PREFIX = "sgc:session:"
+
+
+class MemoryBackend:
+    """LRU en memoria con vencimiento por sesión"""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int = 100000):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()  # id -> (json, vence)
+        self.evictions = 0
+
+    async def load(self, session_id: str) -> Optional[str]:
+        entry = self._data.get(session_id)
+        if entry is None:
+            return None
+        if entry[1] <= time.time():
+            del self._data[session_id]
+            return None
+        self._data.move_to_end(session_id)
+        return entry[0]
+
+    async def save(self, session_id: str, data: str, ttl: int):
+        self._data[session_id] = (data, time.time() + ttl)
+        self._data.move_to_end(session_id)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    async def delete(self, session_id: str):
+        self._data.pop(session_id, None)
+
+    async def aclose(self):
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {"entries": len(self._data), "max_entries": self.max_entries, "evictions": self.evictions}
+
+
+class RedisBackend:
+    """Sesiones en Redis con TTL nativo"""
+
+    name = "redis"
+
+    def __init__(self, url: str):
+        self.client = redis_asyncio.from_url(url, socket_timeout=1.0)
+
+    async def load(self, session_id: str) -> Optional[str]:
+        data = await self.client.get(f"{REDIS_KEY_PREFIX}{session_id}")
+        return data.decode("utf-8") if data is not None else None
+
+    async def save(self, session_id: str, data: str, ttl: int):
+        await self.client.set(f"{REDIS_KEY_PREFIX}{session_id}", data, ex=ttl)
+
+    async def delete(self, session_id: str):
+        await self.client.delete(f"{REDIS_KEY_PREFIX}{session_id}")
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+
+class SqliteBackend:
+    """Sesiones en un archivo SQLite (las consultas corren en un hilo)"""
+
+    name = "sqlite"
+
+    # Cada cuántas escrituras se borran las sesiones vencidas
+    PURGE_EVERY = 1000
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, data TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._writes = 0
+
+    def _execute(self, sql: str, params: tuple = ()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchone()
+
+    async def load(self, session_id: str) -> Optional[str]:
+        row = await asyncio.to_thread(
+            self._execute, "SELECT data FROM sessions WHERE id = ? AND expires_at > ?", (session_id, time.time())
+        )
+        return row[0] if row else None
+
+    async def save(self, session_id: str, data: str, ttl: int):
+        await asyncio.to_thread(
+            self._execute, "INSERT OR REPLACE INTO sessions (id, data, expires_at) VALUES (?, ?, ?)",
+            (session_id, data, time.time() + ttl),
+        )
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY == 0:
+            await asyncio.to_thread(self._execute, "DELETE FROM sessions WHERE expires_at <= ?", (time.time(),))
+
+    async def delete(self, session_id: str):
+        await asyncio.to_thread(self._execute, "DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    async def aclose(self):
+        with self._lock:
+            self._conn.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"path": self.path}
+
+
+class SessionStore:
+    """
+    Sesiones del lado del servidor con escritura diferida
+    """
+
+    def __init__(self, backend, ttl: int = 86400):
+        """
+        Inicializa el almacén
+
+        Args:
+            backend: MemoryBackend, RedisBackend o SqliteBackend
+            ttl: Vida de una sesión sin cambios en segundos (igual al Max-Age de la cookie)
+        """
+        self.backend = backend
+        self.ttl = ttl
+        self._pending: Dict[str, Optional[str]] = {}  # id -> json (None = borrar)
+        self._writes: Dict[str, asyncio.Task] = {}  # id -> escritura en curso
+        self.loads = 0
+        self.misses = 0
+        self.writes = 0
+        self.deletes = 0
+        self.errors = 0
+
+    async def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Datos de la sesión (None si no existe, venció o el backend falló)
+
+        Args:
+            session_id: ID opaco de la cookie
+        """
+        self.loads += 1
+        if session_id in self._pending:
+            data = self._pending[session_id]
+        else:
+            try:
+                data = await self.backend.load(session_id)
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"⚠️ No se pudo leer la sesión ({self.backend.name}): {e}")
+                data = None
+        if data is None:
+            self.misses += 1
+            return None
+        return json.loads(data)
+
+    async def save(self, session_id: str, data: str, wait: bool = False):
+        """
+        Guarda la sesión (JSON ya serializado)
+
+        Args:
+            session_id: ID opaco de la cookie
+            data: Sesión serializada
+            wait: True para esperar la escritura en el backend (ID recién emitido);
+                  False para escribir en segundo plano (sesión existente)
+        """
+        self.writes += 1
+        task = self._schedule(session_id, data)
+        if wait:
+            await asyncio.shield(task)
+
+    async def delete(self, session_id: str):
+        """Borra la sesión del backend (espera la escritura)"""
+        self.deletes += 1
+        await asyncio.shield(self._schedule(session_id, None))
+
+    def _schedule(self, session_id: str, data: Optional[str]) -> asyncio.Task:
+        """Deja el valor en pending y devuelve la escritura que lo va a guardar"""
+        self._pending[session_id] = data
+        task = self._writes.get(session_id)
+        if task is None:
+            task = asyncio.get_running_loop().create_task(self._write(session_id))
+            self._writes[session_id] = task
+        return task
+
+    async def _write(self, session_id: str):
+        """Escribe el último valor pendiente de la sesión en el backend"""
+        await asyncio.sleep(0)  # Deja salir la respuesta antes de escribir
+        try:
+            while True:
+                data = self._pending.get(session_id)
+                start = time.perf_counter()
+                try:
+                    if data is None:
+                        await self.backend.delete(session_id)
+                    else:
+                        await self.backend.save(session_id, data, self.ttl)
+                except Exception as e:
+                    self.errors += 1
+                    logger.warning(f"⚠️ No se pudo guardar la sesión ({self.backend.name}): {e}")
+                metrics.observe("session_store_write_seconds", time.perf_counter() - start,
+                                backend=self.backend.name)
+                # Si cambió mientras se escribía, se vuelve a escribir
+                if self._pending.get(session_id, data) is data:
+                    self._pending.pop(session_id, None)
+                    return
+        finally:
+            self._writes.pop(session_id, None)
+
+    async def flush(self):
+        """Espera a que terminen las escrituras pendientes"""
+        while self._writes:
+            await asyncio.gather(*list(self._writes.values()), return_exceptions=True)
+
+    async def aclose(self):
+        """Escribe lo pendiente y cierra el backend"""
+        await self.flush()
+        await self.backend.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        """Estado para /metrics"""
+        return {
+            "backend": self.backend.name,
+            "pending_writes": len(self._pending),
+            "loads": self.loads,
+            "misses": self.misses,
+            "writes": self.writes,
+            "deletes": self.deletes,
+            "errors": self.errors,
+            **self.backend.stats(),
+        }
+
+
+def build_session_store() -> Optional[SessionStore]:
+    """Almacén según SESSION_BACKEND (None = sesión completa en la cookie firmada)"""
+    backend_name = settings.SESSION_BACKEND
+    if backend_name == "cookie":
+        return None
+    if backend_name == "memory":
+        backend = MemoryBackend(settings.SESSION_MEMORY_MAX_ENTRIES)
+    elif backend_name == "redis":
+        if not settings.REDIS_URL or redis_asyncio is None:
+            raise RuntimeError("SESSION_BACKEND=redis requiere REDIS_URL y el paquete redis instalado")
+        backend = RedisBackend(settings.REDIS_URL)
+    elif backend_name == "sqlite":
+        backend = SqliteBackend(settings.SESSION_SQLITE_PATH)
+    else:
+        raise ValueError(f"SESSION_BACKEND inválido: {backend_name}")
+    logger.info(f"🗄️ Sesiones del lado del servidor en {backend.name}")
+    return SessionStore(backend, ttl=settings.SESSION_MAX_AGE)
+
+
+# Instancia global del almacén de sesiones (None en modo cookie)
+session_store = build_session_store()
+if session_store is not None:
+    metrics.register_collector("session_store", session_store.stats)
@@ -1,121 +1,70 @@
 """
 Servicio para manejo de configuración de tenants en templates y vistas
 """
-from fastapi import Request
-from typing import Dict, Any, Optional, List
+from fastapi import Request, Response
+from jinja2 import pass_context
+from typing import Dict, Any, Optional, List, Mapping
 import logging
 
-from config.tenant_config import TenantBranding, tenant_config
+from config.tenant_config import TenantBranding, check_tenant_branding, tenant_config
+from config.tenant_bundle import TenantBundle
 from middleware.tenant_middleware import TenantContextManager
 
 logger = logging.getLogger(__name__)
 
+# Cache-Control de los recursos del tenant
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "public, max-age=0, must-revalidate"
+
+# kind -> (media type, URL sin versión, URL versionada)
+TENANT_ASSETS = {
+    'css': ("text/css", "/tenant.css", "/tenant.{version}.css"),
+    'js': ("application/javascript; charset=utf-8", "/tenant/config.js", "/tenant/config.{version}.js"),
+}
+
 class TenantService:
     """Servicio principal para obtener configuración de tenant en las vistas"""
     
     @staticmethod
-    def get_tenant_context(request: Request) -> Dict[str, Any]:
+    def get_tenant_bundle(request: Request) -> TenantBundle:
         """
-        Obtiene el contexto completo del tenant para usar en templates
+        Obtiene el bundle de render precalculado del tenant actual
         
         Args:
             request: Request de FastAPI
             
         Returns:
-            Dict[str, Any]: Contexto del tenant para templates
+            TenantBundle: Bundle del tenant (o el del tenant por defecto)
         """
-        # Obtener configuración del tenant desde el middleware
-        tenant_config_obj: TenantBranding = getattr(request.state, 'tenant_config', None)
-        tenant_id: str = getattr(request.state, 'tenant_id', 'default')
+        bundle: Optional[TenantBundle] = getattr(request.state, 'tenant_bundle', None)
         
-        if not tenant_config_obj:
+        if bundle is None:
             # Fallback si no hay middleware configurado
-            logger.warning("No se encontró configuración de tenant en request.state, usando fallback")
-            tenant_config_obj = tenant_config.get_tenant_config('default')
+            logger.warning("No se encontró bundle de tenant en request.state, usando fallback")
+            bundle = tenant_config.get_tenant_bundle('default')
         
-        # Crear contexto completo
-        context = {
-            'tenant': {
-                'id': tenant_id,
-                'company_name': tenant_config_obj.company_name,
-                'company_slogan': tenant_config_obj.company_slogan,
-                'portal_name': tenant_config_obj.portal_name,
-                'portal_subtitle': tenant_config_obj.portal_subtitle,
-                'logo_url': tenant_config_obj.logo_url,
-                'hero_image_url': tenant_config_obj.hero_image_url,
-                'favicon_url': tenant_config_obj.favicon_url,
-                'background_image_url': tenant_config_obj.background_image_url,
-                
-                # Colores y estilos
-                'colors': {
-                    'primary': tenant_config_obj.primary_color,
-                    'secondary': tenant_config_obj.secondary_color,
-                    'accent': tenant_config_obj.accent_color,
-                    'success': tenant_config_obj.success_color,
-                    'danger': tenant_config_obj.danger_color,
-                    'warning': tenant_config_obj.warning_color,
-                    'info': tenant_config_obj.info_color,
-                },
-                
-                'gradients': {
-                    'primary': tenant_config_obj.primary_gradient,
-                    'background': tenant_config_obj.background_gradient,
-                },
-                
-                # Contacto y soporte
-                'contact': {
-                    'support_email': tenant_config_obj.support_email,
-                    'support_phone': tenant_config_obj.support_phone,
-                    'website_url': tenant_config_obj.website_url,
-                },
-                
-                # URLs importantes
-                'urls': {
-                    'terms': tenant_config_obj.terms_url,
-                    'privacy': tenant_config_obj.privacy_url,
-                    'help': tenant_config_obj.help_url,
-                    'videos': tenant_config_obj.video_tutorials_url,
-                },
-                
-                # Configuración de features
-                'features': {
-                    'registration': tenant_config_obj.enable_registration,
-                    'password_reset': tenant_config_obj.enable_password_reset,
-                    'remember_me': tenant_config_obj.enable_remember_me,
-                    'two_factor': tenant_config_obj.enable_2fa,
-                },
-                
-                # Configuración de login
-                'login': {
-                    'title': tenant_config_obj.login_title,
-                    'subtitle': tenant_config_obj.login_subtitle,
-                    'username_placeholder': tenant_config_obj.username_placeholder,
-                    'password_placeholder': tenant_config_obj.password_placeholder,
-                },
-                
-                # Información de la empresa
-                'company_info': {
-                    'description': tenant_config_obj.company_description,
-                    'address': tenant_config_obj.company_address,
-                    'nit': tenant_config_obj.company_nit,
-                },
-                
-                # Configuración técnica
-                'technical': {
-                    'api_base_url': tenant_config_obj.api_base_url,
-                    'api_timeout': tenant_config_obj.api_timeout,
-                    'session_timeout': tenant_config_obj.session_timeout,
-                    'max_login_attempts': tenant_config_obj.max_login_attempts,
-                }
-            }
-        }
+        return bundle
+    
+    @staticmethod
+    def get_tenant_context(request: Request) -> Mapping[str, Any]:
+        """
+        Obtiene el contexto completo del tenant para usar en templates
         
-        return context
+        El contexto se precalcula al cargar las configuraciones y es de solo
+        lectura; usar thaw() si se necesita una copia modificable.
+        
+        Args:
+            request: Request de FastAPI
+            
+        Returns:
+            Mapping[str, Any]: Contexto del tenant para templates
+        """
+        return TenantService.get_tenant_bundle(request).context
     
     @staticmethod
     def get_tenant_css_variables(request: Request) -> str:
         """
-        Genera CSS variables dinámicas basadas en la configuración del tenant
+        Obtiene las CSS variables precalculadas del tenant
         
         Args:
             request: Request de FastAPI
@@ -123,146 +72,31 @@ class TenantService:
         Returns:
             str: CSS con variables personalizadas
         """
-        tenant_config_obj: TenantBranding = getattr(request.state, 'tenant_config', None)
-        
-        if not tenant_config_obj:
+        if not getattr(request.state, 'tenant_config', None):
             return ""
         
-        css_vars = f"""
-        :root {{
-            --tenant-primary-color: {tenant_config_obj.primary_color};
-            --tenant-secondary-color: {tenant_config_obj.secondary_color};
-            --tenant-accent-color: {tenant_config_obj.accent_color};
-            --tenant-success-color: {tenant_config_obj.success_color};
-            --tenant-danger-color: {tenant_config_obj.danger_color};
-            --tenant-warning-color: {tenant_config_obj.warning_color};
-            --tenant-info-color: {tenant_config_obj.info_color};
-            --tenant-primary-gradient: {tenant_config_obj.primary_gradient};
-            --tenant-background-gradient: {tenant_config_obj.background_gradient};
-        }}
-        
-        /* Aplicar variables del tenant */
-        body.login-page {{
-            background: var(--tenant-background-gradient) !important;
-        }}
-        
-        .logo {{
-            background: var(--tenant-primary-gradient) !important;
-            -webkit-background-clip: text !important;
-            -webkit-text-fill-color: transparent !important;
-            background-clip: text !important;
-        }}
-        
-        .portal-subtitle {{
-            color: var(--tenant-secondary-color) !important;
-        }}
-        
-        .video-link {{
-            background: linear-gradient(135deg, var(--tenant-secondary-color), var(--tenant-accent-color)) !important;
-        }}
-        
-        .video-link:hover {{
-            box-shadow: 0 5px 15px var(--tenant-secondary-color)33 !important;
-        }}
-        
-        .login-btn {{
-            background: var(--tenant-primary-gradient) !important;
-        }}
-        
-        .login-btn:hover {{
-            box-shadow: 0 5px 15px var(--tenant-primary-color)33 !important;
-        }}
-        
-        .form-control:focus {{
-            border-color: var(--tenant-secondary-color) !important;
-            box-shadow: 0 0 0 3px var(--tenant-secondary-color)1a !important;
-        }}
-        
-        .form-control.is-valid {{
-            border-color: var(--tenant-success-color) !important;
-            box-shadow: 0 0 0 3px var(--tenant-success-color)1a !important;
-        }}
-        
-        .form-control.is-invalid {{
-            border-color: var(--tenant-danger-color) !important;
-            box-shadow: 0 0 0 3px var(--tenant-danger-color)1a !important;
-        }}
-        
-        .alert-success {{
-            border-left-color: var(--tenant-success-color) !important;
-        }}
-        
-        .alert-danger {{
-            border-left-color: var(--tenant-danger-color) !important;
-        }}
-        
-        .forgot-password a {{
-            color: var(--tenant-secondary-color) !important;
-        }}
-        
-        .register-link a {{
-            color: var(--tenant-secondary-color) !important;
-        }}
-        
-        /* Navegación */
-        .navbar-brand {{
-            color: var(--tenant-primary-color) !important;
-        }}
-        
-        .nav-link:hover {{
-            color: var(--tenant-secondary-color) !important;
-        }}
-        
-        /* Botones secundarios */
-        .btn-outline-primary {{
-            border-color: var(--tenant-primary-color) !important;
-            color: var(--tenant-primary-color) !important;
-        }}
-        
-        .btn-outline-primary:hover {{
-            background-color: var(--tenant-primary-color) !important;
-            border-color: var(--tenant-primary-color) !important;
-        }}
-        """
-        
-        return css_vars
+        return TenantService.get_tenant_bundle(request).css
     
     @staticmethod
-    def get_tenant_meta_tags(request: Request) -> Dict[str, str]:
+    def get_tenant_meta_tags(request: Request) -> Mapping[str, str]:
         """
-        Genera meta tags específicos del tenant
+        Obtiene los meta tags precalculados del tenant
         
         Args:
             request: Request de FastAPI
             
         Returns:
-            Dict[str, str]: Meta tags para el HTML head
+            Mapping[str, str]: Meta tags para el HTML head
         """
-        tenant_config_obj: TenantBranding = getattr(request.state, 'tenant_config', None)
-        
-        if not tenant_config_obj:
+        if not getattr(request.state, 'tenant_config', None):
             return {}
         
-        return {
-            'title': f"{tenant_config_obj.portal_name} {tenant_config_obj.portal_subtitle} - {tenant_config_obj.company_name}",
-            'description': tenant_config_obj.company_description,
-            'keywords': f"{tenant_config_obj.company_name}, {tenant_config_obj.portal_name}, IPS, salud, portal médico",
-            'author': tenant_config_obj.company_name,
-            'theme-color': tenant_config_obj.primary_color,
-            'favicon': tenant_config_obj.favicon_url,
-            'og:title': f"{tenant_config_obj.company_name} - {tenant_config_obj.portal_name}",
-            'og:description': tenant_config_obj.company_description,
-            'og:type': 'website',
-            'og:image': tenant_config_obj.logo_url,
-            'twitter:card': 'summary',
-            'twitter:title': f"{tenant_config_obj.company_name} - {tenant_config_obj.portal_name}",
-            'twitter:description': tenant_config_obj.company_description,
-        }
+        return TenantService.get_tenant_bundle(request).meta_tags
     
     @staticmethod
     def get_tenant_javascript_config(request: Request) -> str:
         """
-        Genera configuración JavaScript específica del tenant
+        Obtiene la configuración JavaScript precalculada del tenant
         
         Args:
             request: Request de FastAPI
@@ -270,61 +104,79 @@ class TenantService:
         Returns:
             str: JavaScript con configuración del tenant
         """
-        tenant_context = TenantService.get_tenant_context(request)
-        tenant_id = getattr(request.state, 'tenant_id', 'default')
-        
-        js_config = f"""
-        // Configuración del tenant
-        window.TENANT_CONFIG = {{
-            id: '{tenant_id}',
-            name: '{tenant_context['tenant']['company_name']}',
-            colors: {{
-                primary: '{tenant_context['tenant']['colors']['primary']}',
-                secondary: '{tenant_context['tenant']['colors']['secondary']}',
-                accent: '{tenant_context['tenant']['colors']['accent']}',
-                success: '{tenant_context['tenant']['colors']['success']}',
-                danger: '{tenant_context['tenant']['colors']['danger']}',
-                warning: '{tenant_context['tenant']['colors']['warning']}',
-                info: '{tenant_context['tenant']['colors']['info']}'
-            }},
-            features: {{
-                registration: {str(tenant_context['tenant']['features']['registration']).lower()},
-                passwordReset: {str(tenant_context['tenant']['features']['password_reset']).lower()},
-                rememberMe: {str(tenant_context['tenant']['features']['remember_me']).lower()},
-                twoFactor: {str(tenant_context['tenant']['features']['two_factor']).lower()}
-            }},
-            urls: {{
-                support: '{tenant_context['tenant']['contact']['support_email']}',
-                help: '{tenant_context['tenant']['urls']['help']}',
-                videos: '{tenant_context['tenant']['urls']['videos']}'
-            }},
-            api: {{
-                timeout: {tenant_context['tenant']['technical']['api_timeout']},
-                maxLoginAttempts: {tenant_context['tenant']['technical']['max_login_attempts']}
-            }}
-        }};
-        
-        // Funciones de utilidad del tenant
-        window.TenantUtils = {{
-            getColor: function(colorName) {{
-                return window.TENANT_CONFIG.colors[colorName] || '#000000';
-            }},
-            
-            isFeatureEnabled: function(featureName) {{
-                return window.TENANT_CONFIG.features[featureName] || false;
-            }},
+        return TenantService.get_tenant_bundle(request).js
+    
+    @staticmethod
+    def get_tenant_asset_url(request: Request, kind: str) -> str:
+        """
+        Obtiene la URL versionada (por hash de contenido) de un recurso del tenant
+        
+        Args:
+            request: Request de FastAPI
+            kind: 'css' o 'js'
             
-            getSupportContact: function() {{
-                return window.TENANT_CONFIG.urls.support;
-            }},
+        Returns:
+            str: URL del recurso, p. ej. /tenant.<hash>.css
+        """
+        bundle = TenantService.get_tenant_bundle(request)
+        version = bundle.css_version if kind == 'css' else bundle.js_version
+        return TENANT_ASSETS[kind][2].format(version=version)
+    
+    @staticmethod
+    def get_tenant_asset_response(request: Request, kind: str, version: Optional[str] = None) -> Response:
+        """
+        Construye la respuesta de /tenant.css o /tenant/config.js con ETag
+        
+        Las URLs versionadas se resuelven por hash (independiente del tenant
+        detectado) y se sirven como inmutables. Las URLs sin versión, o con
+        una versión que ya no existe, se sirven con el recurso del tenant
+        actual y revalidación obligatoria. Si el navegador envía un
+        If-None-Match que coincide se responde 304 sin cuerpo.
+        
+        Args:
+            request: Request de FastAPI
+            kind: 'css' o 'js'
+            version: Hash solicitado en la URL (opcional)
             
-            getHelpUrl: function() {{
-                return window.TENANT_CONFIG.urls.help;
-            }}
-        }};
+        Returns:
+            Response: Respuesta 200 con el recurso o 304
         """
+        bundle = tenant_config.get_bundle_by_asset_version(version) if version else None
+        immutable = bundle is not None
+        if bundle is None:
+            bundle = TenantService.get_tenant_bundle(request)
+        
+        if kind == 'css':
+            content, etag = bundle.css_bytes, bundle.css_etag
+        else:
+            content, etag = bundle.js_bytes, bundle.js_etag
+        
+        headers = {
+            "Cache-Control": IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL,
+            "ETag": etag,
+        }
+        
+        if TenantService._etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
         
-        return js_config
+        return Response(content=content, media_type=TENANT_ASSETS[kind][0], headers=headers)
+    
+    @staticmethod
+    def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+        """Comparación débil de If-None-Match contra un ETag (RFC 9110)"""
+        if not if_none_match:
+            return False
+        
+        for candidate in if_none_match.split(","):
+            candidate = candidate.strip()
+            if candidate == "*":
+                return True
+            if candidate.startswith("W/"):
+                candidate = candidate[2:]
+            if candidate == etag:
+                return True
+        
+        return False
     
     @staticmethod
     def get_tenant_favicon(request: Request) -> str:
@@ -345,18 +197,19 @@ class TenantService:
         return tenant_config_obj.favicon_url
     
     @staticmethod
-    def is_feature_enabled(request: Request, feature_name: str) -> bool:
+    def is_feature_enabled(request: Request, feature_name: str, user_id: Optional[str] = None) -> bool:
         """
         Verifica si una característica está habilitada para el tenant actual
         
         Args:
             request: Request de FastAPI
             feature_name: Nombre de la característica
+            user_id: Usuario para rollouts parciales (por defecto el de la sesión)
             
         Returns:
             bool: True si está habilitada
         """
-        return TenantContextManager.is_tenant_feature_enabled(request, feature_name)
+        return TenantContextManager.is_tenant_feature_enabled(request, feature_name, user_id)
     
     @staticmethod
     def get_tenant_logo_url(request: Request) -> str:
@@ -461,24 +314,7 @@ class TenantService:
             }
         
         config = tenant_config.get_tenant_config(tenant_id)
-        errors = []
-        warnings = []
-        
-        # Validaciones básicas
-        if not config.company_name:
-            errors.append('company_name es requerido')
-        
-        if not config.logo_url:
-            warnings.append('logo_url no está configurado')
-        
-        if not config.hero_image_url:
-            warnings.append('hero_image_url no está configurado')
-        
-        if not config.primary_color or not config.primary_color.startswith('#'):
-            errors.append('primary_color debe ser un color hexadecimal válido')
-        
-        if not config.support_email:
-            warnings.append('support_email no está configurado')
+        errors, warnings = check_tenant_branding(config)
         
         return {
             'valid': len(errors) == 0,
@@ -486,4 +322,16 @@ class TenantService:
             'warnings': warnings,
             'tenant_id': tenant_id,
             'company_name': config.company_name
-        }
\ No newline at end of file
+        }
+
+@pass_context
+def tenant_asset_url(context, kind: str) -> str:
+    """
+    Función global de Jinja2: URL versionada del CSS/JS del tenant actual
+    
+    Uso en templates: <link href="{{ tenant_asset_url('css') }}" rel="stylesheet">
+    """
+    request = context.get('request')
+    if request is None:
+        return TENANT_ASSETS[kind][1]
+    return TenantService.get_tenant_asset_url(request, kind)
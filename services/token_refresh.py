@@ -0,0 +1,273 @@
+"""
+Refresco de tokens de un solo vuelo (single-flight) por sesión
+
+Cuando el access token de una sesión vence, todos los requests concurrentes
+de ese usuario (página, assets, XHR) llegan a refresh_token a la vez. Como
+el refresh token rota, solo el primero puede usarlo: los demás fallaban y
+borraban la sesión. TokenRefresher agrupa los refrescos por hash del
+refresh token: el primero hace el POST y el resto espera la misma tarea.
+El resultado se conserva unos segundos para los requests que llegan justo
+después con la cookie anterior.
+
+Con REDIS_URL configurado la coordinación también es entre workers: un lock
+SET NX por refresh token y el resultado publicado en Redis con TTL corto.
+Si Redis no responde se refresca localmente.
+
+refresh_ahead inicia el refresco en segundo plano cuando el token está por
+vencer; el siguiente request de la sesión aplica el resultado (peek) sin
+esperar a la API de auth.
+
+Solo un refresco exitoso se conserva el tiempo pedido (keep_for): un
+rechazo (None) se reutiliza a lo sumo result_ttl y un error de la API
+(5xx, 429, red) no se guarda, así el siguiente request vuelve a intentar.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from config.settings import settings
+from utils.metrics import metrics
+
+try:
+    import redis.asyncio as redis_asyncio
+except ImportError:  # pragma: no cover - depende del entorno
+    redis_asyncio = None
+
+logger = logging.getLogger(__name__)
+
+REDIS_KEY_PREFIX = "sgc:token-refresh:"
+
+# Cada cuánto consulta Redis un worker que espera el refresco de otro
+REDIS_POLL_INTERVAL = 0.05
+
+RefreshResult = Optional[Dict[str, Any]]
+
+
+def refresh_key(tenant_id: str, refresh_token: str) -> str:
+    """Clave de coordinación (no se guarda el refresh token en claro)"""
+    return hashlib.sha256(f"{tenant_id}:{refresh_token}".encode("utf-8")).hexdigest()
+
+
+class TokenRefresher:
+    """
+    Coordina los refrescos concurrentes de una misma sesión
+    """
+
+    def __init__(self, result_ttl: float = 10.0, lock_ttl: float = 15.0, redis_url: Optional[str] = None,
+                 max_results: int = 10000):
+        """
+        Inicializa el coordinador
+
+        Args:
+            result_ttl: Segundos que se reutiliza el resultado de un refresco
+            lock_ttl: Vida máxima del lock entre workers (debe cubrir el POST)
+            redis_url: URL de Redis para coordinar entre workers (None = solo en proceso)
+            max_results: Resultados máximos guardados en memoria (se descartan los más viejos)
+        """
+        self.result_ttl = result_ttl
+        self.lock_ttl = lock_ttl
+        self.redis_url = redis_url
+        self.max_results = max_results
+        self._redis = None
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._results: Dict[str, Tuple[RefreshResult, float]] = {}
+        if redis_url and redis_asyncio is None:
+            logger.warning("⚠️ REDIS_URL configurado pero el paquete redis no está instalado: "
+                           "el refresco de tokens se coordina solo dentro del proceso")
+
+    @property
+    def redis(self):
+        """Cliente de Redis (se crea en el primer uso)"""
+        if self._redis is None and self.redis_url and redis_asyncio is not None:
+            self._redis = redis_asyncio.from_url(self.redis_url, socket_timeout=1.0)
+        return self._redis
+
+    async def aclose(self):
+        """Cierra la conexión con Redis"""
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+
+    async def refresh(self, tenant_id: str, refresh_token: str,
+                      perform: Callable[[], Awaitable[RefreshResult]]) -> RefreshResult:
+        """
+        Refresca una sola vez por refresh token, aunque lo pidan muchos requests
+
+        Args:
+            tenant_id: ID del tenant de la sesión
+            refresh_token: Refresh token actual de la sesión
+            perform: Hace el POST a la API de auth; devuelve los tokens nuevos o None si fue rechazado
+
+        Returns:
+            RefreshResult: Respuesta de la API (tokens nuevos) o None si el refresco fue rechazado
+        """
+        key = refresh_key(tenant_id, refresh_token)
+
+        cached = self._results.get(key)
+        if cached is not None and time.monotonic() < cached[1]:
+            metrics.increment("token_refresh_total", result="cached")
+            return cached[0]
+
+        task = self._inflight.get(key)
+        if task is not None:
+            metrics.increment("token_refresh_total", result="joined")
+        else:
+            task = self._start(key, perform, self.result_ttl)
+        return await asyncio.shield(task)
+
+    def refresh_ahead(self, tenant_id: str, refresh_token: str,
+                      perform: Callable[[], Awaitable[RefreshResult]], keep_for: float) -> bool:
+        """
+        Inicia un refresco en segundo plano sin esperarlo (refresh-ahead)
+
+        El resultado queda guardado para que el próximo request de la sesión
+        lo aplique con peek().
+
+        Args:
+            tenant_id: ID del tenant de la sesión
+            refresh_token: Refresh token actual de la sesión
+            perform: Hace el POST a la API de auth
+            keep_for: Segundos que se conserva el resultado; el refresh token anterior
+                      queda rotado, así que debe cubrir la vida de la sesión
+
+        Returns:
+            bool: True si se inició un refresco nuevo
+        """
+        key = refresh_key(tenant_id, refresh_token)
+        cached = self._results.get(key)
+        if key in self._inflight or (cached is not None and time.monotonic() < cached[1]):
+            return False
+        self._start(key, perform, max(keep_for, self.result_ttl))
+        metrics.increment("token_refresh_ahead_total")
+        return True
+
+    async def peek(self, tenant_id: str, refresh_token: str) -> RefreshResult:
+        """
+        Tokens de un refresco que ya terminó (sin refrescar ni esperar)
+
+        Args:
+            tenant_id: ID del tenant de la sesión
+            refresh_token: Refresh token actual de la sesión
+
+        Returns:
+            RefreshResult: Tokens nuevos o None si no hay un refresco exitoso terminado
+        """
+        key = refresh_key(tenant_id, refresh_token)
+        cached = self._results.get(key)
+        if cached is not None and time.monotonic() < cached[1]:
+            return cached[0]
+
+        client = self.redis
+        if client is None or key in self._inflight:
+            return None
+        try:
+            shared = await client.get(f"{REDIS_KEY_PREFIX}result:{key}")
+        except Exception as e:
+            logger.warning(f"⚠️ Redis no disponible para consultar el refresco de tokens: {e}")
+            return None
+        return json.loads(shared) if shared is not None else None
+
+    def _start(self, key: str, perform: Callable[[], Awaitable[RefreshResult]], keep_for: float) -> asyncio.Task:
+        """Crea la tarea de refresco compartida"""
+        # Tarea propia: si el request que la inició se cancela, el refresco sigue para los demás
+        task = asyncio.ensure_future(self._run(key, perform, keep_for))
+        task.add_done_callback(lambda done: done.cancelled() or done.exception())
+        self._inflight[key] = task
+        return task
+
+    async def _run(self, key: str, perform: Callable[[], Awaitable[RefreshResult]], keep_for: float) -> RefreshResult:
+        """Refresco compartido por todos los requests de la sesión"""
+        try:
+            result = await self._refresh_once(key, perform, keep_for)
+            self._store(key, result, self._retention(result, keep_for))
+            return result
+        except Exception as e:
+            logger.error(f"Error refrescando token: {e}")
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    async def _refresh_once(self, key: str, perform: Callable[[], Awaitable[RefreshResult]],
+                            keep_for: float) -> RefreshResult:
+        """Refresca coordinando con otros workers si hay Redis"""
+        client = self.redis
+        if client is None:
+            return await self._perform(perform)
+
+        result_key = f"{REDIS_KEY_PREFIX}result:{key}"
+        lock_key = f"{REDIS_KEY_PREFIX}lock:{key}"
+        try:
+            shared = await client.get(result_key)
+            if shared is not None:
+                metrics.increment("token_refresh_total", result="shared")
+                return json.loads(shared)
+
+            if not await client.set(lock_key, "1", nx=True, px=int(self.lock_ttl * 1000)):
+                # Otro worker está refrescando: se espera su resultado
+                deadline = time.monotonic() + self.lock_ttl
+                while time.monotonic() < deadline:
+                    await asyncio.sleep(REDIS_POLL_INTERVAL)
+                    shared = await client.get(result_key)
+                    if shared is not None:
+                        metrics.increment("token_refresh_total", result="shared")
+                        return json.loads(shared)
+                    if not await client.exists(lock_key):
+                        break
+                logger.warning("⚠️ No llegó el refresco de token de otro worker, se refresca localmente")
+        except Exception as e:
+            logger.warning(f"⚠️ Redis no disponible para coordinar el refresco de tokens: {e}")
+            return await self._perform(perform)
+
+        result = await self._perform(perform)
+        try:
+            await client.set(result_key, json.dumps(result), px=int(self._retention(result, keep_for) * 1000))
+            await client.delete(lock_key)
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo publicar el refresco de token en Redis: {e}")
+        return result
+
+    async def _perform(self, perform: Callable[[], Awaitable[RefreshResult]]) -> RefreshResult:
+        """Hace el refresco contra la API y lo cuenta"""
+        try:
+            result = await perform()
+        except Exception:
+            metrics.increment("token_refresh_total", result="error")
+            raise
+        metrics.increment("token_refresh_total", result="performed" if result is not None else "rejected")
+        return result
+
+    def _retention(self, result: RefreshResult, keep_for: float) -> float:
+        """Segundos que se conserva un resultado: un rechazo nunca más que result_ttl"""
+        return keep_for if result is not None else min(keep_for, self.result_ttl)
+
+    def _store(self, key: str, result: RefreshResult, keep_for: float):
+        """Guarda el resultado para los requests que llegan con la cookie anterior"""
+        now = time.monotonic()
+        if len(self._results) >= 256:
+            for expired in [k for k, (_, expires_at) in self._results.items() if expires_at <= now]:
+                del self._results[expired]
+        self._results.pop(key, None)
+        while len(self._results) >= self.max_results:
+            del self._results[next(iter(self._results))]
+        self._results[key] = (result, now + keep_for)
+
+    def stats(self) -> Dict[str, Any]:
+        """Estado para /metrics"""
+        now = time.monotonic()
+        return {
+            "inflight": len(self._inflight),
+            "cached_results": sum(1 for _, expires_at in self._results.values() if expires_at > now),
+            "shared": bool(self.redis_url) and redis_asyncio is not None,
+        }
+
+
+# Instancia global del coordinador de refrescos
+token_refresher = TokenRefresher(
+    result_ttl=settings.TOKEN_REFRESH_RESULT_TTL,
+    lock_ttl=settings.TOKEN_REFRESH_LOCK_TTL,
+    redis_url=settings.REDIS_URL,
+)
+metrics.register_collector("token_refresh", token_refresher.stats)
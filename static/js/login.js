@@ -6,7 +6,7 @@ document.addEventListener('DOMContentLoaded', function() {
     const heroImg = document.querySelector('.hero-img');
     if (heroImg) {
         heroImg.addEventListener('load', function() {
-            console.log('✅ Imagen hero cargada:', this.src);
+            console.log('✅ Imagen hero cargada:', this.currentSrc || this.src);
             // Asegurar que la imagen llene todo el espacio
             this.style.width = '100%';
             this.style.height = '100%';
@@ -16,7 +16,7 @@ document.addEventListener('DOMContentLoaded', function() {
         heroImg.addEventListener('error', function() {
             console.warn('⚠️ Error cargando imagen hero:', this.src);
             this.style.display = 'none';
-            this.parentElement.classList.remove('has-image');
+            this.closest('.doctor-image').classList.remove('has-image');
         });
     }
     
@@ -0,0 +1,109 @@
+"""
+Tests de la cola de auditoría (lotes, fallas del sink y cierre)
+"""
+import asyncio
+import json
+
+from services.audit import DROP_NEWEST, AuditLog, JsonlAuditSink
+
+
+class SlowSink:
+    """Sink en memoria que tarda delay segundos por lote"""
+
+    def __init__(self, delay: float = 0.0, fail: bool = False):
+        self.delay = delay
+        self.fail = fail
+        self.events = []
+        self.closed = False
+
+    async def write(self, events):
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise OSError("sink caído")
+        self.events.extend(events)
+
+    async def aclose(self):
+        self.closed = True
+
+
+def test_stop_waits_for_batch_in_progress():
+    """stop() durante una escritura lenta no pierde el lote"""
+    async def scenario():
+        sink = SlowSink(delay=0.5)
+        audit = AuditLog(sink, batch_size=2, flush_interval=0.01)
+        audit.start()
+        for index in range(5):
+            audit.record("login_success", "default", username=f"user{index}")
+        await asyncio.sleep(0.05)  # El escritor ya está dentro de sink.write
+        await audit.stop()
+        return sink, audit
+
+    sink, audit = asyncio.run(scenario())
+    assert [event["username"] for event in sink.events] == [f"user{index}" for index in range(5)]
+    assert audit.stats()["written"] == 5
+    assert audit.stats()["queued"] == 0
+    assert audit.stats()["dropped"] == {}
+    assert sink.closed
+
+
+def test_cancelled_flush_requeues_batch():
+    """Si se cancela la escritura el lote vuelve a la cola en orden"""
+    async def scenario():
+        audit = AuditLog(SlowSink(delay=1.0), batch_size=3)
+        for index in range(5):
+            audit.record("logout", "default", username=f"user{index}")
+        flush = asyncio.ensure_future(audit.flush())
+        await asyncio.sleep(0.01)
+        flush.cancel()
+        await asyncio.gather(flush, return_exceptions=True)
+        return audit
+
+    audit = asyncio.run(scenario())
+    assert [event["username"] for event in audit._queue] == [f"user{index}" for index in range(5)]
+
+
+def test_failed_write_keeps_events_for_retry():
+    """Un sink caído no pierde eventos mientras haya lugar en la cola"""
+    async def scenario():
+        sink = SlowSink(fail=True)
+        audit = AuditLog(sink, batch_size=2)
+        for index in range(3):
+            audit.record("login_failure", "default", username=f"user{index}")
+        ok = await audit.flush()
+        sink.fail = False
+        await audit.stop()
+        return ok, sink, audit
+
+    ok, sink, audit = asyncio.run(scenario())
+    assert ok is False
+    assert audit.write_errors == 1
+    assert [event["username"] for event in sink.events] == ["user0", "user1", "user2"]
+
+
+def test_overflow_policies():
+    """Con la cola llena se descarta el más viejo o el nuevo según la política"""
+    oldest = AuditLog(SlowSink(), max_queue=2)
+    newest = AuditLog(SlowSink(), max_queue=2, overflow=DROP_NEWEST)
+    for audit in (oldest, newest):
+        for index in range(3):
+            audit.record("login_failure", "default", username=f"user{index}")
+        assert audit.dropped == {"queue_full": 1}
+    assert [event["username"] for event in oldest._queue] == ["user1", "user2"]
+    assert [event["username"] for event in newest._queue] == ["user0", "user1"]
+
+
+def test_jsonl_sink_writes_one_event_per_line(tmp_path):
+    """El sink JSONL escribe un objeto JSON por línea"""
+    path = tmp_path / "audit.jsonl"
+
+    async def scenario():
+        audit = AuditLog(JsonlAuditSink(str(path)))
+        audit.record("login_success", "biomed", username="admin", client_ip="10.0.0.1")
+        audit.record("logout", "biomed", username="admin")
+        await audit.stop()
+
+    asyncio.run(scenario())
+    lines = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert [line["event"] for line in lines] == ["login_success", "logout"]
+    assert lines[0]["tenant_id"] == "biomed"
+    assert lines[0]["client_ip"] == "10.0.0.1"
@@ -0,0 +1,94 @@
+"""
+Tests del estado de autenticación resuelto una vez por request
+"""
+import asyncio
+import dataclasses
+import time
+
+import pytest
+from jose import jwt
+from starlette.requests import Request
+
+from services.auth_context import AuthContext, invalidate_auth_context
+from services.auth_service import AuthService
+
+
+def make_request(session: dict) -> Request:
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/dashboard",
+        "headers": [],
+        "query_string": b"",
+        "state": {"tenant_id": "biomed"},
+        "session": session,
+    })
+
+
+def make_service(authenticated: bool):
+    """AuthService cuyo is_authenticated cuenta las llamadas"""
+    service = AuthService()
+    calls = []
+
+    async def is_authenticated(request):
+        calls.append(request)
+        return authenticated
+
+    service.is_authenticated = is_authenticated
+    return service, calls
+
+
+def test_session_is_verified_once_per_request():
+    """Middleware, decorador y vista reciben el mismo contexto con una sola verificación"""
+    exp = int(time.time()) + 600
+    session = {
+        "access_token": jwt.encode({"sub": "7", "exp": exp}, "secreto", algorithm="HS256"),
+        "user_id": "7",
+        "username": "admin",
+        "user_roles": ["admin"],
+        "user_data": {"id": "7", "username": "admin"},
+    }
+    service, calls = make_service(authenticated=True)
+    request = make_request(session)
+
+    async def scenario():
+        first = await service.resolve_auth_context(request)
+        second = await service.resolve_auth_context(request)
+        user = await service.get_current_user(request)
+        return first, second, user
+
+    first, second, user = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert second is first
+    assert first.authenticated and first.tenant_id == "biomed"
+    assert first.username == "admin" and first.roles == ("admin",)
+    assert first.expires_at == exp
+    assert user == {"id": "7", "username": "admin", "current_tenant": "biomed"}
+
+
+def test_anonymous_request():
+    service, calls = make_service(authenticated=False)
+    request = make_request({})
+    context = asyncio.run(service.resolve_auth_context(request))
+    assert context == AuthContext.anonymous("biomed")
+    assert asyncio.run(service.get_current_user(request)) is None
+    assert len(calls) == 1
+
+
+def test_invalidate_forces_new_resolution():
+    """Tras login/logout el contexto se vuelve a resolver"""
+    service, calls = make_service(authenticated=False)
+    request = make_request({})
+    asyncio.run(service.resolve_auth_context(request))
+    invalidate_auth_context(request)
+    asyncio.run(service.resolve_auth_context(request))
+    assert len(calls) == 2
+
+
+def test_context_is_immutable():
+    context = AuthContext.from_session({"user_roles": ["demo"], "user_data": {"id": "1"}}, "default")
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        context.authenticated = False
+    with pytest.raises(TypeError):
+        context.user["id"] = "2"
+    assert context.has_role("demo") and not context.is_admin
@@ -0,0 +1,117 @@
+"""
+Tests de la cola de trabajos en segundo plano (deduplicación, reintentos y descarte)
+"""
+import asyncio
+
+from services.background_queue import BackgroundQueue
+from services.circuit_breaker import ServiceUnavailableError
+
+
+def make_job(calls, failures=0, error=None):
+    """Trabajo que falla las primeras `failures` veces"""
+    async def job():
+        calls.append(1)
+        if len(calls) <= failures:
+            raise error or RuntimeError("API caída")
+    return job
+
+
+def test_duplicate_keys_are_dropped():
+    """La misma clave dentro de dedup_window se encola una sola vez"""
+    async def scenario():
+        queue = BackgroundQueue("test", dedup_window=60)
+        queue.start()
+        calls = []
+        accepted = [queue.submit("biomed:correo", make_job(calls)) for _ in range(3)]
+        accepted.append(queue.submit("biomed:otro", make_job(calls)))
+        await queue.stop()
+        return accepted, calls, queue.counts
+
+    accepted, calls, counts = asyncio.run(scenario())
+    assert accepted == [True, False, False, True]
+    assert len(calls) == 2
+    assert counts == {"submitted": 2, "deduplicated": 2, "succeeded": 2}
+
+
+def test_failed_job_is_retried_with_backoff():
+    async def scenario():
+        queue = BackgroundQueue("test", max_attempts=3, retry_base=0.01, retry_max=0.02)
+        queue.start()
+        calls = []
+        queue.submit("clave", make_job(calls, failures=2))
+        await asyncio.sleep(0.2)
+        await queue.stop()
+        return calls, queue.counts
+
+    calls, counts = asyncio.run(scenario())
+    assert len(calls) == 3
+    assert counts["retried"] == 2
+    assert counts["succeeded"] == 1
+
+
+def test_job_is_dropped_after_max_attempts():
+    async def scenario():
+        queue = BackgroundQueue("test", max_attempts=2, retry_base=0.01, retry_max=0.01)
+        queue.start()
+        calls = []
+        queue.submit("clave", make_job(calls, failures=10))
+        await asyncio.sleep(0.1)
+        await queue.stop()
+        return calls, queue.counts
+
+    calls, counts = asyncio.run(scenario())
+    assert len(calls) == 2
+    assert counts["failed"] == 1
+    assert "succeeded" not in counts
+
+
+def test_backoff_honors_circuit_retry_after():
+    """Con el circuito abierto se espera al menos su retry_after"""
+    queue = BackgroundQueue("test", retry_base=0.1, retry_max=60)
+    delay = queue._backoff(1, ServiceUnavailableError("auth", "circuit_open", retry_after=30))
+    assert delay == 30
+    assert 0.05 <= queue._backoff(1, RuntimeError()) <= 0.1
+
+
+def test_full_queue_drops_without_blocking():
+    """Con la cola llena el trabajo se descarta y la clave no queda marcada"""
+    async def scenario():
+        queue = BackgroundQueue("test", max_size=1, workers=1)
+        queue.start()
+        started, release = asyncio.Event(), asyncio.Event()
+
+        async def blocking():
+            started.set()
+            await release.wait()
+
+        queue.submit("a", blocking)
+        await started.wait()  # El worker tiene "a"; la cola queda vacía
+        calls = []
+        accepted = [queue.submit("b", make_job(calls)), queue.submit("c", make_job(calls))]
+        stats = queue.stats()
+        release.set()
+        await queue.stop()
+        retry = queue.submit("c", make_job(calls))
+        await asyncio.sleep(0)
+        return accepted, stats, retry, queue.counts
+
+    accepted, stats, retry, counts = asyncio.run(scenario())
+    assert accepted == [True, False]
+    assert stats["queued"] == 1
+    assert counts["dropped"] == 1
+    assert retry is True
+
+
+def test_stop_waits_for_queued_jobs():
+    async def scenario():
+        queue = BackgroundQueue("test", workers=1)
+        queue.start()
+        calls = []
+        for index in range(5):
+            queue.submit(f"clave-{index}", make_job(calls))
+        await queue.stop()
+        return calls, queue.running
+
+    calls, running = asyncio.run(scenario())
+    assert len(calls) == 5
+    assert running is False
@@ -0,0 +1,144 @@
+"""
+Tests del circuit breaker y el bulkhead del cliente de la API de auth
+"""
+import asyncio
+import types
+
+import httpx
+import pytest
+
+import services.circuit_breaker as circuit_breaker_module
+from services.circuit_breaker import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    Bulkhead,
+    CircuitBreaker,
+    ServiceUnavailableError,
+)
+from services.http_clients import ResilientTransport
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Reloj controlado por el test en lugar de time.monotonic"""
+    fake = types.SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(circuit_breaker_module, "time", types.SimpleNamespace(monotonic=lambda: fake.now))
+    return fake
+
+
+def make_breaker(**kwargs) -> CircuitBreaker:
+    options = dict(window_size=4, min_calls=4, failure_rate_threshold=0.5, open_seconds=30, half_open_calls=2)
+    options.update(kwargs)
+    return CircuitBreaker("test", **options)
+
+
+def call(breaker: CircuitBreaker, failed: bool, duration: float = 0.01):
+    breaker.before_call()
+    breaker.record(failed, duration)
+
+
+def open_breaker(breaker: CircuitBreaker):
+    for failed in (False, False, True, True):
+        call(breaker, failed)
+
+
+def test_opens_at_failure_rate(clock):
+    """Con 2 errores de 4 llamadas (50%) el circuito se abre y rechaza al instante"""
+    breaker = make_breaker()
+    for failed in (False, False, True):
+        call(breaker, failed)
+    assert breaker.state == CLOSED  # Menos de min_calls
+    call(breaker, True)
+    assert breaker.state == OPEN
+    with pytest.raises(ServiceUnavailableError) as excinfo:
+        breaker.before_call()
+    assert excinfo.value.reason == "circuit_open"
+    assert excinfo.value.retry_after == pytest.approx(30)
+    assert breaker.rejections == 1
+
+
+def test_opens_at_slow_call_rate(clock):
+    breaker = make_breaker(slow_call_seconds=1.0, slow_call_rate_threshold=0.75)
+    for duration in (0.1, 2.0, 2.0, 2.0):
+        call(breaker, False, duration)
+    assert breaker.state == OPEN
+
+
+def test_half_open_closes_after_successful_trials(clock):
+    """open -> half-open tras open_seconds -> closed si las pruebas salen bien"""
+    breaker = make_breaker()
+    open_breaker(breaker)
+    clock.now += 31
+    breaker.before_call()
+    assert breaker.state == HALF_OPEN
+    breaker.before_call()
+    # Solo half_open_calls pruebas a la vez
+    with pytest.raises(ServiceUnavailableError):
+        breaker.before_call()
+    breaker.record(False, 0.01)
+    assert breaker.state == HALF_OPEN
+    breaker.record(False, 0.01)
+    assert breaker.state == CLOSED
+    assert breaker.stats()["window_calls"] == 0
+
+
+def test_failed_trial_reopens(clock):
+    breaker = make_breaker()
+    open_breaker(breaker)
+    clock.now += 31
+    call(breaker, True)
+    assert breaker.state == OPEN
+    assert breaker.times_opened == 2
+    with pytest.raises(ServiceUnavailableError):
+        breaker.before_call()
+
+
+def test_abandoned_trial_frees_its_slot(clock):
+    """Una prueba cancelada sin resultado no deja el circuito trabado en half-open"""
+    breaker = make_breaker(half_open_calls=1)
+    open_breaker(breaker)
+    clock.now += 31
+    breaker.before_call()
+    breaker.abandon()
+    call(breaker, False)
+    assert breaker.state == CLOSED
+
+
+def test_transport_counts_5xx_and_rejects_when_open():
+    """Las respuestas 5xx cuentan como error; con el circuito abierto no se llama a la API"""
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(503)
+
+    async def scenario():
+        breaker = make_breaker()
+        transport = ResilientTransport(httpx.MockTransport(handler), breaker=breaker)
+        async with httpx.AsyncClient(transport=transport, base_url="http://auth") as client:
+            for _ in range(4):
+                assert (await client.get("/health")).status_code == 503
+            with pytest.raises(ServiceUnavailableError):
+                await client.get("/health")
+        return breaker
+
+    breaker = asyncio.run(scenario())
+    assert breaker.state == OPEN
+    assert len(requests) == 4
+
+
+def test_bulkhead_rejects_when_full():
+    """Sin lugar en max_wait la llamada se rechaza en vez de encolarse"""
+    async def scenario():
+        bulkhead = Bulkhead("test", max_concurrent=1, max_wait=0.01)
+        await bulkhead.acquire()
+        with pytest.raises(ServiceUnavailableError) as excinfo:
+            await bulkhead.acquire()
+        bulkhead.release()
+        await bulkhead.acquire()
+        return bulkhead, excinfo.value
+
+    bulkhead, error = asyncio.run(scenario())
+    assert error.reason == "bulkhead_full"
+    assert bulkhead.stats() == {"active": 1, "max_concurrent": 1, "rejections": 1}
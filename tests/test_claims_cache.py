@@ -0,0 +1,67 @@
+"""
+Tests de la cache de claims de JWT
+"""
+import types
+
+import pytest
+
+import utils.claims_cache as claims_cache_module
+from utils.claims_cache import ClaimsCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Reloj controlado por el test en lugar de time.time"""
+    fake = types.SimpleNamespace(now=1_000_000.0)
+    monkeypatch.setattr(claims_cache_module, "time", types.SimpleNamespace(time=lambda: fake.now))
+    return fake
+
+
+def test_cached_claims_are_read_only(clock):
+    cache = ClaimsCache()
+    claims = cache.put("token-a", {"sub": "admin", "exp": clock.now + 60})
+    assert cache.get("token-a") is claims
+    with pytest.raises(TypeError):
+        claims["sub"] = "otro"
+    assert cache.stats()["hits"] == 1
+
+
+def test_entry_expires_at_token_exp(clock):
+    """Una entrada deja de servirse cuando vence el token"""
+    cache = ClaimsCache()
+    cache.put("token-a", {"sub": "admin", "exp": clock.now + 60})
+    clock.now += 61
+    assert cache.get("token-a") is None
+    assert cache.stats()["expired"] == 1
+    assert cache.stats()["entries"] == 0
+
+
+def test_expired_or_exp_less_tokens_are_not_cached(clock):
+    cache = ClaimsCache()
+    assert cache.put("vencido", {"exp": clock.now - 1})["exp"] == clock.now - 1
+    cache.put("sin-exp", {"sub": "admin"})
+    assert cache.get("vencido") is None
+    assert cache.get("sin-exp") is None
+
+
+def test_least_recently_used_is_evicted(clock):
+    cache = ClaimsCache(max_entries=2)
+    for token in ("a", "b"):
+        cache.put(token, {"sub": token, "exp": clock.now + 60})
+    cache.get("a")
+    cache.put("c", {"sub": "c", "exp": clock.now + 60})
+    assert cache.get("b") is None
+    assert cache.get("a")["sub"] == "a"
+    assert cache.get("c")["sub"] == "c"
+
+
+def test_discard_and_disabled(clock):
+    cache = ClaimsCache()
+    cache.put("token-a", {"exp": clock.now + 60})
+    cache.discard("token-a")
+    assert cache.get("token-a") is None
+
+    disabled = ClaimsCache(enabled=False)
+    disabled.put("token-a", {"exp": clock.now + 60})
+    assert disabled.get("token-a") is None
+    assert disabled.stats()["entries"] == 0
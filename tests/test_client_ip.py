@@ -0,0 +1,56 @@
+"""
+Tests de la IP del cliente detrás de proxies de confianza
+"""
+from starlette.requests import Request
+
+from middleware.security_middleware import SecurityMiddleware
+from services.auth_service import AuthService
+from utils.client_ip import get_client_ip, parse_networks
+
+TRUSTED = parse_networks("10.0.0.0/8, 127.0.0.1")
+
+
+def make_request(peer: str, **headers) -> Request:
+    return Request({
+        "type": "http",
+        "method": "POST",
+        "path": "/login",
+        "client": (peer, 50000),
+        "headers": [(name.replace("_", "-").lower().encode("latin-1"), value.encode("latin-1"))
+                    for name, value in headers.items()],
+        "query_string": b"",
+    })
+
+
+def test_untrusted_peer_headers_are_ignored():
+    """Un cliente directo no puede elegir su IP con X-Forwarded-For o X-Real-IP"""
+    request = make_request("203.0.113.7", X_Forwarded_For="1.2.3.4", X_Real_IP="5.6.7.8")
+    assert get_client_ip(request, TRUSTED) == "203.0.113.7"
+
+
+def test_trusted_proxy_forwarded_for():
+    """Se toma la primera IP no confiable desde la derecha, no la que inventa el cliente"""
+    request = make_request("10.0.0.2", X_Forwarded_For="6.6.6.6, 198.51.100.4, 10.0.0.9")
+    assert get_client_ip(request, TRUSTED) == "198.51.100.4"
+
+
+def test_trusted_proxy_real_ip_and_fallbacks():
+    assert get_client_ip(make_request("127.0.0.1", X_Real_IP="198.51.100.4"), TRUSTED) == "198.51.100.4"
+    assert get_client_ip(make_request("127.0.0.1", X_Forwarded_For="10.0.0.3, 10.0.0.9"), TRUSTED) == "10.0.0.3"
+    assert get_client_ip(make_request("127.0.0.1"), TRUSTED) == "127.0.0.1"
+
+
+def test_no_trusted_proxies_uses_connection_ip():
+    request = make_request("10.0.0.2", X_Forwarded_For="198.51.100.4")
+    assert get_client_ip(request, []) == "10.0.0.2"
+
+
+def test_invalid_entries_are_ignored():
+    assert [str(network) for network in parse_networks("10.0.0.0/8, no-es-ip, ::1")] == ["10.0.0.0/8", "::1/128"]
+
+
+def test_login_and_security_middleware_share_the_helper():
+    """AuthService y SecurityMiddleware resuelven la misma IP (por defecto sin proxies de confianza)"""
+    request = make_request("203.0.113.7", X_Forwarded_For="1.2.3.4")
+    assert AuthService._client_ip(request) == "203.0.113.7"
+    assert SecurityMiddleware._get_client_ip(None, request) == "203.0.113.7"
@@ -0,0 +1,65 @@
+"""
+Tests de los feature flags compilados por tenant
+"""
+import json
+from pathlib import Path
+
+import pytest
+from pydantic import ValidationError
+
+from config.feature_flags import compile_feature_flags, rollout_bucket
+from config.tenant_config import TenantBranding
+
+TENANTS_DIR = Path(__file__).resolve().parent.parent / "config" / "tenants"
+
+
+def make_branding(**changes) -> TenantBranding:
+    with open(TENANTS_DIR / "biomed.json", encoding="utf-8") as f:
+        data = json.load(f)
+    data.update(changes)
+    return TenantBranding(**data)
+
+
+def test_static_flags_and_aliases():
+    """Los campos enable_* y el diccionario features se compilan juntos"""
+    flags = compile_feature_flags("biomed", make_branding(
+        enable_registration=False, enable_2fa=True, features={"reportes": True, "beta": False},
+    ))
+    assert flags.is_enabled("two_factor")
+    assert flags.is_enabled("2fa")
+    assert flags.is_enabled("reportes")
+    assert not flags.is_enabled("registration")
+    assert not flags.is_enabled("beta")
+    assert not flags.is_enabled("no-existe")
+
+
+def test_flags_behave_as_read_only_mapping():
+    flags = compile_feature_flags("biomed", make_branding(features={"reportes": True}))
+    assert flags["reportes"] is True
+    assert flags.get("no-existe", "x") == "x"
+    assert "2fa" not in list(flags)
+    with pytest.raises(TypeError):
+        flags["reportes"] = False
+
+
+def test_percentage_rollout_is_stable_per_user():
+    """Un rollout parcial responde igual para el mismo usuario y respeta el porcentaje"""
+    flags = compile_feature_flags("biomed", make_branding(features={"nuevo_login": 30}))
+    assert not flags.is_enabled("nuevo_login")  # Sin usuario: apagado
+    answers = [flags.is_enabled("nuevo_login", user_id) for user_id in range(2000)]
+    assert answers == [flags.is_enabled("nuevo_login", user_id) for user_id in range(2000)]
+    assert 0.25 < sum(answers) / len(answers) < 0.35
+    assert all(answer == (rollout_bucket("biomed", "nuevo_login", user_id) < 30)
+               for user_id, answer in enumerate(answers))
+
+
+def test_full_and_empty_percentages_are_static():
+    flags = compile_feature_flags("biomed", make_branding(features={"todos": 100, "nadie": 0}))
+    assert flags.is_enabled("todos")
+    assert not flags.is_enabled("nadie", user_id=1)
+    assert not flags.rollouts
+
+
+def test_percentage_out_of_range_is_rejected():
+    with pytest.raises(ValidationError):
+        make_branding(features={"nuevo_login": 150})
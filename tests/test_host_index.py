@@ -0,0 +1,55 @@
+"""
+Tests del índice de dominios -> tenant por header Host
+"""
+from config.host_index import TenantHostIndex, normalize_host
+
+
+def make_index(**kwargs) -> TenantHostIndex:
+    return TenantHostIndex({
+        "biomed.com": "biomed",
+        "*.biomed.com": "biomed",
+        "portal.coosalud.com": "coosalud",
+        "*.clientes.medicorp.com": "medicorp",
+        "admin.clientes.medicorp.com": "default",
+    }, **kwargs)
+
+
+def test_exact_domain():
+    index = make_index()
+    assert index.resolve("biomed.com") == "biomed"
+    assert index.resolve("portal.coosalud.com") == "coosalud"
+    assert index.resolve("coosalud.com") is None
+    assert index.resolve("otro.com") is None
+
+
+def test_wildcard_matches_subdomains_only():
+    """*.dominio aplica a cualquier subdominio, no al dominio en sí"""
+    index = make_index()
+    assert index.resolve("www.biomed.com") == "biomed"
+    assert index.resolve("a.b.biomed.com") == "biomed"
+    assert index.resolve("x.clientes.medicorp.com") == "medicorp"
+    assert index.resolve("clientes.medicorp.com") is None
+
+
+def test_exact_beats_wildcard():
+    assert make_index().resolve("admin.clientes.medicorp.com") == "default"
+
+
+def test_port_case_and_trailing_dot_are_ignored():
+    index = make_index()
+    assert index.resolve("Portal.CooSalud.com:8080") == "coosalud"
+    assert index.resolve("www.biomed.com.") == "biomed"
+    assert normalize_host("[::1]:8000") == "::1"
+    assert normalize_host("localhost:8000") == "localhost"
+
+
+def test_results_are_cached_and_bounded():
+    index = make_index(cache_size=2)
+    for host in ("biomed.com", "www.biomed.com", "otro.com"):
+        index.resolve(host)
+    info = index.cache_info()
+    assert info == {"size": 2, "max_size": 2, "domains": 5}
+    # Añadir un dominio invalida lo cacheado (incluidos los "sin tenant")
+    index.add("otro.com", "coosalud")
+    assert index.cache_info()["size"] == 0
+    assert index.resolve("otro.com") == "coosalud"
@@ -0,0 +1,93 @@
+"""
+Tests del pool compartido de conexiones con la API (warmup y reutilización)
+"""
+import asyncio
+
+from config.settings import settings
+from services.http_clients import SharedHttpClient, auth_http_client, data_http_client
+
+
+async def start_server(connections: list):
+    """Servidor HTTP/1.1 keep-alive mínimo que cuenta las conexiones aceptadas"""
+    async def handle(reader, writer):
+        connections.append(writer)
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                if not head:
+                    break
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\nContent-Type: text/plain\r\n\r\nok")
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    return server, f"http://127.0.0.1:{port}"
+
+
+def test_warmup_opens_connections_that_requests_reuse():
+    """Las conexiones del warmup quedan en el pool y los requests no abren otras"""
+    async def scenario():
+        connections = []
+        server, base_url = await start_server(connections)
+        http_client = SharedHttpClient("test", max_keepalive_connections=5, base_url=base_url,
+                                       warmup_connections=3, warmup_path="/health")
+        try:
+            opened = await http_client.warmup()
+            warmed = len(connections)
+            for _ in range(3):
+                response = await http_client.client.get(f"{base_url}/datos")
+                assert response.text == "ok"
+            stats = http_client.stats()
+        finally:
+            await http_client.aclose()
+            server.close()
+            await server.wait_closed()
+        return opened, warmed, len(connections), stats
+
+    opened, warmed, total, stats = asyncio.run(scenario())
+    assert opened == 3
+    assert warmed == 3
+    assert total == 3
+    assert stats["warmed_up"] == 3
+    assert stats["new_connections"] == 3
+    assert stats["reused_connections"] == 3
+    assert stats["connections"] == 3
+    assert "connect" in stats["phases_ms"]
+
+
+def test_warmup_is_capped_by_keepalive_and_skipped_without_url():
+    async def scenario():
+        connections = []
+        server, base_url = await start_server(connections)
+        capped = SharedHttpClient("test", max_keepalive_connections=2, base_url=base_url, warmup_connections=10)
+        no_url = SharedHttpClient("test", warmup_connections=3)
+        try:
+            return await capped.warmup(), await no_url.warmup()
+        finally:
+            await capped.aclose()
+            server.close()
+            await server.wait_closed()
+
+    assert asyncio.run(scenario()) == (2, 0)
+
+
+def test_warmup_against_unreachable_api_does_not_fail():
+    """Una API caída al arrancar solo deja un warning"""
+    async def scenario():
+        http_client = SharedHttpClient("test", base_url="http://127.0.0.1:1", warmup_connections=2)
+        try:
+            return await http_client.warmup(timeout=2.0)
+        finally:
+            await http_client.aclose()
+
+    assert asyncio.run(scenario()) == 0
+
+
+def test_each_api_uses_its_own_pool_settings():
+    assert data_http_client.timeout.pool == settings.DATA_HTTP_POOL_TIMEOUT
+    assert auth_http_client.timeout.pool == settings.AUTH_HTTP_POOL_TIMEOUT
+    assert data_http_client.limits.max_connections == settings.DATA_HTTP_MAX_CONNECTIONS
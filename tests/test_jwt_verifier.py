@@ -0,0 +1,129 @@
+"""
+Tests de la cache JWKS ante kid desconocidos, rotación y API de auth caída
+"""
+import asyncio
+
+import httpx
+import pytest
+from jose import JWTError, jwt
+
+import services.jwt_verifier as jwt_verifier_module
+from services.jwt_verifier import JwksCache, JwksUnavailableError, JwtVerifier
+
+JWKS_URL = "http://auth.test/.well-known/jwks.json"
+
+
+class FakeAuthClient:
+    """Reemplaza a auth_http_client: sirve el JWKS actual o falla"""
+
+    def __init__(self, kids):
+        self.kids = list(kids)
+        self.fail = False
+        self.calls = 0
+
+    @property
+    def client(self):
+        return self
+
+    async def get(self, url, headers=None):
+        self.calls += 1
+        if self.fail:
+            raise httpx.ConnectError("API de auth caída")
+        keys = [{"kid": kid, "kty": "oct", "k": "c2VjcmV0", "use": "sig"} for kid in self.kids]
+        return httpx.Response(200, json={"keys": keys}, request=httpx.Request("GET", url))
+
+
+@pytest.fixture
+def auth_api(monkeypatch):
+    fake = FakeAuthClient(["k1"])
+    monkeypatch.setattr(jwt_verifier_module, "auth_http_client", fake)
+    return fake
+
+
+def test_rotated_kid_is_fetched(auth_api):
+    """Un kid nuevo dispara una descarga y se encuentra"""
+    async def scenario():
+        cache = JwksCache(JWKS_URL, min_refresh_interval=0)
+        assert (await cache.get_key("k1"))["kid"] == "k1"
+        auth_api.kids.append("k2")
+        return await cache.get_key("k2")
+
+    assert asyncio.run(scenario())["kid"] == "k2"
+    assert auth_api.calls == 2
+
+
+def test_kid_missing_after_fresh_fetch_is_unknown(auth_api):
+    """Si la descarga recién hecha no trae el kid, el kid es desconocido"""
+    async def scenario():
+        cache = JwksCache(JWKS_URL, min_refresh_interval=0)
+        await cache.refresh()
+        return await cache.get_key("inventado")
+
+    assert asyncio.run(scenario()) is None
+    assert auth_api.calls == 2
+
+
+def test_kid_within_min_refresh_interval_is_unavailable(auth_api):
+    """Sin poder volver a descargar no se da por falso un kid nuevo"""
+    async def scenario():
+        cache = JwksCache(JWKS_URL, min_refresh_interval=60)
+        await cache.refresh()
+        auth_api.kids.append("k2")
+        with pytest.raises(JwksUnavailableError):
+            await cache.get_key("k2")
+
+    asyncio.run(scenario())
+    assert auth_api.calls == 1
+
+
+def test_kid_with_failed_fetch_is_unavailable(auth_api):
+    """Si la descarga falla con claves viejas cargadas el kid queda sin confirmar"""
+    async def scenario():
+        cache = JwksCache(JWKS_URL, min_refresh_interval=0)
+        await cache.refresh()
+        auth_api.fail = True
+        with pytest.raises(JwksUnavailableError):
+            await cache.get_key("k2")
+        # Las claves conocidas se siguen usando
+        return await cache.get_key("k1")
+
+    assert asyncio.run(scenario())["kid"] == "k1"
+
+
+def test_verifier_distinguishes_forged_and_unconfirmed_kids(auth_api):
+    """El verificador solo rechaza (JWTError) un kid ausente en una descarga exitosa"""
+    verifier = JwtVerifier(JwksCache(JWKS_URL, min_refresh_interval=0), algorithms=["HS256"])
+    token = jwt.encode({"tenant_id": "default", "exp": 4102444800}, "secret", algorithm="HS256",
+                       headers={"kid": "inventado"})
+
+    async def scenario():
+        auth_api.fail = True
+        with pytest.raises(JwksUnavailableError):
+            await verifier.verify(token, "default")
+        auth_api.fail = False
+        with pytest.raises(JWTError):
+            await verifier.verify(token, "default")
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("require_tenant, claims, tenant_id, accepted", [
+    (False, {"tenant_id": "default"}, "default", True),
+    (False, {"tenant_id": "biomed"}, "default", False),
+    (False, {}, "default", True),
+    (True, {}, "default", False),
+])
+def test_tenant_claim_check(auth_api, require_tenant, claims, tenant_id, accepted):
+    """Solo un tenant_id distinto invalida el token; sin el claim depende de require_tenant"""
+    verifier = JwtVerifier(JwksCache(JWKS_URL, min_refresh_interval=0), algorithms=["HS256"],
+                           require_tenant=require_tenant)
+    token = jwt.encode({**claims, "exp": 4102444800}, "secret", algorithm="HS256", headers={"kid": "k1"})
+
+    async def scenario():
+        return await verifier.verify(token, tenant_id)
+
+    if accepted:
+        assert asyncio.run(scenario())["exp"] == 4102444800
+    else:
+        with pytest.raises(JWTError):
+            asyncio.run(scenario())
@@ -0,0 +1,121 @@
+"""
+Tests del limitador de intentos de login (ventana, bloqueo y backoff)
+"""
+import asyncio
+import types
+
+import pytest
+
+import services.login_throttle as login_throttle_module
+from services.login_throttle import LoginThrottle, lockout_duration, throttle_keys
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Reloj controlado por el test en lugar de time.time"""
+    fake = types.SimpleNamespace(now=1_000_000.0)
+    monkeypatch.setattr(login_throttle_module, "time", types.SimpleNamespace(time=lambda: fake.now))
+    return fake
+
+
+def fail(throttle, attempts, username="admin", client_ip="10.0.0.1", max_attempts=3):
+    """Registra varios fallos; devuelve el último bloqueo aplicado"""
+    async def scenario():
+        applied = 0.0
+        for _ in range(attempts):
+            applied = await throttle.record_failure("default", username, client_ip, max_attempts)
+        return applied
+    return asyncio.run(scenario())
+
+
+def check(throttle, username="admin", client_ip="10.0.0.1"):
+    return asyncio.run(throttle.check("default", username, client_ip))
+
+
+def test_lockout_after_max_attempts(clock):
+    """Al llegar al máximo del tenant el usuario queda bloqueado"""
+    throttle = LoginThrottle(window_seconds=900, lockout_seconds=60)
+    assert fail(throttle, 2) == 0.0
+    assert check(throttle) == 0.0
+    assert fail(throttle, 1) == 60.0
+    assert check(throttle) == pytest.approx(60.0)
+    clock.now += 61
+    assert check(throttle) == 0.0
+
+
+def test_failures_outside_window_are_forgotten(clock):
+    """Los fallos más viejos que la ventana no cuentan"""
+    throttle = LoginThrottle(window_seconds=100, lockout_seconds=60)
+    fail(throttle, 2)
+    clock.now += 101
+    assert fail(throttle, 2) == 0.0
+    assert check(throttle) == 0.0
+
+
+def test_repeated_lockouts_back_off(clock):
+    """Cada bloqueo sucesivo dura el doble, hasta el máximo"""
+    throttle = LoginThrottle(lockout_seconds=60, max_lockout_seconds=200)
+    durations = []
+    for _ in range(4):
+        durations.append(fail(throttle, 3))
+        clock.now += durations[-1] + 1
+    assert durations == [60.0, 120.0, 200.0, 200.0]
+
+
+def test_success_resets_user_but_not_ip(clock):
+    """Un login correcto limpia los fallos del usuario; los de la IP siguen contando"""
+    throttle = LoginThrottle(lockout_seconds=60, ip_factor=2)
+    fail(throttle, 2, username="admin")
+    asyncio.run(throttle.record_success("default", "admin", "10.0.0.1"))
+    assert fail(throttle, 2, username="admin") == 0.0
+    # La IP acumula 4 fallos de 6 permitidos: dos más de otro usuario la bloquean
+    assert fail(throttle, 2, username="demo") == 60.0
+    assert check(throttle, username="otro") == pytest.approx(60.0)
+    assert check(throttle, username="otro", client_ip="10.0.0.2") == 0.0
+
+
+def test_keys_are_per_tenant_and_case_insensitive():
+    """Las claves distinguen tenant y no exponen el usuario"""
+    user_key, ip_key = throttle_keys("biomed", " Admin ", "10.0.0.1")
+    assert user_key == throttle_keys("biomed", "admin", "10.0.0.1")[0]
+    assert user_key != throttle_keys("coosalud", "admin", "10.0.0.1")[0]
+    assert "admin" not in user_key
+    assert ip_key == "ip:biomed:10.0.0.1"
+
+
+def test_lockout_duration():
+    assert [lockout_duration(count, 60, 3600) for count in (1, 2, 3, 7, 8)] == [60, 120, 240, 3600, 3600]
+
+
+def test_disabled_throttle_never_blocks():
+    throttle = LoginThrottle(enabled=False)
+    assert fail(throttle, 10) == 0.0
+    assert check(throttle) == 0.0
+
+
+def test_unreachable_redis_falls_back_to_memory(clock):
+    """Si Redis no responde el límite se aplica con el estado en memoria"""
+    throttle = LoginThrottle(lockout_seconds=60, redis_url="redis://127.0.0.1:1/0")
+    if login_throttle_module.redis_asyncio is None:
+        pytest.skip("paquete redis no instalado")
+    assert fail(throttle, 3) == 60.0
+    assert check(throttle) == pytest.approx(60.0)
+
+
+
+def test_expired_lockouts_are_pruned(clock):
+    """Los bloqueos vencidos no se acumulan en memoria"""
+    throttle = LoginThrottle(lockout_seconds=60)
+
+    async def lock_many():
+        for index in range(10000):
+            await throttle.record_failure("default", f"user{index}", "10.0.0.1", 1)
+
+    asyncio.run(lock_many())
+    memory = throttle._memory
+    assert len(memory._locked_until) >= 10000
+    clock.now += login_throttle_module.LOCKOUT_MEMORY_SECONDS + 1
+    fail(throttle, 1, username="otro", client_ip="10.0.0.2")
+    assert len(memory._locked_until) == 0
+    assert len(memory._lockouts) == 0
+    assert len(memory._failures) == 2
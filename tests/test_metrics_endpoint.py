@@ -0,0 +1,51 @@
+"""
+Tests del acceso a /metrics (desactivado por defecto, token o red interna)
+"""
+import asyncio
+
+import pytest
+from fastapi.exceptions import HTTPException
+from starlette.requests import Request
+
+import main
+from config.settings import settings
+
+
+def make_request(peer: str, authorization: str = "") -> Request:
+    headers = [(b"authorization", authorization.encode("latin-1"))] if authorization else []
+    return Request({"type": "http", "method": "GET", "path": "/metrics", "client": (peer, 50000),
+                    "headers": headers, "query_string": b""})
+
+
+def read_metrics(request: Request):
+    return asyncio.run(main.metrics_endpoint(request))
+
+
+def test_disabled_endpoint_is_not_found(monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_ENABLED", False)
+    with pytest.raises(HTTPException) as excinfo:
+        read_metrics(make_request("127.0.0.1"))
+    assert excinfo.value.status_code == 404
+
+
+def test_internal_network_only_without_token(monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_ENABLED", True)
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "")
+    assert "counters" in read_metrics(make_request("127.0.0.1"))
+    with pytest.raises(HTTPException):
+        read_metrics(make_request("203.0.113.7"))
+
+
+def test_token_is_required_when_configured(monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_ENABLED", True)
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "s3creto")
+    assert "counters" in read_metrics(make_request("203.0.113.7", "Bearer s3creto"))
+    for authorization in ("", "Bearer otro", "Basic s3creto"):
+        with pytest.raises(HTTPException):
+            read_metrics(make_request("127.0.0.1", authorization))
+
+
+def test_metrics_is_not_a_public_path():
+    """/metrics no figura entre las rutas que AuthMiddleware deja pasar sin sesión"""
+    auth_middleware = next(m for m in main.app.user_middleware if m.cls.__name__ == "AuthMiddleware")
+    assert "/metrics" not in auth_middleware.options["excluded_paths"]
@@ -0,0 +1,63 @@
+"""
+Tests de la cache de páginas anónimas (solo la página canónica se cachea)
+"""
+import asyncio
+from typing import Optional
+
+from fastapi.responses import HTMLResponse
+from starlette.requests import Request
+
+from utils import page_cache as page_cache_module
+from utils.page_cache import PageCache, cached_page
+
+
+def make_request() -> Request:
+    request = Request({"type": "http", "method": "GET", "path": "/login", "headers": [], "query_string": b""})
+    request.state.tenant_id = "biomed"
+    return request
+
+
+def make_view(renders: list):
+    @cached_page("auth/login.html", vary=("error", "message"))
+    async def view(request: Request, error: Optional[str] = None, message: Optional[str] = None):
+        renders.append((error, message))
+        return HTMLResponse(f"<p>{error or ''}{message or ''}</p>")
+    return view
+
+
+def test_canonical_page_is_cached(monkeypatch):
+    """Sin parámetros la segunda visita sale de la cache"""
+    cache = PageCache(max_entries=10)
+    monkeypatch.setattr(page_cache_module, "page_cache", cache)
+    renders = []
+    view = make_view(renders)
+
+    for _ in range(3):
+        response = asyncio.run(view(request=make_request(), error=None, message=""))
+        assert response.body == b"<p></p>"
+    assert len(renders) == 1
+    assert cache.stats()["entries"] == 1
+
+
+def test_free_text_params_bypass_the_cache(monkeypatch):
+    """Valores arbitrarios en la URL no agregan entradas a la LRU"""
+    cache = PageCache(max_entries=10)
+    monkeypatch.setattr(page_cache_module, "page_cache", cache)
+    renders = []
+    view = make_view(renders)
+
+    for index in range(20):
+        response = asyncio.run(view(request=make_request(), error=f"error-{index}", message=None))
+        assert response.body == f"<p>error-{index}</p>".encode()
+    asyncio.run(view(request=make_request(), error="error-0", message=None))
+
+    stats = cache.stats()
+    assert len(renders) == 21
+    assert stats["entries"] == 0
+    assert stats["bypasses"] == 21
+
+
+def test_make_key_only_for_empty_params():
+    cache = PageCache()
+    assert cache.make_key("biomed", "auth/login.html", {"error": None, "message": "  "}) is not None
+    assert cache.make_key("biomed", "auth/login.html", {"error": "x", "message": None}) is None
@@ -0,0 +1,99 @@
+"""
+Tests de la sesión en cookie firmada (sin Set-Cookie si la sesión no cambió)
+"""
+import asyncio
+import json
+from datetime import datetime, timedelta
+from http.cookies import SimpleCookie
+
+from starlette.middleware.sessions import SessionMiddleware
+
+from middleware.session_middleware import CustomSessionMiddleware, EnhancedSessionManager
+
+
+async def endpoint(scope, receive, send):
+    """/login autentica, /touch cambia la sesión, /logout la borra; el resto solo la lee"""
+    session = scope["session"]
+    if scope["path"] == "/login":
+        session.update(authenticated=True, username="admin")
+    elif scope["path"] == "/touch":
+        session["visits"] = session.get("visits", 0) + 1
+    elif scope["path"] == "/logout":
+        session.clear()
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": json.dumps(session).encode("utf-8")})
+
+
+def make_app(app_class=CustomSessionMiddleware):
+    return app_class(endpoint, secret_key="test-secret", session_cookie="session", max_age=3600, https_only=True)
+
+
+def call(app, path, cookie=None):
+    """Ejecuta un request; devuelve (sesión vista por el endpoint, valor del Set-Cookie o None)"""
+    headers = [(b"cookie", f"session={cookie}".encode("latin-1"))] if cookie else []
+    scope = {"type": "http", "method": "GET", "path": path, "headers": headers, "query_string": b""}
+    result = {"cookie": None, "body": b""}
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            for name, value in message["headers"]:
+                if name == b"set-cookie":
+                    result["cookie"] = SimpleCookie(value.decode("latin-1"))["session"].value
+        else:
+            result["body"] += message.get("body", b"")
+
+    asyncio.run(app(scope, receive, send))
+    return json.loads(result["body"]), result["cookie"]
+
+
+def test_unchanged_session_sends_no_cookie():
+    """Un request que solo lee la sesión no vuelve a firmarla ni manda Set-Cookie"""
+    app = make_app()
+    _, cookie = call(app, "/login")
+    assert cookie
+    session, set_cookie = call(app, "/page", cookie)
+    assert session == {"authenticated": True, "username": "admin"}
+    assert set_cookie is None
+
+
+def test_changed_session_is_signed_again():
+    app = make_app()
+    _, cookie = call(app, "/login")
+    _, updated = call(app, "/touch", cookie)
+    assert updated and updated != cookie
+    session, _ = call(app, "/page", updated)
+    assert session["visits"] == 1
+
+
+def test_logout_clears_cookie_and_anonymous_sends_none():
+    app = make_app()
+    _, cookie = call(app, "/login")
+    assert call(app, "/logout", cookie)[1] == "null"
+    assert call(app, "/page") == ({}, None)
+
+
+def test_cookies_from_starlette_middleware_stay_valid():
+    """El formato de la cookie es el de Starlette: las sesiones existentes siguen válidas"""
+    _, cookie = call(make_app(SessionMiddleware), "/login")
+    session, set_cookie = call(make_app(), "/page", cookie)
+    assert session == {"authenticated": True, "username": "admin"}
+    assert set_cookie is None
+
+
+def test_tampered_cookie_starts_empty_session():
+    app = make_app()
+    _, cookie = call(app, "/login")
+    assert call(app, "/page", cookie[:-2] + "xx") == ({}, None)
+
+
+def test_last_activity_respects_granularity():
+    """last_activity solo cambia una vez por intervalo"""
+    session = {}
+    assert EnhancedSessionManager.update_last_activity(session, granularity=60) is True
+    assert EnhancedSessionManager.update_last_activity(session, granularity=60) is False
+    session["last_activity"] = (datetime.now() - timedelta(seconds=61)).isoformat()
+    assert EnhancedSessionManager.update_last_activity(session, granularity=60) is True
+    assert EnhancedSessionManager.update_last_activity(session, granularity=0) is True
@@ -0,0 +1,149 @@
+"""
+Tests de las sesiones del lado del servidor (escritura, rotación de ID y borrado)
+"""
+import asyncio
+import json
+from http.cookies import SimpleCookie
+
+from middleware.session_middleware import CustomSessionMiddleware
+from services.session_store import MemoryBackend, SessionStore, SqliteBackend
+
+
+class SlowBackend(MemoryBackend):
+    """Backend compartido (como Redis entre workers) que tarda en escribir"""
+
+    def __init__(self, delay: float = 0.05):
+        super().__init__()
+        self.delay = delay
+
+    async def save(self, session_id, data, ttl):
+        await asyncio.sleep(self.delay)
+        await super().save(session_id, data, ttl)
+
+    async def delete(self, session_id):
+        await asyncio.sleep(self.delay)
+        await super().delete(session_id)
+
+
+def build_app(store):
+    """App mínima: /anon crea una sesión anónima, /login la autentica, /touch la cambia, /logout la borra"""
+    async def endpoint(scope, receive, send):
+        session = scope["session"]
+        if scope["path"] == "/anon":
+            session["csrf"] = "token"
+        elif scope["path"] == "/login":
+            session.update(authenticated=True, username="admin")
+        elif scope["path"] == "/touch":
+            session["last_activity"] = session.get("last_activity", 0) + 1
+        elif scope["path"] == "/logout":
+            session.clear()
+        body = json.dumps(session).encode("utf-8")
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": body})
+
+    return CustomSessionMiddleware(endpoint, secret_key="test-secret", session_cookie="session_id",
+                                   max_age=3600, https_only=True, store=store)
+
+
+async def call(app, path, session_id=None):
+    """Ejecuta un request; devuelve (sesión vista por el endpoint, valor del Set-Cookie o None)"""
+    headers = [(b"cookie", f"session_id={session_id}".encode("latin-1"))] if session_id else []
+    scope = {"type": "http", "method": "GET", "path": path, "headers": headers, "query_string": b""}
+    result = {"cookie": None, "body": b""}
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            for name, value in message["headers"]:
+                if name == b"set-cookie":
+                    result["cookie"] = SimpleCookie(value.decode("latin-1"))["session_id"].value
+        else:
+            result["body"] += message.get("body", b"")
+
+    await app(scope, receive, send)
+    return json.loads(result["body"]), result["cookie"]
+
+
+def test_new_session_is_visible_to_other_workers():
+    """Tras el login otro worker (otro SessionStore, mismo backend) ya ve la sesión"""
+    async def scenario():
+        backend = SlowBackend()
+        worker_a = build_app(SessionStore(backend, ttl=3600))
+        worker_b = build_app(SessionStore(backend, ttl=3600))
+        _, session_id = await call(worker_a, "/login")
+        session, cookie = await call(worker_b, "/page", session_id)
+        return session, cookie
+
+    session, cookie = asyncio.run(scenario())
+    assert session == {"authenticated": True, "username": "admin"}
+    assert cookie is None  # Sin cambios: sin Set-Cookie
+
+
+def test_login_rotates_id_and_deletes_previous():
+    """El ID cambia al autenticarse y el ID anterior deja de existir en el backend"""
+    async def scenario():
+        backend = SlowBackend()
+        app = build_app(SessionStore(backend, ttl=3600))
+        _, anonymous_id = await call(app, "/anon")
+        _, authenticated_id = await call(app, "/login", anonymous_id)
+        return backend, anonymous_id, authenticated_id
+
+    backend, anonymous_id, authenticated_id = asyncio.run(scenario())
+    assert authenticated_id and authenticated_id != anonymous_id
+    assert asyncio.run(backend.load(anonymous_id)) is None
+    assert json.loads(asyncio.run(backend.load(authenticated_id)))["csrf"] == "token"
+
+
+def test_logout_is_visible_to_other_workers():
+    """Tras el logout la sesión ya no existe para otro worker"""
+    async def scenario():
+        backend = SlowBackend()
+        worker_a = build_app(SessionStore(backend, ttl=3600))
+        worker_b = build_app(SessionStore(backend, ttl=3600))
+        _, session_id = await call(worker_a, "/login")
+        _, cleared = await call(worker_a, "/logout", session_id)
+        session, _ = await call(worker_b, "/page", session_id)
+        return cleared, session
+
+    cleared, session = asyncio.run(scenario())
+    assert cleared == "null"
+    assert session == {}
+
+
+def test_updates_to_existing_session_are_written_behind():
+    """Un cambio en una sesión existente no espera al backend pero el mismo proceso lo lee"""
+    async def scenario():
+        backend = SlowBackend()
+        store = SessionStore(backend, ttl=3600)
+        app = build_app(store)
+        _, session_id = await call(app, "/login")
+        await call(app, "/touch", session_id)
+        in_backend = json.loads(await backend.load(session_id))
+        same_worker, _ = await call(app, "/page", session_id)
+        await store.flush()
+        flushed = json.loads(await backend.load(session_id))
+        return in_backend, same_worker, flushed, store.stats()["pending_writes"]
+
+    in_backend, same_worker, flushed, pending = asyncio.run(scenario())
+    assert "last_activity" not in in_backend
+    assert same_worker["last_activity"] == 1
+    assert flushed["last_activity"] == 1
+    assert pending == 0
+
+
+def test_sqlite_backend_round_trip(tmp_path):
+    """El backend SQLite guarda, lee y borra sesiones"""
+    async def scenario():
+        store = SessionStore(SqliteBackend(str(tmp_path / "sessions.sqlite3")), ttl=3600)
+        await store.save("abc", json.dumps({"username": "admin"}), wait=True)
+        loaded = await store.load("abc")
+        await store.delete("abc")
+        deleted = await store.load("abc")
+        await store.aclose()
+        return loaded, deleted
+
+    loaded, deleted = asyncio.run(scenario())
+    assert loaded == {"username": "admin"}
+    assert deleted is None
@@ -0,0 +1,68 @@
+"""
+Tests de /tenant.css y /tenant/config.js versionados (ETag, 304 y cache inmutable)
+"""
+from starlette.requests import Request
+
+from config.tenant_config import tenant_config
+from services.tenant_service import (
+    IMMUTABLE_CACHE_CONTROL,
+    REVALIDATE_CACHE_CONTROL,
+    TenantService,
+)
+
+
+def make_request(if_none_match: str = "") -> Request:
+    """Request con el bundle del tenant 'default' ya resuelto por el middleware"""
+    headers = [(b"if-none-match", if_none_match.encode("latin-1"))] if if_none_match else []
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/tenant.css",
+        "headers": headers,
+        "query_string": b"",
+        "state": {"tenant_id": "default", "tenant_bundle": tenant_config.get_tenant_bundle("default")},
+    })
+
+
+def test_versioned_url_is_immutable():
+    """La URL con hash se sirve con cache inmutable y ETag fuerte"""
+    bundle = tenant_config.get_tenant_bundle("default")
+    response = TenantService.get_tenant_asset_response(make_request(), "css", bundle.css_version)
+    assert response.status_code == 200
+    assert response.body == bundle.css_bytes
+    assert response.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+    assert response.headers["etag"] == f'"{bundle.css_version}"'
+
+
+def test_unversioned_or_unknown_version_revalidates():
+    """Sin versión, o con un hash que ya no existe, se revalida en cada uso"""
+    bundle = tenant_config.get_tenant_bundle("default")
+    for version in (None, "0000000000000000"):
+        response = TenantService.get_tenant_asset_response(make_request(), "js", version)
+        assert response.status_code == 200
+        assert response.body == bundle.js_bytes
+        assert response.headers["cache-control"] == REVALIDATE_CACHE_CONTROL
+        assert response.headers["etag"] == bundle.js_etag
+
+
+def test_matching_etag_returns_304():
+    """If-None-Match con el ETag vigente (también débil o en lista) responde 304 sin cuerpo"""
+    bundle = tenant_config.get_tenant_bundle("default")
+    for if_none_match in (bundle.css_etag, f"W/{bundle.css_etag}", f'"otro", {bundle.css_etag}', "*"):
+        response = TenantService.get_tenant_asset_response(make_request(if_none_match), "css")
+        assert response.status_code == 304
+        assert response.body == b""
+        assert response.headers["etag"] == bundle.css_etag
+
+
+def test_stale_etag_returns_content():
+    response = TenantService.get_tenant_asset_response(make_request('"viejo"'), "css")
+    assert response.status_code == 200
+    assert response.body
+
+
+def test_asset_url_uses_content_hash():
+    """La URL que emiten los templates cambia cuando cambia el contenido"""
+    bundle = tenant_config.get_tenant_bundle("default")
+    assert TenantService.get_tenant_asset_url(make_request(), "css") == f"/tenant.{bundle.css_version}.css"
+    assert TenantService.get_tenant_asset_url(make_request(), "js") == f"/tenant/config.{bundle.js_version}.js"
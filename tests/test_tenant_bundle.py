@@ -0,0 +1,61 @@
+"""
+Tests de los bundles de render precalculados por tenant
+"""
+import dataclasses
+import json
+from pathlib import Path
+
+import pytest
+
+from config.tenant_bundle import build_tenant_bundle, freeze, thaw
+from config.tenant_config import TenantBranding, tenant_config
+
+TENANTS_DIR = Path(__file__).resolve().parent.parent / "config" / "tenants"
+
+
+def load_branding(tenant_id: str) -> TenantBranding:
+    with open(TENANTS_DIR / f"{tenant_id}.json", encoding="utf-8") as f:
+        return TenantBranding(**json.load(f))
+
+
+def test_bundle_is_immutable():
+    """El bundle y su contexto no se pueden modificar durante un request"""
+    bundle = build_tenant_bundle("biomed", load_branding("biomed"))
+    with pytest.raises(TypeError):
+        bundle.context["tenant"]["colors"]["primary"] = "#000000"
+    with pytest.raises(TypeError):
+        bundle.meta_tags["title"] = "otro"
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        bundle.css = ""
+
+
+def test_bundle_renders_tenant_branding():
+    """CSS, JavaScript y meta tags salen de la configuración del tenant"""
+    branding = load_branding("biomed")
+    bundle = build_tenant_bundle("biomed", branding)
+    tenant = bundle.context["tenant"]
+    assert tenant["id"] == "biomed"
+    assert tenant["company_name"] == branding.company_name
+    assert tenant["colors"]["primary"] == branding.primary_color
+    assert f"--tenant-primary-color: {branding.primary_color};" in bundle.css
+    assert "id: 'biomed'" in bundle.js
+    assert bundle.css_bytes == bundle.css.encode("utf-8")
+    assert bundle.js_bytes == bundle.js.encode("utf-8")
+    assert bundle.meta_tags["theme-color"] == branding.primary_color
+
+
+def test_thaw_returns_mutable_copy():
+    """thaw devuelve una copia editable sin tocar el bundle"""
+    frozen = freeze({"tenant": {"colors": {"primary": "#111111"}, "roles": ["admin"]}})
+    copy = thaw(frozen)
+    copy["tenant"]["colors"]["primary"] = "#222222"
+    copy["tenant"]["roles"].append("demo")
+    assert frozen["tenant"]["colors"]["primary"] == "#111111"
+    assert frozen["tenant"]["roles"] == ("admin",)
+
+
+def test_bundles_are_built_once():
+    """Cada request recibe el mismo bundle; un tenant desconocido usa el de 'default'"""
+    bundle = tenant_config.get_tenant_bundle("default")
+    assert tenant_config.get_tenant_bundle("default") is bundle
+    assert tenant_config.get_tenant_bundle("no-existe") is bundle
@@ -0,0 +1,73 @@
+"""
+Tests de la carga lazy de tenants con LRU acotado
+"""
+import json
+import os
+from pathlib import Path
+
+from config.tenant_config import TenantConfig
+
+TENANTS_DIR = Path(__file__).resolve().parent.parent / "config" / "tenants"
+
+
+def write_tenant(config_dir: Path, tenant_id: str, company_name: str):
+    with open(TENANTS_DIR / "biomed.json", encoding="utf-8") as f:
+        data = json.load(f)
+    data["company_name"] = company_name
+    (config_dir / f"{tenant_id}.json").write_text(json.dumps(data), encoding="utf-8")
+
+
+def make_config(config_dir: Path, cache_size: int = 2) -> TenantConfig:
+    for tenant_id in ("alfa", "beta", "gamma"):
+        write_tenant(config_dir, tenant_id, tenant_id.title())
+    config = TenantConfig(config_dir=str(config_dir), lazy=True, cache_size=cache_size)
+    config.load_tenant_configs()
+    return config
+
+
+def test_startup_only_indexes_tenants(tmp_path):
+    """Al arrancar solo se indexan los archivos; nada queda en la cache"""
+    config = make_config(tmp_path)
+    assert set(config.get_available_tenants()) >= {"alfa", "beta", "gamma"}
+    assert config.is_valid_tenant("gamma")
+    assert not config._lazy_cache
+
+
+def test_first_use_loads_and_caches(tmp_path):
+    config = make_config(tmp_path)
+    bundle = config.get_tenant_bundle("alfa")
+    assert config.get_tenant_config("alfa").company_name == "Alfa"
+    assert config.get_tenant_bundle("alfa") is bundle
+
+
+def test_least_recently_used_is_evicted(tmp_path):
+    """Con cache_size=2 el tenant menos usado sale al cargar un tercero"""
+    config = make_config(tmp_path, cache_size=2)
+    alfa = config.get_tenant_bundle("alfa")
+    config.get_tenant_bundle("beta")
+    config.get_tenant_bundle("alfa")  # alfa pasa a ser el más reciente
+    config.get_tenant_bundle("gamma")
+    assert list(config._lazy_cache) == ["alfa", "gamma"]
+    assert config.get_tenant_bundle("alfa") is alfa
+    # beta se vuelve a leer del disco en su siguiente uso
+    assert config.get_tenant_config("beta").company_name == "Beta"
+    assert "beta" in config._lazy_cache
+
+
+def test_evicted_tenant_assets_are_forgotten(tmp_path):
+    config = make_config(tmp_path, cache_size=1)
+    alfa = config.get_tenant_bundle("alfa")
+    assert config.get_bundle_by_asset_version(alfa.js_version) is alfa
+    config.get_tenant_bundle("beta")
+    assert config.get_bundle_by_asset_version(alfa.js_version) is None
+
+
+def test_changed_file_is_reloaded(tmp_path):
+    """Un cambio en el archivo invalida la entrada cacheada"""
+    config = make_config(tmp_path)
+    assert config.get_tenant_config("alfa").company_name == "Alfa"
+    write_tenant(tmp_path, "alfa", "Alfa Salud IPS")
+    stat = os.stat(tmp_path / "alfa.json")
+    os.utime(tmp_path / "alfa.json", ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    config.reload_changed_configs()
+    assert config.get_tenant_config("alfa").company_name == "Alfa Salud IPS"
@@ -0,0 +1,65 @@
+"""
+Tests de la carga de tenants al arrancar (fases, paralelismo e idempotencia)
+"""
+import json
+from pathlib import Path
+
+from config.tenant_config import PARALLEL_PARSE_THRESHOLD, TenantConfig
+
+TENANTS_DIR = Path(__file__).resolve().parent.parent / "config" / "tenants"
+
+
+def write_tenants(config_dir: Path, count: int):
+    with open(TENANTS_DIR / "biomed.json", encoding="utf-8") as f:
+        data = json.load(f)
+    for i in range(count):
+        data["company_name"] = f"Tenant {i}"
+        (config_dir / f"tenant{i:03d}.json").write_text(json.dumps(data), encoding="utf-8")
+
+
+def make_config(config_dir: Path, **kwargs) -> TenantConfig:
+    return TenantConfig(config_dir=str(config_dir), lazy=False, snapshot_path="", **kwargs)
+
+
+def test_construction_reads_nothing(tmp_path):
+    """Crear el TenantConfig no lee archivos; ensure_loaded carga una sola vez"""
+    write_tenants(tmp_path, 2)
+    config = make_config(tmp_path)
+    assert not config.is_valid_tenant("tenant000")
+    assert config.ensure_loaded() is True
+    assert config.ensure_loaded() is False
+    assert config.get_tenant_config("tenant001").company_name == "Tenant 1"
+
+
+def test_parallel_parse_matches_serial(tmp_path):
+    """Leer los JSON en varios hilos da lo mismo que leerlos en uno"""
+    write_tenants(tmp_path, PARALLEL_PARSE_THRESHOLD + 10)
+    serial = make_config(tmp_path, load_workers=1)
+    parallel = make_config(tmp_path, load_workers=4)
+    serial.ensure_loaded()
+    parallel.ensure_loaded()
+    assert dict(parallel.configs) == dict(serial.configs)
+    assert len(parallel.configs) == PARALLEL_PARSE_THRESHOLD + 11  # + default
+
+
+def test_load_timings_per_phase(tmp_path):
+    write_tenants(tmp_path, 3)
+    config = make_config(tmp_path)
+    config.ensure_loaded()
+    assert set(config.load_timings) == {"discover", "parse", "validate", "index", "total"}
+    assert config.load_timings["total"] >= config.load_timings["parse"]
+
+
+def test_invalid_tenants_are_skipped(tmp_path):
+    """Un JSON roto o que no valida no impide cargar el resto"""
+    write_tenants(tmp_path, 2)
+    (tmp_path / "roto.json").write_text("{ no es json", encoding="utf-8")
+    data = json.loads((tmp_path / "tenant000.json").read_text(encoding="utf-8"))
+    data["features"] = {"nuevo_login": 150}
+    (tmp_path / "invalido.json").write_text(json.dumps(data), encoding="utf-8")
+    config = make_config(tmp_path)
+    config.ensure_loaded()
+    assert config.is_valid_tenant("tenant000")
+    assert config.is_valid_tenant("tenant001")
+    assert not config.is_valid_tenant("roto")
+    assert not config.is_valid_tenant("invalido")
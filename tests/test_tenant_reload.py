@@ -0,0 +1,70 @@
+"""
+Tests de la recarga en caliente de tenants con reemplazo atómico del registro
+"""
+import json
+from pathlib import Path
+
+from config.tenant_config import TenantConfig
+
+TENANTS_DIR = Path(__file__).resolve().parent.parent / "config" / "tenants"
+
+
+def write_tenant(config_dir: Path, tenant_id: str, **changes):
+    with open(TENANTS_DIR / "biomed.json", encoding="utf-8") as f:
+        data = json.load(f)
+    data.update(changes)
+    (config_dir / f"{tenant_id}.json").write_text(json.dumps(data), encoding="utf-8")
+
+
+def make_config(config_dir: Path) -> TenantConfig:
+    write_tenant(config_dir, "alfa", company_name="Alfa")
+    write_tenant(config_dir, "beta", company_name="Beta")
+    config = TenantConfig(config_dir=str(config_dir))
+    config.load_tenant_configs()
+    return config
+
+
+def test_reload_swaps_registry_atomically(tmp_path):
+    """La recarga publica un registro nuevo; quien tenía el anterior lo sigue viendo completo"""
+    config = make_config(tmp_path)
+    before = config.registry
+    notified = []
+    config.add_reload_listener(notified.append)
+
+    write_tenant(tmp_path, "alfa", company_name="Alfa Salud IPS")
+    assert config.reload_changed_configs() == {"alfa"}
+
+    after = config.registry
+    assert after is not before
+    assert before.get_config("alfa").company_name == "Alfa"
+    assert after.get_config("alfa").company_name == "Alfa Salud IPS"
+    # Los tenants sin cambios conservan su bundle
+    assert after.get_bundle("beta") is before.get_bundle("beta")
+    assert after.get_bundle("alfa") is not before.get_bundle("alfa")
+    assert notified == [{"alfa"}]
+
+
+def test_reload_without_changes_keeps_registry(tmp_path):
+    config = make_config(tmp_path)
+    before = config.registry
+    assert config.reload_changed_configs() == set()
+    assert config.registry is before
+
+
+def test_invalid_file_keeps_last_good_version(tmp_path):
+    """Un JSON roto no reemplaza la última configuración válida"""
+    config = make_config(tmp_path)
+    (tmp_path / "alfa.json").write_text("{ no es json", encoding="utf-8")
+    assert config.reload_changed_configs() == set()
+    assert config.get_tenant_config("alfa").company_name == "Alfa"
+
+
+def test_added_and_removed_files(tmp_path):
+    config = make_config(tmp_path)
+    write_tenant(tmp_path, "gamma", company_name="Gamma")
+    (tmp_path / "beta.json").unlink()
+    assert config.reload_changed_configs() == {"gamma", "beta"}
+    assert config.is_valid_tenant("gamma")
+    assert not config.is_valid_tenant("beta")
+    # Un tenant eliminado cae en el de 'default'
+    assert config.get_tenant_bundle("beta").tenant_id == "default"
@@ -0,0 +1,74 @@
+"""
+Tests del snapshot compilado de tenants (vigencia por contenido de los JSON)
+"""
+import json
+import os
+import shutil
+from pathlib import Path
+
+import pytest
+
+from config.tenant_config import TenantConfig, scan_tenant_dir
+from config.tenant_snapshot import SnapshotError, compile_tenants, write_snapshot
+
+TENANTS_DIR = Path(__file__).resolve().parent.parent / "config" / "tenants"
+
+
+def build(config_dir: Path) -> str:
+    """Escribe los JSON de prueba y compila su snapshot"""
+    with open(TENANTS_DIR / "biomed.json", encoding="utf-8") as f:
+        data = json.load(f)
+    for i in range(3):
+        data["company_name"] = f"Tenant {i}"
+        (config_dir / f"tenant{i}.json").write_text(json.dumps(data), encoding="utf-8")
+    payload, report = compile_tenants(str(config_dir))
+    assert not report["errors"]
+    snapshot_path = str(config_dir / "tenants.snapshot")
+    write_snapshot(payload, snapshot_path)
+    return snapshot_path
+
+
+def load(config_dir: Path, snapshot_path: str):
+    paths = {tenant_id: path for tenant_id, (path, _) in scan_tenant_dir(str(config_dir)).items()}
+    return TenantConfig.load_snapshot_configs(snapshot_path, paths)
+
+
+def test_copied_files_keep_snapshot_fresh(tmp_path):
+    """Copiar los archivos a otra máquina (fechas distintas) no invalida el snapshot"""
+    source = tmp_path / "ci"
+    source.mkdir()
+    snapshot_path = build(source)
+
+    deployed = tmp_path / "imagen"
+    shutil.copytree(source, deployed)  # copytree preserva mtime: se cambia a mano
+    for path in deployed.glob("*.json"):
+        os.utime(path, ns=(1_000_000_000, 1_000_000_000))
+
+    configs = load(deployed, str(deployed / "tenants.snapshot"))
+    assert configs["tenant1"].company_name == "Tenant 1"
+    assert load(source, snapshot_path).keys() == configs.keys()
+
+
+def test_changed_content_makes_snapshot_stale(tmp_path):
+    snapshot_path = build(tmp_path)
+    path = tmp_path / "tenant0.json"
+    path.write_text(path.read_text(encoding="utf-8").replace("Tenant 0", "Tenant X"), encoding="utf-8")
+    with pytest.raises(SnapshotError):
+        load(tmp_path, snapshot_path)
+
+
+def test_added_tenant_makes_snapshot_stale(tmp_path):
+    snapshot_path = build(tmp_path)
+    shutil.copy(tmp_path / "tenant0.json", tmp_path / "nuevo.json")
+    with pytest.raises(SnapshotError):
+        load(tmp_path, snapshot_path)
+
+
+def test_tenant_config_falls_back_to_json(tmp_path):
+    """Con el snapshot desactualizado TenantConfig carga los JSON"""
+    snapshot_path = build(tmp_path)
+    path = tmp_path / "tenant2.json"
+    path.write_text(path.read_text(encoding="utf-8").replace("Tenant 2", "Tenant Y"), encoding="utf-8")
+    config = TenantConfig(config_dir=str(tmp_path), lazy=False, snapshot_path=snapshot_path)
+    config.ensure_loaded()
+    assert config.get_tenant_config("tenant2").company_name == "Tenant Y"
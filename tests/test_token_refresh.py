@@ -0,0 +1,208 @@
+"""
+Tests del coordinador de refrescos de token (single-flight y refresh-ahead)
+"""
+import asyncio
+
+import httpx
+import pytest
+from starlette.requests import Request
+
+import services.auth_service as auth_service_module
+from services.auth_service import AuthService
+from services.token_refresh import TokenRefresher
+
+
+def make_perform(calls, result, delay=0.05):
+    """POST de refresco simulado que cuenta sus llamadas"""
+    async def perform():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        return result
+    return perform
+
+
+def test_concurrent_refreshes_share_one_request():
+    """Varios requests con el mismo refresh token hacen un solo POST"""
+    async def scenario():
+        refresher = TokenRefresher(result_ttl=10)
+        calls = []
+        perform = make_perform(calls, {"access_token": "nuevo"})
+        results = await asyncio.gather(*[refresher.refresh("default", "rt-1", perform) for _ in range(10)])
+        # Un request que llega después con la cookie vieja reutiliza el resultado
+        late = await refresher.refresh("default", "rt-1", perform)
+        return calls, results, late
+
+    calls, results, late = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert all(result == {"access_token": "nuevo"} for result in results)
+    assert late == {"access_token": "nuevo"}
+
+
+def test_different_refresh_tokens_refresh_independently():
+    """Sesiones distintas no comparten el refresco"""
+    async def scenario():
+        refresher = TokenRefresher()
+        calls = []
+        perform = make_perform(calls, {"access_token": "nuevo"})
+        await asyncio.gather(refresher.refresh("default", "rt-1", perform),
+                             refresher.refresh("default", "rt-2", perform),
+                             refresher.refresh("biomed", "rt-1", perform))
+        return calls
+
+    assert len(asyncio.run(scenario())) == 3
+
+
+def test_rejected_refresh_is_shared():
+    """Un refresco rechazado (None) también se comparte"""
+    async def scenario():
+        refresher = TokenRefresher()
+        calls = []
+        perform = make_perform(calls, None)
+        results = await asyncio.gather(*[refresher.refresh("default", "rt-1", perform) for _ in range(3)])
+        return calls, results
+
+    calls, results = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert results == [None, None, None]
+
+
+def test_cancelled_leader_does_not_fail_the_others():
+    """Si se cancela el request que inició el refresco, los demás reciben el resultado"""
+    async def scenario():
+        refresher = TokenRefresher()
+        calls = []
+        perform = make_perform(calls, {"access_token": "nuevo"})
+        leader = asyncio.ensure_future(refresher.refresh("default", "rt-1", perform))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(refresher.refresh("default", "rt-1", perform))
+        await asyncio.sleep(0)
+        leader.cancel()
+        return calls, await follower, leader
+
+    calls, result, leader = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert result == {"access_token": "nuevo"}
+    assert leader.cancelled()
+
+
+def test_result_is_reused_only_for_result_ttl():
+    """Pasado result_ttl el mismo refresh token vuelve a hacer el POST"""
+    async def scenario():
+        refresher = TokenRefresher(result_ttl=0.05)
+        calls = []
+        perform = make_perform(calls, {"access_token": "nuevo"}, delay=0)
+        await refresher.refresh("default", "rt-1", perform)
+        await refresher.refresh("default", "rt-1", perform)
+        await asyncio.sleep(0.1)
+        await refresher.refresh("default", "rt-1", perform)
+        return calls
+
+    assert len(asyncio.run(scenario())) == 2
+
+
+def test_refresh_ahead_result_outlives_old_token():
+    """El resultado anticipado sigue disponible después del exp del token anterior"""
+    async def scenario():
+        refresher = TokenRefresher(result_ttl=0.01)
+        calls = []
+        perform = make_perform(calls, {"access_token": "nuevo"}, delay=0.01)
+        # Al token actual le quedan 0.05 s; el resultado se guarda por la vida de la sesión
+        started = refresher.refresh_ahead("default", "rt-1", perform, keep_for=max(0.05, 60))
+        again = refresher.refresh_ahead("default", "rt-1", perform, keep_for=60)
+        await asyncio.sleep(0.2)
+        peeked = await refresher.peek("default", "rt-1")
+        # Sesión inactiva que vuelve con el token vencido: no se repite el POST
+        refreshed = await refresher.refresh("default", "rt-1", perform)
+        return calls, started, again, peeked, refreshed
+
+    calls, started, again, peeked, refreshed = asyncio.run(scenario())
+    assert started is True
+    assert again is False
+    assert len(calls) == 1
+    assert peeked == {"access_token": "nuevo"}
+    assert refreshed == {"access_token": "nuevo"}
+
+
+def test_stored_results_are_bounded():
+    """Los resultados en memoria no pasan de max_results"""
+    refresher = TokenRefresher(max_results=3)
+    for index in range(5):
+        refresher._store(f"clave-{index}", {"access_token": str(index)}, keep_for=60)
+    assert list(refresher._results) == ["clave-2", "clave-3", "clave-4"]
+
+
+def test_rejection_is_not_kept_for_the_session_lifetime():
+    """Un rechazo de refresh-ahead solo se reutiliza result_ttl, no keep_for"""
+    async def scenario():
+        refresher = TokenRefresher(result_ttl=0.05)
+        calls = []
+        perform = make_perform(calls, None, delay=0)
+        refresher.refresh_ahead("default", "rt-1", perform, keep_for=60)
+        await asyncio.sleep(0.01)
+        rejected = refresher.refresh_ahead("default", "rt-1", perform, keep_for=60)
+        await asyncio.sleep(0.1)
+        retried = refresher.refresh_ahead("default", "rt-1", perform, keep_for=60)
+        await asyncio.sleep(0.01)
+        return calls, rejected, retried
+
+    calls, rejected, retried = asyncio.run(scenario())
+    assert rejected is False
+    assert retried is True
+    assert len(calls) == 2
+
+
+def test_api_error_is_not_stored():
+    """Un 5xx no cuenta como rechazo: el siguiente request vuelve a intentar"""
+    async def scenario():
+        refresher = TokenRefresher(result_ttl=10)
+        calls = []
+
+        async def perform():
+            calls.append(1)
+            if len(calls) == 1:
+                raise httpx.HTTPStatusError("503", request=httpx.Request("POST", "http://auth"),
+                                            response=httpx.Response(503))
+            return {"access_token": "nuevo"}
+
+        with pytest.raises(httpx.HTTPStatusError):
+            await refresher.refresh("default", "rt-1", perform)
+        peeked = await refresher.peek("default", "rt-1")
+        result = await refresher.refresh("default", "rt-1", perform)
+        return calls, peeked, result
+
+    calls, peeked, result = asyncio.run(scenario())
+    assert len(calls) == 2
+    assert peeked is None
+    assert result == {"access_token": "nuevo"}
+
+
+def refresh_with_status(monkeypatch, status_code):
+    """Ejecuta AuthService.refresh_token contra una API que responde status_code"""
+    client = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(status_code)))
+    monkeypatch.setattr(AuthService, "client", property(lambda self: client))
+    monkeypatch.setattr(auth_service_module, "token_refresher", TokenRefresher())
+    session = {"authenticated": True, "username": "admin", "refresh_token": "rt-1"}
+    request = Request({"type": "http", "method": "GET", "path": "/", "headers": [], "query_string": b"",
+                       "state": {"tenant_id": "default"}, "session": session})
+
+    async def scenario():
+        try:
+            return await AuthService().refresh_token(request)
+        finally:
+            await client.aclose()
+
+    assert asyncio.run(scenario()) is False
+    return session
+
+
+@pytest.mark.parametrize("status_code", [500, 503, 429])
+def test_refresh_keeps_session_when_api_fails(monkeypatch, status_code):
+    """Con 5xx/429 la sesión se conserva; solo un 4xx la borra"""
+    session = refresh_with_status(monkeypatch, status_code)
+    assert session["authenticated"] is True
+    assert session["refresh_token"] == "rt-1"
+
+
+def test_refresh_rejected_by_api_clears_session(monkeypatch):
+    assert refresh_with_status(monkeypatch, 401) == {}
+
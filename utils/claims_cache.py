@@ -0,0 +1,125 @@
+"""
+Cache de claims decodificados de los JWT de sesión
+
+is_authenticated corre en cada request protegido y antes decodificaba el
+mismo access token (base64 + JSON) varias veces por request. ClaimsCache
+guarda los claims por sha256 del token en un LRU acotado; cada entrada
+expira en el `exp` del token, así que un token vencido nunca se sirve
+desde la cache. Los claims se guardan como mappings de solo lectura.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+from config.settings import settings
+from utils.metrics import metrics
+
+
+def token_key(token: str) -> bytes:
+    """Clave de cache de un token (no se guarda el token en memoria)"""
+    return hashlib.sha256(token.encode("utf-8")).digest()
+
+
+class ClaimsCache:
+    """
+    LRU de claims de JWT con expiración en el exp de cada token
+    """
+
+    def __init__(self, max_entries: int = 10000, enabled: bool = True):
+        """
+        Inicializa la cache
+
+        Args:
+            max_entries: Máximo de tokens guardados
+            enabled: False para decodificar siempre (benchmarks, diagnóstico)
+        """
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._entries: "OrderedDict[bytes, Tuple[Mapping[str, Any], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+
+    def get(self, token: str) -> Optional[Mapping[str, Any]]:
+        """
+        Claims del token si están en cache y el token no venció
+
+        Args:
+            token: JWT
+
+        Returns:
+            Optional[Mapping[str, Any]]: Claims (solo lectura) o None
+        """
+        if not self.enabled:
+            return None
+        key = token_key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            claims, expires_at = entry
+            if time.time() >= expires_at:
+                del self._entries[key]
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return claims
+
+    def put(self, token: str, claims: Dict[str, Any]) -> Mapping[str, Any]:
+        """
+        Guarda los claims de un token (solo si tiene exp futuro)
+
+        Args:
+            token: JWT
+            claims: Claims decodificados
+
+        Returns:
+            Mapping[str, Any]: Claims de solo lectura
+        """
+        frozen = MappingProxyType(dict(claims))
+        exp = claims.get("exp")
+        if not self.enabled or not isinstance(exp, (int, float)) or time.time() >= exp:
+            return frozen
+        key = token_key(token)
+        with self._lock:
+            self._entries[key] = (frozen, float(exp))
+            self._entries.move_to_end(key)
+            while len(self._entries) > max(self.max_entries, 1):
+                self._entries.popitem(last=False)
+        return frozen
+
+    def discard(self, token: str):
+        """Elimina un token de la cache (p. ej. al cerrar sesión)"""
+        with self._lock:
+            self._entries.pop(token_key(token), None)
+
+    def clear(self):
+        """Vacía la cache"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Estadísticas para /metrics"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+
+# Instancia global de la cache de claims
+claims_cache = ClaimsCache(max_entries=settings.JWT_CLAIMS_CACHE_SIZE, enabled=settings.JWT_CLAIMS_CACHE_ENABLED)
+metrics.register_collector("jwt_claims_cache", claims_cache.stats)
@@ -0,0 +1,91 @@
+"""
+IP real del cliente detrás de proxies de confianza
+
+X-Forwarded-For y X-Real-IP los puede enviar cualquiera: solo se usan si
+el request llegó desde un proxy configurado en TRUSTED_PROXIES (IPs o
+redes CIDR). X-Forwarded-For se recorre de derecha a izquierda saltando
+los proxies de confianza; la primera IP que no lo es es la del cliente
+(las de más a la izquierda las puede inventar el propio cliente). Sin
+proxies configurados se usa siempre la IP de la conexión.
+"""
+import ipaddress
+import logging
+from typing import List, Optional, Sequence, Union
+
+from fastapi import Request
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+Network = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+
+
+def parse_networks(value: str) -> List[Network]:
+    """
+    Convierte una lista separada por comas de IPs o redes CIDR
+
+    Args:
+        value: Ej. "10.0.0.0/8, 127.0.0.1"
+
+    Returns:
+        List[Network]: Redes válidas (las inválidas se registran y se ignoran)
+    """
+    networks = []
+    for item in value.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        try:
+            networks.append(ipaddress.ip_network(item, strict=False))
+        except ValueError:
+            logger.warning(f"⚠️ IP o red inválida ignorada: {item}")
+    return networks
+
+
+def ip_in_networks(host: Optional[str], networks: Sequence[Network]) -> bool:
+    """True si la IP pertenece a alguna de las redes"""
+    if not host or not networks:
+        return False
+    try:
+        address = ipaddress.ip_address(host.strip())
+    except ValueError:
+        return False
+    return any(address in network for network in networks)
+
+
+# Proxies de confianza de settings.TRUSTED_PROXIES
+TRUSTED_PROXY_NETWORKS = parse_networks(settings.TRUSTED_PROXIES)
+
+
+def get_client_ip(request: Request, trusted: Optional[Sequence[Network]] = None) -> str:
+    """
+    IP del cliente considerando solo proxies de confianza
+
+    Args:
+        request: Request de FastAPI
+        trusted: Redes de proxies de confianza (None = TRUSTED_PROXIES)
+
+    Returns:
+        str: IP del cliente o "unknown"
+    """
+    trusted = TRUSTED_PROXY_NETWORKS if trusted is None else trusted
+    client = getattr(request, "client", None)
+    peer = client.host if client else None
+    if not ip_in_networks(peer, trusted):
+        return peer or "unknown"
+
+    forwarded_for = request.headers.get("X-Forwarded-For")
+    if forwarded_for:
+        hops = [hop.strip() for hop in forwarded_for.split(",") if hop.strip()]
+        for hop in reversed(hops):
+            if not ip_in_networks(hop, trusted):
+                return hop
+        if hops:
+            return hops[0]
+
+    real_ip = request.headers.get("X-Real-IP")
+    if real_ip:
+        return real_ip.strip()
+
+    return peer
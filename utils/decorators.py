@@ -7,7 +7,7 @@ from fastapi.responses import RedirectResponse
 from typing import List, Callable, Any
 import logging
 
-from services.auth_service import AuthService
+from services.auth_service import get_auth_context
 from config.settings import settings
 
 logger = logging.getLogger(__name__)
@@ -41,9 +41,10 @@ def login_required(func: Callable) -> Callable:
                 detail="Request object not found"
             )
         
-        auth_service = AuthService()
+        # Reutiliza el estado ya resuelto por AuthMiddleware en este request
+        auth = await get_auth_context(request)
         
-        if not await auth_service.is_authenticated(request):
+        if not auth.authenticated:
             # Verificar si es una petición API o web
             if _is_api_request(request):
                 raise HTTPException(
@@ -88,9 +89,9 @@ def guest_required(func: Callable) -> Callable:
                 detail="Request object not found"
             )
         
-        auth_service = AuthService()
+        auth = await get_auth_context(request)
         
-        if await auth_service.is_authenticated(request):
+        if auth.authenticated:
             # Usuario ya autenticado, redirigir al dashboard
             return RedirectResponse(url="/dashboard", status_code=302)
         
@@ -127,10 +128,10 @@ def role_required(roles: List[str]) -> Callable:
                     detail="Request object not found"
                 )
             
-            auth_service = AuthService()
+            auth = await get_auth_context(request)
             
             # Verificar autenticación
-            if not await auth_service.is_authenticated(request):
+            if not auth.authenticated:
                 if _is_api_request(request):
                     raise HTTPException(
                         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -142,7 +143,7 @@ def role_required(roles: List[str]) -> Callable:
                     return RedirectResponse(url=login_url, status_code=302)
             
             # Verificar roles
-            if not auth_service.has_any_role(request, roles):
+            if not auth.has_any_role(roles):
                 if _is_api_request(request):
                     raise HTTPException(
                         status_code=status.HTTP_403_FORBIDDEN,
@@ -197,9 +198,10 @@ def api_auth_required(func: Callable) -> Callable:
                 detail="Request object not found"
             )
         
-        auth_service = AuthService()
+        # Reutiliza el estado ya resuelto por AuthMiddleware en este request
+        auth = await get_auth_context(request)
         
-        if not await auth_service.is_authenticated(request):
+        if not auth.authenticated:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Token de autenticación requerido",
@@ -0,0 +1,373 @@
+"""
+Variantes responsivas precalculadas de las imágenes de los tenants
+
+Para cada imagen local de un tenant (logo, hero y fondo bajo /static) se
+generan versiones WebP y JPEG redimensionadas a varios anchos en un
+directorio de cache direccionado por contenido: el nombre de cada archivo
+es el hash del original, así que una imagen que no cambió nunca se vuelve
+a procesar y una que cambió obtiene URLs nuevas (cacheables para siempre).
+El trabajo se reparte en un pool de procesos, una tarea por imagen.
+
+Las fuentes con transparencia (logos PNG) usan PNG como formato de respaldo
+en lugar de JPEG para no perder el canal alfa.
+
+manifest.json relaciona cada URL original con sus variantes y lo usan las
+funciones de Jinja2 image_sources / image_srcset para emitir srcset/sizes.
+Si Pillow no está instalado o una imagen no tiene variantes, los templates
+siguen usando la URL original.
+
+Uso:
+    python -m utils.image_variants [--workers 4] [--widths 320,640,960,1280]
+"""
+import argparse
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set
+
+from markupsafe import Markup
+
+from config.settings import settings
+from utils.metrics import metrics
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover - depende del entorno
+    Image = None
+    ImageOps = None
+
+logger = logging.getLogger(__name__)
+
+STATIC_URL_PREFIX = "/static/"
+STATIC_DIR = "static"
+MANIFEST_NAME = "manifest.json"
+
+# Campos de TenantBranding con imágenes que se derivan
+IMAGE_FIELDS = ("logo_url", "hero_image_url", "background_image_url")
+
+# Formato -> extensión de archivo
+EXTENSIONS = {"webp": "webp", "jpeg": "jpg", "png": "png"}
+
+WEBP_QUALITY = 80
+JPEG_QUALITY = 82
+
+
+def parse_widths(value: str) -> List[int]:
+    """
+    Convierte "320,640,960" en una lista ordenada de anchos
+
+    Args:
+        value: Anchos separados por comas
+
+    Returns:
+        List[int]: Anchos válidos sin repetir
+    """
+    widths = set()
+    for item in value.split(","):
+        item = item.strip()
+        if item.isdigit() and int(item) > 0:
+            widths.add(int(item))
+    return sorted(widths)
+
+
+def static_source_path(url: str) -> Optional[str]:
+    """
+    Ruta en disco de una URL /static/... (None si es externa o sale de static/)
+
+    Args:
+        url: URL de la imagen configurada en el tenant
+
+    Returns:
+        Optional[str]: Ruta del archivo original
+    """
+    if not url or not url.startswith(STATIC_URL_PREFIX):
+        return None
+    path = os.path.normpath(os.path.join(STATIC_DIR, url[len(STATIC_URL_PREFIX):].split("?", 1)[0]))
+    if not path.startswith(STATIC_DIR + os.sep):
+        return None
+    return path
+
+
+def cache_dir_url(cache_dir: str) -> str:
+    """URL pública del directorio de cache (debe estar dentro de static/)"""
+    relative = os.path.relpath(cache_dir, STATIC_DIR).replace(os.sep, "/")
+    return STATIC_URL_PREFIX + relative.strip("/")
+
+
+def _save_atomic(image, path: str, fmt: str, **options):
+    """Guarda la imagen en un temporal y la renombra (nunca queda un archivo a medias)"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".variant-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            image.save(f, fmt, **options)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def generate_variants(source: str, cache_dir: str, widths: Sequence[int]) -> Dict[str, Any]:
+    """
+    Genera las variantes de una imagen (se ejecuta en un proceso del pool)
+
+    Args:
+        source: Ruta del archivo original
+        cache_dir: Directorio de cache
+        widths: Anchos deseados (se limitan al ancho original)
+
+    Returns:
+        Dict[str, Any]: Entrada del manifest con hash, tamaño y variantes
+    """
+    with open(source, "rb") as f:
+        data = f.read()
+    digest = hashlib.sha256(data).hexdigest()[:16]
+    stat = os.stat(source)
+
+    with Image.open(source) as opened:
+        image = ImageOps.exif_transpose(opened)
+        width, height = image.size
+        has_alpha = image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info
+        fallback = "png" if has_alpha else "jpeg"
+        image = image.convert("RGBA" if has_alpha else "RGB")
+
+        targets = sorted({w for w in widths if w < width} | {width})
+        variants: Dict[str, List[List[Any]]] = {"webp": [], fallback: []}
+        generated = 0
+        for target in targets:
+            resized = None
+            for fmt in ("webp", fallback):
+                name = f"{digest}-{target}w.{EXTENSIONS[fmt]}"
+                path = os.path.join(cache_dir, name)
+                if not os.path.exists(path):
+                    if resized is None:
+                        resized = image if target == width else image.resize(
+                            (target, max(1, round(height * target / width))), Image.LANCZOS
+                        )
+                    if fmt == "webp":
+                        _save_atomic(resized, path, "WEBP", quality=WEBP_QUALITY, method=6)
+                    elif fmt == "jpeg":
+                        _save_atomic(resized, path, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+                    else:
+                        _save_atomic(resized, path, "PNG", optimize=True)
+                    generated += 1
+                variants[fmt].append([name, target])
+
+    return {
+        "hash": digest,
+        "source": [stat.st_mtime_ns, stat.st_size],
+        "width": width,
+        "height": height,
+        "fallback": fallback,
+        "variants": variants,
+        "generated": generated,
+    }
+
+
+def collect_tenant_image_urls(config) -> Set[str]:
+    """
+    URLs locales de imágenes de todos los tenants
+
+    Args:
+        config: TenantConfig
+
+    Returns:
+        Set[str]: URLs /static/... de logos, heroes y fondos
+    """
+    urls = set()
+    for tenant_id in config.get_available_tenants():
+        branding = config.get_tenant_config(tenant_id)
+        for field_name in IMAGE_FIELDS:
+            url = getattr(branding, field_name, "")
+            if static_source_path(url):
+                urls.add(url)
+    return urls
+
+
+class ImageVariants:
+    """
+    Manifest de variantes y generación en un pool de procesos
+    """
+
+    def __init__(self, cache_dir: str, widths: Sequence[int]):
+        """
+        Inicializa el manejador
+
+        Args:
+            cache_dir: Directorio de cache (dentro de static/)
+            widths: Anchos a generar
+        """
+        self.cache_dir = cache_dir
+        self.widths = list(widths)
+        self.base_url = cache_dir_url(cache_dir)
+        self.manifest: Dict[str, Dict[str, Any]] = {}
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.cache_dir, MANIFEST_NAME)
+
+    def load_manifest(self) -> int:
+        """
+        Carga manifest.json (si existe)
+
+        Returns:
+            int: Imágenes con variantes
+        """
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)["images"]
+        except FileNotFoundError:
+            manifest = {}
+        except Exception as e:
+            logger.warning(f"⚠️ Manifest de imágenes ilegible ({self.manifest_path}): {e}")
+            manifest = {}
+        self.manifest = manifest
+        return len(manifest)
+
+    def build(self, urls: Iterable[str], workers: int = 0) -> Dict[str, Any]:
+        """
+        Genera las variantes que falten y publica el manifest nuevo
+
+        Args:
+            urls: URLs /static/... de las imágenes originales
+            workers: Procesos del pool (0 = número de CPUs)
+
+        Returns:
+            Dict[str, Any]: Resumen (imágenes, archivos generados, errores, segundos)
+        """
+        if Image is None:
+            logger.warning("⚠️ Pillow no está instalado: no se generan variantes de imágenes")
+            return {"images": 0, "generated": 0, "errors": 0, "seconds": 0.0}
+
+        start_time = time.perf_counter()
+        sources = {}
+        for url in sorted(set(urls)):
+            path = static_source_path(url)
+            if path and os.path.isfile(path):
+                sources[url] = path
+            elif path:
+                logger.warning(f"⚠️ Imagen de tenant no encontrada: {url}")
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        manifest: Dict[str, Dict[str, Any]] = {}
+        generated = errors = 0
+        if sources:
+            workers = min(workers or os.cpu_count() or 1, len(sources))
+            # spawn: el pool se crea desde un hilo del servidor y fork no es seguro ahí
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+                futures = {
+                    pool.submit(generate_variants, path, self.cache_dir, self.widths): url
+                    for url, path in sources.items()
+                }
+                for future in as_completed(futures):
+                    url = futures[future]
+                    try:
+                        entry = future.result()
+                    except Exception as e:
+                        errors += 1
+                        logger.error(f"❌ Error generando variantes de {url}: {e}")
+                        # Se conservan las variantes anteriores de la imagen, si había
+                        if url in self.manifest:
+                            manifest[url] = self.manifest[url]
+                        continue
+                    generated += entry.pop("generated")
+                    manifest[url] = entry
+
+        self._write_manifest(manifest)
+        self.manifest = manifest
+
+        elapsed = time.perf_counter() - start_time
+        metrics.increment("image_variants_generated_total", generated)
+        metrics.observe("image_variants_build_seconds", elapsed)
+        logger.info(f"🖼️ Variantes de imágenes: {len(manifest)} imágenes, {generated} archivos nuevos "
+                    f"en {elapsed:.2f}s")
+        return {"images": len(manifest), "generated": generated, "errors": errors, "seconds": elapsed}
+
+    def _write_manifest(self, manifest: Dict[str, Dict[str, Any]]):
+        """Guarda el manifest de forma atómica"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=".manifest-", suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"widths": self.widths, "images": manifest}, f, indent=2, sort_keys=True)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, self.manifest_path)
+
+    def srcset(self, url: str, fmt: Optional[str] = None) -> str:
+        """
+        Valor de srcset para una imagen
+
+        Args:
+            url: URL original
+            fmt: "webp" o None para el formato de respaldo (JPEG o PNG)
+
+        Returns:
+            str: "url 320w, url 640w, ..." o "" si no hay variantes
+        """
+        entry = self.manifest.get(url)
+        if not entry:
+            return ""
+        variants = entry["variants"].get(fmt or entry["fallback"], [])
+        return ", ".join(f"{self.base_url}/{name} {width}w" for name, width in variants)
+
+    def stats(self) -> Dict[str, Any]:
+        """Estado para /metrics"""
+        return {"images": len(self.manifest), "widths": self.widths, "pillow": Image is not None}
+
+
+# Instancia global
+image_variants = ImageVariants(settings.IMAGE_CACHE_DIR, parse_widths(settings.IMAGE_VARIANT_WIDTHS))
+metrics.register_collector("image_variants", image_variants.stats)
+
+
+def image_sources(url: str, sizes: str = "100vw") -> Markup:
+    """
+    Función global de Jinja2: <source> WebP para usar dentro de <picture>
+
+    Uso en templates:
+        <picture>{{ image_sources(tenant.hero_image_url, '50vw') }}<img ...></picture>
+    """
+    srcset = image_variants.srcset(url, "webp")
+    if not srcset:
+        return Markup("")
+    return Markup('<source type="image/webp" srcset="{}" sizes="{}">').format(srcset, sizes)
+
+
+def image_srcset(url: str, sizes: str = "100vw") -> Markup:
+    """
+    Función global de Jinja2: atributos srcset/sizes del <img> (formato de respaldo)
+
+    Uso en templates: <img src="{{ url }}" {{ image_srcset(url, '50vw') }}>
+    """
+    srcset = image_variants.srcset(url)
+    if not srcset:
+        return Markup("")
+    return Markup('srcset="{}" sizes="{}"').format(srcset, sizes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera las variantes responsivas de las imágenes de los tenants")
+    parser.add_argument("--workers", type=int, default=settings.IMAGE_VARIANT_WORKERS,
+                        help="Procesos del pool (0 = número de CPUs)")
+    parser.add_argument("--widths", default=settings.IMAGE_VARIANT_WIDTHS, help="Anchos separados por comas")
+    parser.add_argument("--cache-dir", default=settings.IMAGE_CACHE_DIR)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    from config.tenant_config import tenant_config
+    tenant_config.ensure_loaded()
+
+    builder = ImageVariants(args.cache_dir, parse_widths(args.widths))
+    result = builder.build(collect_tenant_image_urls(tenant_config), workers=args.workers)
+    print(json.dumps(result))
+    if result["errors"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
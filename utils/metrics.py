@@ -0,0 +1,155 @@
+"""
+Métricas en memoria del proceso (contadores, gauges y tiempos)
+
+Registro simple y thread-safe que se expone en /metrics como JSON. No
+depende de librerías externas; si en el futuro se usa Prometheus basta con
+adaptar snapshot().
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Tuple
+
+
+def _metric_key(name: str, labels: Dict[str, Any]) -> str:
+    """Clave estilo Prometheus: nombre{label="valor",...}"""
+    if not labels:
+        return name
+    rendered = ",".join(f'{key}="{labels[key]}"' for key in sorted(labels))
+    return f"{name}{{{rendered}}}"
+
+
+class Metrics:
+    """
+    Registro de métricas del proceso
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = {}
+        self._gauges: Dict[str, float] = {}
+        self._timings: Dict[str, Dict[str, float]] = {}
+        self._collectors: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+    def increment(self, name: str, value: float = 1, **labels):
+        """
+        Incrementa un contador
+
+        Args:
+            name: Nombre de la métrica
+            value: Cantidad a sumar
+            **labels: Etiquetas de la serie
+        """
+        key = _metric_key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        """
+        Fija el valor de un gauge
+
+        Args:
+            name: Nombre de la métrica
+            value: Valor actual
+            **labels: Etiquetas de la serie
+        """
+        key = _metric_key(name, labels)
+        with self._lock:
+            self._gauges[key] = value
+
+    def observe(self, name: str, value: float, **labels):
+        """
+        Registra una observación (p. ej. una duración en segundos)
+
+        Args:
+            name: Nombre de la métrica
+            value: Valor observado
+            **labels: Etiquetas de la serie
+        """
+        key = _metric_key(name, labels)
+        with self._lock:
+            timing = self._timings.get(key)
+            if timing is None:
+                self._timings[key] = {"count": 1, "sum": value, "min": value, "max": value, "last": value}
+            else:
+                timing["count"] += 1
+                timing["sum"] += value
+                timing["min"] = min(timing["min"], value)
+                timing["max"] = max(timing["max"], value)
+                timing["last"] = value
+
+    @contextmanager
+    def timer(self, name: str, **labels) -> Iterator[None]:
+        """
+        Context manager que observa la duración del bloque en segundos
+
+        Args:
+            name: Nombre de la métrica
+            **labels: Etiquetas de la serie
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def register_collector(self, name: str, collector: Callable[[], Dict[str, Any]]):
+        """
+        Registra una función que aporta métricas calculadas al vuelo
+
+        Args:
+            name: Sección del snapshot donde se publican
+            collector: Función sin argumentos que devuelve un dict
+        """
+        with self._lock:
+            self._collectors[name] = collector
+
+    def get_counter(self, name: str, **labels) -> float:
+        """Valor actual de un contador (0 si no existe)"""
+        with self._lock:
+            return self._counters.get(_metric_key(name, labels), 0)
+
+    def get_gauge(self, name: str, **labels) -> float:
+        """Valor actual de un gauge (0 si no existe)"""
+        with self._lock:
+            return self._gauges.get(_metric_key(name, labels), 0)
+
+    def get_timing(self, name: str, **labels) -> Dict[str, float]:
+        """Resumen de observaciones de una serie (vacío si no existe)"""
+        with self._lock:
+            return dict(self._timings.get(_metric_key(name, labels), {}))
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Obtiene una copia de todas las métricas
+
+        Returns:
+            Dict[str, Any]: counters, gauges, timings y secciones de collectors
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            timings = {
+                key: {**timing, "avg": timing["sum"] / timing["count"]}
+                for key, timing in self._timings.items()
+            }
+            collectors: Tuple[Tuple[str, Callable], ...] = tuple(self._collectors.items())
+
+        snapshot: Dict[str, Any] = {"counters": counters, "gauges": gauges, "timings": timings}
+        for name, collector in collectors:
+            try:
+                snapshot[name] = collector()
+            except Exception as e:
+                snapshot[name] = {"error": str(e)}
+        return snapshot
+
+    def reset(self):
+        """Borra todas las series (útil en benchmarks)"""
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._timings.clear()
+
+
+# Instancia global de métricas
+metrics = Metrics()
@@ -0,0 +1,306 @@
+"""
+Cache de páginas completas para las vistas anónimas de autenticación
+
+Para un usuario sin sesión, /login, /register y /forgot-password solo
+dependen del tenant y de unos pocos parámetros de la URL (error, message,
+next_url...). El decorador cached_page guarda el HTML renderizado junto con
+sus variantes comprimidas (gzip y, si está instalado, brotli) por
+(tenant, template) y lo sirve sin pasar por Jinja2. Solo se cachea la
+página canónica, sin ninguno de esos parámetros: sus valores son texto
+libre del cliente y cachearlos permitiría llenar la LRU con variantes
+inventadas. Las sesiones autenticadas nunca usan la cache y las entradas de
+un tenant se descartan cuando su configuración se recarga.
+"""
+import gzip
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from functools import wraps
+from typing import Any, Callable, Dict, Iterable, Mapping, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from config.settings import settings
+from utils.metrics import metrics
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - depende del entorno
+    brotli = None
+
+PageKey = Tuple[str, str, Tuple[Tuple[str, str], ...]]
+
+
+@dataclass(frozen=True)
+class CachedPage:
+    """Página renderizada y sus variantes comprimidas"""
+    body: bytes = field(repr=False)
+    encoded: Mapping[str, bytes] = field(repr=False)
+    content_type: str
+    render_seconds: float
+    created_at: float
+
+    @property
+    def size(self) -> int:
+        """Bytes ocupados por el cuerpo y sus variantes"""
+        return len(self.body) + sum(len(body) for body in self.encoded.values())
+
+
+def accepted_encoding(accept_encoding: str, available: Iterable[str]) -> Optional[str]:
+    """
+    Elige la mejor codificación disponible que acepta el cliente
+
+    Args:
+        accept_encoding: Valor del header Accept-Encoding
+        available: Codificaciones precalculadas (en orden de preferencia)
+
+    Returns:
+        Optional[str]: "br", "gzip" o None para enviar sin comprimir
+    """
+    accepted = set()
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(name.strip())
+    for encoding in available:
+        if encoding in accepted:
+            return encoding
+    return None
+
+
+class PageCache:
+    """
+    LRU de páginas renderizadas con invalidación por tenant
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 300):
+        """
+        Inicializa la cache
+
+        Args:
+            max_entries: Máximo de páginas guardadas
+            ttl: Segundos de vida de cada página (red de seguridad además de la invalidación)
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[PageKey, CachedPage]" = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bypasses = 0
+        self.render_seconds_saved = 0.0
+
+    def make_key(self, tenant_id: str, template: str, params: Mapping[str, Any]) -> Optional[PageKey]:
+        """
+        Clave normalizada de una página
+
+        Args:
+            tenant_id: ID del tenant
+            template: Template renderizado
+            params: Parámetros que cambian el resultado
+
+        Returns:
+            Optional[PageKey]: Clave o None si la página no se debe cachear
+            (algún parámetro tiene valor: solo se cachea la página canónica)
+        """
+        normalized = []
+        for name in sorted(params):
+            value = params[name]
+            if value is not None and str(value).strip():
+                return None
+            normalized.append((name, ""))
+        return (tenant_id, template, tuple(normalized))
+
+    def generation(self, tenant_id: str) -> int:
+        """Generación actual del tenant (cambia con cada invalidación)"""
+        return self._generations.get(tenant_id, 0)
+
+    def get(self, key: PageKey) -> Optional[CachedPage]:
+        """
+        Obtiene una página si existe y no expiró
+
+        Args:
+            key: Clave de make_key
+
+        Returns:
+            Optional[CachedPage]: Página cacheada o None
+        """
+        with self._lock:
+            page = self._entries.get(key)
+            if page is None:
+                self.misses += 1
+                return None
+            if time.monotonic() - page.created_at > self.ttl:
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.render_seconds_saved += page.render_seconds
+        return page
+
+    def put(self, key: PageKey, body: bytes, content_type: str, render_seconds: float,
+            generation: int) -> Optional[CachedPage]:
+        """
+        Guarda una página renderizada y precalcula sus variantes comprimidas
+
+        Args:
+            key: Clave de make_key
+            body: HTML renderizado
+            content_type: Header Content-Type de la respuesta
+            render_seconds: Lo que tardó en renderizarse
+            generation: Generación del tenant al empezar a renderizar
+
+        Returns:
+            Optional[CachedPage]: Página guardada o None si el tenant se
+            recargó mientras se renderizaba
+        """
+        encoded = {}
+        if brotli is not None:
+            encoded["br"] = brotli.compress(body)
+        encoded["gzip"] = gzip.compress(body, compresslevel=6, mtime=0)
+        page = CachedPage(body=body, encoded=encoded, content_type=content_type,
+                          render_seconds=render_seconds, created_at=time.monotonic())
+
+        with self._lock:
+            if self.generation(key[0]) != generation:
+                return None
+            self._entries[key] = page
+            self._entries.move_to_end(key)
+            while len(self._entries) > max(self.max_entries, 1):
+                self._entries.popitem(last=False)
+        return page
+
+    def invalidate_tenants(self, tenant_ids: Iterable[str]):
+        """
+        Descarta las páginas de los tenants indicados
+
+        Se registra como listener de recarga de TenantConfig.
+
+        Args:
+            tenant_ids: Tenants recargados
+        """
+        tenant_ids = set(tenant_ids)
+        with self._lock:
+            for tenant_id in tenant_ids:
+                self._generations[tenant_id] = self._generations.get(tenant_id, 0) + 1
+            for key in [key for key in self._entries if key[0] in tenant_ids]:
+                del self._entries[key]
+
+    def clear(self):
+        """Vacía la cache"""
+        with self._lock:
+            self._entries.clear()
+            for tenant_id in self._generations:
+                self._generations[tenant_id] += 1
+
+    def record_bypass(self):
+        """Cuenta un request que no pudo usar la cache"""
+        with self._lock:
+            self.bypasses += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Estadísticas para /metrics"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": sum(page.size for page in self._entries.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "bypasses": self.bypasses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "render_seconds_saved": self.render_seconds_saved,
+            }
+
+    def response(self, page: CachedPage, request: Request) -> Response:
+        """
+        Respuesta HTTP para una página cacheada (comprimida si el cliente lo acepta)
+
+        Args:
+            page: Página cacheada
+            request: Request actual
+
+        Returns:
+            Response: Respuesta lista para enviar
+        """
+        headers = {"Content-Type": page.content_type, "Vary": "Accept-Encoding"}
+        encoding = accepted_encoding(request.headers.get("accept-encoding", ""), page.encoded)
+        body = page.body
+        if encoding:
+            body = page.encoded[encoding]
+            headers["Content-Encoding"] = encoding
+        if settings.DEBUG:
+            headers["X-Page-Cache"] = "HIT"
+        return Response(content=body, headers=headers)
+
+
+# Instancia global de la cache de páginas
+page_cache = PageCache(max_entries=settings.PAGE_CACHE_MAX_ENTRIES, ttl=settings.PAGE_CACHE_TTL)
+metrics.register_collector("page_cache", page_cache.stats)
+
+
+def cached_page(template: str, vary: Tuple[str, ...] = ()) -> Callable:
+    """
+    Decorador que sirve la vista desde la cache de páginas para usuarios anónimos
+
+    Va encima de @guest_required: las sesiones autenticadas se saltan la
+    cache y guest_required las redirige; para una sesión anónima
+    guest_required no hace nada, así que un acierto lo puede omitir.
+    Si alguno de los parámetros de vary tiene valor la vista se renderiza
+    sin tocar la cache.
+
+    Args:
+        template: Template que renderiza la vista (parte de la clave)
+        vary: Parámetros de la vista que cambian el HTML
+
+    Returns:
+        Callable: Decorador
+    """
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            request = kwargs.get('request')
+            if request is None:
+                request = next((arg for arg in args if isinstance(arg, Request)), None)
+
+            authenticated = (
+                request is not None and "session" in request.scope
+                and request.session.get("authenticated", False)
+            )
+            key = None
+            if settings.PAGE_CACHE_ENABLED and request is not None and not authenticated:
+                tenant_id = getattr(request.state, 'tenant_id', settings.DEFAULT_TENANT)
+                key = page_cache.make_key(tenant_id, template, {name: kwargs.get(name) for name in vary})
+
+            if key is None:
+                page_cache.record_bypass()
+                metrics.increment("page_cache_requests_total", template=template, result="bypass")
+                return await func(*args, **kwargs)
+
+            page = page_cache.get(key)
+            if page is not None:
+                metrics.increment("page_cache_requests_total", template=template, result="hit")
+                metrics.increment("page_cache_render_seconds_saved_total", page.render_seconds)
+                return page_cache.response(page, request)
+
+            metrics.increment("page_cache_requests_total", template=template, result="miss")
+            generation = page_cache.generation(key[0])
+            start_time = time.perf_counter()
+            response = await func(*args, **kwargs)
+            elapsed = time.perf_counter() - start_time
+            metrics.observe("page_render_seconds", elapsed, template=template)
+
+            body = getattr(response, 'body', None)
+            if (response.status_code == 200 and isinstance(body, bytes)
+                    and "set-cookie" not in response.headers):
+                content_type = response.headers.get("content-type", "text/html; charset=utf-8")
+                page_cache.put(key, body, content_type, elapsed, generation)
+            return response
+
+        return wrapper
+    return decorator